@@ -125,10 +125,13 @@ class DataType(object):
 		return typemap[self._kind][self._nbit]
 	def as_numpy_dtype(self):
 		typemap = {
-			'i':  {  8: np.int8,  16: np.int16,
-			        32: np.int32, 64: np.int64},
-			'u':  {  8: np.uint8,  16: np.uint16,
-			        32: np.uint32, 64: np.uint64},
+			# HACK: Sub-byte types map to bytes to support 'packed' arrays
+			'i':  { 1: np.int8,   2: np.int8,    4: np.int8,
+			        8: np.int8,  16: np.int16,
+			       32: np.int32, 64: np.int64},
+			'u':  { 1: np.uint8,  2: np.uint8,   4: np.uint8,
+			        8: np.uint8, 16: np.uint16,
+			       32: np.uint32, 64: np.uint64},
 			'f':  {16: np.float16,  32: np.float32,
 			       64: np.float64, 128: np.float128},
 			# HACK: These are just types that match the storage size;
@@ -628,7 +628,9 @@ class SigprocReadBlock(SourceBlock):
                     break
 class KurtosisBlock(TransformBlock):
     """This block performs spectral kurtosis and cleaning
-        on sigproc-formatted data in rings"""
+        on sigproc-formatted data in rings
+    Note: bifrost.blocks.spectral_kurtosis is a vectorized replacement for
+        this block that uses the bifrost.pipeline API."""
     def __init__(self, gulp_size=1048576, core=-1):
         """
         @param[in] input_ring Ring containing a 1d
@@ -713,7 +715,9 @@ class DedisperseBlock(object):
         pass
 
 class FoldBlock(TransformBlock):
-    """This block folds a signal into a histogram"""
+    """This block folds a signal into a histogram
+    Note: bifrost.blocks.fold is a vectorized replacement for this block
+        that uses the bifrost.pipeline API."""
     def __init__(
             self, bins, period=1e-3,
             gulp_size=4096*256, dispersion_measure=0,
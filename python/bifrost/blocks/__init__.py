@@ -33,10 +33,16 @@ from .transpose import transpose, TransposeBlock
 from .reverse import reverse, ReverseBlock
 from .fft import fft, FftBlock
 from .fftshift import fftshift, FftShiftBlock
+from .pfb import pfb, PfbBlock
 from .fdmt import fdmt, FdmtBlock
+from .single_pulse_search import single_pulse_search, SinglePulseSearchBlock
+from .fold import fold, FoldBlock
+from .harmonic_sum import harmonic_sum, HarmonicSumBlock
+from .spectral_kurtosis import spectral_kurtosis, SpectralKurtosisBlock
 from .detect import detect, DetectBlock
 from .guppi_raw import read_guppi_raw, GuppiRawSourceBlock
 from .print_header import print_header, PrintHeaderBlock
+from .udp_transmit import udp_transmit, UdpTransmitBlock
 from .sigproc import read_sigproc, SigprocSourceBlock
 from .sigproc import write_sigproc, SigprocSinkBlock
 from .scrunch import scrunch, ScrunchBlock
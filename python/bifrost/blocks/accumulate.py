@@ -35,8 +35,7 @@ from __future__ import absolute_import
 
 import bifrost as bf
 from bifrost.pipeline import TransformBlock
-
-from copy import deepcopy
+from bifrost.header_codec import copy_header
 
 class AccumulateBlock(TransformBlock):
     """Accumulate and sum frames of a ring on the GPU.
@@ -69,11 +68,11 @@ class AccumulateBlock(TransformBlock):
             self.dtype  = dtype
     def define_valid_input_spaces(self):
             """Return set of valid spaces (or 'any') for each input"""
-            return ('cuda',)
+            return ('cuda', 'system')
     def on_sequence(self, iseq):
             ihdr = iseq.header
             itensor = ihdr['_tensor']
-            ohdr = deepcopy(ihdr)
+            ohdr = copy_header(ihdr)
             otensor = ohdr['_tensor']
             if 'scales' in otensor:
                     frame_axis = otensor['shape'].index(-1)
@@ -29,18 +29,19 @@
 from __future__ import absolute_import
 
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 from bifrost.ndarray import copy_array
 
-from copy import deepcopy
-
 class CopyBlock(TransformBlock):
 	def __init__(self, iring, space=None, *args, **kwargs):
 		super(CopyBlock, self).__init__(iring, *args, **kwargs)
 		if space is None:
 			space = self.iring.space
 		self.orings = [self.create_ring(space=space)]
+	def define_variable_nframe(self):
+		return True
 	def on_sequence(self, iseq):
-		ohdr = deepcopy(iseq.header)
+		ohdr = copy_header(iseq.header)
 		return ohdr
 	def on_data(self, ispan, ospan):
 		copy_array(ospan.data, ispan.data)
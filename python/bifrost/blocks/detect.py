@@ -38,10 +38,9 @@ from __future__ import absolute_import
 
 import bifrost as bf
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 from bifrost.DataType import DataType
 
-from copy import deepcopy
-
 class DetectBlock(TransformBlock):
 	def __init__(self, iring, mode, axis=None,
 	             *args, **kwargs):
@@ -54,7 +53,9 @@ class DetectBlock(TransformBlock):
 		self.mode = mode.lower()
 	def define_valid_input_spaces(self):
 		"""Return set of valid spaces (or 'any') for each input"""
-		return ('cuda',)
+		return ('cuda', 'system')
+	def define_variable_nframe(self):
+		return True
 	def on_sequence(self, iseq):
 		ihdr = iseq.header
 		itensor = ihdr['_tensor']
@@ -69,7 +70,7 @@ class DetectBlock(TransformBlock):
 		elif isinstance(self.axis, basestring):
 			self.axis = itensor['labels'].index(self.axis)
 		# Note: axis may be None here, which indicates single-pol mode
-		ohdr = deepcopy(ihdr)
+		ohdr = copy_header(ihdr)
 		otensor = ohdr['_tensor']
 		if self.axis is not None:
 			self.npol = otensor['shape'][self.axis]
@@ -31,15 +31,15 @@
 from __future__ import absolute_import
 
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 from bifrost.fdmt import Fdmt
 from bifrost.units import convert_units
 
-from copy import deepcopy
 import math
 
 class FdmtBlock(TransformBlock):
 	def __init__(self, iring, max_dm,
-	             exponent=-2.0, negative_delays=False,
+	             exponent=-2.0, negative_delays=False, incremental=True,
 	             *args, **kwargs):
 		super(FdmtBlock, self).__init__(iring, *args, **kwargs)
 		self.space    = self.orings[0].space
@@ -48,10 +48,14 @@ class FdmtBlock(TransformBlock):
 		self.dm_units = 'pc cm^-3'
 		self.exponent = exponent
 		self.negative_delays = negative_delays
+		# Note: Incremental execution keeps the partial sums between gulps
+		#         instead of re-reading max_delay frames of overlap each
+		#         gulp. It does not support negative delays.
+		self.incremental = incremental and not negative_delays
 		self.fdmt     = Fdmt()
 	def define_valid_input_spaces(self):
 		"""Return set of valid spaces (or 'any') for each input"""
-		return ('cuda',)
+		return ('cuda', 'system')
 	def on_sequence(self, iseq):
 		ihdr = iseq.header
 		itensor = ihdr['_tensor']
@@ -70,7 +74,7 @@ class FdmtBlock(TransformBlock):
 		if self.negative_delays:
 			self.dm_step *= -1
 		self.fdmt.init(nchan, self.max_delay, f0, df, self.exponent, self.space)
-		ohdr = deepcopy(ihdr)
+		ohdr = copy_header(ihdr)
 		if 'refdm' in ihdr:
 			refdm = convert_units(ihdr['refdm'], ihdr['refdm_units'], self.dm_units)
 		else:
@@ -88,9 +92,14 @@ class FdmtBlock(TransformBlock):
 		ohdr['cfreq_units']  = itensor['units'][-2]
 		ohdr['bw']           = nchan*df_
 		ohdr['bw_units']     = itensor['units'][-2]
+		if self.incremental:
+			# Note: The output lags the input by max_delay frames
+			return ohdr
 		gulp_nframe = self.gulp_nframe or ihdr['gulp_nframe']
 		return ohdr, slice(0, gulp_nframe + self.max_delay, gulp_nframe)
 	def on_data(self, ispan, ospan):
+		if self.incremental:
+			return self.fdmt.execute_incremental(ispan.data, ospan.data)
 		if ispan.nframe <= self.max_delay:
 			# Cannot fully process any frames
 			return 0
@@ -29,11 +29,11 @@
 from __future__ import absolute_import
 
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 from bifrost.fft import Fft
 from bifrost.units import transform_units
 from bifrost.DataType import DataType
 
-from copy import deepcopy
 import math
 
 class FftBlock(TransformBlock):
@@ -64,7 +64,7 @@ class FftBlock(TransformBlock):
 		self.fft         = Fft()
 	def define_valid_input_spaces(self):
 		"""Return set of valid spaces (or 'any') for each input"""
-		return ('cuda',)
+		return ('cuda', 'system')
 	def on_sequence(self, iseq):
 		ihdr = iseq.header
 		itensor = ihdr['_tensor']
@@ -85,7 +85,7 @@ class FftBlock(TransformBlock):
 		shape = [itensor['shape'][ax] for ax in axes]
 		
 		otype = itype.as_real() if self.real_output else itype.as_complex()
-		ohdr = deepcopy(ihdr)
+		ohdr = copy_header(ihdr)
 		otensor = ohdr['_tensor']
 		otensor['dtype'] = str(otype)
 		if itype.is_real and otype.is_complex:
@@ -127,7 +127,9 @@ class FftBlock(TransformBlock):
 		if (ispan.nframe != self.nframe or
 		    ispan._stride_bytes != self.istride or
 		    ospan._stride_bytes != self.ostride):
-			# (Re-)generate the FFT plan
+			# Note: Plans are cached process-wide, so this only creates a
+			#         plan the first time a span shape/layout is seen (e.g.,
+			#         the first partial gulp).
 			self.fft.init(ispan.data, ospan.data, axes=self.axes)
 			self.nframe  = ispan.nframe
 			self.istride = ispan._stride_bytes
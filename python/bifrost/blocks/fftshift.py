@@ -30,10 +30,9 @@ from __future__ import absolute_import
 
 import bifrost as bf
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 from bifrost.DataType import DataType
 
-from copy import deepcopy
-
 class FftShiftBlock(TransformBlock):
 	def __init__(self, iring, axes, inverse=False,
 	             *args, **kwargs):
@@ -44,7 +43,7 @@ class FftShiftBlock(TransformBlock):
 		self.inverse = inverse
 	def define_valid_input_spaces(self):
 		"""Return set of valid spaces (or 'any') for each input"""
-		return ('cuda',)
+		return ('cuda', 'system')
 	def on_sequence(self, iseq):
 		ihdr = iseq.header
 		itensor = ihdr['_tensor']
@@ -55,7 +54,7 @@ class FftShiftBlock(TransformBlock):
 		frame_axis = itensor['shape'].index(-1)
 		if frame_axis in self.axes:
 			raise KeyError("Cannot fftshift frame axis")
-		ohdr = deepcopy(ihdr)
+		ohdr = copy_header(ihdr)
 		otensor = ohdr['_tensor']
 		oshape = otensor['shape']
 		if 'scales' in itensor:
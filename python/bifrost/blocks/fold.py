@@ -0,0 +1,167 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Pulsar folding block
+profiles = fold(data, period, nbin, dm=0, subint_nframe=...)
+Folds a [time, pol, freq] filterbank into [time, pol, freq, phase]
+  pulse profiles (one frame per sub-integration).
+"""
+
+from __future__ import absolute_import
+
+import bifrost as bf
+from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
+from bifrost.units import convert_units
+
+import numpy as np
+
+class FoldBlock(TransformBlock):
+	"""This block folds a [time, pol, freq] filterbank at a given period and
+	dispersion measure into [time, pol, freq, phase] pulse profiles, which
+	is the layout written by SigprocSinkBlock as pulse profile files.
+	Each output frame is a sub-integration of subint_nframe input frames, and
+	each profile bin is the mean of the samples that fell into it. Any
+	incomplete sub-integration at the end of a sequence is discarded.
+	The dispersion delays (relative to the highest frequency) are computed
+	once per sequence. Folding is done with a scatter-add: np.bincount on the
+	host, or atomic adds in a bf.map kernel on the GPU.
+	"""
+	def __init__(self, iring, period, nbin, dm=0., subint_nframe=4096,
+	             *args, **kwargs):
+		super(FoldBlock, self).__init__(iring, *args, **kwargs)
+		self.period        = period
+		self.nbin          = nbin
+		self.dm            = dm
+		self.subint_nframe = subint_nframe
+		self.kdm           = 4.148741601e3 # MHz**2 cm**3 s / pc
+		self.space         = self.orings[0].space
+	def define_valid_input_spaces(self):
+		"""Return set of valid spaces (or 'any') for each input"""
+		return ('cuda', 'system')
+	def define_output_nframes(self, input_nframe):
+		"""Return number of frames that will be produced given input_nframe
+		"""
+		return input_nframe // self.subint_nframe + 1
+	def on_sequence(self, iseq):
+		ihdr = iseq.header
+		itensor = ihdr['_tensor']
+		if tuple(itensor['labels']) != ('time', 'pol', 'freq'):
+			raise KeyError("Expected axes [time, pol, freq], got %s" %
+			               itensor['labels'])
+		npol, nchan = itensor['shape'][1:]
+		t0, dt_  = itensor['scales'][0]
+		f0_, df_ = itensor['scales'][2]
+		dt = convert_units(dt_, itensor['units'][0], 's')
+		f0 = convert_units(f0_, itensor['units'][2], 'MHz')
+		df = convert_units(df_, itensor['units'][2], 'MHz')
+		freqs = f0 + np.arange(nchan)*df
+		delays = self.kdm * self.dm * (freqs**-2 - freqs.max()**-2)
+		# Note: Phases are computed relative to the start of the sequence to
+		#         avoid losing precision with large absolute times
+		t0_s = convert_units(t0, itensor['units'][0], 's')
+		self.phase0 = np.fmod(t0_s, self.period) / self.period
+		self.dt     = dt
+		self.delays = delays
+		self.delays_array = bf.ndarray(delays, dtype='f64', space=self.space)
+		self.profile = bf.ndarray(np.zeros((npol, nchan, self.nbin), np.float32),
+		                          space=self.space)
+		self.hits    = bf.ndarray(np.zeros((nchan, self.nbin), np.float32),
+		                          space=self.space)
+		self.subint_count = 0
+		
+		ohdr = copy_header(ihdr)
+		otensor = ohdr['_tensor']
+		otensor['dtype'] = 'f32'
+		otensor['shape'].append(self.nbin)
+		otensor['labels'].append('phase')
+		otensor['scales'][0] = [t0, dt_*self.subint_nframe]
+		otensor['scales'].append([0, 1./self.nbin])
+		otensor['units'].append(None)
+		ohdr['period']       = self.period
+		ohdr['period_units'] = 's'
+		ohdr['refdm']        = self.dm
+		ohdr['refdm_units']  = 'pc cm^-3'
+		ohdr['npuls']        = int(self.subint_nframe * dt / self.period)
+		return ohdr
+	def fold(self, idata, frame_offset):
+		"""Adds idata, which begins at input frame frame_offset, into the
+		current sub-integration"""
+		ntime, npol, nchan = idata.shape
+		if self.space == 'system':
+			t = (frame_offset + np.arange(ntime)) * self.dt
+			phase = self.phase0 + (t[:,None] - self.delays) / self.period
+			bins = ((phase - np.floor(phase)) * self.nbin).astype(np.intp)
+			np.minimum(bins, self.nbin - 1, out=bins)
+			chan_bins = bins + np.arange(nchan)*self.nbin
+			hits = np.bincount(chan_bins.ravel(), minlength=nchan*self.nbin)
+			self.hits += hits.reshape(nchan, self.nbin)
+			pol_chan_bins = (chan_bins[:,None,:] +
+			                 np.arange(npol)[:,None]*nchan*self.nbin)
+			sums = np.bincount(pol_chan_bins.ravel(),
+			                   weights=np.asarray(idata).ravel(),
+			                   minlength=npol*nchan*self.nbin)
+			self.profile += sums.reshape(npol, nchan, self.nbin)
+		else:
+			bf.map("""
+			double phase = phase0 + ((t0 + t)*dt - delays(c)) / period;
+			int bin = int((phase - floor(phase)) * nbin);
+			bin = bin < nbin ? bin : nbin - 1;
+			atomicAdd(&profile(p,c,bin), float(a(t,p,c)));
+			if( p == 0 ) {
+				atomicAdd(&hits(c,bin), 1.f);
+			}
+			""", idata.shape, 't', 'p', 'c',
+			       a=idata, profile=self.profile, hits=self.hits,
+			       delays=self.delays_array, phase0=self.phase0,
+			       t0=frame_offset, dt=self.dt, period=self.period,
+			       nbin=self.nbin)
+	def on_data(self, ispan, ospan):
+		idata = ispan.data
+		ncommit = 0
+		t = 0
+		while t < ispan.nframe:
+			n = min(ispan.nframe - t, self.subint_nframe - self.subint_count)
+			self.fold(idata[t:t+n], ispan.frame_offset + t)
+			self.subint_count += n
+			t += n
+			if self.subint_count == self.subint_nframe:
+				bf.map("""
+				float h = hits(c,b);
+				out(p,c,b) = h > 0 ? profile(p,c,b) / h : 0;
+				profile(p,c,b) = 0;
+				""", self.profile.shape, 'p', 'c', 'b',
+				       out=ospan.data[ncommit], profile=self.profile,
+				       hits=self.hits)
+				bf.map("hits = 0", hits=self.hits)
+				self.subint_count = 0
+				ncommit += 1
+		return ncommit
+
+def fold(iring, period, nbin, dm=0., subint_nframe=4096, *args, **kwargs):
+	return FoldBlock(iring, period, nbin, dm, subint_nframe, *args, **kwargs)
@@ -39,18 +39,33 @@ def get_with_default(obj, key, default=None):
 def mjd2unix(mjd):
 	return (mjd - 40587) * 86400
 
+class GuppiRawReader(object):
+	"""Reads a GUPPI raw file, parsing its first block header on opening"""
+	def __init__(self, filename):
+		self.f = open(filename, 'rb')
+		self.header = guppi_raw.read_header(self.f)
+		self.header_size = self.f.tell()
+	def close(self):
+		self.f.close()
+	def __enter__(self):
+		return self
+	def __exit__(self, type, value, tb):
+		self.close()
+	def fileno(self):
+		return self.f.fileno()
+	def readinto(self, buf):
+		return self.f.readinto(buf)
+
 class GuppiRawSourceBlock(SourceBlock):
 	def __init__(self, sourcenames, gulp_nframe=1, *args, **kwargs):
 		super(GuppiRawSourceBlock, self).__init__(sourcenames,
 		                                          gulp_nframe=gulp_nframe,
 		                                          *args, **kwargs)
 	def create_reader(self, sourcename):
-		return open(sourcename, 'rb')
+		return GuppiRawReader(sourcename)
 	def on_sequence(self, reader, sourcename):
-		previous_pos = reader.tell()
-		ihdr = guppi_raw.read_header(reader)
-		header_size = reader.tell() - previous_pos
-		self.header_buf = bytearray(header_size)
+		ihdr = reader.header
+		self.header_buf = bytearray(reader.header_size)
 		nbit      = ihdr['NBITS']
 		assert(nbit in set([4,8,16,32,64]))
 		nchan     = ihdr['OBSNCHAN']
@@ -0,0 +1,230 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Harmonic summing block
+sums = harmonic_sum(data, nharms=[1,2,4,8,16], axis='freq')
+Incoherently sums the harmonics of power spectra for periodicity searches.
+"""
+
+from __future__ import absolute_import
+
+import bifrost as bf
+from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
+from bifrost.DataType import DataType
+
+import numpy as np
+
+CANDIDATE_FIELDS = ['power', 'freq', 'nharm', 'time', 'beam']
+
+class HarmonicSumBlock(TransformBlock):
+	"""This block computes incoherent harmonic sums of power spectra along a
+	labelled frequency axis, for each number of harmonics in nharms.
+	The sum for fundamental bin f includes, for each harmonic k, the maximum
+	power over the input bins that cover k times the frequency range of bin
+	f (i.e., the harmonics are max-pooled across bins). Harmonics beyond the
+	end of the axis contribute zero. The frequency scale of the axis is used
+	to locate the harmonics, so spectra that do not start at zero frequency
+	(e.g., after fftshift) are also supported.
+	If threshold is None, the output contains the sums, with a new
+	'harmonic' axis (of length len(nharms)) inserted before the frequency
+	axis.
+	Otherwise, threshold gives the minimum summed power (either one value or
+	one per entry in nharms) of a candidate, and the output is a table of
+	candidates with the fields CANDIDATE_FIELDS (also listed in the
+	'candidate_fields' header entry). Only the best bin in each tile of
+	tile_nfreq bins is considered, and at most max_ncandidate of the most
+	powerful candidates are output per gulp. In this mode the frame axis
+	must be the first axis, and the other axes (apart from the frequency
+	axis) are flattened into the beam index.
+	"""
+	def __init__(self, iring, nharms=[1, 2, 4, 8, 16], axis='freq',
+	             threshold=None, tile_nfreq=64, max_ncandidate=1024,
+	             *args, **kwargs):
+		super(HarmonicSumBlock, self).__init__(iring, *args, **kwargs)
+		self.nharms         = sorted(nharms)
+		self.specified_axis = axis
+		if threshold is not None and np.isscalar(threshold):
+			threshold = [threshold] * len(self.nharms)
+		self.threshold      = threshold
+		self.tile_nfreq     = tile_nfreq
+		self.max_ncandidate = max_ncandidate
+		self.space          = self.orings[0].space
+		self.nharms_array   = bf.ndarray(np.array(self.nharms, dtype=np.int32),
+		                                 space=self.space)
+		self.workspace      = {}
+	def define_valid_input_spaces(self):
+		"""Return set of valid spaces (or 'any') for each input"""
+		return ('cuda', 'system')
+	def define_output_nframes(self, input_nframe):
+		"""Return number of frames that will be produced given input_nframe
+		"""
+		if self.threshold is not None:
+			return self.max_ncandidate
+		return input_nframe
+	def get_workspace(self, name, shape, dtype):
+		array = self.workspace.get(name)
+		if array is None or array.shape != shape:
+			array = bf.ndarray(shape=shape, dtype=dtype, space=self.space)
+			self.workspace[name] = array
+		return array
+	def on_sequence(self, iseq):
+		ihdr = iseq.header
+		itensor = ihdr['_tensor']
+		ndim = len(itensor['shape'])
+		if not DataType(itensor['dtype']).is_real:
+			raise TypeError("Input data must be real (i.e., power spectra)")
+		self.axis = self.specified_axis
+		if isinstance(self.axis, basestring):
+			self.axis = itensor['labels'].index(self.axis)
+		if itensor['shape'][self.axis] == -1:
+			raise KeyError("The frequency axis cannot be the frame axis")
+		self.nfreq = itensor['shape'][self.axis]
+		scales = itensor.get('scales', [None]*ndim)
+		self.f0, self.df = scales[self.axis] or (0, 1)
+		frame_axis = itensor['shape'].index(-1)
+		self.t0, self.dt = scales[frame_axis] or (0, 1)
+		
+		ohdr = copy_header(ihdr)
+		otensor = ohdr['_tensor']
+		ohdr['nharms'] = self.nharms
+		if self.threshold is None:
+			otensor['dtype'] = 'f32'
+			otensor['shape'].insert(self.axis, len(self.nharms))
+			for key, value in [('labels', 'harmonic'), ('scales', None),
+			                   ('units', None)]:
+				if key in otensor:
+					otensor[key].insert(self.axis, value)
+		else:
+			if frame_axis != 0:
+				raise KeyError("The frame axis must be the first axis")
+			if len(self.threshold) != len(self.nharms):
+				raise ValueError("Expected one threshold per entry in nharms")
+			units = itensor.get('units', [None]*ndim)
+			ohdr['_tensor'] = {'dtype':  'f64',
+			                   'shape':  [-1, len(CANDIDATE_FIELDS)],
+			                   'labels': ['candidate', 'field']}
+			ohdr['candidate_fields']     = CANDIDATE_FIELDS
+			ohdr['candidate_freq_units'] = units[self.axis]
+			ohdr['candidate_time_units'] = units[0]
+			ohdr['threshold']            = self.threshold
+		return ohdr
+	def harmonic_sum(self, idata, odata):
+		"""Computes the harmonic sums of idata into odata, which has the shape
+		of idata with an axis of length len(nharms) inserted before the
+		frequency axis"""
+		inds = ['i%i' % i for i in xrange(idata.ndim)]
+		inds[self.axis] = 'f'
+		iinds = list(inds)
+		iinds[self.axis] = '%s'
+		iinds = ','.join(iinds)
+		oinds = list(inds)
+		oinds.insert(self.axis, 'h')
+		oinds = ','.join(oinds)
+		func = """
+		float sum = 0;
+		int h = 0;
+		for( int k=1; k<=maxharm; ++k ) {
+			// The input bins that cover k times the range of bin f
+			int lo = (int)floor(k*(f + c - 0.5) - c + 0.5);
+			int hi = (int)floor(k*(f + c + 0.5) - c + 0.5);
+			lo = lo > 0     ? lo : 0;
+			hi = hi < nfreq ? hi : nfreq;
+			if( lo < hi ) {
+				float power = a(%s);
+				for( int j=lo+1; j<hi; ++j ) {
+					float p = a(%s);
+					power = p > power ? p : power;
+				}
+				sum += power;
+			}
+			if( k == nharms(h) ) {
+				b(%s) = sum;
+				++h;
+			}
+		}
+		""" % (iinds % 'lo', iinds % 'j', oinds)
+		bf.map(func, idata.shape, *inds,
+		       a=idata, b=odata, nharms=self.nharms_array,
+		       maxharm=self.nharms[-1], nfreq=self.nfreq,
+		       c=float(self.f0) / self.df)
+	def on_data(self, ispan, ospan):
+		idata = ispan.data
+		if self.threshold is None:
+			self.harmonic_sum(idata, ospan.data)
+			return
+		shape = list(idata.shape)
+		shape.insert(self.axis, len(self.nharms))
+		sums = self.get_workspace('sums', tuple(shape), 'f32')
+		self.harmonic_sum(idata, sums)
+		# Find the best bin in each tile of each harmonic sum
+		nframe = shape[0]
+		nouter = int(np.prod(shape[1:self.axis], dtype=int))
+		ninner = int(np.prod(shape[self.axis+2:], dtype=int))
+		nharm  = len(self.nharms)
+		ntile  = (self.nfreq - 1) // self.tile_nfreq + 1
+		sums = sums.reshape((nframe, nouter, nharm, self.nfreq, ninner))
+		tshape = (nframe, nouter, nharm, ntile, ninner)
+		tile_power = self.get_workspace('power', tshape, 'f32')
+		tile_f     = self.get_workspace('f',     tshape, 'i32')
+		bf.map("""
+		int f0 = i*tile_nfreq;
+		int f1 = f0 + tile_nfreq < nfreq ? f0 + tile_nfreq : nfreq;
+		float best_power = s(t,o,h,f0,n);
+		int   best_f     = f0;
+		for( int f=f0+1; f<f1; ++f ) {
+			float power = s(t,o,h,f,n);
+			if( power > best_power ) {
+				best_power = power;
+				best_f     = f;
+			}
+		}
+		p(t,o,h,i,n)    = best_power;
+		best(t,o,h,i,n) = best_f;
+		""", tshape, 't', 'o', 'h', 'i', 'n',
+		       s=sums, p=tile_power, best=tile_f,
+		       tile_nfreq=self.tile_nfreq, nfreq=self.nfreq)
+		tile_power = np.asarray(tile_power.copy('system'))
+		threshold = np.array(self.threshold).reshape((1, 1, nharm, 1, 1))
+		t, o, h, i, n = np.nonzero(tile_power >= threshold)
+		power = tile_power[t, o, h, i, n]
+		order = np.argsort(-power, kind='mergesort')[:self.max_ncandidate]
+		t, o, h, i, n = t[order], o[order], h[order], i[order], n[order]
+		f = np.asarray(tile_f.copy('system'))[t, o, h, i, n]
+		cands = np.empty((len(order), len(CANDIDATE_FIELDS)), np.float64)
+		cands[:,0] = power[order]
+		cands[:,1] = self.f0 + f * self.df
+		cands[:,2] = np.array(self.nharms)[h]
+		cands[:,3] = self.t0 + (ispan.frame_offset + t) * self.dt
+		cands[:,4] = o * ninner + n
+		ospan.data[:len(order)] = cands
+		return len(order)
+
+def harmonic_sum(iring, nharms=[1, 2, 4, 8, 16], axis='freq', threshold=None,
+                 *args, **kwargs):
+	return HarmonicSumBlock(iring, nharms, axis, threshold, *args, **kwargs)
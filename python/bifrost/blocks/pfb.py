@@ -0,0 +1,146 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import
+
+import bifrost as bf
+from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
+from bifrost.fft import Fft
+from bifrost.units import transform_units
+from bifrost.DataType import DataType
+
+import numpy as np
+
+def pfb_coeffs(nchan, ntap, window=np.hamming):
+	"""Returns the (ntap, nchan) windowed-sinc FIR coefficients of a PFB"""
+	if isinstance(window, basestring):
+		window = getattr(np, window)
+	x = np.arange(-0.5*ntap, 0.5*ntap, 1./nchan)[:ntap*nchan]
+	coeffs = np.sinc(x)
+	if window is not None:
+		coeffs *= window(ntap*nchan)
+	return coeffs.astype(np.float32).reshape(ntap, nchan)
+
+class PfbBlock(TransformBlock):
+	"""This block channelizes the frame (time) axis of the input data
+	stream using a polyphase filterbank: a windowed-sinc FIR filter across
+	ntap blocks of nchan samples followed by an FFT of length nchan.
+	Each output frame is one spectrum, and the new channel axis is inserted
+	after the frame axis (as with split_axis + fft, but without the
+	scalloping and leakage of a plain FFT). Real inputs produce
+	nchan//2+1 channels.
+	The window (applied to the sinc function) may be a function such as
+	np.hamming, the name of one, or None.
+	Axis scales are updated in the same way as by FftBlock.
+	"""
+	def __init__(self, iring, nchan, ntap=4, window=np.hamming,
+	             axis_label='freq',
+	             *args, **kwargs):
+		super(PfbBlock, self).__init__(iring, *args, **kwargs)
+		self.nchan      = nchan
+		self.ntap       = ntap
+		self.axis_label = axis_label
+		self.space      = self.orings[0].space
+		self.coeffs     = bf.ndarray(pfb_coeffs(nchan, ntap, window),
+		                             space=self.space)
+		self.fft        = Fft()
+		self.fir_output = None
+	def define_valid_input_spaces(self):
+		"""Return set of valid spaces (or 'any') for each input"""
+		return ('cuda', 'system')
+	def define_output_nframes(self, input_nframe):
+		"""Return number of frames that will be produced given input_nframe
+		"""
+		return max(input_nframe // self.nchan - (self.ntap - 1), 0)
+	def on_sequence(self, iseq):
+		ihdr = iseq.header
+		itensor = ihdr['_tensor']
+		if itensor['shape'][0] != -1:
+			raise KeyError("The frame axis must be the first axis")
+		itype = DataType(itensor['dtype'])
+		self.real_input = itype.is_real
+		self.fir_type = itype.as_floating_point()
+		if self.fir_type._nbit < 32:
+			self.fir_type = DataType((self.fir_type._kind, 32))
+		nfreq = self.nchan // 2 + 1 if self.real_input else self.nchan
+		
+		ohdr = copy_header(ihdr)
+		otensor = ohdr['_tensor']
+		otensor['dtype'] = str(self.fir_type.as_complex())
+		otensor['shape'].insert(1, nfreq)
+		if 'labels' in otensor:
+			otensor['labels'].insert(1, self.axis_label)
+		if 'units' in otensor:
+			otensor['units'].insert(1, transform_units(otensor['units'][0], -1))
+		if 'scales' in otensor:
+			t0, dt = otensor['scales'][0]
+			otensor['scales'][0] = [t0, dt*self.nchan]
+			otensor['scales'].insert(1, [0, 1. / (dt*self.nchan)])
+		
+		# Each gulp must be a whole no. spectra, and gulps overlap by the
+		#   samples needed for the remaining taps.
+		gulp_nframe = self.gulp_nframe or ihdr['gulp_nframe']
+		gulp_nframe = -(-gulp_nframe // self.nchan) * self.nchan
+		self.overlap = (self.ntap - 1) * self.nchan
+		return ohdr, slice(0, gulp_nframe + self.overlap, gulp_nframe)
+	def on_data(self, ispan, ospan):
+		nspectra = self.define_output_nframes(ispan.nframe)
+		if nspectra == 0:
+			# Cannot fully process any frames
+			return 0
+		idata = ispan.data[:(nspectra + self.ntap - 1)*self.nchan]
+		nrest = idata.size // idata.shape[0] if idata.shape[0] else 0
+		idata = idata.reshape((nspectra + self.ntap - 1, self.nchan, nrest))
+		odata = ospan.data[:nspectra].reshape((nspectra, -1, nrest))
+		shape = (nspectra, self.nchan, nrest)
+		if (self.fir_output is None or
+		    self.fir_output.shape[0] < nspectra or
+		    self.fir_output.shape[1:] != shape[1:] or
+		    DataType(self.fir_output.dtype) != self.fir_type):
+			self.fir_output = bf.ndarray(shape=shape,
+			                             dtype=str(self.fir_type),
+			                             space=self.space)
+		fir_output = self.fir_output[:nspectra]
+		bf.map("""
+		b_type sum = b_type(0);
+		for( int t=0; t<ntap; ++t ) {
+			sum += b_type(a(s+t,c,r)) * h(t,c);
+		}
+		b(s,c,r) = sum;
+		""", shape, 's', 'c', 'r',
+		       a=idata, b=fir_output, h=self.coeffs, ntap=self.ntap)
+		self.fft.init(fir_output, odata, axes=1)
+		size = self.fft.workspace_size
+		with self.get_temp_storage(self.space).allocate(size) as workspace:
+			self.fft.execute_workspace(fir_output, odata,
+			                           workspace.ptr, workspace.size)
+		return nspectra
+
+def pfb(iring, nchan, ntap=4, window=np.hamming, *args, **kwargs):
+	return PfbBlock(iring, nchan, ntap, window, *args, **kwargs)
@@ -31,10 +31,9 @@ from __future__ import absolute_import
 import bifrost as bf
 import bifrost.quantize
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 from bifrost.DataType import DataType
 
-from copy import deepcopy
-
 class QuantizeBlock(TransformBlock):
 	def __init__(self, iring, dtype, scale=1.,
 	             *args, **kwargs):
@@ -44,9 +43,11 @@ class QuantizeBlock(TransformBlock):
 	def define_valid_input_spaces(self):
 		"""Return set of valid spaces (or 'any') for each input"""
 		return ('system',)
+	def define_variable_nframe(self):
+		return True
 	def on_sequence(self, iseq):
 		ihdr = iseq.header
-		ohdr = deepcopy(ihdr)
+		ohdr = copy_header(ihdr)
 		itype = DataType(ihdr['_tensor']['dtype'])
 		self.itype = itype
 		# Allow user to pass nbit instead of explicit dtype
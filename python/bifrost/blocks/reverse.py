@@ -30,10 +30,9 @@ from __future__ import absolute_import
 
 import bifrost as bf
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 from bifrost.DataType import DataType
 
-from copy import deepcopy
-
 class ReverseBlock(TransformBlock):
 	def __init__(self, iring, axes, *args, **kwargs):
 		super(ReverseBlock, self).__init__(iring, *args, **kwargs)
@@ -42,7 +41,7 @@ class ReverseBlock(TransformBlock):
 		self.specified_axes = axes
 	def define_valid_input_spaces(self):
 		"""Return set of valid spaces (or 'any') for each input"""
-		return ('cuda',)
+		return ('cuda', 'system')
 	def on_sequence(self, iseq):
 		ihdr = iseq.header
 		itensor = ihdr['_tensor']
@@ -53,7 +52,7 @@ class ReverseBlock(TransformBlock):
 		frame_axis = itensor['shape'].index(-1)
 		if frame_axis in self.axes:
 			raise KeyError("Cannot reverse frame axis")
-		ohdr = deepcopy(ihdr)
+		ohdr = copy_header(ihdr)
 		otensor = ohdr['_tensor']
 		oshape = otensor['shape']
 		if 'scales' in itensor:
@@ -37,8 +37,7 @@ into fewer frames, and then outputting the new frame.
 from __future__ import absolute_import
 
 from bifrost.pipeline import TransformBlock
-
-from copy import deepcopy
+from bifrost.header_codec import copy_header
 
 class ScrunchBlock(TransformBlock):
     def __init__(self, iring, factor, *args, **kwargs):
@@ -55,7 +54,7 @@ class ScrunchBlock(TransformBlock):
                 raise ValueError("Scrunch factor does not divide gulp size")
         return input_nframe // self.factor
     def on_sequence(self, iseq):
-        ohdr = deepcopy(iseq.header)
+        ohdr = copy_header(iseq.header)
         ohdr['_tensor']['scales'][0][1] *= self.factor
         return ohdr
     def on_data(self, ispan, ospan):
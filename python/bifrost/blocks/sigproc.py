@@ -28,6 +28,8 @@
 
 from __future__ import absolute_import
 
+import bifrost as bf
+import bifrost.unpack
 from bifrost.pipeline import SourceBlock, SinkBlock
 import bifrost.sigproc2 as sigproc
 from bifrost.DataType import DataType
@@ -98,10 +100,33 @@ class SigprocSourceBlock(SourceBlock):
 		ohdr['time_tag'] = time_tag
 		ohdr['name']     = sourcename
 		return [ohdr]
+	def _can_view(self, reader):
+		# Note: Frames must be a whole number of bytes to be viewed, and the
+		#         packed (last) dim must divide evenly for bf.unpack
+		if reader.nbit >= 8:
+			return True
+		pack_factor = 8 // reader.nbit
+		return reader.header['nchans'] % pack_factor == 0
 	def on_data(self, reader, ospans):
 		ospan = ospans[0]
 		#print "SigprocReadBlock::on_data", ospan.data.dtype
-		if self.unpack:
+		if self.unpack and self._can_view(reader):
+			# Note: This reads straight from the memory-mapped file into the
+			#         output span, without any intermediate arrays
+			indata = reader.view(ospan.shape[0])
+			nframe = indata.shape[0]
+			if nframe == 0:
+				pass
+			elif reader.nbit < 8:
+				itype = ['u','i'][reader.signed] + str(reader.nbit)
+				packed = bf.ndarray(buffer=indata.ctypes.data,
+				                    shape=indata.shape[:-1] +
+				                          (reader.header['nchans'],),
+				                    dtype=itype, space='system')
+				bf.unpack.unpack(packed, ospan.data[:nframe])
+			else:
+				ospan.data[:nframe] = indata
+		elif self.unpack:
 			indata = reader.read(ospan.shape[0])
 			nframe = indata.shape[0]
 			#print indata.shape, indata.dtype, nframe
@@ -0,0 +1,252 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Single-pulse search block
+cands = single_pulse_search(data, threshold=6.0)
+Searches a [..., dispersion, time] data stream (e.g., the output of
+  FdmtBlock) for dispersed pulses and outputs a compact table of candidates.
+"""
+
+from __future__ import absolute_import
+
+import bifrost as bf
+from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
+
+import numpy as np
+
+CANDIDATE_FIELDS = ['snr', 'time', 'dm', 'width', 'beam', 'nmember']
+
+def cluster_candidates(beam, dm, time, width, snr, max_ddm, max_dtime):
+	"""Groups candidates that are neighbours in (beam, DM, time, width) using
+	a friends-of-friends algorithm, and returns the index of the brightest
+	member of each cluster and the number of members in each cluster.
+	Two candidates are neighbours if they are in the same beam, their DM
+	indices differ by no more than max_ddm and their start times differ by
+	no more than max_dtime plus the wider of their two widths.
+	"""
+	order = np.argsort(-snr, kind='mergesort')
+	unassigned = np.ones(len(snr), dtype=bool)
+	peaks    = []
+	nmembers = []
+	for i in order:
+		if not unassigned[i]:
+			continue
+		# Note: The first unassigned candidate is always the brightest member
+		#         of its cluster
+		unassigned[i] = False
+		nmember  = 1
+		frontier = [i]
+		while frontier:
+			j = frontier.pop()
+			friends = np.flatnonzero(
+			    unassigned &
+			    (beam == beam[j]) &
+			    (np.abs(dm - dm[j]) <= max_ddm) &
+			    (np.abs(time - time[j]) <= max_dtime + np.maximum(width, width[j])))
+			unassigned[friends] = False
+			nmember += len(friends)
+			frontier.extend(friends)
+		peaks.append(i)
+		nmembers.append(nmember)
+	return np.array(peaks, dtype=int), np.array(nmembers, dtype=int)
+
+class SinglePulseSearchBlock(TransformBlock):
+	"""This block searches a [..., dispersion, time] data stream (e.g., the
+	output of FdmtBlock) for single pulses, and outputs one frame per
+	candidate instead of the dense DM-time plane.
+	The search proceeds as follows, with the dense steps done in the input
+	space:
+	  1) The baseline of each DM trial is removed by subtracting a running
+	     mean over baseline_nframe frames, and the result is normalised by
+	     its rms over the gulp.
+	  2) The data are convolved with boxcars of each of the given widths
+	     (using prefix sums, so that the cost is independent of the width),
+	     and the S/N of the best boxcar starting in each tile of
+	     tile_nframe frames is found.
+	  3) Only the tiles with S/N >= threshold are copied to the host, where
+	     they are clustered with a friends-of-friends algorithm in
+	     (beam, DM, time, width). DM trials up to cluster_ndm apart are
+	     considered neighbours.
+	The output frames have the fields CANDIDATE_FIELDS (also listed in the
+	'candidate_fields' header entry), with time and width in the units of
+	the time axis and dm in the units of the dispersion axis. The leading
+	axes of the input are flattened into the beam index.
+	At most max_ncandidate of the brightest candidates are output per gulp.
+	"""
+	def __init__(self, iring, threshold=6.0, widths=[1, 2, 4, 8, 16, 32],
+	             baseline_nframe=1024, tile_nframe=None, cluster_ndm=8,
+	             max_ncandidate=1024,
+	             *args, **kwargs):
+		super(SinglePulseSearchBlock, self).__init__(iring, *args, **kwargs)
+		self.threshold       = threshold
+		self.widths          = sorted(widths)
+		self.baseline_nframe = baseline_nframe
+		self.tile_nframe     = tile_nframe or self.widths[-1]
+		self.cluster_ndm     = cluster_ndm
+		self.max_ncandidate  = max_ncandidate
+		self.space           = self.orings[0].space
+		# Gulps overlap so that every boxcar fits within a gulp
+		self.overlap         = self.widths[-1]
+		self.workspace       = {}
+		widths = np.array(self.widths, dtype=np.int32)
+		self.width_array = bf.ndarray(widths, space=self.space)
+		self.norm_array  = bf.ndarray((1. / np.sqrt(widths)).astype(np.float32),
+		                              space=self.space)
+	def define_valid_input_spaces(self):
+		"""Return set of valid spaces (or 'any') for each input"""
+		return ('cuda', 'system')
+	def define_output_nframes(self, input_nframe):
+		"""Return number of frames that will be produced given input_nframe
+		"""
+		return self.max_ncandidate
+	def get_workspace(self, name, shape, dtype):
+		array = self.workspace.get(name)
+		if array is None or array.shape != shape:
+			array = bf.ndarray(shape=shape, dtype=dtype, space=self.space)
+			self.workspace[name] = array
+		return array
+	def on_sequence(self, iseq):
+		ihdr = iseq.header
+		itensor = ihdr['_tensor']
+		ndim = len(itensor['shape'])
+		if ndim < 2 or itensor['shape'][-1] != -1:
+			raise KeyError("The frame (time) axis must be the last axis")
+		labels = itensor.get('labels', [None]*ndim)
+		if 'dispersion' in labels and labels.index('dispersion') != ndim - 2:
+			raise KeyError("The dispersion axis must precede the time axis")
+		scales = itensor.get('scales', [None]*ndim)
+		units  = itensor.get('units',  [None]*ndim)
+		self.t0,  self.dt  = scales[-1] or (0, 1)
+		self.dm0, self.ddm = scales[-2] or (0, 1)
+		self.ndm = itensor['shape'][-2]
+		
+		ohdr = copy_header(ihdr)
+		ohdr['_tensor'] = {'dtype':  'f64',
+		                   'shape':  [-1, len(CANDIDATE_FIELDS)],
+		                   'labels': ['candidate', 'field']}
+		ohdr['candidate_fields']     = CANDIDATE_FIELDS
+		ohdr['candidate_time_units'] = units[-1]
+		ohdr['candidate_dm_units']   = units[-2]
+		ohdr['threshold']            = self.threshold
+		
+		gulp_nframe = self.gulp_nframe or ihdr['gulp_nframe']
+		return ohdr, slice(0, gulp_nframe + self.overlap, gulp_nframe)
+	def on_data(self, ispan, ospan):
+		nframe  = ispan.nframe
+		nsearch = nframe - self.overlap
+		if nsearch <= 0:
+			# Cannot fully process any frames
+			return 0
+		idata = ispan.data.reshape((-1, self.ndm, nframe))
+		shape = idata.shape[:2]
+		ntile = (nsearch - 1) // self.tile_nframe + 1
+		cumsum   = self.get_workspace('cumsum', shape + (nframe+1,), 'f64')
+		boxsum   = self.get_workspace('boxsum', shape + (nframe+1,), 'f64')
+		rms      = self.get_workspace('rms',    shape, 'f32')
+		tile_snr = self.get_workspace('snr',    shape + (ntile,), 'f32')
+		tile_t   = self.get_workspace('t',      shape + (ntile,), 'i32')
+		tile_w   = self.get_workspace('w',      shape + (ntile,), 'i32')
+		# Prefix sums of the input, for the running-mean baseline
+		bf.map("""
+		double sum = 0;
+		p(b,d,0) = 0;
+		for( int t=0; t<n; ++t ) {
+			sum += a(b,d,t);
+			p(b,d,t+1) = sum;
+		}
+		""", shape, 'b', 'd', a=idata, p=cumsum, n=nframe)
+		# Prefix sums and rms of the baseline-subtracted data
+		bf.map("""
+		double sum = 0, sumsq = 0;
+		q(b,d,0) = 0;
+		for( int t=0; t<n; ++t ) {
+			int lo = t - h > 0 ? t - h : 0;
+			int hi = t + h + 1 < n ? t + h + 1 : n;
+			double x = a(b,d,t) - (p(b,d,hi) - p(b,d,lo)) / (hi - lo);
+			sum   += x;
+			sumsq += x*x;
+			q(b,d,t+1) = sum;
+		}
+		rms(b,d) = sqrt(sumsq / n);
+		""", shape, 'b', 'd', a=idata, p=cumsum, q=boxsum, rms=rms,
+		       n=nframe, h=self.baseline_nframe // 2)
+		# Best boxcar in each tile
+		bf.map("""
+		float best_snr = 0;
+		int   best_t   = 0;
+		int   best_w   = 0;
+		float scale = rms(b,d) > 0 ? 1.f / rms(b,d) : 0.f;
+		int t0 = i*tile_nframe;
+		int t1 = t0 + tile_nframe < nsearch ? t0 + tile_nframe : nsearch;
+		for( int t=t0; t<t1; ++t ) {
+			for( int k=0; k<nwidth; ++k ) {
+				int w = widths(k);
+				float snr = (q(b,d,t+w) - q(b,d,t)) * norms(k) * scale;
+				if( snr > best_snr ) {
+					best_snr = snr;
+					best_t   = t;
+					best_w   = k;
+				}
+			}
+		}
+		snr(b,d,i) = best_snr;
+		tt(b,d,i)  = best_t;
+		ww(b,d,i)  = best_w;
+		""", shape + (ntile,), 'b', 'd', 'i',
+		       q=boxsum, rms=rms, widths=self.width_array,
+		       norms=self.norm_array, snr=tile_snr, tt=tile_t, ww=tile_w,
+		       nwidth=len(self.widths), nsearch=nsearch,
+		       tile_nframe=self.tile_nframe)
+		tile_snr = np.asarray(tile_snr.copy('system'))
+		beam, dm, tile = np.nonzero(tile_snr >= self.threshold)
+		if len(beam) == 0:
+			return 0
+		snr   = tile_snr[beam, dm, tile]
+		time  = np.asarray(tile_t.copy('system'))[beam, dm, tile]
+		width = np.array(self.widths)[
+		    np.asarray(tile_w.copy('system'))[beam, dm, tile]]
+		peaks, nmembers = cluster_candidates(beam, dm, time, width, snr,
+		                                     self.cluster_ndm,
+		                                     self.tile_nframe)
+		# Note: peaks are ordered by decreasing S/N
+		peaks    = peaks[:self.max_ncandidate]
+		nmembers = nmembers[:self.max_ncandidate]
+		frame0 = ispan.frame_offset
+		cands = np.empty((len(peaks), len(CANDIDATE_FIELDS)), np.float64)
+		cands[:,0] = snr[peaks]
+		cands[:,1] = self.t0  + (frame0 + time[peaks]) * self.dt
+		cands[:,2] = self.dm0 + dm[peaks] * self.ddm
+		cands[:,3] = width[peaks] * self.dt
+		cands[:,4] = beam[peaks]
+		cands[:,5] = nmembers
+		ospan.data[:len(peaks)] = cands
+		return len(peaks)
+
+def single_pulse_search(iring, threshold=6.0, *args, **kwargs):
+	return SinglePulseSearchBlock(iring, threshold, *args, **kwargs)
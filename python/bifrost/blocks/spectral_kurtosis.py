@@ -0,0 +1,157 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Spectral kurtosis RFI flagging block
+data = spectral_kurtosis(data, window_nframe=128, mode='zero')
+mask = spectral_kurtosis(data, window_nframe=128, mode='mask')
+"""
+
+from __future__ import absolute_import
+
+import bifrost as bf
+from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
+from bifrost.DataType import DataType
+
+import numpy as np
+
+def sk_thresholds(m, nacc=1, shape_factor=1., nsigma=3.):
+	"""Returns the (lower, upper) thresholds of the generalized spectral
+	kurtosis estimator for windows of m samples, each of which is the
+	sum of nacc power spectra with shape factor shape_factor.
+	The thresholds are nsigma standard deviations from the expected value of
+	1, using the variance of the estimator given by Nita & Gary (2010).
+	"""
+	nd = nacc * shape_factor
+	var = (2. * nd * (nd + 1) * m**2 /
+	       ((m - 1) * (m*nd + 2) * (m*nd + 3)))
+	return 1 - nsigma*np.sqrt(var), 1 + nsigma*np.sqrt(var)
+
+class SpectralKurtosisBlock(TransformBlock):
+	"""This block flags radio frequency interference using the generalized
+	spectral kurtosis (SK) estimator of Nita & Gary (2010).
+	The input is a [time, ..., freq] stream of power spectra (or of complex
+	voltage spectra, whose power is used). The SK of each channel (and of
+	each element of the other axes) is computed over consecutive windows of
+	window_nframe frames, and a window is flagged if its SK lies outside the
+	thresholds given by sk_thresholds.
+	nacc is the number of power spectra accumulated into each input sample,
+	and shape_factor is the shape factor of their distribution (1 for power
+	from an FFT of Gaussian noise).
+	If mode is 'zero', the output is the input with the flagged samples set
+	to zero. If mode is 'mask', the output has one frame per window, with
+	the flagged elements set to 1 (as u8).
+	Both modes compute the statistics and the output of each window in a
+	single fused kernel. Any incomplete window at the end of a sequence is
+	discarded.
+	"""
+	def __init__(self, iring, window_nframe=128, mode='zero', nsigma=3.,
+	             nacc=1, shape_factor=1.,
+	             *args, **kwargs):
+		super(SpectralKurtosisBlock, self).__init__(iring, *args, **kwargs)
+		if mode not in ['zero', 'mask']:
+			raise ValueError("Invalid mode: %s" % mode)
+		if window_nframe < 2:
+			raise ValueError("Windows must contain at least 2 frames")
+		self.window_nframe = window_nframe
+		self.mode          = mode
+		self.nsigma        = nsigma
+		self.nacc          = nacc
+		self.shape_factor  = shape_factor
+	def define_valid_input_spaces(self):
+		"""Return set of valid spaces (or 'any') for each input"""
+		return ('cuda', 'system')
+	def define_output_nframes(self, input_nframe):
+		"""Return number of frames that will be produced given input_nframe
+		"""
+		nwindow = input_nframe // self.window_nframe
+		if self.mode == 'mask':
+			return nwindow
+		return nwindow * self.window_nframe
+	def on_sequence(self, iseq):
+		ihdr = iseq.header
+		itensor = ihdr['_tensor']
+		if itensor['shape'][0] != -1:
+			raise KeyError("The frame axis must be the first axis")
+		self.complex_input = DataType(itensor['dtype']).is_complex
+		self.lower, self.upper = sk_thresholds(self.window_nframe, self.nacc,
+		                                       self.shape_factor, self.nsigma)
+		ohdr = copy_header(ihdr)
+		ohdr['sk_window_nframe'] = self.window_nframe
+		ohdr['sk_thresholds']    = [self.lower, self.upper]
+		if self.mode == 'mask':
+			otensor = ohdr['_tensor']
+			otensor['dtype'] = 'u8'
+			if 'scales' in otensor and otensor['scales'][0] is not None:
+				t0, dt = otensor['scales'][0]
+				otensor['scales'][0] = [t0, dt*self.window_nframe]
+		# Each gulp must be a whole no. windows
+		gulp_nframe = self.gulp_nframe or ihdr['gulp_nframe']
+		gulp_nframe = -(-gulp_nframe // self.window_nframe) * self.window_nframe
+		return ohdr, slice(0, gulp_nframe, gulp_nframe)
+	def on_data(self, ispan, ospan):
+		nwindow = ispan.nframe // self.window_nframe
+		if nwindow == 0:
+			return 0
+		nframe = nwindow * self.window_nframe
+		idata = ispan.data[:nframe]
+		idata = idata.reshape((nwindow, self.window_nframe, -1))
+		shape = (nwindow, idata.shape[-1])
+		if self.complex_input:
+			power = "Complex<float>(a(w,m,r)).mag2()"
+		else:
+			power = "float(a(w,m,r))"
+		func = """
+		double s1 = 0, s2 = 0;
+		for( int m=0; m<M; ++m ) {
+			double p = %s;
+			s1 += p;
+			s2 += p*p;
+		}
+		// Note: All-zero windows (e.g., already flagged data) are not flagged
+		double sk = s1 > 0 ? (M*nd + 1) / (M - 1) * (M*s2 / (s1*s1) - 1) : 1;
+		bool flag = sk < lower || sk > upper;
+		""" % power
+		if self.mode == 'zero':
+			odata = ospan.data[:nframe].reshape(idata.shape)
+			func += """
+			for( int m=0; m<M; ++m ) {
+				b(w,m,r) = flag ? b_type(0) : b_type(a(w,m,r));
+			}
+			"""
+		else:
+			odata = ospan.data[:nwindow].reshape(shape)
+			func += "b(w,r) = flag;"
+		bf.map(func, shape, 'w', 'r', a=idata, b=odata,
+		       M=float(self.window_nframe),
+		       nd=float(self.nacc*self.shape_factor),
+		       lower=self.lower, upper=self.upper)
+		return self.define_output_nframes(nframe)
+
+def spectral_kurtosis(iring, window_nframe=128, mode='zero', *args, **kwargs):
+	return SpectralKurtosisBlock(iring, window_nframe, mode, *args, **kwargs)
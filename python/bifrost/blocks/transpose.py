@@ -29,10 +29,10 @@
 from __future__ import absolute_import
 
 from bifrost.pipeline import TransformBlock
+from bifrost.header_codec import copy_header
 import bifrost as bf
 import bifrost.transpose
 
-from copy import deepcopy
 import numpy as np
 
 class TransposeBlock(TransformBlock):
@@ -57,7 +57,7 @@ class TransposeBlock(TransformBlock):
 			if isinstance(self.axes[d], basestring):
 				# Look up axis by label
 				self.axes[d] = itensor['labels'].index(self.axes[d])
-		ohdr = deepcopy(ihdr)
+		ohdr = copy_header(ihdr)
 		otensor = ohdr['_tensor']
 		# Permute metadata of axes
 		for item in ['shape', 'labels', 'scales', 'units']:
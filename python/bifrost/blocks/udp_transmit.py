@@ -0,0 +1,76 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import absolute_import
+
+from bifrost.pipeline import SinkBlock
+from bifrost.udp_transmit import UDPTransmit, format_supported
+from bifrost.libbifrost import _bf
+
+class UdpTransmitBlock(SinkBlock):
+	"""Sends a [time, src, ...] stream as packets through the (connected)
+	socket sock, one packet per source per frame. The payloads are sent
+	directly from the input ring's spans. Each packet's header is a copy of
+	hdr_template with its sequence no. and source no. fields set according
+	to fmt ('raw', 'chips', 'simple' or 'generic'). Sequence numbers count
+	frames from seq0 and continue across input sequences, and source numbers
+	count from src0. A [time, ...] stream with fewer than 3 axes is sent as
+	a single source.
+	If rate is given, the average send rate is limited to rate bytes/sec.
+	"""
+	def __init__(self, iring, sock, fmt='generic', hdr_template=None,
+	             seq0=0, src0=0, rate=None, core=-1,
+	             *args, **kwargs):
+		super(UdpTransmitBlock, self).__init__(iring, *args, **kwargs)
+		if not format_supported(fmt):
+			raise ValueError("Unsupported packet format: %s" % fmt)
+		self.fmt          = fmt
+		self.hdr_template = hdr_template
+		self.seq          = seq0
+		self.src0         = src0
+		self.transmit     = UDPTransmit(sock, core=core, rate=rate)
+	def define_valid_input_spaces(self):
+		"""Return set of valid spaces (or 'any') for the input"""
+		return ('system', 'cuda_host')
+	def on_sequence(self, iseq):
+		itensor = iseq.header['_tensor']
+		if itensor['shape'][0] != -1:
+			raise KeyError("The frame axis must be the first axis")
+		shape = itensor['shape']
+		self.nsrc = shape[1] if len(shape) >= 3 else 1
+	def on_data(self, ispan):
+		data = ispan.data.reshape((ispan.nframe, self.nsrc, -1))
+		status = self.transmit.send_span(self.fmt, data, self.seq, self.src0,
+		                                 self.hdr_template)
+		if status == _bf.BF_TRANSMIT_ERROR:
+			raise IOError("Failed to send packets")
+		self.seq += ispan.nframe
+
+def udp_transmit(iring, sock, fmt='generic', hdr_template=None, *args,
+                 **kwargs):
+	return UdpTransmitBlock(iring, sock, fmt, hdr_template, *args, **kwargs)
@@ -40,3 +40,22 @@ def get_device():
 
 def stream_synchronize():
 	_fast_call(_bf.StreamSynchronize)
+
+class Event(object):
+	"""Marks a point in the current thread's stream, allowing the host to
+	check or wait (without spinning) for the work enqueued before it.
+	Note: Without CUDA support, events are always complete.
+	"""
+	def __init__(self):
+		self.obj = _get(_bf.EventCreate(), retarg=0)
+	def __del__(self):
+		if hasattr(self, 'obj') and bool(self.obj):
+			_bf.EventDestroy(self.obj)
+	def record(self):
+		_fast_call(_bf.EventRecord, self.obj)
+		return self
+	def query(self):
+		"""Returns True if all work recorded before the event has completed"""
+		return bool(_get(_bf.EventQuery(self.obj)))
+	def synchronize(self):
+		_fast_call(_bf.EventSynchronize, self.obj)
@@ -42,6 +42,8 @@ class Fdmt(object):
 		space = _string2space(space)
 		psize = None
 		_check( _bf.FdmtInit(self.obj, nchan, max_delay, f0, df, exponent, space, 0, psize) )
+		self.max_delay     = max_delay
+		self.stream_nframe = 0
 	def execute(self, idata, odata, negative_delays=False):
 		# TODO: Work out how to integrate CUDA stream
 		psize = None
@@ -65,3 +67,24 @@ class Fdmt(object):
 		                        negative_delays,
 		                        workspace_ptr, ctypes.pointer(size))
 		return odata
+	def execute_incremental(self, idata, odata):
+		"""Transforms the next part of a continuous input stream
+
+		The partial sums needed by later calls are kept by the plan, so each
+		  input frame is only transformed once. The output lags the input by
+		  max_delay frames: the complete output frames are written to the
+		  start of odata (which has the same number of frames as idata), and
+		  the number of them is returned.
+		Note: The stream restarts after init() or reset_incremental().
+		Note: Only positive delays are supported.
+		"""
+		ntime = idata.shape[-1]
+		nout  = min(ntime, max(self.stream_nframe + ntime - self.max_delay, 0))
+		_check( _bf.FdmtExecuteIncremental(self.obj,
+		                                   asarray(idata).as_BFarray(),
+		                                   asarray(odata)[..., :nout].as_BFarray()) )
+		self.stream_nframe += ntime
+		return nout
+	def reset_incremental(self):
+		_check( _bf.FdmtResetIncremental(self.obj) )
+		self.stream_nframe = 0
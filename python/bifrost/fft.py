@@ -28,35 +28,208 @@
 
 from libbifrost import _bf, _check, _get, _fast_call, _string2space
 from ndarray import asarray
+from DataType import DataType
+import device as bf_device
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
+import multiprocessing
+import threading
+import numpy as np
 import ctypes
+import os
 
-class Fft(object):
-	def __init__(self):
+# Spaces whose arrays are transformed on the host
+HOST_SPACES = set(['system', 'cuda_host'])
+
+_nthread = None
+_thread_pool = None
+_thread_pool_pid = None
+
+def set_num_threads(nthread):
+	"""Sets the no. threads used to execute host FFTs (default: no. CPUs)"""
+	global _nthread
+	_nthread = nthread
+
+def get_num_threads():
+	if _nthread is None:
+		return multiprocessing.cpu_count()
+	return _nthread
+
+def _get_thread_pool():
+	global _thread_pool, _thread_pool_pid
+	# Note: A pool inherited from a parent process (via fork) is unusable
+	if _thread_pool is None or _thread_pool_pid != os.getpid():
+		_thread_pool = ThreadPool(get_num_threads())
+		_thread_pool_pid = os.getpid()
+	return _thread_pool
+
+def _as_numpy_float(array, dtype):
+	"""Returns a numpy view or copy of array with a floating-point type
+	(e.g., ci8 -> complex64, i16 -> float32)"""
+	if dtype.is_floating_point and dtype._nbit >= 32:
+		return array.view(np.ndarray)
+	if dtype.is_complex:
+		if dtype._nbit < 8:
+			raise TypeError("Unsupported host FFT input type: %s" % dtype)
+		array = array.view(np.ndarray)
+		return array['re'] + np.complex64(1j)*array['im']
+	return array.view(np.ndarray).astype(np.float32)
+
+class _HostFftPlan(object):
+	"""A transform over the given axes of host arrays of a particular
+	shape, type and layout, executed using numpy.fft in parallel over
+	batches"""
+	def __init__(self, iarray, oarray, axes):
+		self.itype = DataType(iarray.bf.dtype)
+		self.otype = DataType(oarray.bf.dtype)
+		if self.itype.is_real and self.otype.is_real:
+			raise TypeError("Real to real FFTs are not supported")
+		self.axes = list(axes)
+		if self.itype.is_real:
+			self.mode = 'r2c'
+		elif self.otype.is_real:
+			self.mode = 'c2r'
+		else:
+			self.mode = 'c2c'
+		self.shape = [oarray.shape[ax] if self.mode == 'c2r' else
+		              iarray.shape[ax] for ax in self.axes]
+		# Note: Inverse transforms are unnormalized to match cuFFT
+		self.norm = reduce(lambda a, b: a*b, self.shape, 1)
+		# Split the largest non-transformed axis into one chunk per thread
+		batch_axes = [ax for ax in xrange(iarray.ndim) if ax not in self.axes]
+		nthread = get_num_threads()
+		self.chunks = [Ellipsis]
+		if batch_axes and nthread > 1:
+			batch_axis = max(batch_axes, key=lambda ax: iarray.shape[ax])
+			nbatch = iarray.shape[batch_axis]
+			nchunk = min(nthread, nbatch)
+			bounds = [nbatch*i//nchunk for i in xrange(nchunk+1)]
+			self.chunks = [(slice(None),)*batch_axis + (slice(b, e),)
+			               for b, e in zip(bounds[:-1], bounds[1:])]
+	def _execute_chunk(self, iarray, oarray, inverse):
+		idata = _as_numpy_float(iarray, self.itype)
+		if self.mode == 'r2c':
+			odata = np.fft.rfftn(idata, axes=self.axes)
+		elif self.mode == 'c2r':
+			odata = np.fft.irfftn(idata, s=self.shape, axes=self.axes)
+			odata *= self.norm
+		elif inverse:
+			odata = np.fft.ifftn(idata, axes=self.axes)
+			odata *= self.norm
+		else:
+			odata = np.fft.fftn(idata, axes=self.axes)
+		oarray.view(np.ndarray)[...] = odata
+	def execute(self, iarray, oarray, inverse):
+		if len(self.chunks) == 1:
+			self._execute_chunk(iarray, oarray, inverse)
+		else:
+			_get_thread_pool().map(
+			    lambda chunk: self._execute_chunk(iarray[chunk],
+			                                      oarray[chunk], inverse),
+			    self.chunks)
+
+class _CudaFftPlan(object):
+	"""A cuFFT plan for arrays of a particular shape, type and layout"""
+	def __init__(self, iarray, oarray, axes):
 		self.obj = _get(_bf.FftCreate(), retarg=0)
+		ndim = len(axes)
+		axes_type = ctypes.c_int*ndim
+		self.workspace_size = _get(_bf.FftInit(
+			self.obj,
+			iarray=iarray.as_BFarray(),
+			oarray=oarray.as_BFarray(),
+			ndim=ndim, axes=axes_type(*axes)))
+		# Note: Transforms using the same plan must not overlap (the plan
+		#         holds per-execution state on the device), so a shared plan
+		#         is only used by one thread at a time.
+		self.lock = threading.Lock()
 	def __del__(self):
 		if hasattr(self, 'obj') and bool(self.obj):
 			_bf.FftDestroy(self.obj)
+	def execute(self, iarray, oarray, inverse, workspace_ptr, workspace_size):
+		with self.lock:
+			_fast_call(_bf.FftExecute, self.obj,
+			           iarray.as_BFarray(),
+			           oarray.as_BFarray(),
+			           inverse,
+			           workspace_ptr, workspace_size)
+			bf_device.stream_synchronize()
+
+class PlanCache(object):
+	"""Thread-safe cache of FFT plans, keyed by the full transform signature
+	and evicting the least-recently-used plan when full"""
+	def __init__(self, capacity=64):
+		self.capacity = capacity
+		self.plans = OrderedDict()
+		self.lock = threading.Lock()
+		self.nplan = 0 # No. plans created (for diagnostics)
+	def __len__(self):
+		return len(self.plans)
+	def clear(self):
+		with self.lock:
+			self.plans.clear()
+	def get(self, iarray, oarray, axes):
+		if (iarray.bf.space in HOST_SPACES and
+		    oarray.bf.space in HOST_SPACES):
+			plan_type = _HostFftPlan
+			context = ('host', get_num_threads())
+		else:
+			plan_type = _CudaFftPlan
+			context = ('cuda', bf_device.get_device())
+		key = (iarray.shape, iarray.strides, str(iarray.bf.dtype),
+		       iarray.bf.space,
+		       oarray.shape, oarray.strides, str(oarray.bf.dtype),
+		       oarray.bf.space,
+		       tuple(axes), context)
+		with self.lock:
+			try:
+				plan = self.plans.pop(key)
+			except KeyError:
+				plan = plan_type(iarray, oarray, axes)
+				self.nplan += 1
+				while len(self.plans) >= max(self.capacity, 1):
+					self.plans.popitem(last=False)
+			# Note: Re-inserting marks the plan as most recently used
+			self.plans[key] = plan
+			return plan
+
+# Process-wide plan cache shared by all Fft instances
+plan_cache = PlanCache()
+
+def set_plan_cache_size(capacity):
+	"""Sets the max no. FFT plans kept by the process-wide plan cache"""
+	plan_cache.capacity = capacity
+
+class Fft(object):
+	"""Multi-dimensional FFT of arrays in CUDA (using cuFFT) or host memory
+	(using numpy.fft).
+	Plans are taken from a process-wide cache, so re-initialising for a
+	previously-seen shape and layout (e.g., after a partial gulp), or for the
+	same transform as another Fft instance, does not create a new plan.
+	"""
+	def __init__(self):
+		self.plan = None
+		self.workspace_size = 0
 	def init(self, iarray, oarray, axes=None):
+		iarray = asarray(iarray)
+		oarray = asarray(oarray)
 		if isinstance(axes, int):
 			axes = [axes]
-		ndim = len(axes)
-		if axes is not None:
-			axes_type = ctypes.c_int*ndim
-			axes = axes_type(*axes)
-		self.workspace_size = _get(_bf.FftInit(
-			self.obj,
-			iarray=asarray(iarray).as_BFarray(),
-			oarray=asarray(oarray).as_BFarray(),
-			ndim=ndim, axes=axes))
+		if axes is None:
+			axes = range(iarray.ndim)
+		self.plan = plan_cache.get(iarray, oarray, axes)
+		self.workspace_size = getattr(self.plan, 'workspace_size', 0)
 	def execute(self, iarray, oarray, inverse=False):
 		return self.execute_workspace(iarray, oarray,
 		                              workspace_ptr=None, workspace_size=0,
 		                              inverse=inverse)
 	def execute_workspace(self, iarray, oarray, workspace_ptr, workspace_size,
 	                      inverse=False):
-		_fast_call(_bf.FftExecute, self.obj,
-		                       asarray(iarray).as_BFarray(),
-		                       asarray(oarray).as_BFarray(),
-		                       inverse,
-		                       workspace_ptr, workspace_size)
+		iarray = asarray(iarray)
+		oarray = asarray(oarray)
+		if isinstance(self.plan, _HostFftPlan):
+			self.plan.execute(iarray, oarray, inverse)
+		else:
+			self.plan.execute(iarray, oarray, inverse,
+			                  workspace_ptr, workspace_size)
 		return oarray
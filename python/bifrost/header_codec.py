@@ -0,0 +1,133 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Compact binary encoding of sequence headers
+
+Headers are encoded as a magic prefix followed by the header in marshal
+  format (version 2, which is also readable by Python 3), which is several
+  times faster to decode than JSON.
+Before encoding, headers are normalised to the values that JSON would give:
+  tuples become lists, numpy scalars become Python numbers, and the
+  '_tensor' entry is checked against its schema (dtype string, shape list of
+  ints and optional per-axis lists of labels, scales and units).
+Decoding also accepts JSON headers (e.g., as produced by capture
+  callbacks), and decoded headers are memoized so that each distinct header
+  is decoded only once per process.
+"""
+
+try:
+	import simplejson as json
+except ImportError:
+	print "WARNING: Install simplejson for better performance"
+	import json
+import marshal
+import cPickle
+from copy import deepcopy
+import numpy as np
+
+MAGIC   = '\xbfH\x01' # Note: Cannot be the start of a JSON document
+MARSHAL_VERSION    = 2
+MAX_CACHED_HEADERS = 1024
+
+_SCALAR_TYPES = set([type(None), bool, int, long, float, str, unicode])
+
+def _normalize(val):
+	# Note: Exact types are required because marshal encodes subclasses
+	#         (e.g., numpy scalars) incorrectly.
+	if type(val) in _SCALAR_TYPES:
+		return val
+	elif isinstance(val, dict):
+		return dict((key if type(key) in (str, unicode) else str(key),
+		             _normalize(item))
+		            for key, item in val.iteritems())
+	elif isinstance(val, (list, tuple)):
+		return [_normalize(item) for item in val]
+	elif isinstance(val, (bool, np.bool_)):
+		return bool(val)
+	elif isinstance(val, (int, long, np.integer)):
+		return int(val)
+	elif isinstance(val, (float, np.floating)):
+		return float(val)
+	elif isinstance(val, basestring):
+		return unicode(val)
+	raise TypeError("Cannot encode header value of type %s" % type(val))
+
+def _normalize_tensor(tensor):
+	if 'dtype' not in tensor or 'shape' not in tensor:
+		raise ValueError("Header '_tensor' must specify dtype and shape")
+	# Note: This allows passing DataType instances instead of string types
+	dtype = str(tensor['dtype'])
+	tensor = dict((key, _normalize(val)) for key, val in tensor.iteritems()
+	              if key != 'dtype')
+	tensor['dtype'] = dtype
+	shape = tensor['shape']
+	if not all(isinstance(dim, (int, long)) for dim in shape):
+		raise ValueError("Header '_tensor' shape must be a list of ints")
+	for key in ('labels', 'scales', 'units'):
+		if key in tensor and len(tensor[key]) != len(shape):
+			raise ValueError("Header '_tensor' %s must have one entry per "
+			                 "axis" % key)
+	return tensor
+
+def encode_header(header):
+	"""Returns the binary encoding of the header dict as a string"""
+	tensor = header.get('_tensor')
+	header = dict((key, _normalize(val)) for key, val in header.iteritems()
+	              if key != '_tensor')
+	if tensor is not None:
+		header['_tensor'] = _normalize_tensor(tensor)
+	return MAGIC + marshal.dumps(header, MARSHAL_VERSION)
+
+_header_cache = {}
+
+def decode_header(buf):
+	"""Returns the header dict encoded in the string buf, which may be in
+	binary or JSON format.
+	Note: The returned dict is shared between all callers decoding the same
+	        header, and so must not be modified (see copy_header).
+	"""
+	try:
+		return _header_cache[buf]
+	except KeyError:
+		pass
+	if buf.startswith(MAGIC):
+		header = marshal.loads(buf[len(MAGIC):])
+	else:
+		header = json.loads(buf)
+	if len(_header_cache) >= MAX_CACHED_HEADERS:
+		_header_cache.clear()
+	_header_cache[buf] = header
+	return header
+
+def copy_header(header):
+	"""Returns a deep copy of a header (several times faster than deepcopy)"""
+	try:
+		return cPickle.loads(cPickle.dumps(header, cPickle.HIGHEST_PROTOCOL))
+	except (cPickle.PicklingError, TypeError):
+		return deepcopy(header)
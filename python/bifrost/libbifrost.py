@@ -99,6 +99,13 @@ def _load_bifrost_lib():
 						 str(header_paths))
 	pyclibrary.utils.add_library_locations(_get_env_paths(library_env))
 	lib = CLibrary(library_name, _parser, prefix=api_prefix)
+	# PYCLIBRARY ISSUE WAR for functions being looked up lazily in a way that
+	#   is not thread-safe (concurrent first calls can raise NameError).
+	for name in lib['functions']:
+		try:
+			getattr(lib, name)
+		except KeyError:
+			pass # Declared but not present in this build
 	return lib
 
 _bf = _load_bifrost_lib() # Internal access to library
@@ -27,6 +27,8 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from libbifrost import _bf, _check, _get, _array
+from DataType import DataType
+from Space import Space
 import bifrost as bf
 import numpy as np
 import ctypes
@@ -46,6 +48,10 @@ def map(func_string, shape=None,# axis_names=None,
 	
 	If shape is None, the broadcast shape of all of the arrays is used.
 	
+	If all of the arrays are in 'system' or 'cuda_host' memory, the function
+	  is compiled for and executed on the host (CPU), otherwise it is
+	  executed on the GPU.
+	
 	Examples:
 	  # Add two arrays together
 	  bf.map("c = a + b", c=c, a=a, b=b)
@@ -77,17 +83,80 @@ def map(func_string, shape=None,# axis_names=None,
 	#else:
 	#if len(axis_names) != len(shape):
 	#	raise ValueError('Number of axis names must match number of dims in shape')
+	map_args, arg_arrays = _map_args(func_string, shape, axis_names, kwargs)
+	_check(_bf.Map(*map_args))
+
+def precompile(func_string, shape=None, *args, **kwargs):
+	"""Compile the kernel for a call to map without executing it.
+	
+	Arguments are the same as for map, except that instead of an ndarray,
+	  each array argument may be given as a template tuple of the form
+	  (shape, dtype[, space[, immutable]]), which describes a contiguous
+	  array without requiring one to be allocated. The data of any ndarrays
+	  that are passed are not accessed.
+	
+	Kernels are cached per-thread, so this should be called from the thread
+	  that will execute the map (e.g., in a block's on_sequence callback) in
+	  order to avoid compilation latency when the data arrive. Compiled
+	  kernels are also cached on disk (see $BIFROST_MAP_CACHE_DIR), so that
+	  restarted processes do not need to recompile them.
+	
+	Note that the template must match the arguments that will later be
+	  passed to map exactly, including their space, strides and
+	  writeability (e.g., input spans are immutable).
+	
+	Example:
+	  # In on_sequence, for use in on_data with input ispan and output ospan
+	  shape = [self.gulp_nframe] + itensor['shape'][1:]
+	  bf.map.precompile("b = a*a", a=(shape, 'f32', 'cuda', True),
+	                               b=(shape, 'f32', 'cuda'))
+	"""
+	if isinstance(shape, basestring):
+		raise TypeError("Invalid type for shape argument")
+	if any([not isinstance(arg, basestring) for arg in args]):
+		raise TypeError("Invalid type for index name, must be string")
+	map_args, arg_arrays = _map_args(func_string, shape, args, kwargs)
+	_check(_bf.MapPrecompile(*map_args))
+
+# Allows use as bf.map.precompile
+map.precompile = precompile
+
+def _is_literal(x):
+	return (isinstance(x, int) or
+	        isinstance(x, float) or
+	        isinstance(x, complex))
+
+def _template_BFarray(shape, dtype, space='system', immutable=False):
+	"""Returns a contiguous BFarray with no data, for use as a template"""
+	dtype = DataType(dtype)
+	a = _bf.BFarray()
+	a.data      = None
+	a.space     = Space(space).as_BFspace()
+	a.dtype     = dtype.as_BFdtype()
+	a.immutable = immutable
+	a.ndim      = len(shape)
+	stride = dtype.itemsize
+	for d in reversed(xrange(len(shape))):
+		a.shape[d]   = shape[d]
+		a.strides[d] = stride
+		stride *= shape[d]
+	a.big_endian = False
+	a.conjugated = False
+	return a
+
+def _map_args(func_string, shape, axis_names, kwargs):
 	ndim      = len(shape) if shape is not None else 0
 	narg      = len(kwargs)
-	def is_literal(x):
-		return (isinstance(x, int) or
-		        isinstance(x, float) or
-		        isinstance(x, complex))
 	arg_arrays = []
 	args = []
 	arg_names = []
 	for key,arg in kwargs.items():
-		if is_literal(arg):
+		if isinstance(arg, tuple):
+			# Note: Templates have no data and are only used for precompile
+			args.append(_template_BFarray(*arg))
+			arg_names.append(key)
+			continue
+		if _is_literal(arg):
 			arr = np.array(arg)
 			if isinstance(arg, int) and -(1<<31) <= arg < (1<<31):
 				arr = arr.astype(np.int32)
@@ -105,6 +174,8 @@ def map(func_string, shape=None,# axis_names=None,
 		arg_arrays.append(arr)
 		args.append(arr.as_BFarray())
 		arg_names.append(key)
-	_check(_bf.Map(ndim, _array(shape, dtype=ctypes.c_long), _array(axis_names),
-	               narg, _array(args), _array(arg_names),
-	               func_string))
+	# Note: arg_arrays is returned so that the arrays outlive the BFarrays
+	return ((ndim, _array(shape, dtype=ctypes.c_long), _array(axis_names),
+	         narg, _array(args), _array(arg_names),
+	         func_string),
+	        arg_arrays)
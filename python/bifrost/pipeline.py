@@ -27,15 +27,26 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import bifrost as bf
-from bifrost.ring2 import Ring, ring_view
+from bifrost.ring2 import Ring, ring_view, SequenceBase
 from temp_storage import TempStorage
 from bifrost.proclog import ProcLog
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from contextlib2 import ExitStack
+from contextlib import closing
+from itertools import islice
+from functools import partial
+from multiprocessing.pool import ThreadPool
 import threading
+import multiprocessing
+import Queue
+import os
+import sys
+import ctypes
+import ctypes.util
+import re
 import time
-from copy import copy
+from copy import copy, deepcopy
 import signal
 
 def izip(*iterables):
@@ -67,7 +78,13 @@ class BlockScope(object):
 	             core=None,
 	             gpu=None,
 	             share_temp_storage=False,
-	             fuse=False):
+	             fuse=False,
+	             process=False,
+	             batch_ngulp=None,
+	             batch_latency=None,
+	             prefetch_depth=None,
+	             prefetch_nsource=None,
+	             async_ngulp=None):
 		if name is None:
 			name = 'BlockScope_%i' % BlockScope.instance_count
 			BlockScope.instance_count += 1
@@ -80,6 +97,24 @@ class BlockScope(object):
 		self._share_temp_storage = share_temp_storage
 		self._temp_storage_ = {}
 		self._fused = fuse
+		# Blocks within a process scope are run in their own process
+		self._process = process
+		# Max no. consecutive gulps that may be batched into one on_data call
+		#   by blocks that support variable nframe, and the max processing
+		#   latency (in secs) that a batch may incur.
+		self._batch_ngulp   = batch_ngulp
+		self._batch_latency = batch_latency
+		# No. gulps that source blocks may read ahead (in a background
+		#   thread) of the gulp they are committing.
+		self._prefetch_depth = prefetch_depth
+		# No. upcoming sources that source blocks open (and begin caching)
+		#   in background threads while reading the current one.
+		self._prefetch_nsource = prefetch_nsource
+		# Max no. gulps whose device work may still be in flight while the
+		#   next gulp is acquired and reserved (default 0, i.e., synchronise
+		#   on every gulp). Spans are committed in order as their work
+		#   completes.
+		self._async_ngulp = async_ngulp
 		if fuse:
 			#if self._buffer_factor is None:
 			#	self._buffer_factor = 1.0
@@ -181,28 +216,229 @@ class Pipeline(BlockScope):
 			Pipeline.instance_count += 1
 		super(Pipeline, self).__init__(name=name, **kwargs)
 		self.blocks = []
+		self.threads = []
+		self.processes = []
 		self.shutdown_timeout = 5.
+		self._process_shutdown_event = None
+		self._nblock_ready     = None
+		self._all_blocks_ready = None
+		self._failed_blocks    = []
 	def as_default(self):
 		return PipelineContext(self)
-	def run(self):
-		# Launch blocks as threads
-		self.threads = [threading.Thread(target=block.run, name=block.name)
-		                for block in self.blocks]
+	def run(self, executor='thread'):
+		"""Runs the pipeline until all blocks have finished
+		executor: 'thread' runs blocks as threads in this process, except
+		            for those within a BlockScope(process=True), which are
+		            run together in a separate process.
+		          'process' additionally runs every other block in a
+		            process of its own.
+		Rings that cross between processes are placed in shared memory
+		  (and hence in the 'system' space). Blocks are unaware of this.
+		Note: Processes are forked, so CUDA must not have been initialised
+		        before a pipeline with multiple processes is run.
+		If a process fails (i.e., exits with a non-zero code, as it does
+		  when one of its blocks raises), the pipeline is shut down and
+		  RuntimeError is raised.
+		"""
+		if executor not in ('thread', 'process'):
+			raise ValueError("Invalid executor '%s'" % executor)
+		groups = self._group_blocks(executor)
+		shared_rings = self._share_rings(groups)
+		local_blocks = groups.pop(None, [])
+		self.processes         = []
+		self._nblock_ready     = None
+		self._all_blocks_ready = None
+		self._failed_blocks    = []
+		if not groups:
+			self._run_threads(local_blocks)
+			return
+		self._process_shutdown_event = multiprocessing.Event()
+		# Note: Sources begin their first sequence but do not write any data
+		#         into it until every block (in any process) has opened its
+		#         inputs, so that no reader misses the start of the data
+		#         while its process is still being forked.
+		self._nblock_ready     = multiprocessing.Semaphore(0)
+		self._all_blocks_ready = multiprocessing.Event()
+		# Note: Processes must be forked before any threads are started
+		self.processes = [multiprocessing.Process(target=self._run_process,
+		                                          args=(blocks,),
+		                                          name=blocks[0].name)
+		                  for blocks in groups.values()]
+		for process in self.processes:
+			process.daemon = True
+			process.start()
+		try:
+			self._start_threads(local_blocks)
+			self._release_sources()
+			# Wait for blocks to finish, or for a process to fail
+			# Note: Doing it this way allows signals to be caught here
+			while any(worker.is_alive() for worker in
+			          self.threads + self.processes):
+				self._check_processes()
+				time.sleep(0.1)
+			self._check_processes()
+		finally:
+			for ring in shared_rings:
+				ring._destroy_shared()
+	def _start_threads(self, blocks):
+		# Launch blocks (and chains of fused blocks) as threads
+		self.threads = [threading.Thread(target=self._run_block, args=(block,),
+		                                 name=block.name)
+		                for block in self._fuse_blocks(blocks)]
 		for thread in self.threads:
 			thread.daemon = True
 			thread.start()
+	def _run_block(self, block):
+		try:
+			block.run()
+		except:
+			self._failed_blocks.append(block)
+			raise
+	def _run_threads(self, blocks):
+		self._start_threads(blocks)
 		# Wait for blocks to finish
 		for thread in self.threads:
 			# Note: Doing it this way allows signals to be caught here
 			while thread.is_alive():
 				thread.join(timeout=2**30)
+	def _release_sources(self):
+		"""Waits until every block has reported that it is ready (or a process
+		has failed) and then lets the sources start writing data"""
+		nready = 0
+		while nready < len(self.blocks):
+			# Note: Doing it this way allows signals to be caught here
+			if self._nblock_ready.acquire(timeout=0.1):
+				nready += 1
+			else:
+				self._check_processes()
+				if not any(worker.is_alive() for worker in
+				           self.threads + self.processes):
+					break
+		self._all_blocks_ready.set()
+	def _check_processes(self):
+		"""Shuts down the pipeline and raises if any process has failed"""
+		if self._process_shutdown_event.is_set():
+			return # Processes may have been stopped by shutdown()
+		for process in self.processes:
+			if process.exitcode:
+				self.shutdown()
+				raise RuntimeError("Process %s exited with code %i" %
+				                   (process.name, process.exitcode))
+	def _run_process(self, blocks):
+		# Note: This runs in a child process
+		self.blocks    = blocks
+		self.processes = []
+		def watch_shutdown():
+			# Note: See _wait_for_blocks_ready for why this polls
+			while not self._process_shutdown_event.is_set():
+				time.sleep(0.1)
+			for block in blocks:
+				block.shutdown()
+		watcher = threading.Thread(target=watch_shutdown)
+		watcher.daemon = True
+		watcher.start()
+		self._run_threads(blocks)
+		if self._failed_blocks:
+			sys.exit(1)
+	def _fuse_blocks(self, blocks):
+		"""Returns blocks with each chain of blocks that can be fused replaced
+		by a FusedBlockChain."""
+		readers = defaultdict(list)
+		for block in self.blocks:
+			for iring in block.irings:
+				readers[_base_ring(iring)].append(block)
+		candidates = set(blocks)
+		downstream = {}
+		for block in blocks:
+			if (not isinstance(block, MultiTransformBlock) or
+			    len(block.orings) != 1):
+				continue
+			oring_readers = readers[block.orings[0]]
+			if (len(oring_readers) == 1 and
+			    oring_readers[0] in candidates and
+			    FusedBlockChain.can_follow(block, oring_readers[0])):
+				downstream[block] = oring_readers[0]
+		fused_blocks = set(downstream.values())
+		runners = []
+		for block in blocks:
+			if block in fused_blocks:
+				continue # Run as part of the chain containing its upstream
+			chain = [block]
+			while chain[-1] in downstream:
+				chain.append(downstream[chain[-1]])
+			runners.append(FusedBlockChain(chain) if len(chain) > 1 else block)
+		return runners
+	def _group_blocks(self, executor):
+		"""Returns a dict of process key -> blocks, where the key None denotes
+		the current process."""
+		groups = {}
+		for block in self.blocks:
+			key = None
+			scope = block
+			while scope is not None:
+				if scope._process:
+					key = scope
+				scope = scope._parent_scope
+			if key is None and executor == 'process':
+				key = block
+			groups.setdefault(key, []).append(block)
+		return groups
+	def _share_rings(self, groups):
+		"""Moves rings whose writer and readers are in different processes
+		into shared memory and returns them."""
+		process_of = {}
+		for key, blocks in groups.items():
+			for block in blocks:
+				process_of[block] = key
+		readers = defaultdict(list)
+		for block in self.blocks:
+			for iring in block.irings:
+				readers[_base_ring(iring)].append((block, iring))
+		shared_rings = []
+		for ring, ring_readers in readers.items():
+			writer_process = process_of.get(ring.owner)
+			if all(process_of[reader] is writer_process
+			       for reader, _ in ring_readers):
+				continue
+			shm_name = re.sub(r'[^A-Za-z0-9_.-]', '_', 'pipeline_%i_%i_%s' %
+			                  (os.getpid(), len(shared_rings), ring.name))
+			ring._make_shared(shm_name)
+			# Views (e.g., from block_view) hold their own copy of the handle
+			for _, iring in ring_readers:
+				view = iring
+				while view is not ring:
+					view.obj   = ring.obj
+					view.space = ring.space
+					view = view.base
+			shared_rings.append(ring)
+		return shared_rings
+	def _notify_block_ready(self):
+		if self._nblock_ready is not None:
+			self._nblock_ready.release()
+	def _wait_for_blocks_ready(self, shutdown_event):
+		"""Waits until all blocks are ready or shutdown_event is set"""
+		if self._all_blocks_ready is None:
+			return
+		# Note: This polls rather than waiting on the event because a process
+		#         that dies while waiting on a multiprocessing.Event leaves
+		#         it in a state where set() blocks forever.
+		while not (self._all_blocks_ready.is_set() or
+		           shutdown_event.is_set()):
+			time.sleep(0.1)
 	def shutdown(self):
 		for block in self.blocks:
 			block.shutdown()
+		if self._process_shutdown_event is not None:
+			self._process_shutdown_event.set()
 		join_all(self.threads, timeout=self.shutdown_timeout)
 		for thread in self.threads:
 			if thread.is_alive():
 				print "WARNING: Thread %s did not shut down on time and will be killed" % thread.name
+		join_all(self.processes, timeout=self.shutdown_timeout)
+		for process in self.processes:
+			if process.is_alive():
+				print "WARNING: Process %s did not shut down on time and will be killed" % process.name
+				process.terminate()
 	def shutdown_on_signals(self, signals=None):
 		if signals is None:
 			signals = [signal.SIGHUP,
@@ -229,12 +465,69 @@ class Pipeline(BlockScope):
 thread_local.pipeline_stack.append(Pipeline())
 thread_local.blockscope_stack.append(get_default_pipeline())
 
+def _base_ring(ring):
+	while ring.base is not None:
+		ring = ring.base
+	return ring
+
 def get_ring(block_or_ring):
 	try:
 		return block_or_ring.orings[0]
 	except AttributeError:
 		return block_or_ring
 
+class _CompletionQueue(object):
+	"""Holds the spans of each gulp until the work that on_data enqueued for
+	it has completed, committing them in order without blocking the block's
+	thread until more than depth gulps are in flight.
+	Note: Work done on the host is complete when on_data returns, so its
+	        spans are committed immediately.
+	"""
+	def __init__(self, depth):
+		self.depth   = depth
+		self.pending = deque()
+		self._events = [] # Completed events available for reuse
+		self._retire_time = 0.
+	def __len__(self):
+		return len(self.pending)
+	def push(self, span_stack, ospans, ostrides, start_time, on_retire=None):
+		"""Records the completion of the work enqueued so far (since
+		start_time) and takes ownership of span_stack, which holds the
+		gulp's spans. Once they have been committed, on_retire is passed
+		the time the gulp took to process."""
+		event = self._events.pop() if self._events else bf.device.Event()
+		event.record()
+		self.pending.append((event, span_stack, ospans, ostrides,
+		                     start_time, on_retire))
+		# Note: A span can only be partially committed when no spans are
+		#         reserved after it, so the queue must be emptied first.
+		if any([ostride < ospan.nframe
+		        for (ospan, ostride) in zip(ospans, ostrides)]):
+			self.drain()
+		while self.pending and (len(self.pending) > self.depth or
+		                        self.pending[0][0].query()):
+			self._retire()
+	def drain(self):
+		while self.pending:
+			self._retire()
+	def _retire(self):
+		(event, span_stack, ospans, ostrides,
+		 start_time, on_retire) = self.pending.popleft()
+		try:
+			event.synchronize()
+			self._events.append(event)
+			for ospan, ostride in zip(ospans, ostrides):
+				ospan.commit(ostride)
+		finally:
+			span_stack.close()
+		cur_time = time.time()
+		# Note: Gulps in flight overlap, so each is only charged for the time
+		#         since the previous one completed.
+		process_time = cur_time - max(start_time, self._retire_time)
+		self._retire_time = cur_time
+		if on_retire is not None:
+			on_retire(process_time)
+
 def block_view(block, header_transform):
 	new_block = copy(block)
 	new_block.orings = [ring_view(oring, header_transform)
@@ -264,28 +557,42 @@ class Block(BlockScope):
 				                 (self.name, i, str(valid_spaces)))
 		self.orings = [] # Update this in subclass constructors
 		self.shutdown_event = threading.Event()
+		self._ready = False
+		self._perf_totals = None
 	def shutdown(self):
 		self.shutdown_event.set()
 	def create_ring(self, *args, **kwargs):
 		return Ring(*args, owner=self, **kwargs)
 	def run(self):
-		#bf.affinity.set_openmp_cores(cpus) # TODO
-		core = self.core
-		if core is not None:
-			bf.affinity.set_core(core if isinstance(core, int) else core[0])
-		if self.gpu is not None:
-			bf.device.set_device(self.gpu)
-		self.cache_scope_hierarchy()
-		with ExitStack() as oring_stack:
-			active_orings = self.begin_writing(oring_stack, self.orings)
-			self.main(active_orings)
+		try:
+			#bf.affinity.set_openmp_cores(cpus) # TODO
+			core = self.core
+			if core is not None:
+				bf.affinity.set_core(core if isinstance(core, int) else core[0])
+			if self.gpu is not None:
+				bf.device.set_device(self.gpu)
+			self.cache_scope_hierarchy()
+			with ExitStack() as oring_stack:
+				active_orings = self.begin_writing(oring_stack, self.orings)
+				self.main(active_orings)
+		finally:
+			# Note: This stops blocks that end (or fail) before opening any
+			#         input from holding up the sources
+			self._notify_ready()
+	def _notify_ready(self):
+		"""Tells the pipeline that this block has opened its inputs and
+		begun its outputs (called once per block)"""
+		if not self._ready:
+			self._ready = True
+			self.pipeline._notify_block_ready()
 	def num_outputs(self):
 		# TODO: This is a little hacky
 		return len(self.orings)
 	def begin_writing(self, exit_stack, orings):
 		return [exit_stack.enter_context(oring.begin_writing())
 		        for oring in orings]
-	def begin_sequences(self, exit_stack, orings, oheaders, igulp_nframes):
+	def begin_sequences(self, exit_stack, orings, oheaders, igulp_nframes,
+	                    batch_ngulp=1, async_ngulp=0):
 		ogulp_nframes = self._define_output_nframes(igulp_nframes)
 		for ohdr, ogulp_nframe in zip(oheaders, ogulp_nframes):
 			ohdr['gulp_nframe'] = ogulp_nframe
@@ -293,8 +600,31 @@ class Block(BlockScope):
 		#         additional buffering is defined by the reader(s) rather
 		#         than the writer.
 		obuf_nframes = [1*ogulp_nframe for ogulp_nframe in ogulp_nframes]
-		return [exit_stack.enter_context(oring.begin_sequence(ohdr,obuf_nframe))
-		        for (oring,ohdr,obuf_nframe) in zip(orings,oheaders,obuf_nframes)]
+		oseqs = [exit_stack.enter_context(oring.begin_sequence(ohdr,obuf_nframe))
+		         for (oring,ohdr,obuf_nframe) in zip(orings,oheaders,obuf_nframes)]
+		if batch_ngulp > 1:
+			# Make room for reserving spans of batch_ngulp gulps at a time
+			for oseq, ogulp_nframe in zip(oseqs, ogulp_nframes):
+				tensor = oseq.tensor
+				oseq.ring.resize(batch_ngulp*ogulp_nframe*tensor['frame_nbyte'],
+				                 batch_ngulp*ogulp_nframe*tensor['frame_nbyte'],
+				                 tensor['nringlet'])
+		if async_ngulp > 0:
+			# Make room for the spans still in flight on top of the readers'
+			#   buffering, so that readers do not need to resize the ring
+			#   while they are held.
+			buffer_factor = async_ngulp + 1 + (self.buffer_factor or 3)
+			for oseq, ogulp_nframe in zip(oseqs, ogulp_nframes):
+				tensor = oseq.tensor
+				gulp_nbyte = batch_ngulp*ogulp_nframe*tensor['frame_nbyte']
+				oseq.ring.resize(gulp_nbyte,
+				                 int(buffer_factor*gulp_nbyte),
+				                 tensor['nringlet'])
+		return oseqs
+	def _max_async_ngulp(self):
+		"""Returns the max no. gulps that may be in flight at once"""
+		async_ngulp = self.async_ngulp
+		return 0 if async_ngulp is None else async_ngulp
 	def reserve_spans(self, exit_stack, oseqs, ispans):
 		igulp_nframes = [span.nframe for span in ispans]
 		ogulp_nframes = self._define_output_nframes(igulp_nframes)
@@ -311,8 +641,74 @@ class Block(BlockScope):
 	def define_valid_input_spaces(self):
 		"""Return set of valid spaces (or 'any') for each input"""
 		return ['any']*len(self.irings)
+	def _update_perf_log(self, acquire_time, reserve_time, process_time,
+	                     nframe, nbyte, iseqs=[], ispans=[]):
+		"""Logs the times taken by the latest gulp (-1 => not measured),
+		running totals of the times and of the no. frames and bytes
+		processed, and the fraction of each input ring that is filled ahead
+		of this block (see bifrost.telemetry)."""
+		cur_time = time.time()
+		times = {'acquire_time': acquire_time,
+		         'reserve_time': reserve_time,
+		         'process_time': process_time}
+		totals = self._perf_totals
+		if totals is None:
+			start_time = cur_time - sum([t for t in times.values() if t > 0])
+			totals = self._perf_totals = {'start_time':         start_time,
+			                              'ngulp':              0,
+			                              'nframe':             0,
+			                              'nbyte':              0,
+			                              'total_acquire_time': 0.,
+			                              'total_reserve_time': 0.,
+			                              'total_process_time': 0.}
+		totals['ngulp']  += 1
+		totals['nframe'] += nframe
+		totals['nbyte']  += nbyte
+		for key, value in times.items():
+			if value >= 0:
+				totals['total_'+key] += value
+		entry = dict(times)
+		entry.update(totals)
+		entry['update_time'] = cur_time
+		for i, (iseq, ispan) in enumerate(zip(iseqs, ispans)):
+			entry['in%i_fill' % i] = _ring_fill(iseq, ispan)
+		self.perf_proclog.update(entry)
+
+def _spans_nbyte(spans, nframes=None):
+	"""Returns the total no. bytes in the first nframes[i] frames of each
+	span (or in the whole spans)"""
+	if nframes is None:
+		nframes = [span.nframe for span in spans]
+	return sum([nframe*span.frame_nbyte
+	            for (span, nframe) in zip(spans, nframes)])
+
+def _ring_fill(iseq, ispan):
+	"""Returns the fraction of iseq's ring that has been written beyond the
+	end of ispan"""
+	frame_offset = ispan.frame_offset + ispan.nframe
+	nbyte = iseq.available_nframe(frame_offset) * ispan.frame_nbyte
+	return nbyte / float(max(iseq.ring.total_span(), 1))
+
+# Note: This is the Linux value; fadvise is only a hint, so it is fine if it
+#         does not apply (or the call fails) on other platforms.
+_POSIX_FADV_WILLNEED = 3
+try:
+	_libc_fadvise = ctypes.CDLL(ctypes.util.find_library('c')).posix_fadvise
+	_libc_fadvise.argtypes = [ctypes.c_int, ctypes.c_long, ctypes.c_long,
+	                          ctypes.c_int]
+except (OSError, AttributeError):
+	_libc_fadvise = None
+
+def _prewarm(reader, nbyte):
+	"""Asks the OS to start reading the first nbyte bytes of the reader's
+	file into the page cache (if the reader has a fileno)"""
+	if _libc_fadvise is None or not hasattr(reader, 'fileno'):
+		return
+	_libc_fadvise(reader.fileno(), 0, nbyte, _POSIX_FADV_WILLNEED)
 
 class SourceBlock(Block):
+	# No. bytes at the start of each source to pre-warm when opening ahead
+	prewarm_nbyte = 64*1024*1024
 	def __init__(self, sourcenames, gulp_nframe, *args, **kwargs):
 		super(SourceBlock, self).__init__([], *args, gulp_nframe=gulp_nframe, **kwargs)
 		self.sourcenames = sourcenames
@@ -321,38 +717,198 @@ class SourceBlock(Block):
 		self._seq_count = 0
 		self.perf_proclog = ProcLog(self.name+"/perf")
 	def main(self, orings):
-		for sourcename in self.sourcenames:
-			if self.shutdown_event.is_set():
+		with closing(self._open_readers()) as readers:
+			for sourcename, reader in readers:
+				self._read_source(orings, sourcename, reader)
+	def _open_readers(self):
+		"""Yields the name and (unopened) reader of each source until
+		shutdown, creating the readers for up to prefetch_nsource upcoming
+		sources in background threads."""
+		nahead = self.prefetch_nsource or 0
+		if nahead <= 0:
+			for sourcename in self.sourcenames:
+				if self.shutdown_event.is_set():
+					break
+				yield sourcename, self.create_reader(sourcename)
+			return
+		pool = ThreadPool(nahead)
+		sourcenames = iter(self.sourcenames)
+		pending = deque()
+		try:
+			while not self.shutdown_event.is_set():
+				for sourcename in islice(sourcenames, nahead+1-len(pending)):
+					pending.append((sourcename,
+					                pool.apply_async(self._create_reader_ahead,
+					                                 (sourcename,))))
+				if not pending:
+					break
+				sourcename, result = pending.popleft()
+				yield sourcename, result.get()
+		finally:
+			pool.close()
+			# Close any readers that were opened ahead but not used
+			for sourcename, result in pending:
+				try:
+					reader = result.get()
+				except Exception:
+					continue
+				with reader:
+					pass
+			pool.join()
+	def _create_reader_ahead(self, sourcename):
+		reader = self.create_reader(sourcename)
+		_prewarm(reader, self.prewarm_nbyte)
+		return reader
+	def _read_source(self, orings, sourcename, reader):
+		with reader as ireader:
+			oheaders = self.on_sequence(ireader, sourcename)
+			for ohdr in oheaders:
+				if 'time_tag' not in ohdr:
+					ohdr['time_tag'] = self._seq_count
+			self._seq_count += 1
+			with ExitStack() as oseq_stack:
+				prefetch_depth = self.prefetch_depth or 0
+				async_ngulp = 0 if prefetch_depth > 0 else self._max_async_ngulp()
+				oseqs = self.begin_sequences(oseq_stack, orings, oheaders,
+				                             igulp_nframes=[],
+				                             async_ngulp=async_ngulp)
+				self._notify_ready()
+				self.pipeline._wait_for_blocks_ready(self.shutdown_event)
+				if prefetch_depth > 0:
+					self._resize_for_prefetch(oseqs, prefetch_depth)
+					self._read_sequence_ahead(ireader, oseqs, prefetch_depth)
+				else:
+					self._read_sequence(ireader, oseqs, async_ngulp)
+	def _read_sequence(self, ireader, oseqs, async_ngulp=0):
+		completions = _CompletionQueue(async_ngulp)
+		try:
+			while not self.shutdown_event.is_set():
+				prev_time = time.time()
+				ospan_stack = ExitStack()
+				try:
+					ospans = self.reserve_spans(ospan_stack, oseqs, ispans=[])
+					cur_time = time.time()
+					reserve_time = cur_time - prev_time
+					prev_time = cur_time
+					ostrides = self.on_data(ireader, ospans)
+				except Exception:
+					exc_info = sys.exc_info()
+					try:
+						completions.drain()
+					finally:
+						ospan_stack.close()
+					raise exc_info[0], exc_info[1], exc_info[2]
+				completions.push(ospan_stack, ospans, ostrides, prev_time,
+				                 partial(self._update_source_perf_log,
+				                         reserve_time, ospans, ostrides))
+				# TODO: Is this an OK way to detect end-of-data?
+				if any([ostride==0 for ostride in ostrides]):
+					break
+		finally:
+			completions.drain()
+	def _update_source_perf_log(self, reserve_time, ospans, ostrides,
+	                            process_time):
+		self._update_perf_log(-1, reserve_time, process_time,
+		                      ostrides[0] if len(ostrides) else 0,
+		                      _spans_nbyte(ospans, ostrides))
+	def _resize_for_prefetch(self, oseqs, prefetch_depth):
+		# Make room for the read-ahead spans on top of the readers' buffering
+		buffer_factor = prefetch_depth + 1 + (self.buffer_factor or 3)
+		ogulp_nframes = self._define_output_nframes([])
+		for oseq, ogulp_nframe in zip(oseqs, ogulp_nframes):
+			tensor = oseq.tensor
+			buf_nframe = int(buffer_factor*ogulp_nframe)
+			oseq.ring.resize(ogulp_nframe*tensor['frame_nbyte'],
+			                 buf_nframe*tensor['frame_nbyte'],
+			                 tensor['nringlet'])
+	def _read_sequence_ahead(self, ireader, oseqs, prefetch_depth):
+		"""Reads the sequence with up to prefetch_depth+1 gulps reserved at
+		once, calling on_data in a background thread so that the reads
+		overlap with reserving and committing spans.
+		Note: A short read is taken to mean the end of the data, and any
+		        spans reserved after it are cancelled.
+		"""
+		requests = Queue.Queue()
+		results  = Queue.Queue()
+		stop     = threading.Event()
+		reader_thread = threading.Thread(target=self._prefetch_main,
+		                                 args=(ireader, requests, results, stop),
+		                                 name=self.name+'/prefetch')
+		reader_thread.daemon = True
+		reader_thread.start()
+		ogulp_nframes = self._define_output_nframes([])
+		pending = deque() # Reserved spans in the order they were requested
+		noutstanding = [0] # No. requests whose results have not been received
+		def get_result():
+			noutstanding[0] -= 1
+			ostrides, exc_info = results.get()
+			if exc_info is not None:
+				raise exc_info[0], exc_info[1], exc_info[2]
+			return ostrides
+		def cancel_pending():
+			stop.set()
+			# Note: The spans must not be released while still being read into
+			while noutstanding[0]:
+				noutstanding[0] -= 1
+				results.get()
+			# Note: Spans can only be cancelled in reverse order
+			while pending:
+				for ospan in pending.pop():
+					ospan.commit(0)
+					ospan.close()
+		try:
+			while True:
+				prev_time = time.time()
+				while (len(pending) <= prefetch_depth and
+				       not self.shutdown_event.is_set()):
+					ospans = [oseq.reserve(ogulp_nframe)
+					          for (oseq, ogulp_nframe) in zip(oseqs, ogulp_nframes)]
+					pending.append(ospans)
+					requests.put(ospans)
+					noutstanding[0] += 1
+				if not pending:
+					break
+				cur_time = time.time()
+				reserve_time = cur_time - prev_time
+				prev_time = cur_time
+				ostrides = get_result()
+				ospans = pending.popleft()
+				end_of_data = any([ostride < ospan.nframe
+				                   for (ospan, ostride) in zip(ospans, ostrides)])
+				if end_of_data:
+					cancel_pending()
+				for ospan, ostride in zip(ospans, ostrides):
+					ospan.commit(ostride)
+					ospan.close()
+				cur_time = time.time()
+				process_time = cur_time - prev_time
+				prev_time = cur_time
+				self._update_perf_log(-1, reserve_time, process_time,
+				                      ostrides[0] if len(ostrides) else 0,
+				                      _spans_nbyte(ospans, ostrides))
+				if end_of_data:
+					break
+		finally:
+			cancel_pending()
+			requests.put(None)
+			reader_thread.join()
+	def _prefetch_main(self, ireader, requests, results, stop):
+		if self.gpu is not None:
+			bf.device.set_device(self.gpu)
+		while True:
+			ospans = requests.get()
+			if ospans is None:
 				break
-			with self.create_reader(sourcename) as ireader:
-				oheaders = self.on_sequence(ireader, sourcename)
-				for ohdr in oheaders:
-					if 'time_tag' not in ohdr:
-						ohdr['time_tag'] = self._seq_count
-				self._seq_count += 1
-				with ExitStack() as oseq_stack:
-					oseqs = self.begin_sequences(oseq_stack, orings, oheaders, igulp_nframes=[])
-					while not self.shutdown_event.is_set():
-						prev_time = time.time()
-						with ExitStack() as ospan_stack:
-							ospans = self.reserve_spans(ospan_stack, oseqs, ispans=[])
-							cur_time = time.time()
-							reserve_time = cur_time - prev_time
-							prev_time = cur_time
-							ostrides = self.on_data(ireader, ospans)
-							bf.device.stream_synchronize()
-							for ospan, ostride in zip(ospans, ostrides):
-								ospan.commit(ostride)
-							# TODO: Is this an OK way to detect end-of-data?
-							if any([ostride==0 for ostride in ostrides]):
-								break
-						cur_time = time.time()
-						process_time = cur_time - prev_time
-						prev_time = cur_time
-						self.perf_proclog.update({
-							'acquire_time': -1,
-							'reserve_time': reserve_time,
-							'process_time': process_time})
+			if stop.is_set():
+				results.put(([0]*len(ospans), None))
+				continue
+			try:
+				ostrides = self.on_data(ireader, ospans)
+				bf.device.stream_synchronize()
+				results.put((ostrides, None))
+			except Exception:
+				stop.set()
+				results.put((None, sys.exc_info()))
 	def define_output_nframes(self, _):
 		"""Return output nframe for each output, given input_nframes.
 		"""
@@ -361,7 +917,11 @@ class SourceBlock(Block):
 		"""Return set of valid spaces (or 'any') for each input"""
 		return []
 	def create_reader(self, sourcename):
-		"""Return an object to use for reading source data"""
+		"""Return an object to use for reading source data
+		Note: With block_scope(prefetch_nsource=N), this is called in a
+		        background thread for each of the next N sources, and so
+		        must not modify the block.
+		"""
 		# TODO: Should return a dummy reader object here?
 		raise NotImplementedError
 	def on_sequence(self, reader, sourcename):
@@ -379,6 +939,13 @@ def _span_slice(soft_slice):
 	             soft_slice.stop,
 	             soft_slice.step or (soft_slice.stop - start))
 
+def _resolve_ostrides(ostrides, ospans):
+	# Allow returning None to indicate complete consumption
+	if ostrides is None:
+		ostrides = [ospan.nframe for ospan in ospans]
+	return [ostride if ostride is not None else ospan.nframe
+	        for (ostride,ospan) in zip(ostrides,ospans)]
+
 class MultiTransformBlock(Block):
 	def __init__(self, irings_, guarantee=True, *args, **kwargs):
 		super(MultiTransformBlock, self).__init__(irings_, *args, **kwargs)
@@ -391,83 +958,173 @@ class MultiTransformBlock(Block):
 		self.perf_proclog = ProcLog(self.name+"/perf")
 		self.sequence_proclogs = [ProcLog(self.name+"/sequence%i"%i)
 		                          for i in xrange(len(self.irings))]
+		# Running estimate of the processing time per input frame
+		self._frame_time = None
+	def _begin_sequence(self, iseqs):
+		"""Calls on_sequence and returns the output headers and the slices
+		with which to read the inputs."""
+		for i, iseq in enumerate(iseqs):
+			self.sequence_proclogs[i].update(iseq.header)
+		oheaders, islices = self._on_sequence(iseqs)
+		for ohdr in oheaders:
+			if 'time_tag' not in ohdr:
+				ohdr['time_tag'] = self._seq_count
+		self._seq_count += 1
+		return oheaders, islices
+	def _resize_inputs(self, iseqs, islices):
+		"""Resizes the input rings for reading with islices and returns the
+		islices with defaults filled in."""
+		# Allow passing None to mean slice(gulp_nframe)
+		if islices is None:
+			islices = [None]*len(self.irings)
+		default_igulp_nframes = [self.gulp_nframe or iseq.header['gulp_nframe']
+		                        for iseq in iseqs]
+		islices = [islice or slice(igulp_nframe)
+		           for (islice,igulp_nframe) in
+		           zip(islices,default_igulp_nframes)]
+		
+		islices = [_span_slice(slice_) for slice_ in islices]
+		batch_ngulp = self._max_batch_ngulp(islices)
+		async_ngulp = self._max_async_ngulp()
+		for iseq, islice in zip(iseqs, islices):
+			if self.buffer_factor is None:
+				src_block = iseq.ring.owner
+				if src_block is not None and self.is_fused_with(src_block):
+					buffer_factor = 1
+				else:
+					buffer_factor = None
+			else:
+				buffer_factor = self.buffer_factor
+			if async_ngulp > 0:
+				# Make room for the spans still held while in flight
+				buffer_factor = (buffer_factor or 3) + async_ngulp
+			iseq.resize(gulp_nframe=batch_ngulp*(islice.stop - islice.start),
+			            buf_nframe=self.buffer_nframe,
+			            buffer_factor=buffer_factor)
+		return islices
+	def _max_batch_ngulp(self, islices):
+		"""Returns the max no. gulps that may be batched into one on_data
+		call when reading with islices."""
+		batch_ngulp = self.batch_ngulp or 1
+		if batch_ngulp > 1 and not self.define_variable_nframe():
+			return 1
+		# Note: Overlapping (or gapped) reads cannot be batched
+		if any(islice.step != islice.stop - islice.start
+		       for islice in islices):
+			return 1
+		return batch_ngulp
+	def _update_frame_time(self, process_time, nframe):
+		if nframe == 0:
+			return
+		frame_time = process_time / nframe
+		if self._frame_time is None:
+			self._frame_time = frame_time
+		else:
+			self._frame_time += 0.1 * (frame_time - self._frame_time)
+	def _read_spans(self, iseqs, islices, batch_ngulp=1):
+		"""Returns an iterator over lists of input spans (one per input).
+		If batch_ngulp > 1, each span covers as many consecutive gulps (up
+		  to batch_ngulp) as are already available and can be processed
+		  within batch_latency."""
+		for ispans, ispan_stack in self._acquire_spans(iseqs, islices,
+		                                               batch_ngulp):
+			with ispan_stack:
+				yield ispans
+	def _acquire_spans(self, iseqs, islices, batch_ngulp=1):
+		"""As _read_spans, but also yields the ExitStack holding each list
+		of spans, which the caller must close to release them."""
+		igulp_nframes = [islice.stop - islice.start for islice in islices]
+		frame_offsets = [islice.start for islice in islices]
+		while True:
+			ngulp = batch_ngulp
+			if ngulp > 1:
+				if self.batch_latency is not None and self._frame_time:
+					gulp_time = self._frame_time * igulp_nframes[0]
+					ngulp = min(ngulp, int(self.batch_latency / gulp_time))
+				for iseq, frame_offset, igulp_nframe in zip(iseqs, frame_offsets,
+				                                            igulp_nframes):
+					ngulp = min(ngulp,
+					            iseq.available_nframe(frame_offset) // igulp_nframe)
+				# Note: This waits for (at least) one gulp if none are available
+				ngulp = max(ngulp, 1)
+			ispan_stack = ExitStack()
+			try:
+				ispans = [ispan_stack.enter_context(
+				              iseq.acquire(frame_offset, ngulp*igulp_nframe))
+				          for (iseq,frame_offset,igulp_nframe)
+				          in zip(iseqs,frame_offsets,igulp_nframes)]
+			except:
+				ispan_stack.close()
+				raise
+			# Note: Batched reads always have step == igulp_nframe
+			frame_offsets = [frame_offset + ngulp*islice.step
+			                 for (frame_offset,islice)
+			                 in zip(frame_offsets,islices)]
+			for ispan, frame_offset in zip(ispans, frame_offsets):
+				ispan.keep_until(frame_offset)
+			yield ispans, ispan_stack
 	def main(self, orings):
 		for iseqs in izip(*[iring.read(guarantee=self.guarantee)
 		                    for iring in self.irings]):
 			if self.shutdown_event.is_set():
 				break
-			for i, iseq in enumerate(iseqs):
-				self.sequence_proclogs[i].update(iseq.header)
-			oheaders, islices = self._on_sequence(iseqs)
-			for ohdr in oheaders:
-				if 'time_tag' not in ohdr:
-					ohdr['time_tag'] = self._seq_count
-			self._seq_count += 1
-			
-			# Allow passing None to mean slice(gulp_nframe)
-			if islices is None:
-				islices = [None]*len(self.irings)
-			default_igulp_nframes = [self.gulp_nframe or iseq.header['gulp_nframe']
-			                        for iseq in iseqs]
-			islices = [islice or slice(igulp_nframe)
-			           for (islice,igulp_nframe) in
-			           zip(islices,default_igulp_nframes)]
-			
-			islices = [_span_slice(slice_) for slice_ in islices]
-			for iseq, islice in zip(iseqs, islices):
-				if self.buffer_factor is None:
-					src_block = iseq.ring.owner
-					if src_block is not None and self.is_fused_with(src_block):
-						buffer_factor = 1
-					else:
-						buffer_factor = None
-				else:
-					buffer_factor = self.buffer_factor
-				iseq.resize(gulp_nframe=(islice.stop - islice.start),
-				            buf_nframe=self.buffer_nframe,
-				            buffer_factor=buffer_factor)
-			
+			oheaders, islices = self._begin_sequence(iseqs)
+			islices = self._resize_inputs(iseqs, islices)
 			igulp_nframes = [islice.stop - islice.start for islice in islices]
+			batch_ngulp = self._max_batch_ngulp(islices)
+			async_ngulp = self._max_async_ngulp()
 			
 			with ExitStack() as oseq_stack:
-				oseqs = self.begin_sequences(oseq_stack, orings, oheaders, igulp_nframes)
-				prev_time = time.time()
-				for ispans in izip(*[iseq.read(islice.stop - islice.start,
-				                              islice.step,
-				                              islice.start)
-				                    for (iseq,islice)
-				                    in zip(iseqs,islices)]):
-					if self.shutdown_event.is_set():
-						break
-					cur_time = time.time()
-					acquire_time = cur_time - prev_time
-					prev_time = cur_time
-					with ExitStack() as ospan_stack:
-						ospans = self.reserve_spans(ospan_stack, oseqs, ispans)
+				oseqs = self.begin_sequences(oseq_stack, orings, oheaders,
+				                             igulp_nframes, batch_ngulp,
+				                             async_ngulp)
+				self._notify_ready()
+				# Note: Spans are committed (and released) only once the work
+				#         that on_data enqueued for them has completed, so
+				#         the next gulp is acquired and reserved meanwhile.
+				completions = _CompletionQueue(async_ngulp)
+				try:
+					prev_time = time.time()
+					for ispans, span_stack in self._acquire_spans(iseqs, islices,
+					                                              batch_ngulp):
+						if self.shutdown_event.is_set():
+							span_stack.close()
+							break
 						cur_time = time.time()
-						reserve_time = cur_time - prev_time
+						acquire_time = cur_time - prev_time
 						prev_time = cur_time
-						# *TODO: See if can fuse together multiple on_data calls here before
-						#          calling stream_synchronize().
-						#        Consider passing .data instead of rings here
-						ostrides = self._on_data(ispans, ospans)
-						# TODO: // Default to not spinning the CPU: cudaSetDeviceFlags(cudaDeviceScheduleBlockingSync);
-						bf.device.stream_synchronize()
-						# Allow returning None to indicate complete consumption
-						if ostrides is None:
-							ostrides = [ospan.nframe for ospan in ospans]
-						ostrides = [ostride if ostride is not None else ospan.nframe
-						            for (ostride,ospan) in zip(ostrides,ospans)]
-						for ospan, ostride in zip(ospans, ostrides):
-							ospan.commit(ostride)
-					cur_time = time.time()
-					process_time = cur_time - prev_time
-					prev_time = cur_time
-					self.perf_proclog.update({
-						'acquire_time': acquire_time,
-						'reserve_time': reserve_time,
-						'process_time': process_time})
+						try:
+							ospans = self.reserve_spans(span_stack, oseqs, ispans)
+							cur_time = time.time()
+							reserve_time = cur_time - prev_time
+							prev_time = cur_time
+							# Note: Blocks in a BlockScope(fuse=True) have their
+							#         on_data calls fused by FusedBlockChain.
+							#       Consider passing .data instead of rings here
+							ostrides = self._on_data(ispans, ospans)
+							ostrides = _resolve_ostrides(ostrides, ospans)
+						except Exception:
+							exc_info = sys.exc_info()
+							try:
+								completions.drain()
+							finally:
+								span_stack.close()
+							raise exc_info[0], exc_info[1], exc_info[2]
+						completions.push(span_stack, ospans, ostrides, prev_time,
+						                 partial(self._update_transform_perf_log,
+						                         acquire_time, reserve_time,
+						                         batch_ngulp, iseqs, ispans))
+						prev_time = time.time()
+				finally:
+					completions.drain()
 			self._on_sequence_end(iseqs)
+	def _update_transform_perf_log(self, acquire_time, reserve_time,
+	                               batch_ngulp, iseqs, ispans, process_time):
+		if batch_ngulp > 1:
+			self._update_frame_time(process_time, ispans[0].nframe)
+		self._update_perf_log(acquire_time, reserve_time,
+		                      process_time, ispans[0].nframe,
+		                      _spans_nbyte(ispans), iseqs, ispans)
 	def _on_sequence(self, iseqs):
 		return self.on_sequence(iseqs)
 	def _on_sequence_end(self, iseqs):
@@ -489,6 +1146,10 @@ class MultiTransformBlock(Block):
 		"""Process data from from ispans to ospans and return the number of
 		frames to commit for each output (or None to commit complete spans)."""
 		raise NotImplementedError
+	def define_variable_nframe(self):
+		"""Return True if on_data accepts spans of any (whole) no. gulps,
+		allowing consecutive gulps to be batched into one call"""
+		return False
 
 class TransformBlock(MultiTransformBlock):
 	def __init__(self, iring, *args, **kwargs):
@@ -562,3 +1223,215 @@ class SinkBlock(MultiTransformBlock):
 	def on_data(self, ispan):
 		"""Return nothing"""
 		raise NotImplementedError
+
+def _fused_ancestor(scope):
+	"""Returns the outermost BlockScope(fuse=True) containing scope"""
+	fused_ancestor = None
+	scope = scope._parent_scope
+	while scope is not None:
+		if scope._fused:
+			fused_ancestor = scope
+		scope = scope._parent_scope
+	return fused_ancestor
+
+class FusedSequence(SequenceBase):
+	"""Stands in for the ring sequence between two fused blocks"""
+	def __init__(self, header, space):
+		SequenceBase.__init__(self, ring=None)
+		self._header = header
+		self.space   = space
+	@property
+	def name(self):
+		return self._header['name']
+	@property
+	def time_tag(self):
+		return self._header['time_tag']
+	@property
+	def nringlet(self):
+		return self.tensor['nringlet']
+
+class FusedSpan(object):
+	"""Stands in for a ring span between two fused blocks, with the data held
+	in a scratch buffer."""
+	def __init__(self, sequence, data, frame_offset):
+		self.sequence     = sequence
+		self.tensor       = sequence.tensor
+		self.data         = data
+		self.frame_offset = frame_offset
+		self.frame_nbyte  = self.tensor['frame_nbyte']
+		self.shape        = list(data.shape)
+		self.nframe       = self.shape[len(self.tensor['ringlet_shape'])]
+		self.commit_nframe = self.nframe
+	@property
+	def ring(self):
+		return None
+	@property
+	def dtype(self):
+		return self.tensor['dtype']
+	@property
+	def _stride_bytes(self):
+		if len(self.tensor['ringlet_shape']):
+			return self.data.strides[0]
+		return self.nframe * self.frame_nbyte
+	def commit(self, nframe):
+		self.commit_nframe = nframe
+	def head(self, nframe):
+		"""Returns a read-only span covering the first nframe frames"""
+		data = self.data
+		if nframe != self.nframe:
+			frame_axis = len(self.tensor['ringlet_shape'])
+			data = data[(slice(None),)*frame_axis + (slice(0, nframe),)]
+		return FusedSpan(self.sequence, data, self.frame_offset)
+
+class FusedBlockChain(object):
+	"""Runs a chain of blocks within a BlockScope(fuse=True) in one thread
+	The first block reads its input rings as normal, but the spans passed
+	  between blocks in the chain are held in scratch buffers instead of
+	  rings, and the device is synchronised only once per gulp.
+	Each block after the first processes exactly what its predecessor
+	  produced in each gulp, and so must not slice its input (i.e., must
+	  return no islice from on_sequence).
+	"""
+	@staticmethod
+	def can_follow(upstream, block):
+		fused_ancestor = _fused_ancestor(block)
+		return (isinstance(block, (TransformBlock, SinkBlock)) and
+		        fused_ancestor is not None and
+		        fused_ancestor is _fused_ancestor(upstream))
+	def __init__(self, blocks):
+		self.blocks = blocks
+		self.name = '+'.join(block.name for block in blocks)
+		self._scratch = {}
+	def shutdown(self):
+		for block in self.blocks:
+			block.shutdown()
+	def _shutdown_requested(self):
+		return any(block.shutdown_event.is_set() for block in self.blocks)
+	def run(self):
+		head, tail = self.blocks[0], self.blocks[-1]
+		try:
+			core = head.core
+			if core is not None:
+				bf.affinity.set_core(core if isinstance(core, int) else core[0])
+			if head.gpu is not None:
+				bf.device.set_device(head.gpu)
+			for block in self.blocks:
+				block.cache_scope_hierarchy()
+			with ExitStack() as oring_stack:
+				active_orings = tail.begin_writing(oring_stack, tail.orings)
+				self.main(active_orings)
+		finally:
+			self._notify_ready()
+	def _notify_ready(self):
+		for block in self.blocks:
+			block._notify_ready()
+	def _begin_fused_sequences(self, oheaders, igulp_nframes):
+		"""Calls on_sequence for each block after the first and returns
+		their input sequences along with the tail's output headers and input
+		gulp size."""
+		fseqs = [None]
+		for upstream, block in zip(self.blocks[:-1], self.blocks[1:]):
+			ogulp_nframes = upstream._define_output_nframes(igulp_nframes)
+			for ohdr, ogulp_nframe in zip(oheaders, ogulp_nframes):
+				ohdr['gulp_nframe'] = ogulp_nframe
+			header = oheaders[0]
+			header_transform = block.irings[0].header_transform
+			if header_transform is not None:
+				header = header_transform(deepcopy(header))
+			fseq = FusedSequence(header, upstream.orings[0].space)
+			oheaders, islices = block._begin_sequence([fseq])
+			if any(islice is not None for islice in islices):
+				raise NotImplementedError("Block %s cannot be fused because "
+				                          "it slices its input" % block.name)
+			fseqs.append(fseq)
+			igulp_nframes = ogulp_nframes[:1]
+		return fseqs, oheaders, igulp_nframes
+	def _reserve_scratch(self, index, fseq, nframe, frame_offset):
+		tensor = fseq.tensor
+		key = (tuple(tensor['ringlet_shape']), tuple(tensor['frame_shape']),
+		       str(tensor['dtype']), fseq.space)
+		# Note: Scratch buffers are reused for as long as they are big enough
+		if (index not in self._scratch or
+		    self._scratch[index][0] != key or
+		    self._scratch[index][1] < nframe):
+			shape = tensor['ringlet_shape'] + [nframe] + tensor['frame_shape']
+			self._scratch[index] = (key, nframe,
+			                        bf.ndarray(shape=shape,
+			                                   dtype=str(tensor['dtype']),
+			                                   space=fseq.space))
+		_, capacity, data = self._scratch[index]
+		return FusedSpan(fseq, data, frame_offset).head(nframe)
+	def main(self, orings):
+		head, tail = self.blocks[0], self.blocks[-1]
+		for iseqs in izip(*[iring.read(guarantee=head.guarantee)
+		                    for iring in head.irings]):
+			if self._shutdown_requested():
+				break
+			oheaders, islices = head._begin_sequence(iseqs)
+			islices = head._resize_inputs(iseqs, islices)
+			igulp_nframes = [islice.stop - islice.start for islice in islices]
+			fseqs, oheaders, tail_igulp_nframes = \
+			    self._begin_fused_sequences(oheaders, igulp_nframes)
+			# fseqs[i+1] is the output of block i
+			frame_offsets = [0] * len(self.blocks)
+			
+			if all(block.define_variable_nframe() for block in self.blocks[1:]):
+				batch_ngulp = head._max_batch_ngulp(islices)
+			else:
+				batch_ngulp = 1
+			
+			with ExitStack() as oseq_stack:
+				oseqs = tail.begin_sequences(oseq_stack, orings, oheaders,
+				                             tail_igulp_nframes, batch_ngulp)
+				self._notify_ready()
+				prev_time = time.time()
+				for ispans in head._read_spans(iseqs, islices, batch_ngulp):
+					if self._shutdown_requested():
+						break
+					cur_time = time.time()
+					acquire_time = cur_time - prev_time
+					prev_time = cur_time
+					head_nframe = ispans[0].nframe
+					head_ispans = ispans
+					# The no. frames and bytes each block processes this gulp
+					block_sizes = [(0, 0)] * len(self.blocks)
+					with ExitStack() as ospan_stack:
+						for i, block in enumerate(self.blocks):
+							block_sizes[i] = (ispans[0].nframe,
+							                  _spans_nbyte(ispans))
+							if block is tail:
+								ospans = tail.reserve_spans(ospan_stack, oseqs, ispans)
+							else:
+								nframe = block._define_output_nframes(
+								    [ispan.nframe for ispan in ispans])[0]
+								ospans = [self._reserve_scratch(i+1, fseqs[i+1], nframe,
+								                                frame_offsets[i+1])]
+							ostrides = block._on_data(ispans, ospans)
+							ostrides = _resolve_ostrides(ostrides, ospans)
+							if block is not tail:
+								nframe = ostrides[0]
+								frame_offsets[i+1] += nframe
+								ispans = [ospans[0].head(nframe)]
+								ospans, ostrides = [], []
+								if nframe == 0:
+									# Nothing reaches the rest of the chain this gulp
+									break
+						# Note: This is the only synchronisation for the whole chain
+						bf.device.stream_synchronize()
+						for ospan, ostride in zip(ospans, ostrides):
+							ospan.commit(ostride)
+					cur_time = time.time()
+					process_time = cur_time - prev_time
+					prev_time = cur_time
+					if batch_ngulp > 1:
+						head._update_frame_time(process_time, head_nframe)
+					for block, (nframe, nbyte) in zip(self.blocks, block_sizes):
+						if block is head:
+							block._update_perf_log(acquire_time, -1, process_time,
+							                       nframe, nbyte, iseqs, head_ispans)
+						else:
+							block._update_perf_log(acquire_time, -1, process_time,
+							                       nframe, nbyte)
+			head._on_sequence_end(iseqs)
+			for block, fseq in zip(self.blocks[1:], fseqs[1:]):
+				block._on_sequence_end([fseq])
@@ -31,12 +31,6 @@ from libbifrost import _bf, _check, _get, _string2space, _space2string
 import ctypes
 import numpy as np
 
-try:
-	import simplejson as json
-except ImportError:
-	print "WARNING: Install simplejson for better performance"
-	import json
-
 class ProcLog(object):
 	def __init__(self, name):
 		self.obj = _get(_bf.ProcLogCreate(name=name), retarg=0)
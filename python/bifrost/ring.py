@@ -239,6 +239,9 @@ class ReadSequence(SequenceBase):
 		offset = begin
 		while True:
 			with self.acquire(offset, span_size) as ispan:
+				# Note: Overlapping reads keep the overlap guaranteed
+				ispan.keep_size = max(ispan.offset + ispan.size -
+				                      (offset + stride), 0)
 				yield ispan
 			offset += stride
 
@@ -343,9 +346,13 @@ class ReadSpan(SpanBase):
 		SpanBase.__init__(self, sequence.ring, writeable=False)
 		self.obj = _get(_bf.RingSpanAcquire(sequence=sequence.obj,
 		                                    offset=offset, size=size), retarg=0)
+		self.keep_size = 0
 	def __enter__(self):
 		return self
 	def __exit__(self, type, value, tb):
 		self.release()
 	def release(self):
-		_check(_bf.RingSpanRelease(self.obj))
+		if self.keep_size:
+			_check(_bf.RingSpanReleaseKeep(self.obj, self.keep_size))
+		else:
+			_check(_bf.RingSpanRelease(self.obj))
@@ -32,16 +32,12 @@
 from libbifrost import _bf, _check, _get, _string2space, _space2string, _fast_call, _fast_get
 from DataType import DataType
 from ndarray import ndarray
-from copy import copy, deepcopy
+from copy import copy
 
 import ctypes
 import numpy as np
 
-try:
-	import simplejson as json
-except ImportError:
-	print "WARNING: Install simplejson for better performance"
-	import json
+from header_codec import encode_header, decode_header, copy_header
 
 # TODO: Should probably move this elsewhere (e.g., utils)
 def split_shape(shape):
@@ -70,9 +66,23 @@ def ring_view(ring, header_transform):
 
 class Ring(object):
 	instance_count = 0
-	def __init__(self, space='system', name=None, owner=None):
-		self.space = space
-		self.obj = _get(_bf.RingCreate(space=_string2space(self.space)), retarg=0)
+	def __init__(self, space='system', name=None, owner=None, hugepages=False):
+		"""Creates a ring in the given memory space
+		If space is 'shared', the ring is placed in the named shared-memory
+		  segment given by name (optionally backed by hugepages) and can be
+		  opened from other processes using Ring.attach(name). The data of
+		  shared rings reside in the 'system' space.
+		"""
+		if space == 'shared':
+			if name is None:
+				raise ValueError("Shared rings must be given a name")
+			self.space = 'system'
+			self.obj = _get(_bf.RingCreateShared(space=_string2space(self.space),
+			                                     name=name,
+			                                     hugepages=hugepages), retarg=0)
+		else:
+			self.space = space
+			self.obj = _get(_bf.RingCreate(space=_string2space(self.space)), retarg=0)
 		if name is None:
 			name = 'ring_%i' % Ring.instance_count
 			Ring.instance_count += 1
@@ -81,10 +91,46 @@ class Ring(object):
 		self.header_transform = None
 		# If this is non-None, then the object is wrapping a base Ring instance
 		self.base = None
+	@classmethod
+	def attach(cls, name, owner=None):
+		"""Opens a shared ring created (typically in another process) with
+		Ring(space='shared', name=name)
+		"""
+		ring = cls.__new__(cls)
+		ring.obj = _get(_bf.RingAttach(name=name), retarg=0)
+		ring.space = 'system'
+		ring.name = name
+		ring.owner = owner
+		ring.header_transform = None
+		ring.base = None
+		return ring
 	def __del__(self):
 		if (hasattr(self, "base") and self.base is None and
 		    hasattr(self, "obj") and bool(self.obj)):
 			_bf.RingDestroy(self.obj)
+	def _make_shared(self, shm_name):
+		"""Moves the ring's buffer and state into named shared memory so that
+		it can be used by processes forked after this call.
+		Must be called before the ring has been written to.
+		Note: Only host memory can be shared, so the ring's space becomes
+		        'system'.
+		"""
+		if self.base is not None:
+			raise ValueError("Cannot share a ring view; share its base instead")
+		if self.space not in ('system', 'cuda_host'):
+			raise ValueError("Ring %s in space '%s' cannot be shared between "
+			                 "processes" % (self.name, self.space))
+		obj = _get(_bf.RingCreateShared(space=_string2space('system'),
+		                                name=shm_name,
+		                                hugepages=False), retarg=0)
+		_bf.RingDestroy(self.obj)
+		self.obj   = obj
+		self.space = 'system'
+	def _destroy_shared(self):
+		"""Destroys a ring created by _make_shared, removing its shared memory"""
+		if bool(self.obj):
+			_bf.RingDestroy(self.obj)
+		self.obj = None
 	def view(self):
 		new_ring = copy(self)
 		new_ring.base = self
@@ -94,6 +140,13 @@ class Ring(object):
 		                       contiguous_bytes,
 		                       total_bytes,
 		                       nringlet) )
+	def total_span(self):
+		"""Returns the size in bytes of the ring's buffer"""
+		_check( _bf.RingLock(self.obj) )
+		try:
+			return _get(_bf.RingLockedGetTotalSpan(self.obj))
+		finally:
+			_check( _bf.RingUnlock(self.obj) )
 	def begin_writing(self):
 		return RingWriter(self)
 	def _begin_writing(self):
@@ -177,23 +230,17 @@ class SequenceBase(object):
 		return self._tensor
 	@property
 	def header(self):
+		"""The sequence's header dict
+		Note: This is shared between all readers of the sequence, and so
+		        must not be modified (use copy_header first).
+		"""
 		if self._header is not None:
 			return self._header
 		size = self.header_size
 		if size == 0:
-			# WAR for hdr_buffer_ptr.contents crashing when size == 0
-			hdr_array = np.empty(0, dtype=np.uint8)
-			hdr_array.flags['WRITEABLE'] = False
-			return json.loads(hdr_array.tostring())
-		BufferType = ctypes.c_byte*size
-		hdr_buffer_ptr = ctypes.cast(self._header_ptr, ctypes.POINTER(BufferType))
-		hdr_buffer = hdr_buffer_ptr.contents
-		#hdr_array = memoryview(hdr_buffer)
-		# WAR for ctypes producing an invalid type code that numpy fails on
-		#hdr_array = buffer(memoryview(hdr_buffer))
-		hdr_array = np.frombuffer(hdr_buffer, dtype=np.uint8)
-		hdr_array.flags['WRITEABLE'] = False
-		self._header = json.loads(hdr_array.tostring())
+			# WAR for ctypes.string_at crashing when size == 0
+			return decode_header('')
+		self._header = decode_header(ctypes.string_at(self._header_ptr, size))
 		return self._header
 
 class WriteSequence(SequenceBase):
@@ -202,7 +249,7 @@ class WriteSequence(SequenceBase):
 		self._header = header
 		# This allows passing DataType instances instead of string types
 		header['_tensor']['dtype'] = str(header['_tensor']['dtype'])
-		header_str = json.dumps(header)
+		header_str = encode_header(header)
 		header_size = len(header_str)
 		gulp_nframe = header['gulp_nframe']
 		tensor = self.tensor
@@ -237,6 +284,8 @@ class ReadSequence(SequenceBase):
 		self._ring = ring
 		# A function for transforming the header before it's read
 		self.header_transform = header_transform
+		# The transformed header, which is computed once per sequence
+		self._view_header = None
 		if which == 'specific':
 			self.obj = _get(_bf.RingSequenceOpen(ring=ring.obj,
 			                                     name=name, guarantee=guarantee), retarg=0)
@@ -261,14 +310,23 @@ class ReadSequence(SequenceBase):
 		#   a new sequence.
 		self._header = None
 		self._tensor = None
+		self._view_header = None
 	def acquire(self, frame_offset, nframe):
 		return ReadSpan(self, frame_offset, nframe)
+	def available_nframe(self, frame_offset=0):
+		"""Returns the no. frames from frame_offset that can be acquired
+		without waiting for the writer"""
+		frame_nbyte = self.tensor['frame_nbyte']
+		nbyte = _get(_bf.RingSpanAvailable(sequence=self.obj,
+		                                   offset=frame_offset*frame_nbyte))
+		return nbyte // frame_nbyte
 	def read(self, nframe, stride=None, begin=0):
 		if stride is None:
 			stride = nframe
 		offset = begin
 		while True:
 			with self.acquire(offset, nframe) as ispan:
+				ispan.keep_until(offset + stride)
 				yield ispan
 			offset += stride
 	def resize(self, gulp_nframe, buf_nframe=None, buffer_factor=None):
@@ -282,9 +340,11 @@ class ReadSequence(SequenceBase):
 	@property
 	def header(self):
 		hdr = super(ReadSequence, self).header
-		if self.header_transform is not None:
-			hdr = self.header_transform(deepcopy(hdr))
-		return hdr
+		if self.header_transform is None:
+			return hdr
+		if self._view_header is None:
+			self._view_header = self.header_transform(copy_header(hdr))
+		return self._view_header
 
 def accumulate(vals, op='+', init=None, reverse=False):
 	if   op == '+':   op = lambda a,b:a+b
@@ -432,9 +492,19 @@ class ReadSpan(SpanBase):
 		           frame_offset*tensor['frame_nbyte'],
 		           nframe*tensor['frame_nbyte'])
 		self._set_base_obj(self.obj)
+		self.keep_nframe = 0
+	def keep_until(self, frame_offset):
+		"""Keeps the frames from frame_offset to the end of the span
+		guaranteed after it is released, for overlapping reads"""
+		self.keep_nframe = max(self.frame_offset + self.nframe - frame_offset,
+		                       0)
 	def __enter__(self):
 		return self
 	def __exit__(self, type, value, tb):
 		self.release()
 	def release(self):
-		_fast_call(_bf.RingSpanRelease, self.obj)
+		if self.keep_nframe:
+			_fast_call(_bf.RingSpanReleaseKeep, self.obj,
+			           self.keep_nframe*self.tensor['frame_nbyte'])
+		else:
+			_fast_call(_bf.RingSpanRelease, self.obj)
@@ -55,6 +55,9 @@ data:          [time][pol][nbit] (General case: [time][if/pol][chan][nbit])
 #   https://github.com/SixByNine/sigproc
 
 import struct
+import mmap
+import ctypes
+import ctypes.util
 import numpy as np
 from collections import defaultdict
 
@@ -217,6 +220,24 @@ def _read_header(f):
 	#	f.seek(header['header_size'], 0) # Seek back to end of header
 	return header
 
+# Note: These are the Linux values; madvise is only a hint, so it is fine if
+#         they do not apply (or the call fails) on other platforms.
+_MADV_SEQUENTIAL = 2
+_MADV_WILLNEED   = 3
+try:
+	_libc_madvise = ctypes.CDLL(ctypes.util.find_library('c')).madvise
+	_libc_madvise.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+except (OSError, AttributeError):
+	_libc_madvise = None
+
+def _madvise(data, advice):
+	"""Gives advice about the (contiguous) memory-mapped array data"""
+	if _libc_madvise is None or data.size == 0:
+		return
+	addr = data.ctypes.data
+	page_addr = addr - addr % mmap.PAGESIZE
+	_libc_madvise(page_addr, data.nbytes + (addr - page_addr), advice)
+
 # TODO: Move this elsewhere?
 def unpack(data, nbit):
 	if nbit > 8:
@@ -259,6 +280,7 @@ class SigprocFile(object):
 		# Note: If nbit < 8, pack_factor = 8 / nbit and the last dimension
 		#         is divided by pack_factor, with dtype set to uint8.
 		self.f = open(filename, 'rb')
+		self._mapped = None
 		self.header = _read_header(self.f)
 		self.header_size = self.header['header_size']
 		self.frame_shape = (self.header['nifs'], self.header['nchans'])
@@ -296,11 +318,15 @@ class SigprocFile(object):
 		#self.frame_nbyte = self.frame_size*self.dtype().itemsize
 		return self
 	def close(self):
+		# Note: The mapping itself is released once all views of it are gone
+		self._mapped = None
 		self.f.close()
 	def __enter__(self):
 		return self
 	def __exit__(self, type, value, tb):
 		self.close()
+	def fileno(self):
+		return self.f.fileno()
 	def seek(self, offset, whence=0):
 		if whence == 0:
 			offset += self.header_size
@@ -349,6 +375,49 @@ class SigprocFile(object):
 			nframe = data.size // self.frame_size
 		data = data.reshape((nframe,)+self.frame_shape)
 		return data
+	def _map(self):
+		"""Returns the whole file as a read-only uint8 array backed by a
+		memory mapping, which is created on first use"""
+		if self._mapped is None:
+			mapping = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+			self._mapped = np.frombuffer(mapping, np.uint8)
+			_madvise(self._mapped, _MADV_SEQUENTIAL)
+		return self._mapped
+	def view(self, nframe_or_start, end=None):
+		"""Like read(), but returns a read-only view of the frames in the
+		memory-mapped file instead of reading them into a new array.
+		If nbit < 8, the data are left packed, with the last dimension
+		  holding nchans*nbit/8 bytes.
+		"""
+		frame_nbit = self.frame_size*self.nbit
+		if self.nbit < 8 and self.header['nchans']*self.nbit % 8 != 0:
+			raise ValueError("Frames cannot be viewed as whole bytes "+
+			                 "(nchans=%i, nbit=%i)" % (self.header['nchans'],
+			                                           self.nbit))
+		frame_nbyte = frame_nbit // 8
+		if end is not None:
+			start = nframe_or_start or 0
+			if end == -1:
+				end = self.nframe()
+			nframe = end - start
+			begin = self.header_size + start*frame_nbyte
+		else:
+			nframe = nframe_or_start
+			begin = self.f.tell()
+		mapped = self._map()
+		nbyte = max(min(nframe*frame_nbyte, mapped.size - begin), 0)
+		if nbyte % frame_nbyte != 0:
+			raise IOError("File read returned incomplete frame (truncated file?)")
+		nframe = nbyte // frame_nbyte
+		self.f.seek(begin + nbyte)
+		# Start reading in the next span of the same size
+		_madvise(mapped[begin+nbyte:begin+2*nbyte], _MADV_WILLNEED)
+		data = mapped[begin:begin+nbyte]
+		if self.nbit < 8:
+			return data.reshape((nframe,) + self.frame_shape[:-1] +
+			                    (self.header['nchans']*self.nbit // 8,))
+		data = data.view(self.dtype)
+		return data.reshape((nframe,)+self.frame_shape)
 	def readinto(self, buf):
 		"""Fills buf with raw bytes straight from the file"""
 		return self.f.readinto(buf)
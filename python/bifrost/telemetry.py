@@ -0,0 +1,194 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Pipeline status and performance monitoring
+
+Reads the proclogs that bifrost processes write under /dev/shm/bifrost/<pid>/
+and derives the performance of each pipeline block from the '<block>/perf'
+logs: its throughput, its duty cycle (the fraction of time spent
+processing), how much of its time is spent stalled waiting for input
+(acquire) or for space in its output rings (reserve), and how full its input
+rings are.
+
+monitor = Monitor()
+while True:
+	time.sleep(1)
+	for pid, block, stats in monitor.update():
+		print pid, block, stats['byte_rate'], stats['bound']
+"""
+
+import os
+
+PROCLOG_DIR = '/dev/shm/bifrost'
+
+def _parse_value(value):
+	for type_ in (int, float):
+		try:
+			return type_(value)
+		except ValueError:
+			pass
+	return value
+
+def load_log(filename):
+	"""Returns the contents of a proclog file as a dict, with numeric values
+	converted to numbers"""
+	contents = {}
+	with open(filename, 'r') as logfile:
+		for line in logfile:
+			key, sep, value = line.partition(':')
+			if sep:
+				contents[key.strip()] = _parse_value(value.strip())
+	return contents
+
+def list_pids(basedir=PROCLOG_DIR):
+	"""Returns the ids of the running processes that have proclogs"""
+	try:
+		entries = os.listdir(basedir)
+	except OSError:
+		return []
+	return sorted([int(entry) for entry in entries
+	               if entry.isdigit() and os.path.exists('/proc/'+entry)])
+
+def get_command_line(pid):
+	"""Returns the command line of a process (or '' if unavailable)"""
+	try:
+		with open('/proc/%i/cmdline' % pid, 'r') as f:
+			return f.read().replace('\0', ' ').strip()
+	except IOError:
+		return ''
+
+def load_process_logs(pid, basedir=PROCLOG_DIR):
+	"""Returns all of the proclogs of a process as a dict mapping the name of
+	each log (e.g., 'FftBlock_0/perf') to its contents"""
+	logdir = os.path.join(basedir, str(pid))
+	logs = {}
+	for dirpath, dirnames, filenames in os.walk(logdir):
+		for filename in filenames:
+			path = os.path.join(dirpath, filename)
+			try:
+				contents = load_log(path)
+			except IOError:
+				# Note: Logs are removed when their owners are destroyed
+				continue
+			logs[os.path.relpath(path, logdir)] = contents
+	return logs
+
+def load_block_perfs(pid, basedir=PROCLOG_DIR):
+	"""Returns the perf logs of a process's pipeline blocks as a dict mapping
+	block names to log contents"""
+	return dict((name[:-len('/perf')], contents)
+	            for name, contents in load_process_logs(pid, basedir).items()
+	            if name.endswith('/perf'))
+
+_TOTAL_KEYS = ['ngulp', 'nframe', 'nbyte', 'total_acquire_time',
+               'total_reserve_time', 'total_process_time']
+
+def _has_totals(perf):
+	# Note: Logs written by older versions only hold the latest gulp's times
+	return all([key in perf for key in _TOTAL_KEYS + ['start_time',
+	                                                   'update_time']])
+
+def _nonnegative(value):
+	return value if value is not None and value > 0 else 0
+
+def block_stats(perf, prev_perf=None):
+	"""Derives a block's performance from its perf log, averaged over the
+	time since prev_perf (an earlier perf log of the same block) or since
+	the block started. Returns a dict containing:
+	  gulp_rate, frame_rate, byte_rate: Gulps, frames and bytes per second
+	  duty_cycle:   Fraction of time spent processing
+	  acquire_frac: Fraction of time spent waiting for input
+	  reserve_frac: Fraction of time spent waiting for output space
+	  bound:        'input', 'output' or 'compute', whichever of the above
+	                  the block spends the most time on
+	  in_fills:     Fraction of each input ring filled ahead of the block
+	Rates are None if the log does not include running totals, in which
+	  case the fractions are those of the latest gulp.
+	"""
+	stats = {}
+	if _has_totals(perf):
+		if (prev_perf is not None and _has_totals(prev_perf) and
+		    prev_perf['update_time'] < perf['update_time'] and
+		    prev_perf['start_time'] == perf['start_time']):
+			base = prev_perf
+			elapsed = perf['update_time'] - prev_perf['update_time']
+		else:
+			base = dict((key, 0) for key in _TOTAL_KEYS)
+			elapsed = perf['update_time'] - perf['start_time']
+		elapsed = max(elapsed, 1e-9)
+		def delta(key):
+			return perf[key] - base[key]
+		stats['gulp_rate']    = delta('ngulp')  / elapsed
+		stats['frame_rate']   = delta('nframe') / elapsed
+		stats['byte_rate']    = delta('nbyte')  / elapsed
+		acquire_time = delta('total_acquire_time')
+		reserve_time = delta('total_reserve_time')
+		process_time = delta('total_process_time')
+		total_time   = elapsed
+	else:
+		stats['gulp_rate']  = None
+		stats['frame_rate'] = None
+		stats['byte_rate']  = None
+		acquire_time = _nonnegative(perf.get('acquire_time'))
+		reserve_time = _nonnegative(perf.get('reserve_time'))
+		process_time = _nonnegative(perf.get('process_time'))
+		total_time   = max(acquire_time + reserve_time + process_time, 1e-9)
+	stats['duty_cycle']   = process_time / total_time
+	stats['acquire_frac'] = acquire_time / total_time
+	stats['reserve_frac'] = reserve_time / total_time
+	stats['bound'] = max([('input',   stats['acquire_frac']),
+	                      ('output',  stats['reserve_frac']),
+	                      ('compute', stats['duty_cycle'])],
+	                     key=lambda item: item[1])[0]
+	nin = len([key for key in perf if key.startswith('in') and
+	                                  key.endswith('_fill')])
+	stats['in_fills'] = [perf['in%i_fill' % i] for i in xrange(nin)]
+	return stats
+
+class Monitor(object):
+	"""Tracks the performance of the pipeline blocks of all running bifrost
+	processes (or only those in pids) between calls to update."""
+	def __init__(self, pids=None, basedir=PROCLOG_DIR):
+		self.pids    = pids
+		self.basedir = basedir
+		self.perfs   = {}
+	def update(self):
+		"""Returns a list of (pid, block name, stats) sorted by pid and
+		block name, where stats is as given by block_stats (averaged since
+		the previous update)"""
+		pids = list_pids(self.basedir) if self.pids is None else self.pids
+		perfs = {}
+		for pid in pids:
+			for name, perf in load_block_perfs(pid, self.basedir).items():
+				if 'process_time' in perf:
+					perfs[(pid, name)] = perf
+		rows = [(pid, name, block_stats(perf, self.perfs.get((pid, name))))
+		        for (pid, name), perf in sorted(perfs.items())]
+		self.perfs = perfs
+		return rows
@@ -31,12 +31,22 @@ from libbifrost import _bf, _check, _get, _fast_get, _string2space, _space2strin
 import ctypes
 import numpy as np
 
+def format_supported(fmt):
+	"""Returns True if packets of the given format can be captured"""
+	return bool(_get(_bf.UdpCaptureFormatSupported(fmt)))
+
 class UDPCapture(object):
+	"""Captures packets of the given format (e.g., 'chips', 'simple' or
+	'generic') from sock into ring, receiving up to batch_npkt packets per
+	system call."""
 	def __init__(self, fmt, sock, ring, nsrc, src0, max_payload_size,
-	             buffer_ntime, slot_ntime, sequence_callback, core=None):
+	             buffer_ntime, slot_ntime, sequence_callback, core=None,
+	             batch_npkt=16):
 		self.obj = None
 		if core is None:
 			core = -1
+		if not format_supported(fmt):
+			raise ValueError("Unsupported packet format: %s" % fmt)
 		self.obj = _get(_bf.UdpCaptureCreate(format=fmt,
 		                                     fd=sock.fileno(),
 		                                     ring=ring.obj,
@@ -46,7 +56,8 @@ class UDPCapture(object):
 		                                     buffer_ntime=buffer_ntime,
 		                                     slot_ntime=slot_ntime,
 		                                     sequence_callback=sequence_callback,
-		                                     core=core), retarg=0)
+		                                     core=core,
+		                                     batch_npkt=batch_npkt), retarg=0)
 	def __del__(self):
 		if hasattr(self, 'obj') and bool(self.obj):
 			_bf.UdpCaptureDestroy(self.obj)
@@ -60,3 +71,13 @@ class UDPCapture(object):
 		_check( _bf.UdpCaptureFlush(self.obj) )
 	def end(self):
 		_check( _bf.UdpCaptureEnd(self.obj) )
+	def get_stats(self, src=None):
+		"""Returns a snapshot of the capture statistics (for all sources, or
+		for source src) as a dict. This is cheap and may be called from any
+		thread."""
+		if src is None:
+			src = -1
+		stats = _bf.BFudpcapture_stats()
+		_check( _bf.UdpCaptureGetStats(self.obj, src, ctypes.byref(stats)) )
+		return dict((name, getattr(stats, name))
+		            for name, _ in stats._fields_)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2017, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2017, The University of New Mexico. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from libbifrost import _bf, _check, _get
+from udp_transmit import format_supported
+
+import ctypes
+
+class UDPGenerator(object):
+	"""Sends synthetic packets of the given format (see
+	udp_transmit.format_supported) from nsrc sources through the (connected)
+	socket sock, for testing and benchmarking packet capture.
+	Every byte of a payload is set to (seq*nsrc + src) % 256. Each packet's
+	header is a copy of hdr_template (or zeros) with its sequence and source
+	fields set. Packets can be deliberately dropped, duplicated and
+	reordered (see set_impairments), and their average rate limited to rate
+	bytes per second.
+	"""
+	def __init__(self, fmt, sock, nsrc, payload_size, src0=0,
+	             hdr_template=None, rate=None, core=-1):
+		self.obj = None
+		if not format_supported(fmt):
+			raise ValueError("Unsupported packet format: %s" % fmt)
+		self.obj = _get(_bf.UdpGeneratorCreate(format=fmt,
+		                                       fd=sock.fileno(),
+		                                       nsrc=nsrc,
+		                                       src0=src0,
+		                                       payload_size=payload_size,
+		                                       core=core), retarg=0)
+		self.nsrc = nsrc
+		self.seq  = 0
+		if hdr_template is not None:
+			self.set_header(hdr_template)
+		if rate is not None:
+			self.set_rate(rate)
+	def __del__(self):
+		if hasattr(self, 'obj') and bool(self.obj):
+			_bf.UdpGeneratorDestroy(self.obj)
+	def __enter__(self):
+		return self
+	def __exit__(self, type, value, tb):
+		pass
+	def set_header(self, hdr_template):
+		_check( _bf.UdpGeneratorSetHeader(self.obj, hdr_template,
+		                                  len(hdr_template)) )
+	def set_rate(self, rate):
+		"""Limits the average send rate to rate bytes per second (None or 0
+		removes the limit)"""
+		_check( _bf.UdpGeneratorSetRate(self.obj, rate or 0) )
+	def set_impairments(self, drop=0., duplicate=0., reorder=0.,
+	                    reorder_distance=8, seed=0):
+		"""Sets the probabilities with which each packet is dropped,
+		duplicated, and swapped with one of the next reorder_distance
+		packets"""
+		_check( _bf.UdpGeneratorSetImpairments(self.obj, drop, duplicate,
+		                                       reorder, reorder_distance,
+		                                       seed) )
+	def send(self, ntime, seq0=None):
+		"""Sends the packets of ntime time samples from each source,
+		continuing from the previous call unless seq0 is given"""
+		if seq0 is not None:
+			self.seq = seq0
+		status = _get( _bf.UdpGeneratorSend(self.obj, self.seq, ntime) )
+		self.seq += ntime
+		return status
+	def get_stats(self):
+		"""Returns the no. packets sent, dropped, duplicated and reordered
+		as a dict"""
+		stats = _bf.BFudpgenerator_stats()
+		_check( _bf.UdpGeneratorGetStats(self.obj, ctypes.byref(stats)) )
+		return dict((name, getattr(stats, name))
+		            for name, _ in stats._fields_)
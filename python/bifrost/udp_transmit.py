@@ -31,24 +31,36 @@ from libbifrost import _bf, _check, _get
 import ctypes
 import numpy as np
 
+def format_supported(fmt):
+	"""Returns True if packets of the given format can be sent with
+	UDPTransmit.send_span"""
+	return bool(_get(_bf.UdpTransmitFormatSupported(fmt)))
+
 def _packet2pointer(packet):
 	buf = ctypes.c_char_p(packet)
 	siz = ctypes.c_uint( len(packet) )
 	return buf, siz
 
 
-def _packets2pointer(packets):
-	count = ctypes.c_uint( len(packets) )
-	buf = ctypes.c_char_p("".join(packets))
-	siz = ctypes.c_uint( len(packets[0]) )
-	return buf, siz, count
+def _packets2pointers(packets):
+	# Note: The pointers refer directly to the memory of the packet strings
+	count = len(packets)
+	bufs = (ctypes.c_void_p * count)(*[ctypes.cast(ctypes.c_char_p(packet),
+	                                               ctypes.c_void_p)
+	                                   for packet in packets])
+	sizs = (ctypes.c_uint64 * count)(*[len(packet) for packet in packets])
+	return bufs, sizs, count
 
 
 class UDPTransmit(object):
-	def __init__(self, sock, core=-1):
+	"""Sends packets through the (connected) socket sock, at no more than
+	rate bytes per second on average if rate is given."""
+	def __init__(self, sock, core=-1, rate=None):
 		self.obj = None
 		self.obj = _get(_bf.UdpTransmitCreate(fd=sock.fileno(),
 		                                     core=core), retarg=0)
+		if rate is not None:
+			self.set_rate(rate)
 	def __del__(self):
 		if hasattr(self, 'obj') and bool(self.obj):
 			_bf.UdpTransmitDestroy(self.obj)
@@ -56,10 +68,40 @@ class UDPTransmit(object):
 		return self
 	def __exit__(self, type, value, tb):
 		pass
+	def set_rate(self, rate):
+		"""Limits the average send rate to rate bytes per second (None or 0
+		removes the limit)"""
+		_check( _bf.UdpTransmitSetRate(self.obj, rate or 0) )
 	def send(self, packet):
 		ptr, siz = _packet2pointer(packet)
 		return _get( _bf.UdpTransmitSend(self.obj, ptr, siz) )
 	def sendmany(self, packets):
+		"""Sends a list of packets, which may differ in size"""
 		assert(type(packets) is list)
-		ptr, siz, count = _packets2pointer(packets)
-		return _get( _bf.UdpTransmitSendMany(self.obj, ptr, siz, count) )
\ No newline at end of file
+		ptrs, sizs, count = _packets2pointers(packets)
+		return _get( _bf.UdpTransmitSendV(self.obj, ptrs, sizs, count) )
+	def send_span(self, fmt, data, seq0=0, src0=0, hdr_template=None):
+		"""Sends one packet for each [time, src] element of data (e.g., a
+		ring span's data), which must be a C-contiguous array of shape
+		[ntime, nsrc, ...] in system memory. The payloads are sent directly
+		from data. Each packet's header is a copy of hdr_template (a string,
+		or zeros if None) with the sequence no. (seq0 + time) and source
+		no. (src0 + src) fields set according to fmt (see format_supported).
+		"""
+		if not format_supported(fmt):
+			raise ValueError("Unsupported packet format: %s" % fmt)
+		if hasattr(data, 'bf') and data.bf.space not in ('system',
+		                                                 'cuda_host'):
+			raise ValueError("Data must be in system memory")
+		if data.ndim < 2:
+			raise ValueError("Data must have shape [ntime, nsrc, ...]")
+		if not data.flags['C_CONTIGUOUS']:
+			raise ValueError("Data must be contiguous")
+		ntime, nsrc = data.shape[:2]
+		payload_size = data[0,0].nbytes if data.size else 0
+		if hdr_template is None:
+			hdr_template = ''
+		return _get( _bf.UdpTransmitSendSpan(self.obj, fmt, hdr_template,
+		                                     len(hdr_template),
+		                                     seq0, src0, data.ctypes.data,
+		                                     ntime, nsrc, payload_size) )
@@ -38,11 +38,35 @@ extern "C" {
 
 BFstatus bfStreamGet(void*       stream);
 BFstatus bfStreamSet(void const* stream);
+/*! \p bfStreamSynchronize waits for all work enqueued on the current
+ *       thread's stream to complete. The calling thread sleeps rather than
+ *       spins while waiting.
+ */
 BFstatus bfStreamSynchronize();
 BFstatus bfDeviceGet(int* device);
 BFstatus bfDeviceSet(int  device);
 BFstatus bfDeviceSetById(const char* pci_bus_id);
 
+/*! \brief An event marks a point in a stream, allowing the host to check
+ *         or wait for the completion of all work enqueued before it.
+ *  \note  Without CUDA support, events are always complete.
+ */
+typedef struct BFevent_impl* BFevent;
+
+BFstatus bfEventCreate(BFevent* event);
+BFstatus bfEventDestroy(BFevent event);
+/*! \p bfEventRecord records \p event in the current thread's stream
+ */
+BFstatus bfEventRecord(BFevent event);
+/*! \p bfEventQuery sets \p complete to whether all work recorded before
+ *       \p event has completed, without blocking
+ */
+BFstatus bfEventQuery(BFevent event, BFbool* complete);
+/*! \p bfEventSynchronize waits (without spinning) for all work recorded
+ *       before \p event to complete
+ */
+BFstatus bfEventSynchronize(BFevent event);
+
 #ifdef __cplusplus
 } // extern "C"
 #endif
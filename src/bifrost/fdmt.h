@@ -122,6 +122,35 @@ BFstatus bfFdmtExecute(BFfdmt         plan,
                        BFbool         negative_delays,
                        void*          exec_storage,
                        BFsize*        exec_storage_size);
+
+/*! \p bfFdmtExecuteIncremental executes a FDMT plan on the next part of a
+ *       continuous input stream. The partial sums needed by later calls are
+ *       retained by the plan, so each input sample is transformed only once
+ *       (instead of re-transforming \p max_delay samples of overlap).
+ *
+ *  \param plan              The FDMT plan to execute
+ *  \param in                The next \p ntime samples of the input stream, of shape [..., \p nchan, \p ntime]
+ *  \param out               The output dispersion bank of shape [..., \p max_delay, \p nout], where \p nout <= \p ntime
+ *  \return One of the following error codes: \n
+ *  \p BF_STATUS_SUCCESS, \p BF_STATUS_INVALID_HANDLE,
+ *  \p BF_STATUS_INVALID_POINTER, \p BF_STATUS_INVALID_SPACE,
+ *  \p BF_STATUS_INVALID_SHAPE, \p BF_STATUS_UNSUPPORTED_DTYPE,
+ *  \p BF_STATUS_UNSUPPORTED_STRIDE, \p BF_STATUS_MEM_ALLOC_FAILED,
+ *  \p BF_STATUS_DEVICE_ERROR, \p BF_STATUS_INTERNAL_ERROR
+ *  \note The output lags the input by \p max_delay samples: \p out receives
+ *        the \p nout most recent complete output samples, which must all lie
+ *        at or after the start of the stream. The results are the same as
+ *        those of \p bfFdmtExecute applied to the whole stream.
+ *  \note The stream is restarted by \p bfFdmtInit and \p bfFdmtResetIncremental.
+ *  \note Only positive delays are supported.
+ */
+BFstatus bfFdmtExecuteIncremental(BFfdmt         plan,
+                                  BFarray const* in,
+                                  BFarray const* out);
+/*! \p bfFdmtResetIncremental discards the retained state of an incremental
+ *       execution so that the next call starts a new stream.
+ */
+BFstatus bfFdmtResetIncremental(BFfdmt plan);
 BFstatus bfFdmtDestroy(BFfdmt plan);
 
 #ifdef __cplusplus
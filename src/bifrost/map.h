@@ -55,9 +55,9 @@ extern "C" {
  *  \p BF_STATUS_SUCCESS, \p BF_STATUS_INVALID_SPACE,
  *  \p BF_STATUS_INVALID_POINTER, \p BF_STATUS_INVALID_STRIDE,
  *  \p BF_STATUS_UNSUPPORTED_DTYPE, \p BF_STATUS_INVALID_ARGUMENT,
- *  \p BF_STATUS_DEVICE_ERROR
+ *  \p BF_STATUS_DEVICE_ERROR, \p BF_STATUS_UNSUPPORTED
  *  \note The string \p func must be valid C++11 syntax suitable for execution
- *        as CUDA device code. Examples:\n
+ *        as CUDA device code or host code. Examples:\n
  *        \code{.cpp} "c(i,j,k) = a(i,k) + b" // Using axis_names = {"i", "j", "k"}\endcode
  *        \code{.cpp} "z(_) = x(_) * y(_ - y.shape()/2)"    // Using the built-in index array "_"\endcode
  *        \code{.cpp} "out(i) = in((i + shift) % in.shape(0))" // Using the shape of an array
@@ -65,6 +65,12 @@ extern "C" {
  *  \note Any BFarrays that are immutable, have shape=[1] and are accessible
  *        from system memory are treated as scalars, and must be accessed as,
  *         e.g., "b" not "b(0)".
+ *  \note If all (non-scalar) BFarrays are in system or cuda_host memory, the
+ *          computation is performed on the host using a kernel compiled with
+ *          the system C++ compiler (overridable via $BIFROST_MAP_CXX) and run
+ *          across OpenMP threads. Compiled kernels are cached in the same
+ *          way as CUDA kernels. \p BF_STATUS_UNSUPPORTED is returned if no
+ *          host compiler is available.
  *  \note While this function is very flexible, it does not guarantee efficient
  *          computation. E.g., using it for transpose operations is likely to
  *          be much less efficient than using the dedicated bfTranspose function.
@@ -77,6 +83,28 @@ BFstatus bfMap(int                  ndim,
                char const*const*    arg_names,
                char const*          func);
 
+/*! \p bfMapPrecompile compiles (and caches) the kernel that \p bfMap would
+ *     use for the given arguments, without executing it.
+ *
+ *  The parameters are the same as for \p bfMap, except that the data
+ *    pointers of \p args are not accessed (and may be NULL); only their
+ *    space, dtype, shape, strides and mutability are used.
+ *  \note Kernels are cached per-thread in memory, so this should be called
+ *          from the thread that will later call \p bfMap (e.g., from a
+ *          block's on_sequence callback).
+ *  \note Compiled kernels are also stored in a persistent on-disk cache
+ *          (by default $HOME/.cache/bifrost/map, overridable via
+ *          $BIFROST_MAP_CACHE_DIR; set it to an empty string to disable),
+ *          so that subsequent processes can skip compilation.
+ */
+BFstatus bfMapPrecompile(int                  ndim,
+                         long const*          shape,
+                         char const*const*    axis_names,
+                         int                  narg,
+                         BFarray const*const* args,
+                         char const*const*    arg_names,
+                         char const*          func);
+
 #ifdef __cplusplus
 } // extern "C"
 #endif
@@ -72,6 +72,29 @@ typedef struct BFwspan_impl*       BFwspan;
 
 // Ring
 BFstatus bfRingCreate(BFring* ring, BFspace space);
+/*! \p bfRingCreateShared creates a ring whose buffer, sequences and
+ *    reader/writer state reside in named shared memory, so that it can be
+ *    used from other processes (via fork or \p bfRingAttach) with the same
+ *    guarantee and overwrite semantics as within a single process.
+ *
+ *  \param ring      Pointer to the returned ring handle
+ *  \param space     The memory space of the ring (must be BF_SPACE_SYSTEM)
+ *  \param name      Unique name of the shared memory segment (no slashes)
+ *  \param hugepages If true, the data buffer is allocated from the hugetlbfs
+ *                      mount at $BIFROST_HUGEPAGE_DIR (default /dev/hugepages)
+ *  \note The segments live under /dev/shm and are removed when the ring is
+ *          destroyed by the process that created it.
+ */
+BFstatus bfRingCreateShared(BFring* ring, BFspace space, const char* name,
+                            BFbool hugepages);
+/*! \p bfRingAttach opens a ring created by \p bfRingCreateShared,
+ *    typically in another process.
+ *
+ *  \param ring Pointer to the returned ring handle
+ *  \param name Name passed to \p bfRingCreateShared
+ *  \note Destroying an attached ring only detaches it from the process.
+ */
+BFstatus bfRingAttach(BFring* ring, const char* name);
 BFstatus bfRingDestroy(BFring ring);
 /*! \p bfRingResize requests allocation of memory for the ring
  * 
@@ -184,6 +207,15 @@ BFstatus bfRingSpanAcquire(BFrspan*    span,
                            BFoffset    offset,
                            BFsize      size);
 BFstatus bfRingSpanRelease(BFrspan span);
+// As bfRingSpanRelease, but the last keep_size bytes of the span remain
+//   guaranteed so that they can be read again by the next (overlapping) span.
+BFstatus bfRingSpanReleaseKeep(BFrspan span,
+                               BFsize  keep_size);
+// Returns the no. bytes from offset (relative to the sequence begin) that can
+//   currently be acquired without waiting for the writer.
+BFstatus bfRingSpanAvailable(BFrsequence sequence,
+                             BFoffset    offset,
+                             BFsize*     size);
 
 //BFstatus bfRingSpanClose(BFrspan span);
 BFstatus bfRingSpanStillValid(BFrspan  span,
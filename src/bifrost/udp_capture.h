@@ -52,6 +52,12 @@ typedef enum {
 	BF_CAPTURE_ERROR
 } BFudpcapture_status;
 
+/*! \p bfUdpCaptureCreate creates a capture of packets of the given format
+ *       (e.g., "chips", "simple" or "generic") into \p ring.
+ *
+ *  \param batch_npkt The max no. packets received by each system call
+ *  \return \p BF_STATUS_UNSUPPORTED if the format is not supported
+ */
 BFstatus bfUdpCaptureCreate(BFudpcapture* obj,
                             const char*   format,
                             int           fd,
@@ -62,12 +68,39 @@ BFstatus bfUdpCaptureCreate(BFudpcapture* obj,
                             BFsize        buffer_ntime,
                             BFsize        slot_ntime,
                             BFudpcapture_sequence_callback sequence_callback,
-                            int           core);
+                            int           core,
+                            BFsize        batch_npkt);
+BFstatus bfUdpCaptureFormatSupported(const char* format, BFbool* supported);
 BFstatus bfUdpCaptureDestroy(BFudpcapture obj);
 BFstatus bfUdpCaptureRecv(BFudpcapture obj, BFudpcapture_status* result);
 BFstatus bfUdpCaptureFlush(BFudpcapture obj);
 BFstatus bfUdpCaptureEnd(BFudpcapture obj);
-// TODO: bfUdpCaptureGetXX
+
+/*! \brief Cumulative capture statistics, for all sources or for one
+ *  \note  ninvalid and ndropped are not attributable to a source, and are
+ *         always 0 in per-source statistics.
+ */
+typedef struct {
+	BFsize nvalid;         // No. packets captured
+	BFsize nvalid_bytes;
+	BFsize nlate;          // No. packets that arrived after their buffer was committed
+	BFsize nlate_bytes;
+	BFsize ninvalid;       // No. packets that could not be decoded
+	BFsize ninvalid_bytes;
+	BFsize ndropped;       // No. packets dropped because the socket buffer was full
+	BFsize ngood_bytes;    // No. bytes committed to the ring from packets
+	BFsize nmissing_bytes; // No. bytes committed to the ring without a packet
+	BFsize nblanked;       // No. buffers zeroed due to >50% missing data
+	double reserve_time;   // Secs spent waiting for space in the ring
+} BFudpcapture_stats;
+
+/*! \p bfUdpCaptureGetStats returns a snapshot of the statistics, as of the
+ *       end of the latest call to \p bfUdpCaptureRecv, for all sources
+ *       (\p src < 0) or for source \p src.
+ *  \note This may be called from any thread.
+ */
+BFstatus bfUdpCaptureGetStats(BFudpcapture obj, int src,
+                              BFudpcapture_stats* stats);
 
 #ifdef __cplusplus
 } // extern "C"
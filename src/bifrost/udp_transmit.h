@@ -30,6 +30,8 @@
 #ifndef BF_UDP_TRANSMIT_H_INCLUDE_GUARD_
 #define BF_UDP_TRANSMIT_H_INCLUDE_GUARD_
 
+#include <bifrost/common.h>
+
 #ifdef __cplusplus
 extern "C" {
 #endif
@@ -45,9 +47,118 @@ typedef enum {
 BFstatus bfUdpTransmitCreate(BFudptransmit* obj,
                             int           fd,
                             int           core);
+/*! \p bfUdpTransmitFormatSupported returns whether packets of the given
+ *       format (e.g., "raw", "chips", "simple" or "generic") can be sent
+ *       with \p bfUdpTransmitSendSpan.
+ */
+BFstatus bfUdpTransmitFormatSupported(const char* format, BFbool* supported);
 BFstatus bfUdpTransmitDestroy(BFudptransmit obj);
+/*! \p bfUdpTransmitSetRate limits the average rate at which packets are
+ *       sent to \p rate bytes per second (0 => unlimited, the default).
+ */
+BFstatus bfUdpTransmitSetRate(BFudptransmit obj, double rate);
 BFstatus bfUdpTransmitSend(BFudptransmit obj, char* packet, unsigned int len);
 BFstatus bfUdpTransmitSendMany(BFudptransmit obj, char* packets, unsigned int len, unsigned int npackets);
+/*! \p bfUdpTransmitSendV sends \p npackets packets of (possibly) different
+ *       sizes directly from the memory at \p packets[i].
+ */
+BFstatus bfUdpTransmitSendV(BFudptransmit         obj,
+                            void**                packets,
+                            BFsize*               sizes,
+                            BFsize                npackets,
+                            BFudptransmit_status* result);
+/*! \p bfUdpTransmitSendSpan sends one packet for each [time][src] element
+ *       of a contiguous array of data, e.g., a span of a ring.
+ *
+ *  \param obj          The transmitter
+ *  \param format       The packet format (see \p bfUdpTransmitFormatSupported)
+ *  \param hdr_template The header to send with each packet (may be NULL if
+ *                      \p hdr_size is 0)
+ *  \param hdr_size     The size in bytes of \p hdr_template
+ *  \param seq0         The sequence number of the first time sample
+ *  \param src0         The source number of the first source
+ *  \param data         The payloads, of shape [\p ntime][\p nsrc][\p payload_size]
+ *  \param ntime        The number of time samples in \p data
+ *  \param nsrc         The number of sources in \p data
+ *  \param payload_size The size in bytes of each payload
+ *  \param result       The result of the send
+ *  \note The payloads are sent directly from \p data without being copied.
+ *  \note Each packet's header is a copy of \p hdr_template (or of zeros if
+ *        \p hdr_template is NULL) with its sequence and source fields set by
+ *        the format; the remaining fields (e.g., nchan) are sent as given.
+ *        The "raw" format sends \p hdr_template (of any size) unchanged.
+ */
+BFstatus bfUdpTransmitSendSpan(BFudptransmit         obj,
+                               const char*           format,
+                               void const*           hdr_template,
+                               BFsize                hdr_size,
+                               BFoffset              seq0,
+                               int                   src0,
+                               void const*           data,
+                               BFsize                ntime,
+                               BFsize                nsrc,
+                               BFsize                payload_size,
+                               BFudptransmit_status* result);
+
+typedef struct BFudpgenerator_impl* BFudpgenerator;
+
+typedef struct {
+	BFsize nsent;       // Packets sent (including duplicates)
+	BFsize nsent_bytes;
+	BFsize ndropped;    // Packets deliberately not sent
+	BFsize nduplicated; // Packets deliberately sent twice
+	BFsize nreordered;  // Packets deliberately sent out of order
+} BFudpgenerator_stats;
+
+/*! \p bfUdpGeneratorCreate creates a generator of synthetic packets for
+ *       testing and benchmarking capture code.
+ *
+ *  \param obj          The new generator
+ *  \param format       The packet format (see \p bfUdpTransmitFormatSupported)
+ *  \param fd           The (connected) socket to send through
+ *  \param nsrc         The number of sources to send packets from
+ *  \param src0         The source number of the first source
+ *  \param payload_size The size in bytes of each payload
+ *  \param core         The CPU core to bind the calling thread to (or -1)
+ *  \note Every byte of a payload is set to (seq*nsrc + src) % 256, where src
+ *        is counted from 0.
+ *  \note The header template is initially all zeros (see
+ *        \p bfUdpGeneratorSetHeader).
+ */
+BFstatus bfUdpGeneratorCreate(BFudpgenerator* obj,
+                              const char*     format,
+                              int             fd,
+                              int             nsrc,
+                              int             src0,
+                              BFsize          payload_size,
+                              int             core);
+BFstatus bfUdpGeneratorDestroy(BFudpgenerator obj);
+/*! \p bfUdpGeneratorSetHeader sets the header template that the format's
+ *       per-packet fields are set in (see \p bfUdpTransmitSendSpan).
+ */
+BFstatus bfUdpGeneratorSetHeader(BFudpgenerator obj,
+                                 void const*    hdr_template,
+                                 BFsize         hdr_size);
+BFstatus bfUdpGeneratorSetRate(BFudpgenerator obj, double rate);
+/*! \p bfUdpGeneratorSetImpairments sets the probabilities with which each
+ *       packet is dropped, duplicated, and swapped with one of the next
+ *       \p reorder_distance packets, using random numbers seeded by \p seed.
+ */
+BFstatus bfUdpGeneratorSetImpairments(BFudpgenerator obj,
+                                      double         drop_prob,
+                                      double         duplicate_prob,
+                                      double         reorder_prob,
+                                      int            reorder_distance,
+                                      BFsize         seed);
+/*! \p bfUdpGeneratorSend sends the packets of \p ntime time samples from
+ *       each source, starting at sequence number \p seq0.
+ */
+BFstatus bfUdpGeneratorSend(BFudpgenerator        obj,
+                            BFoffset              seq0,
+                            BFsize                ntime,
+                            BFudptransmit_status* result);
+BFstatus bfUdpGeneratorGetStats(BFudpgenerator        obj,
+                                BFudpgenerator_stats* stats);
 
 #ifdef __cplusplus
 } // extern "C"
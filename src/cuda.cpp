@@ -31,6 +31,8 @@
 #include "cuda.hpp"
 #include "assert.hpp"
 
+#include <map>
+
 #if BF_CUDA_ENABLED
 thread_local cudaStream_t g_cuda_stream = cudaStreamPerThread;
 #endif
@@ -76,9 +78,129 @@ BFstatus bfDeviceSetById(const char* pci_bus_id) {
 	return BF_STATUS_SUCCESS;
 #endif
 }
+
+struct BFevent_impl {
+#if BF_CUDA_ENABLED
+	cudaEvent_t event;
+#endif
+};
+
+BFstatus bfEventCreate(BFevent* event) {
+	BF_ASSERT(event, BF_STATUS_INVALID_POINTER);
+	BFevent_impl* event_impl = new BFevent_impl;
+#if BF_CUDA_ENABLED
+	// Note: cudaEventBlockingSync makes waiting threads sleep instead of
+	//         spinning, without needing cudaDeviceScheduleBlockingSync to
+	//         be set before the context is created.
+	cudaError_t ret = cudaEventCreateWithFlags(&event_impl->event,
+	                                           cudaEventBlockingSync |
+	                                           cudaEventDisableTiming);
+	if( ret != cudaSuccess ) {
+		delete event_impl;
+	}
+	BF_CHECK_CUDA(ret, BF_STATUS_DEVICE_ERROR);
+#endif
+	*event = event_impl;
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfEventDestroy(BFevent event) {
+	BF_ASSERT(event, BF_STATUS_INVALID_HANDLE);
+#if BF_CUDA_ENABLED
+	cudaEventDestroy(event->event);
+#endif
+	delete event;
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfEventRecord(BFevent event) {
+	BF_ASSERT(event, BF_STATUS_INVALID_HANDLE);
+#if BF_CUDA_ENABLED
+	BF_CHECK_CUDA(cudaEventRecord(event->event, g_cuda_stream),
+	              BF_STATUS_DEVICE_ERROR);
+#endif
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfEventQuery(BFevent event, BFbool* complete) {
+	BF_ASSERT(event,    BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(complete, BF_STATUS_INVALID_POINTER);
+#if BF_CUDA_ENABLED
+	cudaError_t ret = cudaEventQuery(event->event);
+	if( ret == cudaErrorNotReady ) {
+		*complete = false;
+		return BF_STATUS_SUCCESS;
+	}
+	BF_CHECK_CUDA(ret, BF_STATUS_DEVICE_ERROR);
+#endif
+	*complete = true;
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfEventSynchronize(BFevent event) {
+	BF_ASSERT(event, BF_STATUS_INVALID_HANDLE);
+#if BF_CUDA_ENABLED
+	BF_CHECK_CUDA(cudaEventSynchronize(event->event),
+	              BF_STATUS_DEVICE_ERROR);
+#endif
+	return BF_STATUS_SUCCESS;
+}
+
+#if BF_CUDA_ENABLED
+// Owns an event on each device used by a thread, for the lifetime of the
+//   thread (events can only be recorded on their own device's streams)
+class ThreadEvents {
+	typedef std::map<int, BFevent> event_map;
+	event_map _events;
+	// No copy or move
+	ThreadEvents(ThreadEvents const& );
+	ThreadEvents& operator=(ThreadEvents const& );
+public:
+	ThreadEvents() {}
+	~ThreadEvents() {
+		// Note: Errors are ignored here because the CUDA runtime may
+		//         already have been torn down at process exit.
+		int device;
+		bool restore = (cudaGetDevice(&device) == cudaSuccess);
+		for( event_map::iterator it=_events.begin(); it!=_events.end(); ++it ) {
+			cudaSetDevice(it->first);
+			bfEventDestroy(it->second);
+		}
+		if( restore ) {
+			cudaSetDevice(device);
+		}
+	}
+	// Returns the event for the current device
+	BFstatus get(BFevent* event) {
+		int device;
+		BF_CHECK_CUDA(cudaGetDevice(&device), BF_STATUS_DEVICE_ERROR);
+		event_map::iterator it = _events.find(device);
+		if( it == _events.end() ) {
+			BFevent new_event;
+			BFstatus ret = bfEventCreate(&new_event);
+			if( ret != BF_STATUS_SUCCESS ) {
+				return ret;
+			}
+			it = _events.insert(std::make_pair(device, new_event)).first;
+		}
+		*event = it->second;
+		return BF_STATUS_SUCCESS;
+	}
+};
+#endif
+
 BFstatus bfStreamSynchronize() {
 #if BF_CUDA_ENABLED
-	BF_CHECK_CUDA(cudaStreamSynchronize(g_cuda_stream),
+	// Note: cudaStreamSynchronize spins the CPU unless the device was
+	//         created with cudaDeviceScheduleBlockingSync, so this waits on
+	//         a blocking-sync event instead.
+	// Note: The thread may switch devices (bfDeviceSet), so each device
+	//         gets its own event.
+	thread_local ThreadEvents thread_events;
+	BFevent event;
+	BFstatus ret = thread_events.get(&event);
+	if( ret != BF_STATUS_SUCCESS ) {
+		return ret;
+	}
+	BF_CHECK_CUDA(cudaEventRecord(event->event, g_cuda_stream),
+	              BF_STATUS_DEVICE_ERROR);
+	BF_CHECK_CUDA(cudaEventSynchronize(event->event),
 	              BF_STATUS_DEVICE_ERROR);
 #endif
 	return BF_STATUS_SUCCESS;
@@ -0,0 +1,1115 @@
+/*
+ * Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+ * Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+ *
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions
+ * are met:
+ * * Redistributions of source code must retain the above copyright
+ *   notice, this list of conditions and the following disclaimer.
+ * * Redistributions in binary form must reproduce the above copyright
+ *   notice, this list of conditions and the following disclaimer in the
+ *   documentation and/or other materials provided with the distribution.
+ * * Neither the name of The Bifrost Authors nor the names of its
+ *   contributors may be used to endorse or promote products derived
+ *   from this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+ * EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+ * PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+ * CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+ * EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+ * PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+ * PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+ * OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include <bifrost/fdmt.h>
+#include "assert.hpp"
+#include "utils.hpp"
+#include "workspace.hpp"
+#include "cuda.hpp"
+#include "trace.hpp"
+#include <bifrost/memory.h>
+#if BF_CUDA_ENABLED
+#include "fdmt_kernels.h"
+#endif
+
+#include <limits>
+#include <cassert>
+#include <cmath>
+#include <cstring>
+#include <algorithm>
+#include <vector>
+#include <map>
+#include <string>
+
+// HACK TESTING
+#include <iostream>
+using std::cout;
+using std::endl;
+
+// Note: Binary-compatible with CUDA's int2
+struct FdmtIndexPair {
+	int x;
+	int y;
+};
+inline FdmtIndexPair make_fdmt_index_pair(int x, int y) {
+	FdmtIndexPair p;
+	p.x = x;
+	p.y = y;
+	return p;
+}
+
+// Host implementations of the FDMT kernels
+// Note: These perform exactly the same floating-point operations in the same
+//         order as the CUDA kernels, and so produce identical results.
+// Note: Time is processed in blocks so that the running sums and the input
+//         samples they read stay in cache while iterating over delays.
+enum { FDMT_HOST_TIME_BLOCK = 1024 };
+// The maximum number of samples processed at once by incremental execution
+//   (which determines the size of the retained state)
+enum { FDMT_STREAM_BLOCK = 4096 };
+
+template<typename InType, typename OutType>
+void fdmt_init_host(int            ntime,
+                    int            nchan,
+                    bool           reverse_band,
+                    bool           reverse_time,
+                    int     const* offsets,
+                    InType         in,
+                    int            istride,
+                    OutType*       out,
+                    int            ostride) {
+	int ntblock = (ntime-1) / FDMT_HOST_TIME_BLOCK + 1;
+#pragma omp parallel for collapse(2) schedule(dynamic)
+	for( int c=0; c<nchan; ++c ) {
+		for( int tb=0; tb<ntblock; ++tb ) {
+			int offset = offsets[c];
+			int ndelay = offsets[c+1] - offset;
+			int c_ = reverse_band ? nchan-1 - c : c;
+			int t0 = tb*FDMT_HOST_TIME_BLOCK;
+			int t1 = std::min(t0 + (int)FDMT_HOST_TIME_BLOCK, ntime);
+			OutType tmp[FDMT_HOST_TIME_BLOCK];
+			std::fill(tmp, tmp + (t1-t0), OutType(0));
+			for( int d=0; d<ndelay; ++d ) {
+				OutType scale = 1.f/(d+1);
+				OutType* orow = &out[(ptrdiff_t)ostride*(offset+d)];
+				for( int t=t0; t<t1; ++t ) {
+					if( t >= d ) {
+						int t_ = reverse_time ? ntime-1 - (t-d) : (t-d);
+						tmp[t-t0] += in[t_ + istride*c_];
+						orow[t] = tmp[t-t0] * scale;
+					} else {
+						// Note: This fills the unused elements with NaNs
+						orow[t] = std::numeric_limits<OutType>::quiet_NaN();
+					}
+				}
+			}
+		}
+	}
+}
+
+template<typename DType>
+void fdmt_exec_host(int                  ntime,
+                    int                  nrow,
+                    bool                 is_final_step,
+                    bool                 reverse_time,
+                    int           const* delays,
+                    FdmtIndexPair const* srcrows,
+                    DType         const* in,
+                    int                  istride,
+                    DType*               out,
+                    int                  ostride) {
+	int ntblock = (ntime-1) / FDMT_HOST_TIME_BLOCK + 1;
+#pragma omp parallel for collapse(2) schedule(static)
+	for( int r=0; r<nrow; ++r ) {
+		for( int tb=0; tb<ntblock; ++tb ) {
+			int delay   = delays[r];
+			int srcrow0 = srcrows[r].x;
+			int srcrow1 = srcrows[r].y;
+			int t0 = tb*FDMT_HOST_TIME_BLOCK;
+			int t1 = std::min(t0 + (int)FDMT_HOST_TIME_BLOCK, ntime);
+			if( is_final_step ) {
+				// Avoid elements that go unused due to diagonal reindexing
+				t0 = std::max(t0, r);
+			}
+			for( int t=t0; t<t1; ++t ) {
+				// Note: Non-existent rows are signified by -1
+				DType outval = (srcrow0 != -1) ? in[ t        + istride*srcrow0] : 0;
+				if( t >= delay ) {
+					outval  += (srcrow1 != -1) ? in[(t-delay) + istride*srcrow1] : 0;
+				}
+				int t_ = (is_final_step && reverse_time) ? ntime-1 - t : t;
+				out[t_ + (ptrdiff_t)ostride*r] = outval;
+			}
+		}
+	}
+}
+
+// Host implementations of the incremental (streaming) FDMT kernels
+// Note: Each step keeps its recent output in a circular buffer (rows of
+//         length buflen), and all of these kernels process ntime new samples
+//         starting at time tabs since the start of the stream (which is
+//         found at position pos in each circular buffer). tabs need only be
+//         exact while it is smaller than max_delay.
+template<typename InType, typename DType>
+void fdmt_stream_input_host(int      ntime,
+                            int      nchan,
+                            bool     reverse_band,
+                            InType   in,
+                            int      istride,
+                            DType*   buf,
+                            int      buflen,
+                            int      pos) {
+#pragma omp parallel for schedule(static)
+	for( int c=0; c<nchan; ++c ) {
+		int c_ = reverse_band ? nchan-1 - c : c;
+		DType* brow = &buf[(ptrdiff_t)buflen*c];
+		// Note: Loops are split where the circular buffer wraps around
+		for( int t=0; t<ntime; ) {
+			int b = (pos + t) % buflen;
+			int n = std::min(ntime - t, buflen - b);
+			for( int k=0; k<n; ++k ) {
+				brow[b+k] = in[t+k + istride*c_];
+			}
+			t += n;
+		}
+	}
+}
+
+template<typename DType>
+void fdmt_stream_init_host(int          ntime,
+                           int          nchan,
+                           int          tabs,
+                           int   const* offsets,
+                           DType const* in,
+                           int          ilen,
+                           int          ipos,
+                           DType*       out,
+                           int          olen,
+                           int          opos) {
+	int ntblock = (ntime-1) / FDMT_HOST_TIME_BLOCK + 1;
+#pragma omp parallel for collapse(2) schedule(dynamic)
+	for( int c=0; c<nchan; ++c ) {
+		for( int tb=0; tb<ntblock; ++tb ) {
+			int offset = offsets[c];
+			int ndelay = offsets[c+1] - offset;
+			DType const* irow = &in[(ptrdiff_t)ilen*c];
+			int t0 = tb*FDMT_HOST_TIME_BLOCK;
+			int t1 = std::min(t0 + (int)FDMT_HOST_TIME_BLOCK, ntime);
+			DType tmp[FDMT_HOST_TIME_BLOCK];
+			std::fill(tmp, tmp + (t1-t0), DType(0));
+			for( int d=0; d<ndelay; ++d ) {
+				DType scale = 1.f/(d+1);
+				DType* orow = &out[(ptrdiff_t)olen*(offset+d)];
+				// Note: This fills the elements that precede the start of the
+				//         stream with NaNs
+				int tvalid = std::min(std::max(d - tabs, t0), t1);
+				for( int t=t0; t<tvalid; ++t ) {
+					orow[(opos + t) % olen] = std::numeric_limits<DType>::quiet_NaN();
+				}
+				for( int t=tvalid; t<t1; ) {
+					int i = (ipos + t - d + ilen) % ilen;
+					int o = (opos + t) % olen;
+					int n = std::min(t1 - t, std::min(ilen - i, olen - o));
+					DType*       tp = &tmp[t-t0];
+					DType const* ip = &irow[i];
+					DType*       op = &orow[o];
+					for( int k=0; k<n; ++k ) {
+						tp[k] += ip[k];
+						op[k] = tp[k] * scale;
+					}
+					t += n;
+				}
+			}
+		}
+	}
+}
+
+template<typename DType>
+void fdmt_stream_exec_host(int                  ntime,
+                           int                  nrow,
+                           int                  tabs,
+                           int           const* delays,
+                           FdmtIndexPair const* srcrows,
+                           DType         const* in,
+                           int                  ilen,
+                           int                  ipos,
+                           DType*               out,
+                           int                  olen,
+                           int                  opos) {
+#pragma omp parallel for schedule(static)
+	for( int r=0; r<nrow; ++r ) {
+		int delay   = delays[r];
+		int srcrow0 = srcrows[r].x;
+		int srcrow1 = srcrows[r].y;
+		DType* orow = &out[(ptrdiff_t)olen*r];
+		for( int t=0; t<ntime; ) {
+			int i0 = (ipos + t) % ilen;
+			int i1 = (ipos + t - delay + ilen) % ilen;
+			int o  = (opos + t) % olen;
+			int n = std::min(ntime - t, std::min(olen - o,
+			                                     std::min(ilen - i0, ilen - i1)));
+			bool delayed = (tabs + t >= delay);
+			if( !delayed ) {
+				n = std::min(n, delay - tabs - t);
+			}
+			// Note: Non-existent rows are signified by -1
+			DType const* in0 = (srcrow0 != -1) ? &in[i0 + (ptrdiff_t)ilen*srcrow0] : 0;
+			DType const* in1 = (srcrow1 != -1 && delayed) ? &in[i1 + (ptrdiff_t)ilen*srcrow1] : 0;
+			DType*       op  = &orow[o];
+			if( in0 && in1 ) {
+				for( int k=0; k<n; ++k ) {
+					op[k] = in0[k] + in1[k];
+				}
+			} else {
+				for( int k=0; k<n; ++k ) {
+					DType outval = in0 ? in0[k] : 0;
+					if( delayed ) {
+						outval  += in1 ? in1[k] : 0;
+					}
+					op[k] = outval;
+				}
+			}
+			t += n;
+		}
+	}
+}
+
+// Copies the complete output samples from the final step's circular buffer,
+//   undoing the diagonal skew so that output sample t of every row is
+//   aligned with the TOA at the highest frequency
+template<typename DType>
+void fdmt_stream_gather_host(int          ntime,
+                             int          nrow,
+                             DType const* in,
+                             int          ilen,
+                             int          ipos,
+                             DType*       out,
+                             int          ostride) {
+#pragma omp parallel for schedule(static)
+	for( int r=0; r<nrow; ++r ) {
+		DType const* irow = &in[(ptrdiff_t)ilen*r];
+		DType*       orow = &out[(ptrdiff_t)ostride*r];
+		for( int t=0; t<ntime; ) {
+			int i = (ipos + t + r) % ilen;
+			int n = std::min(ntime - t, ilen - i);
+			std::memcpy(&orow[t], &irow[i], n*sizeof(DType));
+			t += n;
+		}
+	}
+}
+
+// Storage allocated in a given memory space, used when the caller does not
+//   provide plan or execution storage
+class FdmtStorage {
+	void*   _ptr;
+	BFsize  _size;
+	BFspace _space;
+	FdmtStorage(FdmtStorage const& );
+	FdmtStorage& operator=(FdmtStorage const& );
+public:
+	FdmtStorage() : _ptr(0), _size(0), _space(BF_SPACE_SYSTEM) {}
+	~FdmtStorage() { this->free(); }
+	void free() {
+		if( _ptr ) {
+			bfFree(_ptr, _space);
+			_ptr  = 0;
+			_size = 0;
+		}
+	}
+	void* resize(BFsize size, BFspace space) {
+		if( size > _size || space != _space ) {
+			this->free();
+			BF_ASSERT_EXCEPTION(bfMalloc(&_ptr, size, space) == BF_STATUS_SUCCESS,
+			                    BF_STATUS_MEM_ALLOC_FAILED);
+			_size  = size;
+			_space = space;
+		}
+		return _ptr;
+	}
+};
+
+class BFfdmt_impl {
+	typedef int    IType;
+	typedef double FType;
+	typedef FdmtIndexPair IndexPair;
+public: // HACK WAR for what looks like a bug in the CUDA 7.0 compiler
+	typedef float  DType;
+private:
+	IType _nchan;
+	IType _max_delay;
+	FType _f0;
+	FType _df;
+	FType _exponent;
+	IType _nrow_max;
+	IType _plan_stride;
+	IType _buffer_stride;
+	std::vector<IType>                   _offsets;
+	std::vector<std::vector<IndexPair> > _step_srcrows;
+	std::vector<std::vector<IType> >     _step_delays;
+	IType*     _d_offsets;
+	IndexPair* _d_step_srcrows;
+	IType*     _d_step_delays;
+	DType*     _d_buffer_a;
+	DType*     _d_buffer_b;
+	Workspace _plan_storage;
+	Workspace _exec_storage;
+	FdmtStorage _auto_plan_storage;
+	FdmtStorage _auto_exec_storage;
+	BFspace _space;
+#if BF_CUDA_ENABLED
+	cudaStream_t _stream;
+#endif
+	bool _reverse_band;
+	// State retained between incremental executions
+	IType                _stream_block;
+	IType                _stream_input_len;
+	DType*               _d_stream_input;
+	std::vector<IType>   _stream_buflens;
+	std::vector<DType*>  _d_stream_bufs;
+	FdmtStorage          _stream_storage;
+	bool                 _stream_ready;
+	BFoffset             _stream_nframe;
+	
+	FType cfreq(IType chan) {
+		return _f0 + _df*chan;
+	}
+	FType rel_delay(FType flo, FType fhi, FType fmin, FType fmax) {
+		FType g = _exponent;
+		FType eps = std::numeric_limits<FType>::epsilon();
+		FType denom = ::pow(fmin,g) - ::pow(fmax,g);
+		if( std::abs(denom) < eps ) {
+			denom = ::copysign(eps, denom);
+		}
+		return (::pow(flo,g) - ::pow(fhi,g)) / denom;
+	}
+	FType rel_delay(FType flo, FType fhi) {
+		FType fmin = cfreq(0);
+		FType fmax = cfreq(_nchan-1);
+		//std::swap(fmin, fmax);
+		//FType fmax = cfreq(_nchan); // HACK TESTING
+		return rel_delay(flo, fhi, fmin, fmax);
+	}
+	IType subband_ndelay(FType f0, FType df) {
+		FType fracdelay = rel_delay(f0, f0+df);
+		FType fmaxdelay = fracdelay*(_max_delay-1);
+		IType ndelay = IType(::ceil(fmaxdelay)) + 1;
+		return ndelay;
+	}
+public:
+	BFfdmt_impl() : _nchan(0), _max_delay(0), _f0(0), _df(0), _exponent(0),
+	                _space(BF_SPACE_AUTO)
+#if BF_CUDA_ENABLED
+	                , _stream(g_cuda_stream)
+#endif
+	                , _stream_ready(false), _stream_nframe(0) {}
+	inline IType   nchan()     const { return _nchan; }
+	inline BFspace space()     const { return _space; }
+	// Note: Managed memory is processed on the device
+	inline bool    on_host()   const {
+#if BF_CUDA_ENABLED
+		return !space_accessible_from(_space, BF_SPACE_CUDA);
+#else
+		return true;
+#endif
+	}
+	inline IType   max_delay() const { return _max_delay; }
+	void init(IType nchan,
+	          IType max_delay,
+	          FType f0,
+	          FType df,
+	          FType exponent,
+	          BFspace space) {
+		BF_TRACE();
+		_space = space;
+		// Note: Any incremental execution restarts with a new stream
+		_stream_ready  = false;
+		_stream_nframe = 0;
+		if( df < 0. ) {
+			_reverse_band = true;
+			f0 += (nchan-1)*df;
+			df *= -1;
+		} else {
+			_reverse_band = false;
+		}
+		if( nchan     == _nchan     &&
+		    max_delay == _max_delay &&
+		    f0        == _f0        &&
+		    df        == _df        &&
+		    exponent  == _exponent ) {
+			return;
+		}
+		_f0        = f0;
+		_df        = df;
+		_nchan     = nchan;
+		_max_delay = max_delay;
+		_exponent  = exponent;
+		// Note: Initialized with 1 entry as dummy for initialization step
+		std::vector<std::vector<IndexPair> > step_subband_parents(1);
+		IType nsubband = _nchan;
+		while( nsubband > 1 ) {
+			IType step = step_subband_parents.size();
+			step_subband_parents.push_back(std::vector<IndexPair>());
+			for( IType sb=0; sb<nsubband; sb+=2 ) {
+				IType parent0 = sb;
+				IType parent1 = sb+1;
+				if( nsubband % 2 ) {
+					// Note: Alternating left/right-biased merging scheme
+					if( (step-1) % 2 ) {
+						parent0 -= 1; // Note: First entry becomes -1 => non-existent
+						parent1 -= 1;
+					} else {
+						// Note: Last entry becomes -1 => non-existent
+						if( parent1 == nsubband ) parent1 = -1;
+					}
+				}
+				//cout << step << ": " << parent0 << ", " << parent1 << endl;
+				IndexPair parents = make_fdmt_index_pair(parent0, parent1);
+				step_subband_parents[step].push_back(parents);
+			}
+			nsubband = step_subband_parents[step].size();
+		}
+		// Note: Includes initialization step
+		IType nstep = step_subband_parents.size();
+		
+		std::vector<std::vector<IType> > step_subband_nchans(nstep);
+		step_subband_nchans[0].assign(_nchan, 1);
+		for( IType step=1; step<nstep; ++step ) {
+			IType nsubband = step_subband_parents[step].size();
+			step_subband_nchans[step].resize(nsubband);
+			for( IType sb=0; sb<nsubband; ++sb ) {
+				IndexPair parents = step_subband_parents[step][sb];
+				IType p0 = parents.x;//first;
+				IType p1 = parents.y;//second;
+				IType parent0_nchan = (p0!=-1) ? step_subband_nchans[step-1][p0] : 0;
+				IType parent1_nchan = (p1!=-1) ? step_subband_nchans[step-1][p1] : 0;
+				IType child_nchan = parent0_nchan + parent1_nchan;
+				step_subband_nchans[step][sb] = child_nchan;
+			}
+		}
+		
+		std::vector<std::vector<IType> > step_subband_chan_offsets(nstep);
+		std::vector<std::vector<IType> > step_subband_row_offsets(nstep);
+		IType nrow_max = 0;
+		for( IType step=0; step<nstep; ++step ) {
+			IType nsubband = step_subband_nchans[step].size();
+			// Note: +1 to store the total in the last element
+			//        (The array will hold a complete exclusive scan)
+			step_subband_chan_offsets[step].resize(nsubband+1);
+			step_subband_row_offsets[step].resize(nsubband+1);
+			IType chan0 = 0;
+			IType row_offset = 0;
+			for( IType sb=0; sb<nsubband; ++sb ) {
+				IType nchan = step_subband_nchans[step][sb];
+				FType f0 = cfreq(chan0) - (step == 0 ? 0.5*_df : 0.);
+				//FType f0 = cfreq(chan0); // HACK TESTING
+				FType df = _df * (step == 0 ? 1 : nchan-1);
+				//FType df = _df * nchan; // HACK TESTING
+				//cout << "df = " << df << endl;
+				IType ndelay = subband_ndelay(f0, df);
+				//cout << "NDELAY = " << ndelay << endl;
+				step_subband_chan_offsets[step][sb] = chan0;
+				step_subband_row_offsets[step][sb] = row_offset;
+				chan0 += nchan;
+				row_offset += ndelay;
+			}
+			step_subband_chan_offsets[step][nsubband] = chan0;
+			step_subband_row_offsets[step][nsubband] = row_offset;
+			nrow_max = std::max(nrow_max, row_offset);
+			//*cout << "**** Nrow: " << row_offset << endl;
+		}
+		// Save for use during initialization
+		//plan->_init_subband_row_offsets = step_subband_row_offsets[0];
+		_offsets = step_subband_row_offsets[0];
+		_nrow_max = nrow_max;
+		//cout << "**** " << _nrow_max << endl;
+		
+		// Note: First entry in these remains empty
+		std::vector<std::vector<IndexPair> > step_srcrows(nstep);
+		std::vector<std::vector<IType> >     step_delays(nstep);
+		for( IType step=1; step<nstep; ++step ) {
+			IType nsubband = step_subband_nchans[step].size();
+			IType nrow     = step_subband_row_offsets[step][nsubband];
+			//*cout << "nrow " << nrow << endl;
+			step_srcrows[step].resize(nrow);
+			step_delays[step].resize(nrow);
+			for( IType sb=0; sb<nsubband; ++sb ) {
+				IndexPair parents = step_subband_parents[step][sb];
+				IType p0 = parents.x;//first;
+				IType p1 = parents.y;//second;
+				// TODO: Setting these to 1 instead of 0 in the exceptional case fixed some indexing
+				//         issues, but should double-check that the results are good.
+				IType p0_nchan = (p0!=-1) ? step_subband_nchans[step-1][p0] : 1;
+				IType p1_nchan = (p1!=-1) ? step_subband_nchans[step-1][p1] : 1;
+				// Note: If first parent doesn't exist, then it effectively starts where the second parent starts
+				//       If second parent doesn't exist, then it effectively starts where the first parent ends
+				IType p0_chan0 = step_subband_chan_offsets[step-1][(p0!=-1) ? p0 : p1];
+				IType p1_chan0 = step_subband_chan_offsets[step-1][(p1!=-1) ? p1 : p0];
+				if( p1 == -1 ) {
+					p1_chan0 += (p0_nchan-1);
+				}
+				FType flo    = cfreq(p0_chan0);
+				FType fmidlo = cfreq(p0_chan0 + (p0_nchan-1));
+				FType fmidhi = cfreq(p1_chan0);
+				FType fhi    = cfreq(p1_chan0 + (p1_nchan-1));
+				FType cmidlo = rel_delay(flo, fmidlo, flo, fhi);
+				FType cmidhi = rel_delay(flo, fmidhi, flo, fhi);
+				/*
+				// HACK TESTING
+				FType flo    = cfreq(p0_chan0) - 0.5*_df;
+				FType fmidlo = flo + (p0_nchan-1)*_df;
+				FType fmidhi = flo + p0_nchan*_df;
+				FType fhi    = flo + (p0_nchan + p1_nchan - 1)*_df;
+				FType cmidlo = rel_delay(fmidlo, flo, fhi, flo);
+				FType cmidhi = rel_delay(fmidhi, flo, fhi, flo);
+				*/
+				//cout << p0 << ", " << p1 << endl;
+				//cout << p0_chan0 << ", " << p0_nchan << "; " << p1_chan0 << ", " << p1_nchan << endl;
+				//cout << cmidlo << ", " << cmidhi << endl;
+				
+				// TODO: See if should use same approach with these as in fdmt.py
+				IType beg = step_subband_row_offsets[step][sb];
+				IType end = step_subband_row_offsets[step][sb+1];
+				IType ndelay = end - beg;
+				for( IType delay=0; delay<ndelay; ++delay ) {
+					IType dmidlo = (IType)::round(delay*cmidlo);
+					IType dmidhi = (IType)::round(delay*cmidhi);
+					IType drest = delay - dmidhi;
+					assert( dmidlo <= delay );
+					assert( dmidhi <= delay );
+					IType prev_beg  = (p0!=-1) ? step_subband_row_offsets[step-1][p0]   : -1;
+					IType prev_mid0 = (p0!=-1) ? step_subband_row_offsets[step-1][p0+1] : -1;
+					IType prev_mid1 = (p1!=-1) ? step_subband_row_offsets[step-1][p1]   : -1;
+					IType prev_end  = (p1!=-1) ? step_subband_row_offsets[step-1][p1+1] : -1;
+					// HACK WAR for strange indexing error observed only when nchan=4096
+					if( p1 != -1 && drest >= prev_end - prev_mid1 ) {
+						drest -= 1;
+					}
+					if( (p0 != -1 && dmidlo >= prev_mid0 - prev_beg) ||
+					    (p1 != -1 && drest  >= prev_end - prev_mid1) ) {
+						cout << "FDMT DEBUGGING INFO" << endl;
+						cout << "SB " << sb << endl;
+						cout << "delay " << delay << endl;
+						cout << "Step " << step << " prev: " << prev_mid0 - prev_beg << ", " << prev_end - prev_mid1 << endl;
+						cout << "       srcs: " << dmidlo << ", " << drest << endl;
+						
+					}
+					assert( p0 == -1 || dmidlo < prev_mid0 - prev_beg );
+					assert( p1 == -1 || drest  < prev_end - prev_mid1 );
+					IType dst_row  = step_subband_row_offsets[step  ][sb] + delay;
+					IType src_row0 = (p0!=-1) ? step_subband_row_offsets[step-1][p0] + dmidlo : -1;
+					IType src_row1 = (p1!=-1) ? step_subband_row_offsets[step-1][p1] + drest  : -1;
+					step_srcrows[step][dst_row].x = src_row0;//first  = src_row0;
+					//cout << "step " << step << ", dst_row = " << dst_row << ", delay = " << dmidhi << ", src_row0 = " << src_row0 << ", src_row1 = " << src_row1 << endl;
+					step_srcrows[step][dst_row].y = src_row1;//second = src_row1;
+					step_delays[step][dst_row] = dmidhi;
+					//IType prev_nsubband = step_subband_nchans[step-1].size();
+					//IType prev_nrow = step_subband_row_offsets[step-1][prev_nsubband];
+				}
+			}
+		}
+		// Save for use during execution
+		_step_srcrows = step_srcrows;
+		_step_delays  = step_delays;
+	}
+	bool init_plan_storage(void* storage_ptr, BFsize* storage_size) {
+		BF_TRACE();
+		enum {
+			ALIGNMENT_BYTES = 512,
+			ALIGNMENT_ELMTS = ALIGNMENT_BYTES / sizeof(int)
+		};
+		Workspace workspace(ALIGNMENT_BYTES);
+		_plan_stride = round_up(_nrow_max, ALIGNMENT_ELMTS);
+		//int nstep_execute = _step_delays.size() - 1;
+		int nstep = _step_delays.size();
+		workspace.reserve(_nchan+1, &_d_offsets);
+		workspace.reserve(nstep*_plan_stride, &_d_step_srcrows);
+		workspace.reserve(nstep*_plan_stride, &_d_step_delays);
+		if( storage_size ) {
+			if( !storage_ptr ) {
+				// Return required storage size
+				*storage_size = workspace.size();
+				return false;
+			} else {
+				BF_ASSERT_EXCEPTION(*storage_size >= workspace.size(),
+				                    BF_STATUS_INSUFFICIENT_STORAGE);
+			}
+		} else {
+			// Auto-allocate storage
+			BF_ASSERT_EXCEPTION(!storage_ptr, BF_STATUS_INVALID_ARGUMENT);
+			storage_ptr = _auto_plan_storage.resize(workspace.size(), _space);
+		}
+		workspace.commit(storage_ptr);
+		if( this->on_host() ) {
+			std::memcpy(_d_offsets, &_offsets[0], sizeof(int)*_offsets.size());
+			for( int step=0; step<nstep; ++step ) {
+				std::memcpy(_d_step_srcrows + step*_plan_stride,
+				            &_step_srcrows[step][0],
+				            sizeof(IndexPair)*_step_srcrows[step].size());
+				std::memcpy(_d_step_delays  + step*_plan_stride,
+				            &_step_delays[step][0],
+				            sizeof(int)*_step_delays[step].size());
+			}
+			return true;
+		}
+#if BF_CUDA_ENABLED
+		BF_TRACE_STREAM(_stream);
+		BF_CHECK_CUDA_EXCEPTION( cudaMemcpyAsync(_d_offsets,
+		                                         &_offsets[0],
+		                                         sizeof(int )*_offsets.size(),
+		                                         cudaMemcpyHostToDevice,
+		                                         _stream),
+		                         BF_STATUS_MEM_OP_FAILED );
+		for( int step=0; step<nstep; ++step ) {
+			BF_CHECK_CUDA_EXCEPTION( cudaMemcpyAsync(_d_step_srcrows + step*_plan_stride,
+			                                         &_step_srcrows[step][0],
+			                                         sizeof(IndexPair)*_step_srcrows[step].size(),
+			                                         cudaMemcpyHostToDevice,
+			                                         _stream),
+			               BF_STATUS_MEM_OP_FAILED );
+			BF_CHECK_CUDA_EXCEPTION( cudaMemcpyAsync(_d_step_delays  + step*_plan_stride,
+			                                         &_step_delays[step][0],
+			                                         sizeof(int)*_step_delays[step].size(),
+			                                         cudaMemcpyHostToDevice,
+			                                         _stream),
+			               BF_STATUS_MEM_OP_FAILED );
+		}
+		BF_CHECK_CUDA_EXCEPTION( cudaStreamSynchronize(_stream),
+		                         BF_STATUS_DEVICE_ERROR );
+#endif
+		return true;
+	}
+	bool init_exec_storage(void* storage_ptr, BFsize* storage_size, size_t ntime) {
+		BF_TRACE();
+		enum {
+			ALIGNMENT_BYTES = 512,
+			ALIGNMENT_ELMTS = ALIGNMENT_BYTES / sizeof(DType)
+		};
+		Workspace workspace(ALIGNMENT_BYTES);
+		//std::cout << "ntime = " << ntime << std::endl;
+		//std::cout << "_nrow_max = " << _nrow_max << std::endl;
+		_buffer_stride = round_up(ntime, ALIGNMENT_ELMTS);
+		//std::cout << "_buffer_stride = " << _buffer_stride << std::endl;
+		// TODO: Check if truly safe to allocate smaller buffer_b
+		workspace.reserve(_nrow_max*_buffer_stride, &_d_buffer_a);
+		workspace.reserve(_nrow_max*_buffer_stride, &_d_buffer_b);
+		if( storage_size ) {
+			if( !storage_ptr ) {
+				//cout << "++++ returning storage size" << endl;
+				// Return required storage size
+				*storage_size = workspace.size();
+				return false;
+			} else {
+				//cout << "++++ using user storage" << endl;
+				BF_ASSERT_EXCEPTION(*storage_size >= workspace.size(),
+				                    BF_STATUS_INSUFFICIENT_STORAGE);
+			}
+		} else {
+			//cout << "++++ auto-allocating storage" << endl;
+			// Auto-allocate storage
+			BF_ASSERT_EXCEPTION(!storage_ptr, BF_STATUS_INVALID_ARGUMENT);
+			storage_ptr = _auto_exec_storage.resize(workspace.size(), _space);
+		}
+		//cout << "++++ committing" << endl;
+		workspace.commit(storage_ptr);
+		return true;
+	}
+	void execute(BFarray const* in,
+	             BFarray const* out,
+	             size_t         ntime,
+	             bool           negative_delays) {
+		BF_TRACE();
+		//cout << "out dtype = " << out->dtype << endl;
+		BF_ASSERT_EXCEPTION(out->dtype == BF_DTYPE_F32, BF_STATUS_UNSUPPORTED_DTYPE);
+		BF_ASSERT_EXCEPTION(   out->strides[in->ndim-1] == 4, BF_STATUS_UNSUPPORTED_STRIDE);
+		//BF_ASSERT_EXCEPTION(/*abs*/(in->strides[in->ndim-1]) == 1, BF_STATUS_UNSUPPORTED_STRIDE);
+		BF_ASSERT_EXCEPTION( in->strides[in->ndim-2] > 0, BF_STATUS_UNSUPPORTED_STRIDE);
+		BF_ASSERT_EXCEPTION(out->strides[in->ndim-2] > 0, BF_STATUS_UNSUPPORTED_STRIDE);
+		//bool reverse_time = (in->strides[in->ndim-1] < 0);
+		bool reverse_time = negative_delays;
+		if( this->on_host() ) {
+			this->execute_host(in, out, ntime, reverse_time);
+		} else {
+#if BF_CUDA_ENABLED
+			this->execute_cuda(in, out, ntime, reverse_time);
+#else
+			BF_ASSERT_EXCEPTION(false, BF_STATUS_UNSUPPORTED_SPACE);
+#endif
+		}
+	}
+#define FDMT_SWITCH_INPUT_DTYPE(CALL_INIT) \
+		switch( in->dtype ) { \
+			/* HACK testing disabled */ \
+			/* TODO: Get NbitReader working */ \
+			/*case BF_DTYPE_I1:  CALL_INIT(NbitReader<1>); break;*/ \
+			/*case BF_DTYPE_I2:  CALL_INIT(NbitReader<2>); break;*/ \
+			/*case BF_DTYPE_I4:  CALL_INIT(NbitReader<4>); break;*/ \
+		case BF_DTYPE_I8:  CALL_INIT(int8_t*);  break; \
+		case BF_DTYPE_I16: CALL_INIT(int16_t*); break; \
+		case BF_DTYPE_I32: CALL_INIT(int32_t*); break; \
+		case BF_DTYPE_U8:  CALL_INIT(uint8_t*);  break; \
+		case BF_DTYPE_U16: CALL_INIT(uint16_t*); break; \
+		case BF_DTYPE_U32: CALL_INIT(uint32_t*); break; \
+		case BF_DTYPE_F32: CALL_INIT(float*);   break; \
+		default: BF_ASSERT_EXCEPTION(false, BF_STATUS_UNSUPPORTED_DTYPE); \
+		}
+	void execute_host(BFarray const* in,
+	                  BFarray const* out,
+	                  size_t         ntime,
+	                  bool           reverse_time) {
+		DType* d_ibuf = _d_buffer_b;
+		DType* d_obuf = _d_buffer_a;
+#define CALL_FDMT_INIT_HOST(IterType) \
+		BF_ASSERT_EXCEPTION(/*abs*/(in->strides[in->ndim-1]) == sizeof(value_type<IterType>::type), BF_STATUS_UNSUPPORTED_STRIDE); \
+		fdmt_init_host(ntime, _nchan, _reverse_band, reverse_time, \
+		               _d_offsets, \
+		               (IterType)in->data, \
+		               in->strides[in->ndim-2]/sizeof(value_type<IterType>::type), \
+		               d_obuf, _buffer_stride)
+		FDMT_SWITCH_INPUT_DTYPE(CALL_FDMT_INIT_HOST)
+#undef CALL_FDMT_INIT_HOST
+		std::swap(d_ibuf, d_obuf);
+		
+		size_t ostride = _buffer_stride;
+		IType nstep = _step_delays.size();
+		for( int step=1; step<nstep; ++step ) {
+			IType nrow = _step_srcrows[step].size();
+			if( step == nstep-1 ) {
+				d_obuf  = (DType*)out->data;
+				ostride = out->strides[out->ndim-2]/sizeof(DType);
+				// Note: Diagonal reindexing to align output with TOA at highest freq
+				ostride += reverse_time ? +1 : -1;
+			}
+			fdmt_exec_host(ntime, nrow, (step==nstep-1), reverse_time,
+			               _d_step_delays  + step*_plan_stride,
+			               _d_step_srcrows + step*_plan_stride,
+			               d_ibuf, _buffer_stride,
+			               d_obuf, ostride);
+			std::swap(d_ibuf, d_obuf);
+		}
+	}
+#if BF_CUDA_ENABLED
+	void execute_cuda(BFarray const* in,
+	                  BFarray const* out,
+	                  size_t         ntime,
+	                  bool           reverse_time) {
+		BF_TRACE_STREAM(_stream);
+		DType* d_ibuf = _d_buffer_b;
+		DType* d_obuf = _d_buffer_a;
+		//std::cout << "_d_buffer_a = " << _d_buffer_a << std::endl;
+		//std::cout << "_d_buffer_b = " << _d_buffer_b << std::endl;
+		BF_CHECK_CUDA_EXCEPTION(cudaGetLastError(), BF_STATUS_INTERNAL_ERROR);
+#define LAUNCH_FDMT_INIT_KERNEL(IterType) \
+		BF_ASSERT_EXCEPTION(/*abs*/(in->strides[in->ndim-1]) == sizeof(value_type<IterType>::type), BF_STATUS_UNSUPPORTED_STRIDE); \
+		launch_fdmt_init_kernel(ntime, _nchan, _reverse_band, reverse_time, \
+		                        _d_offsets, \
+		                        (IterType)in->data, \
+		                        in->strides[in->ndim-2]/sizeof(value_type<IterType>::type), /* TODO: Check this*/ \
+		                        d_obuf, _buffer_stride, \
+		                        _stream)
+		FDMT_SWITCH_INPUT_DTYPE(LAUNCH_FDMT_INIT_KERNEL)
+#undef LAUNCH_FDMT_INIT_KERNEL
+		BF_CHECK_CUDA_EXCEPTION(cudaGetLastError(), BF_STATUS_INTERNAL_ERROR);
+		std::swap(d_ibuf, d_obuf);
+		
+		size_t ostride = _buffer_stride;
+		IType nstep = _step_delays.size();
+		for( int step=1; step<nstep; ++step ) {
+			//cout << "STEP " << step << endl;
+			IType nrow = _step_srcrows[step].size();
+			//cout << "nrow " << nrow << endl;
+			if( step == nstep-1 ) {
+				d_obuf  = (DType*)out->data;
+				ostride = out->strides[out->ndim-2]/sizeof(DType); // TODO: Check this
+				// HACK TESTING diagonal reindexing to align output with TOA at highest freq
+				ostride += reverse_time ? +1 : -1;
+			}
+			//cudaDeviceSynchronize(); // HACK TESTING
+			launch_fdmt_exec_kernel(ntime, nrow, (step==nstep-1), reverse_time,
+			                        _d_step_delays  + step*_plan_stride,
+			                        (int2 const*)(_d_step_srcrows + step*_plan_stride),
+			                        d_ibuf, _buffer_stride,
+			                        d_obuf, ostride,
+			                        _stream);
+			//cudaDeviceSynchronize(); // HACK TESTING
+			//BF_CHECK_CUDA_EXCEPTION(cudaGetLastError(), BF_STATUS_INTERNAL_ERROR);
+			std::swap(d_ibuf, d_obuf);
+		}
+		BF_CHECK_CUDA_EXCEPTION(cudaGetLastError(), BF_STATUS_INTERNAL_ERROR);
+		//cudaDeviceSynchronize(); // HACK TESTING
+	}
+	void set_stream(cudaStream_t stream) {
+		_stream = stream;
+	}
+#endif
+	void reset_incremental() {
+		_stream_nframe = 0;
+	}
+	void init_stream_storage() {
+		BF_TRACE();
+		enum {
+			ALIGNMENT_BYTES = 512,
+			ALIGNMENT_ELMTS = ALIGNMENT_BYTES / sizeof(DType)
+		};
+		Workspace workspace(ALIGNMENT_BYTES);
+		_stream_block = std::max(_max_delay, (IType)FDMT_STREAM_BLOCK);
+		// Note: Each circular buffer must hold the samples in the block being
+		//         processed plus the history that is read by the next step
+		IType max_init_delay = 0;
+		for( IType c=0; c<_nchan; ++c ) {
+			max_init_delay = std::max(max_init_delay, _offsets[c+1] - _offsets[c] - 1);
+		}
+		_stream_input_len = round_up(max_init_delay + _stream_block, ALIGNMENT_ELMTS);
+		workspace.reserve(_nchan*_stream_input_len, &_d_stream_input);
+		IType nstep = _step_delays.size();
+		_stream_buflens.resize(nstep);
+		_d_stream_bufs.resize(nstep);
+		for( IType step=0; step<nstep; ++step ) {
+			IType nrow = (step == 0) ? _offsets[_nchan] : _step_srcrows[step].size();
+			// Note: The output of the final step is read back over max_delay
+			//         samples to undo the diagonal skew
+			IType history = _max_delay;
+			if( step < nstep-1 ) {
+				history = *std::max_element(_step_delays[step+1].begin(),
+				                            _step_delays[step+1].end());
+			}
+			_stream_buflens[step] = round_up(history + _stream_block, ALIGNMENT_ELMTS);
+			workspace.reserve(nrow*_stream_buflens[step], &_d_stream_bufs[step]);
+		}
+		workspace.commit(_stream_storage.resize(workspace.size(), _space));
+		_stream_ready = true;
+	}
+	void execute_incremental(BFarray const* in,
+	                         BFarray const* out) {
+		BF_TRACE();
+		BF_ASSERT_EXCEPTION(out->dtype == BF_DTYPE_F32, BF_STATUS_UNSUPPORTED_DTYPE);
+		BF_ASSERT_EXCEPTION(out->strides[out->ndim-1] == sizeof(DType), BF_STATUS_UNSUPPORTED_STRIDE);
+		BF_ASSERT_EXCEPTION( in->strides[ in->ndim-2] > 0, BF_STATUS_UNSUPPORTED_STRIDE);
+		BF_ASSERT_EXCEPTION(out->strides[out->ndim-2] > 0, BF_STATUS_UNSUPPORTED_STRIDE);
+		IType ntime = in->shape[in->ndim-1];
+		IType nout  = out->shape[out->ndim-1];
+		BF_ASSERT_EXCEPTION(nout <= ntime, BF_STATUS_INVALID_SHAPE);
+		// Note: Output sample t is complete once input sample t+max_delay-1
+		//         has been processed, but lags by max_delay samples to match
+		//         bfFdmtExecute applied to overlapping spans.
+		BFoffset stream_end = _stream_nframe + ntime;
+		BF_ASSERT_EXCEPTION(nout == 0 || stream_end >= BFoffset(_max_delay + nout),
+		                    BF_STATUS_INVALID_SHAPE);
+		BFoffset out_begin = nout ? stream_end - _max_delay - nout : stream_end;
+		if( !_stream_ready ) {
+			this->init_stream_storage();
+		}
+		IType ostride = out->strides[out->ndim-2]/sizeof(DType);
+		for( IType t0=0; t0<ntime; t0+=_stream_block ) {
+			IType nt = std::min(_stream_block, ntime-t0);
+			// The output samples that become complete in this block
+			BFoffset complete_end = _stream_nframe + nt;
+			BFoffset obeg = std::max(out_begin + _max_delay, _stream_nframe) - _max_delay;
+			BFoffset oend = std::max(out_begin + _max_delay, complete_end)   - _max_delay;
+			void const* idata = (char*)in->data + t0*in->strides[in->ndim-1];
+			DType* odata = (DType*)out->data + (obeg - out_begin);
+			if( this->on_host() ) {
+				this->execute_incremental_block_host(in, idata, nt, odata, ostride,
+				                                     obeg, oend - obeg);
+			} else {
+#if BF_CUDA_ENABLED
+				this->execute_incremental_block_cuda(in, idata, nt, odata, ostride,
+				                                     obeg, oend - obeg);
+#else
+				BF_ASSERT_EXCEPTION(false, BF_STATUS_UNSUPPORTED_SPACE);
+#endif
+			}
+			_stream_nframe += nt;
+		}
+	}
+	void execute_incremental_block_host(BFarray const* in,
+	                                    void const*    idata,
+	                                    IType          ntime,
+	                                    DType*         odata,
+	                                    IType          ostride,
+	                                    BFoffset       obeg,
+	                                    IType          nout) {
+		// Note: The start of the stream is only relevant to the first
+		//         max_delay samples
+		int tabs = std::min(_stream_nframe, BFoffset(_max_delay));
+#define CALL_FDMT_STREAM_INPUT_HOST(IterType) \
+		BF_ASSERT_EXCEPTION(in->strides[in->ndim-1] == sizeof(value_type<IterType>::type), BF_STATUS_UNSUPPORTED_STRIDE); \
+		fdmt_stream_input_host(ntime, _nchan, _reverse_band, \
+		                       (IterType)idata, \
+		                       in->strides[in->ndim-2]/sizeof(value_type<IterType>::type), \
+		                       _d_stream_input, _stream_input_len, \
+		                       _stream_nframe % _stream_input_len)
+		FDMT_SWITCH_INPUT_DTYPE(CALL_FDMT_STREAM_INPUT_HOST)
+#undef CALL_FDMT_STREAM_INPUT_HOST
+		fdmt_stream_init_host(ntime, _nchan, tabs, _d_offsets,
+		                      _d_stream_input, _stream_input_len,
+		                      _stream_nframe % _stream_input_len,
+		                      _d_stream_bufs[0], _stream_buflens[0],
+		                      _stream_nframe % _stream_buflens[0]);
+		IType nstep = _step_delays.size();
+		for( int step=1; step<nstep; ++step ) {
+			IType nrow = _step_srcrows[step].size();
+			fdmt_stream_exec_host(ntime, nrow, tabs,
+			                      _d_step_delays  + step*_plan_stride,
+			                      _d_step_srcrows + step*_plan_stride,
+			                      _d_stream_bufs[step-1], _stream_buflens[step-1],
+			                      _stream_nframe % _stream_buflens[step-1],
+			                      _d_stream_bufs[step], _stream_buflens[step],
+			                      _stream_nframe % _stream_buflens[step]);
+		}
+		if( nout ) {
+			fdmt_stream_gather_host(nout, _max_delay,
+			                        _d_stream_bufs[nstep-1], _stream_buflens[nstep-1],
+			                        obeg % _stream_buflens[nstep-1],
+			                        odata, ostride);
+		}
+	}
+#if BF_CUDA_ENABLED
+	void execute_incremental_block_cuda(BFarray const* in,
+	                                    void const*    idata,
+	                                    IType          ntime,
+	                                    DType*         odata,
+	                                    IType          ostride,
+	                                    BFoffset       obeg,
+	                                    IType          nout) {
+		BF_TRACE_STREAM(_stream);
+		int tabs = std::min(_stream_nframe, BFoffset(_max_delay));
+		BF_CHECK_CUDA_EXCEPTION(cudaGetLastError(), BF_STATUS_INTERNAL_ERROR);
+#define LAUNCH_FDMT_STREAM_INPUT_KERNEL(IterType) \
+		BF_ASSERT_EXCEPTION(in->strides[in->ndim-1] == sizeof(value_type<IterType>::type), BF_STATUS_UNSUPPORTED_STRIDE); \
+		launch_fdmt_stream_input_kernel(ntime, _nchan, _reverse_band, \
+		                                (IterType)idata, \
+		                                in->strides[in->ndim-2]/sizeof(value_type<IterType>::type), \
+		                                _d_stream_input, _stream_input_len, \
+		                                _stream_nframe % _stream_input_len, \
+		                                _stream)
+		FDMT_SWITCH_INPUT_DTYPE(LAUNCH_FDMT_STREAM_INPUT_KERNEL)
+#undef LAUNCH_FDMT_STREAM_INPUT_KERNEL
+		launch_fdmt_stream_init_kernel(ntime, _nchan, tabs, _d_offsets,
+		                               _d_stream_input, _stream_input_len,
+		                               _stream_nframe % _stream_input_len,
+		                               _d_stream_bufs[0], _stream_buflens[0],
+		                               _stream_nframe % _stream_buflens[0],
+		                               _stream);
+		IType nstep = _step_delays.size();
+		for( int step=1; step<nstep; ++step ) {
+			IType nrow = _step_srcrows[step].size();
+			launch_fdmt_stream_exec_kernel(ntime, nrow, tabs,
+			                               _d_step_delays  + step*_plan_stride,
+			                               (int2 const*)(_d_step_srcrows + step*_plan_stride),
+			                               _d_stream_bufs[step-1], _stream_buflens[step-1],
+			                               _stream_nframe % _stream_buflens[step-1],
+			                               _d_stream_bufs[step], _stream_buflens[step],
+			                               _stream_nframe % _stream_buflens[step],
+			                               _stream);
+		}
+		if( nout ) {
+			launch_fdmt_stream_gather_kernel(nout, _max_delay,
+			                                 _d_stream_bufs[nstep-1], _stream_buflens[nstep-1],
+			                                 obeg % _stream_buflens[nstep-1],
+			                                 odata, ostride,
+			                                 _stream);
+		}
+		BF_CHECK_CUDA_EXCEPTION(cudaGetLastError(), BF_STATUS_INTERNAL_ERROR);
+	}
+#endif
+#undef FDMT_SWITCH_INPUT_DTYPE
+};
+
+BFstatus bfFdmtCreate(BFfdmt* plan_ptr) {
+	BF_TRACE();
+	BF_ASSERT(plan_ptr, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*plan_ptr = new BFfdmt_impl(),
+	                   *plan_ptr = 0);
+}
+// **TODO: Passing 'BFarray const* in' here could replace nchan, f0, df and space if BFarray included dimension scales
+//           Also, could potentially set the output dimension scales (dm0, ddm)
+//           OR, could just leave these to higher-level wrappers (e.g., Python)
+//             This might be for the best in the short term
+BFstatus bfFdmtInit(BFfdmt  plan,
+                    BFsize  nchan,
+                    BFsize  max_delay,
+                    double  f0,
+                    double  df,
+                    double  exponent,
+                    BFspace space,
+                    void*   plan_storage,
+                    BFsize* plan_storage_size) {
+	BF_TRACE();
+	BF_ASSERT(plan, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(space_accessible_from(space, BF_SPACE_SYSTEM) ||
+	          space_accessible_from(space, BF_SPACE_CUDA),
+	          BF_STATUS_UNSUPPORTED_SPACE);
+	BF_TRY(plan->init(nchan, max_delay, f0, df, exponent, space));
+	BF_TRY_RETURN(plan->init_plan_storage(plan_storage, plan_storage_size));
+}
+BFstatus bfFdmtSetStream(BFfdmt      plan,
+                         void const* stream) {
+	BF_TRACE();
+	BF_ASSERT(plan, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(stream, BF_STATUS_INVALID_POINTER);
+#if BF_CUDA_ENABLED
+	BF_TRY_RETURN(plan->set_stream(*(cudaStream_t*)stream));
+#else
+	// Note: Host execution is synchronous, so there is no stream to set
+	return BF_STATUS_SUCCESS;
+#endif
+}
+BFstatus bfFdmtExecute(BFfdmt         plan,
+                       BFarray const* in,
+                       BFarray const* out,
+                       BFbool         negative_delays,
+                       void*          exec_storage,
+                       BFsize*        exec_storage_size) {
+	BF_TRACE();
+	BF_ASSERT(plan, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(in,   BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(out,  BF_STATUS_INVALID_POINTER);
+	BF_ASSERT( in->shape[ in->ndim-2] == plan->nchan(),     BF_STATUS_INVALID_SHAPE);
+	BF_ASSERT(out->shape[out->ndim-2] == plan->max_delay(), BF_STATUS_INVALID_SHAPE);
+	BF_ASSERT(  in->shape[in->ndim-1] == out->shape[out->ndim-1], BF_STATUS_INVALID_SHAPE);
+	// TODO: BF_ASSERT(...);
+	size_t ntime = in->shape[in->ndim-1];
+	bool ready;
+	BF_TRY(ready = plan->init_exec_storage(exec_storage, exec_storage_size, ntime));
+	if( !ready ) {
+		// Just requesting exec_storage_size, not ready to execute yet
+		return BF_STATUS_SUCCESS;
+	}
+	BFspace exec_space = plan->on_host() ? BF_SPACE_SYSTEM : BF_SPACE_CUDA;
+	BF_ASSERT(space_accessible_from( in->space, exec_space), BF_STATUS_INVALID_SPACE);
+	BF_ASSERT(space_accessible_from(out->space, exec_space), BF_STATUS_INVALID_SPACE);
+	BF_TRY_RETURN(plan->execute(in, out, ntime, negative_delays));
+}
+
+BFstatus bfFdmtExecuteIncremental(BFfdmt         plan,
+                                  BFarray const* in,
+                                  BFarray const* out) {
+	BF_TRACE();
+	BF_ASSERT(plan, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(in,   BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(out,  BF_STATUS_INVALID_POINTER);
+	BF_ASSERT( in->shape[ in->ndim-2] == plan->nchan(),     BF_STATUS_INVALID_SHAPE);
+	BF_ASSERT(out->shape[out->ndim-2] == plan->max_delay(), BF_STATUS_INVALID_SHAPE);
+	BFspace exec_space = plan->on_host() ? BF_SPACE_SYSTEM : BF_SPACE_CUDA;
+	BF_ASSERT(space_accessible_from( in->space, exec_space), BF_STATUS_INVALID_SPACE);
+	BF_ASSERT(space_accessible_from(out->space, exec_space), BF_STATUS_INVALID_SPACE);
+	BF_TRY_RETURN(plan->execute_incremental(in, out));
+}
+BFstatus bfFdmtResetIncremental(BFfdmt plan) {
+	BF_TRACE();
+	BF_ASSERT(plan, BF_STATUS_INVALID_HANDLE);
+	BF_TRY_RETURN(plan->reset_incremental());
+}
+
+BFstatus bfFdmtDestroy(BFfdmt plan) {
+	BF_TRACE();
+	BF_ASSERT(plan, BF_STATUS_INVALID_HANDLE);
+	delete plan;
+	return BF_STATUS_SUCCESS;
+}
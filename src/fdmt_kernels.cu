@@ -0,0 +1,405 @@
+/*
+ * Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+ * Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+ *
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions
+ * are met:
+ * * Redistributions of source code must retain the above copyright
+ *   notice, this list of conditions and the following disclaimer.
+ * * Redistributions in binary form must reproduce the above copyright
+ *   notice, this list of conditions and the following disclaimer in the
+ *   documentation and/or other materials provided with the distribution.
+ * * Neither the name of The Bifrost Authors nor the names of its
+ *   contributors may be used to endorse or promote products derived
+ *   from this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+ * EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+ * PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+ * CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+ * EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+ * PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+ * PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+ * OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include "fdmt_kernels.h"
+#include "utils.hpp"
+
+#include <math_constants.h> // For CUDART_NAN_F
+
+#include <algorithm>
+
+// Note: Can be tuned over block shape
+template<typename InType, typename OutType>
+__global__
+void fdmt_init_kernel(int                         ntime,
+                      int                         nchan,
+                      bool                        reverse_band,
+                      bool                        reverse_time,
+                      int     const* __restrict__ d_offsets,
+                      InType  /*const* __restrict__*/ d_in,
+                      int                         istride,
+                      OutType*       __restrict__ d_out,
+                      int                         ostride) {
+	int t0 = threadIdx.x + blockIdx.x*blockDim.x;
+	int c0 = threadIdx.y + blockIdx.y*blockDim.y;
+	//int b0 = blockIdx.z;
+	//for( int b=b0; b<nbatch; b+=gridDim.z ) {
+	for( int c=c0; c<nchan; c+=blockDim.y*gridDim.y ) {
+		int offset = d_offsets[c];
+		int ndelay = d_offsets[c+1] - offset;
+		for( int t=t0; t<ntime; t+=blockDim.x*gridDim.x ) {
+			OutType tmp(0);
+			for( int d=0; d<ndelay; ++d ) {
+				// Note: This fills the unused elements with NaNs
+				OutType outval(CUDART_NAN_F);//std::numeric_limits<OutType>::quiet_NaN());
+				if( t >= d ) {
+					int c_ = reverse_band ? nchan-1 - c : c;
+					// Note: With reverse_time, the delayed sample (t-d) is also
+					//         indexed in reversed time.
+					int t_ = reverse_time ? ntime-1 - (t-d) : (t-d);
+					tmp += d_in[t_ + istride*c_];// + ibstride*b];
+					// TODO: Check effect of not-/using sqrt
+					//         The final paper has no sqrt (i.e., computation is just the mean)
+					//outval = tmp * rsqrtf(d+1);
+					outval = tmp * (1.f/(d+1));
+				}
+				d_out[t + ostride*(offset+d)] = outval;
+				//d_out[t + ostride*(offset+d) + obstride*b] = outval;
+			}
+		}
+	}
+	//}
+}
+
+// Note: Can be tuned over block shape
+template<typename DType>
+__global__
+void fdmt_exec_kernel(int                       ntime,
+                      int                       nrow,
+                      bool                      is_final_step,
+                      bool                      reverse_time,
+                      int   const* __restrict__ d_delays,
+                      int2  const* __restrict__ d_srcrows,
+                      DType const* __restrict__ d_in,
+                      int                       istride,
+                      DType*       __restrict__ d_out,
+                      int                       ostride) {
+	int t0 = threadIdx.x + blockIdx.x*blockDim.x;
+	int r0 = threadIdx.y + blockIdx.y*blockDim.y;
+	for( int r=r0; r<nrow; r+=blockDim.y*gridDim.y ) {
+		int delay   = d_delays[r];
+		int srcrow0 = d_srcrows[r].x;
+		int srcrow1 = d_srcrows[r].y;
+		for( int t=t0; t<ntime; t+=blockDim.x*gridDim.x ) {
+			// Avoid elements that go unused due to diagonal reindexing
+			if( is_final_step && t < r ) {
+				//int ostride_ = ostride - reverse_time;
+				//d_out[t + ostride_*r] = CUDART_NAN_F;
+				continue;
+			}
+			// HACK TESTING
+			////if( ostride < ntime && t >= ntime-1 - r ) {
+			//if( ostride != ntime && t < r ) {
+			//	int ostride_ = ostride - (ostride > ntime);
+			//	d_out[t + ostride_*r] = CUDART_NAN_F;
+			//	continue;
+			//}// else if( ostride > ntime && t >= ntime - r ) {
+				//	//d_out[t - (ntime-1) + ostride*r] = CUDART_NAN_F;
+					//	continue;
+				//}
+			
+			// Note: Non-existent rows are signified by -1
+			//if( t == 0 && r == 0 ) {
+			//	printf("t,srcrow0,srcrow1,istride = %i, %i, %i, %i\n", t, srcrow0, srcrow1, istride);
+			//}
+			//if( threadIdx.x == 63 && blockIdx.y == 4 ) {
+			//printf("istride = %i, srcrow0 = %i, srcrow1 = %i, d_in = %p\n", istride, srcrow0, srcrow1, d_in);
+				//}
+			//if( t == 0 ) {// && r == 1 ) {
+			//	printf("istride = %i, srcrow0 = %i, srcrow1 = %i, d_in = %p\n", istride, srcrow0, srcrow1, d_in);
+			//}
+			DType outval = (srcrow0 != -1) ? d_in[ t        + istride*srcrow0] : 0;
+			if( t >= delay ) {
+				outval  += (srcrow1 != -1) ? d_in[(t-delay) + istride*srcrow1] : 0;
+			}
+			int t_ = (is_final_step && reverse_time) ? ntime-1 - t : t;
+			d_out[t_ + ostride*r] = outval;
+		}
+	}
+}
+
+template<typename InType, typename OutType>
+void launch_fdmt_init_kernel(int            ntime,
+                             int            nchan,
+                             bool           reverse_band,
+                             bool           reverse_time,
+                             //int     const* d_ndelays,
+                             int     const* d_offsets,
+                             InType  /*const**/ d_in,
+                             int            istride,
+                             OutType*       d_out,
+                             int            ostride,
+                             cudaStream_t   stream) {
+	dim3 block(256, 1); // TODO: Tune this
+	dim3 grid(std::min((ntime-1)/block.x+1, 65535u),
+	          std::min((nchan-1)/block.y+1, 65535u));
+	//fdmt_init_kernel<<<grid,block,0,stream>>>(ntime,nchan,
+	//                                          //d_ndelays,
+	//                                          d_offsets,
+	//                                          d_in,istride,
+	//                                          d_out,ostride);
+	void* args[] = {&ntime,
+	                &nchan,
+	                &reverse_band,
+	                &reverse_time,
+	                &d_offsets,
+	                &d_in,
+	                &istride,
+	                &d_out,
+	                &ostride};
+	cudaLaunchKernel((void*)fdmt_init_kernel<InType,OutType>,
+	                 grid, block,
+	                 &args[0], 0, stream);
+}
+
+template<typename DType>
+void launch_fdmt_exec_kernel(int          ntime,
+                             int          nrow,
+                             bool         is_final_step,
+                             bool         reverse_time,
+                             int   const* d_delays,
+                             int2  const* d_srcrows,
+                             DType const* d_in,
+                             int          istride,
+                             DType*       d_out,
+                             int          ostride,
+                             cudaStream_t stream) {
+	//cout << "LAUNCH " << d_in << ", " << d_out << endl;
+	dim3 block(256, 1); // TODO: Tune this
+	dim3 grid(std::min((ntime-1)/block.x+1, 65535u),
+	          std::min((nrow -1)/block.y+1, 65535u));
+	//fdmt_exec_kernel<<<grid,block,0,stream>>>(ntime,nrow,
+	//                                          d_delays,d_srcrows,
+	//                                          d_in,istride,
+	//                                          d_out,ostride);
+	void* args[] = {&ntime,
+	                &nrow,
+	                &is_final_step,
+	                &reverse_time,
+	                &d_delays,
+	                &d_srcrows,
+	                &d_in,
+	                &istride,
+	                &d_out,
+	                &ostride};
+	//cudaLaunchKernel((void*)static_cast<void(*)(int, int, const int*, const int2*, const DType*, int, DType*, int)>(fdmt_exec_kernel<DType>),
+	cudaLaunchKernel((void*)fdmt_exec_kernel<DType>,
+	                 grid, block,
+	                 &args[0], 0, stream);
+}
+
+// Note: The stream kernels mirror the host implementations in fdmt.cpp
+template<typename InType>
+__global__
+void fdmt_stream_input_kernel(int                    ntime,
+                              int                    nchan,
+                              bool                   reverse_band,
+                              InType                 d_in,
+                              int                    istride,
+                              float*    __restrict__ d_buf,
+                              int                    buflen,
+                              int                    pos) {
+	int t0 = threadIdx.x + blockIdx.x*blockDim.x;
+	int c0 = threadIdx.y + blockIdx.y*blockDim.y;
+	for( int c=c0; c<nchan; c+=blockDim.y*gridDim.y ) {
+		int c_ = reverse_band ? nchan-1 - c : c;
+		for( int t=t0; t<ntime; t+=blockDim.x*gridDim.x ) {
+			d_buf[(pos + t) % buflen + (size_t)buflen*c] = d_in[t + istride*c_];
+		}
+	}
+}
+
+__global__
+void fdmt_stream_init_kernel(int                    ntime,
+                             int                    nchan,
+                             int                    tabs,
+                             int   const* __restrict__ d_offsets,
+                             float const* __restrict__ d_in,
+                             int                    ilen,
+                             int                    ipos,
+                             float*       __restrict__ d_out,
+                             int                    olen,
+                             int                    opos) {
+	int t0 = threadIdx.x + blockIdx.x*blockDim.x;
+	int c0 = threadIdx.y + blockIdx.y*blockDim.y;
+	for( int c=c0; c<nchan; c+=blockDim.y*gridDim.y ) {
+		int offset = d_offsets[c];
+		int ndelay = d_offsets[c+1] - offset;
+		for( int t=t0; t<ntime; t+=blockDim.x*gridDim.x ) {
+			float tmp(0);
+			for( int d=0; d<ndelay; ++d ) {
+				float outval(CUDART_NAN_F);
+				if( tabs + t >= d ) {
+					tmp += d_in[(ipos + t - d + ilen) % ilen + (size_t)ilen*c];
+					outval = tmp * (1.f/(d+1));
+				}
+				d_out[(opos + t) % olen + (size_t)olen*(offset+d)] = outval;
+			}
+		}
+	}
+}
+
+__global__
+void fdmt_stream_exec_kernel(int                      ntime,
+                             int                      nrow,
+                             int                      tabs,
+                             int   const* __restrict__ d_delays,
+                             int2  const* __restrict__ d_srcrows,
+                             float const* __restrict__ d_in,
+                             int                      ilen,
+                             int                      ipos,
+                             float*       __restrict__ d_out,
+                             int                      olen,
+                             int                      opos) {
+	int t0 = threadIdx.x + blockIdx.x*blockDim.x;
+	int r0 = threadIdx.y + blockIdx.y*blockDim.y;
+	for( int r=r0; r<nrow; r+=blockDim.y*gridDim.y ) {
+		int delay   = d_delays[r];
+		int srcrow0 = d_srcrows[r].x;
+		int srcrow1 = d_srcrows[r].y;
+		for( int t=t0; t<ntime; t+=blockDim.x*gridDim.x ) {
+			float outval = (srcrow0 != -1) ? d_in[(ipos + t) % ilen + (size_t)ilen*srcrow0] : 0;
+			if( tabs + t >= delay ) {
+				outval  += (srcrow1 != -1) ? d_in[(ipos + t - delay + ilen) % ilen + (size_t)ilen*srcrow1] : 0;
+			}
+			d_out[(opos + t) % olen + (size_t)olen*r] = outval;
+		}
+	}
+}
+
+__global__
+void fdmt_stream_gather_kernel(int                      ntime,
+                               int                      nrow,
+                               float const* __restrict__ d_in,
+                               int                      ilen,
+                               int                      ipos,
+                               float*       __restrict__ d_out,
+                               int                      ostride) {
+	int t0 = threadIdx.x + blockIdx.x*blockDim.x;
+	int r0 = threadIdx.y + blockIdx.y*blockDim.y;
+	for( int r=r0; r<nrow; r+=blockDim.y*gridDim.y ) {
+		for( int t=t0; t<ntime; t+=blockDim.x*gridDim.x ) {
+			d_out[t + (size_t)ostride*r] = d_in[(ipos + t + r) % ilen + (size_t)ilen*r];
+		}
+	}
+}
+
+inline dim3 fdmt_stream_grid(dim3 block, int ntime, int nrow) {
+	return dim3(std::min((ntime-1)/block.x+1, 65535u),
+	            std::min((nrow -1)/block.y+1, 65535u));
+}
+
+template<typename InType>
+void launch_fdmt_stream_input_kernel(int          ntime,
+                                     int          nchan,
+                                     bool         reverse_band,
+                                     InType       d_in,
+                                     int          istride,
+                                     float*       d_buf,
+                                     int          buflen,
+                                     int          pos,
+                                     cudaStream_t stream) {
+	dim3 block(256, 1); // TODO: Tune this
+	dim3 grid = fdmt_stream_grid(block, ntime, nchan);
+	fdmt_stream_input_kernel<<<grid,block,0,stream>>>(ntime, nchan,
+	                                                  reverse_band,
+	                                                  d_in, istride,
+	                                                  d_buf, buflen, pos);
+}
+
+void launch_fdmt_stream_init_kernel(int          ntime,
+                                    int          nchan,
+                                    int          tabs,
+                                    int   const* d_offsets,
+                                    float const* d_in,
+                                    int          ilen,
+                                    int          ipos,
+                                    float*       d_out,
+                                    int          olen,
+                                    int          opos,
+                                    cudaStream_t stream) {
+	dim3 block(256, 1); // TODO: Tune this
+	dim3 grid = fdmt_stream_grid(block, ntime, nchan);
+	fdmt_stream_init_kernel<<<grid,block,0,stream>>>(ntime, nchan, tabs,
+	                                                 d_offsets,
+	                                                 d_in, ilen, ipos,
+	                                                 d_out, olen, opos);
+}
+
+void launch_fdmt_stream_exec_kernel(int          ntime,
+                                    int          nrow,
+                                    int          tabs,
+                                    int   const* d_delays,
+                                    int2  const* d_srcrows,
+                                    float const* d_in,
+                                    int          ilen,
+                                    int          ipos,
+                                    float*       d_out,
+                                    int          olen,
+                                    int          opos,
+                                    cudaStream_t stream) {
+	dim3 block(256, 1); // TODO: Tune this
+	dim3 grid = fdmt_stream_grid(block, ntime, nrow);
+	fdmt_stream_exec_kernel<<<grid,block,0,stream>>>(ntime, nrow, tabs,
+	                                                 d_delays, d_srcrows,
+	                                                 d_in, ilen, ipos,
+	                                                 d_out, olen, opos);
+}
+
+void launch_fdmt_stream_gather_kernel(int          ntime,
+                                      int          nrow,
+                                      float const* d_in,
+                                      int          ilen,
+                                      int          ipos,
+                                      float*       d_out,
+                                      int          ostride,
+                                      cudaStream_t stream) {
+	dim3 block(256, 1); // TODO: Tune this
+	dim3 grid = fdmt_stream_grid(block, ntime, nrow);
+	fdmt_stream_gather_kernel<<<grid,block,0,stream>>>(ntime, nrow,
+	                                                   d_in, ilen, ipos,
+	                                                   d_out, ostride);
+}
+
+#define INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(IterType) \
+	template void launch_fdmt_init_kernel<IterType,float>( \
+		int, int, bool, bool, int const*, IterType, int, float*, int, \
+		cudaStream_t)
+INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(int8_t*);
+INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(int16_t*);
+INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(int32_t*);
+INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(uint8_t*);
+INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(uint16_t*);
+INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(uint32_t*);
+INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL(float*);
+#undef INSTANTIATE_LAUNCH_FDMT_INIT_KERNEL
+#define INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(IterType) \
+	template void launch_fdmt_stream_input_kernel<IterType>( \
+		int, int, bool, IterType, int, float*, int, int, cudaStream_t)
+INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(int8_t*);
+INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(int16_t*);
+INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(int32_t*);
+INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(uint8_t*);
+INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(uint16_t*);
+INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(uint32_t*);
+INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL(float*);
+#undef INSTANTIATE_LAUNCH_FDMT_STREAM_INPUT_KERNEL
+template void launch_fdmt_exec_kernel<float>(
+	int, int, bool, bool, int const*, int2 const*, float const*, int, float*,
+	int, cudaStream_t);
@@ -0,0 +1,105 @@
+/*
+ * Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+ * Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+ *
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions
+ * are met:
+ * * Redistributions of source code must retain the above copyright
+ *   notice, this list of conditions and the following disclaimer.
+ * * Redistributions in binary form must reproduce the above copyright
+ *   notice, this list of conditions and the following disclaimer in the
+ *   documentation and/or other materials provided with the distribution.
+ * * Neither the name of The Bifrost Authors nor the names of its
+ *   contributors may be used to endorse or promote products derived
+ *   from this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+ * EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+ * PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+ * CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+ * EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+ * PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+ * PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+ * OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#pragma once
+
+#include <cuda_runtime_api.h>
+
+// Note: These are instantiated in fdmt_kernels.cu for the input types
+//         supported by bfFdmtExecute (int8/16/32, uint8/16/32 and float).
+template<typename InType, typename OutType>
+void launch_fdmt_init_kernel(int            ntime,
+                             int            nchan,
+                             bool           reverse_band,
+                             bool           reverse_time,
+                             int     const* d_offsets,
+                             InType         d_in,
+                             int            istride,
+                             OutType*       d_out,
+                             int            ostride,
+                             cudaStream_t   stream=0);
+
+template<typename DType>
+void launch_fdmt_exec_kernel(int          ntime,
+                             int          nrow,
+                             bool         is_final_step,
+                             bool         reverse_time,
+                             int   const* d_delays,
+                             int2  const* d_srcrows,
+                             DType const* d_in,
+                             int          istride,
+                             DType*       d_out,
+                             int          ostride,
+                             cudaStream_t stream=0);
+
+// Kernels for incremental execution, which operate on circular buffers
+template<typename InType>
+void launch_fdmt_stream_input_kernel(int          ntime,
+                                     int          nchan,
+                                     bool         reverse_band,
+                                     InType       d_in,
+                                     int          istride,
+                                     float*       d_buf,
+                                     int          buflen,
+                                     int          pos,
+                                     cudaStream_t stream=0);
+
+void launch_fdmt_stream_init_kernel(int          ntime,
+                                    int          nchan,
+                                    int          tabs,
+                                    int   const* d_offsets,
+                                    float const* d_in,
+                                    int          ilen,
+                                    int          ipos,
+                                    float*       d_out,
+                                    int          olen,
+                                    int          opos,
+                                    cudaStream_t stream=0);
+
+void launch_fdmt_stream_exec_kernel(int          ntime,
+                                    int          nrow,
+                                    int          tabs,
+                                    int   const* d_delays,
+                                    int2  const* d_srcrows,
+                                    float const* d_in,
+                                    int          ilen,
+                                    int          ipos,
+                                    float*       d_out,
+                                    int          olen,
+                                    int          opos,
+                                    cudaStream_t stream=0);
+
+void launch_fdmt_stream_gather_kernel(int          ntime,
+                                      int          nrow,
+                                      float const* d_in,
+                                      int          ilen,
+                                      int          ipos,
+                                      float*       d_out,
+                                      int          ostride,
+                                      cudaStream_t stream=0);
@@ -43,6 +43,26 @@ bfMap(3, c.shape, {"dm", "t"},
 #define BF_MAP_KERNEL_CACHE_SIZE 128
 #endif
 
+// The C++ compiler used to build host (CPU) map kernels
+// Note: This can be overridden at runtime via $BIFROST_MAP_CXX
+#ifndef BF_MAP_HOST_CXX
+#define BF_MAP_HOST_CXX "c++"
+#endif
+
+// Compiled kernels are also stored here so that they persist across processes
+// Note: This can be overridden at runtime via $BIFROST_MAP_CACHE_DIR, and
+//         setting it to an empty string disables the on-disk cache.
+#ifndef BF_MAP_DISK_CACHE_DIR
+#define BF_MAP_DISK_CACHE_DIR ".cache/bifrost/map" // Relative to $HOME
+#endif
+
+#ifndef BF_VERSION_MAJOR
+#define BF_VERSION_MAJOR 0
+#endif
+#ifndef BF_VERSION_MINOR
+#define BF_VERSION_MINOR 0
+#endif
+
 #include <bifrost/map.h>
 
 #include "cuda.hpp"
@@ -51,27 +71,42 @@ bfMap(3, c.shape, {"dm", "t"},
 #include "array_utils.hpp"
 #include "ObjectCache.hpp"
 
+#if BF_CUDA_ENABLED
 #include <cuda.h>
 #include <nvrtc.h>
+#endif
 
 #include "IndexArray.cuh.jit"
-#include "ArrayIndexer.cuh"
 #include "ArrayIndexer.cuh.jit"
-#include "ShapeIndexer.cuh"
 #include "ShapeIndexer.cuh.jit"
-#include "Complex.hpp"
 #include "Complex.hpp.jit"
 #include "int_fastdiv.h.jit"
 
+#include <dlfcn.h>
+#include <unistd.h>
+#include <sys/wait.h>
+#include <sys/stat.h>
+
 #include <vector>
 #include <sstream>
+#include <fstream>
 #include <iomanip>
+#include <memory>
+#include <atomic>
+#include <mutex>
+#include <map>
+#include <set>
+#include <cstdlib>
+#include <cstdio>
+#include <cerrno>
 
 #include <iostream>
 using std::cout;
 using std::cerr;
 using std::endl;
 
+#if BF_CUDA_ENABLED
+
 #define BF_CHECK_NVRTC(call) \
 	do { \
 		nvrtcResult ret = call; \
@@ -99,6 +134,356 @@ BFstatus bifrost_status(nvrtcResult status) {
     }
 }
 
+#endif // BF_CUDA_ENABLED
+
+// Host map kernels take a single array of pointers, one per argument
+typedef void (*BFmapHostFunc)(void* const* args);
+
+// A map kernel compiled for the host and loaded from a shared library
+class HostKernel {
+	std::shared_ptr<void> _lib;
+	BFmapHostFunc         _func;
+public:
+	inline HostKernel() : _func(0) {}
+	inline HostKernel(const char* func_name, std::string const& lib_path) {
+		void* lib = ::dlopen(lib_path.c_str(), RTLD_NOW | RTLD_LOCAL);
+		if( !lib ) {
+			throw std::runtime_error(::dlerror());
+		}
+		_lib = std::shared_ptr<void>(lib, ::dlclose);
+		_func = (BFmapHostFunc)::dlsym(lib, func_name);
+		if( !_func ) {
+			throw std::runtime_error(::dlerror());
+		}
+	}
+	inline void launch(std::vector<void*> const& arg_ptrs) const {
+		_func(&arg_ptrs[0]);
+	}
+};
+
+// Any BFarrays that are immutable, have shape=[1] and are accessible from
+//   system memory are passed to kernels by value.
+inline bool is_scalar_arg(BFarray const* arg) {
+	return (arg->ndim     == 1 &&
+	        arg->shape[0] == 1 &&
+	        arg->immutable &&
+	        space_accessible_from(arg->space, BF_SPACE_SYSTEM));
+}
+
+// Returns true if all (non-scalar) args can be processed on the host
+inline bool map_args_on_host(int narg, BFarray const*const* args) {
+	for( int a=0; a<narg; ++a ) {
+		if( !is_scalar_arg(args[a]) &&
+		    args[a]->space != BF_SPACE_SYSTEM &&
+		    args[a]->space != BF_SPACE_CUDA_HOST ) {
+			return false;
+		}
+	}
+	return true;
+}
+
+// Directory in which host kernels are compiled; the JIT headers are written
+//   here the first time it is requested.
+class MapHostWorkdir {
+	std::string _path;
+	void write_file(std::string const& name, const char* contents) {
+		std::ofstream file((_path + "/" + name).c_str());
+		file << contents;
+	}
+public:
+	MapHostWorkdir() {
+		const char* tmpdir = getenv("TMPDIR");
+		std::string path_template = std::string(tmpdir ? tmpdir : "/tmp") +
+		                            "/bifrost_map_XXXXXX";
+		std::vector<char> path(path_template.begin(), path_template.end());
+		path.push_back('\0');
+		if( !::mkdtemp(&path[0]) ) {
+			return;
+		}
+		_path = &path[0];
+		this->write_file("Complex.hpp",      Complex_hpp);
+		this->write_file("ArrayIndexer.cuh", ArrayIndexer_cuh);
+		this->write_file("ShapeIndexer.cuh", ShapeIndexer_cuh);
+		this->write_file("IndexArray.cuh",   IndexArray_cuh);
+		this->write_file("int_fastdiv.h",    int_fastdiv_h);
+	}
+	~MapHostWorkdir() {
+		if( !_path.empty() ) {
+			std::string cmd = "rm -rf '" + _path + "'";
+			if( std::system(cmd.c_str()) != 0 ) {}
+		}
+	}
+	inline bool        valid() const { return !_path.empty(); }
+	inline std::string path()  const { return _path; }
+};
+
+MapHostWorkdir const& get_map_host_workdir() {
+	static MapHostWorkdir workdir;
+	return workdir;
+}
+
+// Persistent cache of compiled kernels (shared libraries and PTX), keyed by
+//   a hash of the library version, target, compiler identity and options, JIT
+//   headers and generated source code. Entries are written atomically, so the
+//   cache may be shared between concurrent processes.
+// Note: Sources that fail to compile (e.g., the basic-indexing variant of a
+//         kernel that needs full indexing) are recorded with an empty ".fail"
+//         entry under the same key, so that the compiler is not re-run for
+//         them by later processes. A missing compiler is not recorded.
+class MapDiskCache {
+	std::string _dir;
+	mutable std::mutex            _failed_mutex;
+	mutable std::set<std::string> _failed;
+	static bool make_dir(std::string const& path) {
+		return ::mkdir(path.c_str(), 0775) == 0 || errno == EEXIST;
+	}
+public:
+	MapDiskCache() {
+		const char* dir = getenv("BIFROST_MAP_CACHE_DIR");
+		if( dir ) {
+			_dir = dir;
+		} else {
+			const char* home = getenv("HOME");
+			if( !home ) {
+				return;
+			}
+			_dir = std::string(home) + "/" + BF_MAP_DISK_CACHE_DIR;
+		}
+		// Create the directory and any missing parents
+		for( size_t i=1; i<=_dir.size(); ++i ) {
+			if( (i == _dir.size() || _dir[i] == '/') &&
+			    !make_dir(_dir.substr(0, i)) ) {
+				_dir.clear();
+				return;
+			}
+		}
+	}
+	inline bool enabled() const { return !_dir.empty(); }
+	// Note: FNV-1a; this is only used to name files, not for security
+	static std::string make_key(std::string const& target,
+	                            std::string const& options,
+	                            std::string const& source) {
+		std::stringstream ss;
+		ss << "bifrost-" << BF_VERSION_MAJOR << "." << BF_VERSION_MINOR << "\n"
+		   << target  << "\n"
+		   << options << "\n"
+		   << Complex_hpp << ArrayIndexer_cuh << ShapeIndexer_cuh
+		   << IndexArray_cuh << int_fastdiv_h << "\n"
+		   << source;
+		std::string const& s = ss.str();
+		unsigned long long hash = 14695981039346656037ull;
+		for( size_t i=0; i<s.size(); ++i ) {
+			hash ^= (unsigned char)s[i];
+			hash *= 1099511628211ull;
+		}
+		std::stringstream key;
+		key << target << "_" << std::hex << std::setfill('0') << std::setw(16)
+		    << hash;
+		return key.str();
+	}
+	inline std::string path(std::string const& key, const char* ext) const {
+		return _dir + "/" + key + ext;
+	}
+	// Creates a uniquely-named (per writer) temporary file alongside the entry
+	//   and returns its path, or an empty string on failure
+	std::string make_temp(std::string const& key, const char* ext) const {
+		std::string path_template = this->path(key, ext) + ".tmpXXXXXX";
+		std::vector<char> path(path_template.begin(), path_template.end());
+		path.push_back('\0');
+		int fd = ::mkstemp(&path[0]);
+		if( fd == -1 ) {
+			return "";
+		}
+		// Note: mkstemp creates the file readable only by its owner
+		::fchmod(fd, 0644);
+		::close(fd);
+		return &path[0];
+	}
+	inline bool contains(std::string const& key, const char* ext) const {
+		return this->enabled() &&
+		       ::access(this->path(key, ext).c_str(), R_OK) == 0;
+	}
+	bool load(std::string const& key, const char* ext,
+	          std::string* contents) const {
+		if( !this->enabled() ) {
+			return false;
+		}
+		std::ifstream file(this->path(key, ext).c_str(), std::ios::binary);
+		if( !file ) {
+			return false;
+		}
+		std::stringstream ss;
+		ss << file.rdbuf();
+		*contents = ss.str();
+		return true;
+	}
+	// Atomically moves a complete file at temp_path into the cache
+	// Note: The temporary file is left in place if this fails
+	inline bool commit(std::string const& temp_path,
+	                   std::string const& key, const char* ext) const {
+		return ::rename(temp_path.c_str(), this->path(key, ext).c_str()) == 0;
+	}
+	bool store(std::string const& key, const char* ext,
+	           std::string const& contents) const {
+		if( !this->enabled() ) {
+			return false;
+		}
+		std::string temp_path = this->make_temp(key, ext);
+		if( temp_path.empty() ) {
+			return false;
+		}
+		std::ofstream file(temp_path.c_str(), std::ios::binary);
+		file << contents;
+		file.close();
+		if( !file || !this->commit(temp_path, key, ext) ) {
+			::unlink(temp_path.c_str());
+			return false;
+		}
+		return true;
+	}
+	void mark_failed(std::string const& key) const {
+		{
+			std::lock_guard<std::mutex> lock(_failed_mutex);
+			_failed.insert(key);
+		}
+		this->store(key, ".fail", "");
+	}
+	bool failed(std::string const& key) const {
+		{
+			std::lock_guard<std::mutex> lock(_failed_mutex);
+			if( _failed.count(key) ) {
+				return true;
+			}
+		}
+		return this->contains(key, ".fail");
+	}
+};
+
+MapDiskCache const& get_map_disk_cache() {
+	static MapDiskCache disk_cache;
+	return disk_cache;
+}
+
+// Returns the standard output of a shell command
+std::string command_output(std::string const& cmd) {
+	std::string output;
+	FILE* pipe = ::popen(cmd.c_str(), "r");
+	if( !pipe ) {
+		return output;
+	}
+	char buf[4096];
+	size_t nread;
+	while( (nread = ::fread(buf, 1, sizeof(buf), pipe)) > 0 ) {
+		output.append(buf, nread);
+	}
+	::pclose(pipe);
+	return output;
+}
+
+// Returns the host compiler's version and the target features that it enables
+//   with the given options (e.g., those resolved by -march=native), so that
+//   cached kernels are never reused with a different compiler or CPU
+std::string host_compiler_id(std::string const& cxx,
+                             std::string const& options) {
+	static std::mutex mutex;
+	static std::map<std::string,std::string> ids;
+	std::lock_guard<std::mutex> lock(mutex);
+	std::string& id = ids[options];
+	if( id.empty() ) {
+		id = (command_output(cxx + " --version 2>&1") +
+		      command_output(options + " -x c++ -dM -E - < /dev/null 2>&1"));
+	}
+	return id;
+}
+
+BFstatus compile_map_kernel_host(std::string const& source,
+                                 bool basic_indexing_only,
+                                 HostKernel* kernel) {
+	static std::atomic<int> kernel_count(0);
+	MapHostWorkdir const& workdir = get_map_host_workdir();
+	BF_ASSERT(workdir.valid(), BF_STATUS_INTERNAL_ERROR);
+	const char* cxx_env = getenv("BIFROST_MAP_CXX");
+	std::string cxx = cxx_env ? cxx_env : BF_MAP_HOST_CXX;
+	std::stringstream options;
+	options << cxx
+	        << " -std=c++11 -O3 -ffast-math -fPIC -shared -fopenmp"
+#ifndef BF_MAP_HOST_ANY_ARCH
+	        << " -march=native"
+#endif
+	        ;
+	MapDiskCache const& disk_cache = get_map_disk_cache();
+	std::string disk_key = MapDiskCache::make_key(
+		"host", options.str() + "\n" + host_compiler_id(cxx, options.str()),
+		source);
+	if( disk_cache.contains(disk_key, ".so") ) {
+		BF_TRY(*kernel = HostKernel("map_kernel",
+		                            disk_cache.path(disk_key, ".so")));
+		return BF_STATUS_SUCCESS;
+	} else if( disk_cache.failed(disk_key) ) {
+		// Note: This source is already known not to compile
+		return BF_STATUS_INVALID_ARGUMENT;
+	}
+	std::stringstream stem_ss;
+	stem_ss << workdir.path() << "/map_kernel_" << kernel_count++;
+	std::string stem     = stem_ss.str();
+	std::string src_path = stem + ".cpp";
+	std::string lib_path = stem + ".so";
+	std::string log_path = stem + ".log";
+	std::string temp_path;
+	if( disk_cache.enabled() ) {
+		// Note: Built in-place to avoid a copy when it is moved into the cache
+		temp_path = disk_cache.make_temp(disk_key, ".so");
+		if( !temp_path.empty() ) {
+			lib_path = temp_path;
+		}
+	}
+	{
+		std::ofstream src_file(src_path.c_str());
+		src_file << source;
+		BF_ASSERT(src_file, BF_STATUS_INTERNAL_ERROR);
+	}
+	std::stringstream cmd;
+	cmd << options.str()
+	    << " -I'" << workdir.path() << "'"
+	    << " -o '" << lib_path << "'"
+	    << " '"    << src_path << "'"
+	    << " > '"  << log_path << "' 2>&1";
+	int ret = std::system(cmd.str().c_str());
+#if BF_DEBUG
+	if( ret != 0 && !basic_indexing_only ) {
+		std::ifstream log_file(log_path.c_str());
+		std::cout << "---------------------------------------------------" << std::endl;
+		std::cout << "--- Host JIT compile log for program bfMap ---" << std::endl;
+		std::cout << "---------------------------------------------------" << std::endl;
+		std::cout << log_file.rdbuf() << std::endl;
+		std::cout << "---------------------------------------------------" << std::endl;
+	}
+#endif
+	::unlink(src_path.c_str());
+	::unlink(log_path.c_str());
+	if( ret == -1 || !WIFEXITED(ret) || WEXITSTATUS(ret) == 127 ) {
+		// Note: The shell returns 127 when the compiler could not be found
+		::unlink(lib_path.c_str());
+		BF_FAIL("Host C++ compiler available", BF_STATUS_UNSUPPORTED);
+	}
+	if( WEXITSTATUS(ret) != 0 ) {
+		::unlink(lib_path.c_str());
+		disk_cache.mark_failed(disk_key);
+		// Note: Don't print debug msg here, failure may not be expected
+		return BF_STATUS_INVALID_ARGUMENT;
+	}
+	if( !temp_path.empty() && disk_cache.commit(temp_path, disk_key, ".so") ) {
+		lib_path = disk_cache.path(disk_key, ".so");
+		BF_TRY(*kernel = HostKernel("map_kernel", lib_path));
+		return BF_STATUS_SUCCESS;
+	}
+	// Note: The library remains loaded after the file is removed
+	BF_TRY_ELSE(*kernel = HostKernel("map_kernel", lib_path),
+	            ::unlink(lib_path.c_str()));
+	::unlink(lib_path.c_str());
+	return BF_STATUS_SUCCESS;
+}
+
 BFstatus build_map_kernel(int*                 external_ndim,
                           long*                external_shape,
                           char const*const*    axis_names,
@@ -107,7 +492,9 @@ BFstatus build_map_kernel(int*                 external_ndim,
                           char const*const*    arg_names,
                           char const*          func,
                           bool basic_indexing_only,
-                          std::string* ptx_string) {
+                          bool host,
+                          std::string* kernel_string,
+                          HostKernel*  host_kernel) {
 	// Make local copies of ndim and shape to avoid corrupting external copies
 	//   until we know that this function has succeeded.
 	// TODO: This is not very elegant
@@ -136,34 +523,60 @@ BFstatus build_map_kernel(int*                 external_ndim,
 		args = &mutable_array_ptrs[0];
 	}
 	std::stringstream code;
+	if( host ) {
+		// Allow the device-oriented JIT headers to be compiled for the host
+		code << "#define __host__" << endl;
+		code << "#define __device__" << endl;
+		code << "#define __forceinline__ inline __attribute__((always_inline))" << endl;
+		code << "struct int2 { int x, y; };" << endl;
+		code << "#include <cstdlib>" << endl;
+		code << "#include <algorithm>" << endl;
+	}
 	code << "#include \"Complex.hpp\"" << endl;
 	code << "#include \"ArrayIndexer.cuh\"" << endl;
 	code << "#include \"ShapeIndexer.cuh\"" << endl;
 	code << "extern \"C\"\n";
-	code << "__global__\n";
-	code << "void map_kernel(";
-	for( int a=0; a<narg; ++a ) {
-		const char* ctype_string = dtype2ctype_string(args[a]->dtype);
-		BF_ASSERT(ctype_string, BF_STATUS_INVALID_ARGUMENT);
-		if( args[a]->ndim     == 1 &&
-		    args[a]->shape[0] == 1 &&
-		    args[a]->immutable &&
-		    space_accessible_from(args[a]->space, BF_SPACE_SYSTEM) ) {
-			// Special case for scalar parameters
-			code << "  " << ctype_string
-			     << " const"
-			     << " " << arg_names[a];
-				
-		} else {
-			code << ctype_string
-			     << (args[a]->immutable ? " const" : "")
-			     << "* " << arg_names[a] << "_ptr";
+	if( host ) {
+		code << "void map_kernel(void* const* _args) {\n";
+		for( int a=0; a<narg; ++a ) {
+			const char* ctype_string = dtype2ctype_string(args[a]->dtype);
+			BF_ASSERT(ctype_string, BF_STATUS_INVALID_ARGUMENT);
+			if( is_scalar_arg(args[a]) ) {
+				// Special case for scalar parameters
+				code << "  " << ctype_string << " const " << arg_names[a]
+				     << " = *(" << ctype_string << " const*)_args[" << a << "];\n";
+			} else {
+				code << "  " << ctype_string
+				     << (args[a]->immutable ? " const" : "")
+				     << "* " << arg_names[a] << "_ptr = ("
+				     << ctype_string
+				     << (args[a]->immutable ? " const" : "")
+				     << "*)_args[" << a << "];\n";
+			}
 		}
-		if( a != narg-1 ) {
-			code << ",\n";
+	} else {
+		code << "__global__\n";
+		code << "void map_kernel(";
+		for( int a=0; a<narg; ++a ) {
+			const char* ctype_string = dtype2ctype_string(args[a]->dtype);
+			BF_ASSERT(ctype_string, BF_STATUS_INVALID_ARGUMENT);
+			if( is_scalar_arg(args[a]) ) {
+				// Special case for scalar parameters
+				code << "  " << ctype_string
+				     << " const"
+				     << " " << arg_names[a];
+					
+			} else {
+				code << ctype_string
+				     << (args[a]->immutable ? " const" : "")
+				     << "* " << arg_names[a] << "_ptr";
+			}
+			if( a != narg-1 ) {
+				code << ",\n";
+			}
 		}
+		code << ") {\n";
 	}
-	code << ") {\n";
 	code << "  enum { NDIM = " << ndim << " };\n";
 	code << "  typedef StaticIndexArray<int,";
 	for( int d=0; d<ndim; ++d ) {
@@ -191,15 +604,19 @@ BFstatus build_map_kernel(int*                 external_ndim,
 		     << ",_Strides_"       << arg_names[a]
 		     << "> _ArrayIndexer_" << arg_names[a] << ";\n";
 	}
-	code <<
-		"  int _i0 = threadIdx.x + blockIdx.x*blockDim.x;\n"
-		"  for( int _i=_i0; _i<_ShapeIndexer::SIZE; _i+=blockDim.x*gridDim.x ) {\n"
-		"    auto const& _  = _ShapeIndexer::lift(_i);\n";
+	if( host ) {
+		code <<
+			"  #pragma omp parallel for schedule(static)\n"
+			"  for( int _i=0; _i<_ShapeIndexer::SIZE; ++_i ) {\n"
+			"    auto const& _  = _ShapeIndexer::lift(_i);\n";
+	} else {
+		code <<
+			"  int _i0 = threadIdx.x + blockIdx.x*blockDim.x;\n"
+			"  for( int _i=_i0; _i<_ShapeIndexer::SIZE; _i+=blockDim.x*gridDim.x ) {\n"
+			"    auto const& _  = _ShapeIndexer::lift(_i);\n";
+	}
 	for( int a=0; a<narg; ++a ) {
-		if( args[a]->ndim     == 1 &&
-		    args[a]->shape[0] == 1 &&
-		    args[a]->immutable &&
-		    space_accessible_from(args[a]->space, BF_SPACE_SYSTEM) ) {
+		if( is_scalar_arg(args[a]) ) {
 			// pass
 		} else {
 			// TODO: De-dupe this with the one above
@@ -228,6 +645,24 @@ BFstatus build_map_kernel(int*                 external_ndim,
 	code << "  }\n";
 	code << "}\n";
 	
+#if BF_DEBUG_RTC
+		int i = 1;
+		for( std::string line; std::getline(code, line); ++i ) {
+			cout << std::setfill(' ') << std::setw(3) << i << " " << line << endl;
+		}
+#endif
+	
+	if( host ) {
+		BFstatus ret = compile_map_kernel_host(code.str(), basic_indexing_only,
+		                                       host_kernel);
+		if( ret != BF_STATUS_SUCCESS ) {
+			return ret;
+		}
+		*external_ndim = ndim;
+		::memcpy(external_shape, shape, ndim*sizeof(*shape));
+		return BF_STATUS_SUCCESS;
+	}
+#if BF_CUDA_ENABLED
 	const char* program_name = "bfMap";
 	const char* header_codes[] = {
 		Complex_hpp,
@@ -245,18 +680,6 @@ BFstatus build_map_kernel(int*                 external_ndim,
 	};
 	size_t nheader = sizeof(header_codes) / sizeof(const char*);
 	
-#if BF_DEBUG_RTC
-		int i = 1;
-		for( std::string line; std::getline(code, line); ++i ) {
-			cout << std::setfill(' ') << std::setw(3) << i << " " << line << endl;
-		}
-#endif
-	
-	nvrtcProgram program;
-	BF_CHECK_NVRTC( nvrtcCreateProgram(&program,
-	                                   code.str().c_str(),
-	                                   program_name,
-	                                   nheader, header_codes, header_names) );
 	std::vector<std::string> options;
 	options.push_back("--std=c++11");
 	options.push_back("--device-as-default-execution-space");
@@ -266,9 +689,28 @@ BFstatus build_map_kernel(int*                 external_ndim,
 	options.push_back("-arch="+cc_ss.str());
 	options.push_back("--restrict");
 	std::vector<const char*> options_c;
+	std::stringstream options_ss;
+	options_ss << "CUDA_VERSION=" << CUDA_VERSION;
 	for( int i=0; i<(int)options.size(); ++i ) {
 		options_c.push_back(options[i].c_str());
+		options_ss << " " << options[i];
+	}
+	MapDiskCache const& disk_cache = get_map_disk_cache();
+	std::string disk_key = MapDiskCache::make_key("cuda", options_ss.str(), code.str());
+	if( disk_cache.load(disk_key, ".ptx", kernel_string) ) {
+		*external_ndim = ndim;
+		::memcpy(external_shape, shape, ndim*sizeof(*shape));
+		return BF_STATUS_SUCCESS;
+	} else if( disk_cache.failed(disk_key) ) {
+		// Note: This source is already known not to compile
+		return BF_STATUS_INVALID_ARGUMENT;
 	}
+	
+	nvrtcProgram program;
+	BF_CHECK_NVRTC( nvrtcCreateProgram(&program,
+	                                   code.str().c_str(),
+	                                   program_name,
+	                                   nheader, header_codes, header_names) );
 	nvrtcResult ret = nvrtcCompileProgram(program,
 	                                      options_c.size(),
 	                                      &options_c[0]);
@@ -291,6 +733,7 @@ BFstatus build_map_kernel(int*                 external_ndim,
 	}
 #endif // BIFROST_DEBUG
 	if( ret != NVRTC_SUCCESS ) {
+		disk_cache.mark_failed(disk_key);
 		// Note: Don't print debug msg here, failure may not be expected
 		return BF_STATUS_INVALID_ARGUMENT;
 	}
@@ -304,21 +747,30 @@ BFstatus build_map_kernel(int*                 external_ndim,
 #if BF_DEBUG_RTC
 	std::cout << ptx << std::endl;
 #endif
-	*ptx_string = ptx;
+	*kernel_string = ptx;
+	disk_cache.store(disk_key, ".ptx", *kernel_string);
 	*external_ndim = ndim;
 	::memcpy(external_shape, shape, ndim*sizeof(*shape));
 	return BF_STATUS_SUCCESS;
+#else
+	BF_FAIL("Built with CUDA support (bfMap)", BF_STATUS_INVALID_SPACE);
+#endif // BF_CUDA_ENABLED
 }
 
-BFstatus bfMap(int                  ndim,
-               long const*          shape,
-               char const*const*    axis_names,
-               int                  narg,
-               BFarray const*const* args,
-               char const*const*    arg_names,
-               char const*          func) {
+BFstatus map_impl(int                  ndim,
+                  long const*          shape,
+                  char const*const*    axis_names,
+                  int                  narg,
+                  BFarray const*const* args,
+                  char const*const*    arg_names,
+                  char const*          func,
+                  bool                 launch) {
+	thread_local static ObjectCache<std::string,HostKernel>
+		host_kernel_cache(BF_MAP_KERNEL_CACHE_SIZE);
+#if BF_CUDA_ENABLED
 	thread_local static ObjectCache<std::string,CUDAKernel>
 		kernel_cache(BF_MAP_KERNEL_CACHE_SIZE);
+#endif
 	BF_ASSERT(ndim >= 0,           BF_STATUS_INVALID_ARGUMENT);
 	//BF_ASSERT(!ndim || shape,      BF_STATUS_INVALID_POINTER);
 	//BF_ASSERT(!ndim || axis_names, BF_STATUS_INVALID_POINTER);
@@ -338,6 +790,12 @@ BFstatus bfMap(int                  ndim,
 	}
 	shape = mutable_shape;
 	
+	// Note: Computation is done on the host iff all args are in host memory
+	bool host = map_args_on_host(narg, args);
+#if !BF_CUDA_ENABLED
+	BF_ASSERT(host, BF_STATUS_INVALID_SPACE);
+#endif
+	
 	std::stringstream cache_key_ss;
 	cache_key_ss << ndim << ",";
 	for( int d=0; d<ndim; ++d ) {
@@ -359,16 +817,52 @@ BFstatus bfMap(int                  ndim,
 	cache_key_ss << func;
 	std::string cache_key = cache_key_ss.str();
 	
+	if( host ) {
+		if( !host_kernel_cache.contains(cache_key) ) {
+			HostKernel kernel;
+			std::string unused;
+			// First we try with basic_indexing_only = true
+			BFstatus ret = build_map_kernel(&ndim, mutable_shape, axis_names,
+			                                narg, args, arg_names, func,
+			                                true, true, &unused, &kernel);
+			if( ret == BF_STATUS_UNSUPPORTED ) {
+				// No host compiler available; no point trying again
+				return ret;
+			} else if( ret != BF_STATUS_SUCCESS ) {
+				// Then we fall back to basic_indexing_only = false
+				BF_CHECK(build_map_kernel(&ndim, mutable_shape, axis_names,
+				                          narg, args, arg_names, func,
+				                          false, true, &unused, &kernel));
+			}
+			host_kernel_cache.insert(cache_key, kernel);
+		}
+		HostKernel& kernel = host_kernel_cache.get(cache_key);
+		if( !launch ) {
+			return BF_STATUS_SUCCESS;
+		}
+		std::vector<void*> kernel_args;
+		kernel_args.reserve(narg);
+		for( int a=0; a<narg; ++a ) {
+			// Note: Scalars and arrays are both passed as pointers to the
+			//         underlying data.
+			BF_ASSERT(args[a]->data, BF_STATUS_INVALID_POINTER);
+			kernel_args.push_back(args[a]->data);
+		}
+		kernel.launch(kernel_args);
+		return BF_STATUS_SUCCESS;
+	}
+	
+#if BF_CUDA_ENABLED
 	if( !kernel_cache.contains(cache_key) ) {
 		std::string ptx;
 		// First we try with basic_indexing_only = true
 		if( build_map_kernel(&ndim, mutable_shape, axis_names, narg,
 		                     args, arg_names, func,
-		                     true, &ptx) != BF_STATUS_SUCCESS ) {
+		                     true, false, &ptx, 0) != BF_STATUS_SUCCESS ) {
 			// Then we fall back to basic_indexing_only = false
 			BF_CHECK(build_map_kernel(&ndim, mutable_shape, axis_names, narg,
 			                          args, arg_names, func,
-			                          false, &ptx));
+			                          false, false, &ptx, 0));
 		}
 		CUDAKernel kernel("map_kernel", ptx.c_str());
 		kernel_cache.insert(cache_key, kernel);
@@ -377,15 +871,15 @@ BFstatus bfMap(int                  ndim,
 		//std::cout << "FOUND IN CACHE" << std::endl;
 	}
 	CUDAKernel& kernel = kernel_cache.get(cache_key);
+	if( !launch ) {
+		return BF_STATUS_SUCCESS;
+	}
 	
 	std::vector<void*> kernel_args;
 	kernel_args.reserve(narg);
 	
 	for( int a=0; a<narg; ++a ) {
-		if( args[a]->ndim     == 1 &&
-		    args[a]->shape[0] == 1 &&
-		    args[a]->immutable &&
-		    space_accessible_from(args[a]->space, BF_SPACE_SYSTEM) ) {
+		if( is_scalar_arg(args[a]) ) {
 			// Special case for scalar parameters
 			kernel_args.push_back(args[a]->data);
 		} else {
@@ -404,6 +898,29 @@ BFstatus bfMap(int                  ndim,
 	                        0, g_cuda_stream,
 	                        kernel_args) == CUDA_SUCCESS,
 	          BF_STATUS_DEVICE_ERROR);
+#endif // BF_CUDA_ENABLED
 	
 	return BF_STATUS_SUCCESS;
 }
+
+BFstatus bfMap(int                  ndim,
+               long const*          shape,
+               char const*const*    axis_names,
+               int                  narg,
+               BFarray const*const* args,
+               char const*const*    arg_names,
+               char const*          func) {
+	return map_impl(ndim, shape, axis_names, narg, args, arg_names, func,
+	                true);
+}
+
+BFstatus bfMapPrecompile(int                  ndim,
+                         long const*          shape,
+                         char const*const*    axis_names,
+                         int                  narg,
+                         BFarray const*const* args,
+                         char const*const*    arg_names,
+                         char const*          func) {
+	return map_impl(ndim, shape, axis_names, narg, args, arg_names, func,
+	                false);
+}
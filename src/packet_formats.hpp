@@ -0,0 +1,317 @@
+/*
+ * Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+ * Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+ *
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions
+ * are met:
+ * * Redistributions of source code must retain the above copyright
+ *   notice, this list of conditions and the following disclaimer.
+ * * Redistributions in binary form must reproduce the above copyright
+ *   notice, this list of conditions and the following disclaimer in the
+ *   documentation and/or other materials provided with the distribution.
+ * * Neither the name of The Bifrost Authors nor the names of its
+ *   contributors may be used to endorse or promote products derived
+ *   from this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+ * EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+ * PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+ * CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+ * EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+ * PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+ * PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+ * OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+/*
+  Packet formats understood by the UDP capture engine
+
+  Each format is a decoder/processor pair:
+    The decoder parses a raw packet into a PacketDesc, returning false if
+      the packet is invalid:
+        bool operator()(const uint8_t* pkt_ptr, int pkt_size,
+                        PacketDesc* pkt) const;
+    The processor scatters a decoded packet's payload into the output
+      buffers, which have the layout [time][chan][src][chan_nbyte]:
+        void operator()(const PacketDesc* pkt, uint64_t seq0,
+                        uint64_t nseq_per_obuf, int nbuf, uint8_t* obufs[],
+                        size_t ngood_bytes[], size_t* src_ngood_bytes[]);
+        void blank_out_source(uint8_t* data, int src, int nsrc, int nchan,
+                              int payload_size, int nseq);
+  New formats are registered by name in udp_capture.cpp.
+
+  Formats that can also be transmitted provide an encoder, which stamps the
+    per-packet fields into a copy of a user-supplied header template:
+        static const size_t header_size;
+        void operator()(uint8_t* hdr_ptr, uint64_t seq, int src) const;
+  Encoders are registered by name in udp_transmit.cpp.
+*/
+
+#pragma once
+
+#include <arpa/inet.h> // For ntohs
+#include <endian.h>    // For be64toh
+
+#include <cstring>     // For memcpy, memset
+#include <cstdint>
+
+#ifndef BF_UNPACK_FACTOR
+#define BF_UNPACK_FACTOR 1
+#endif
+
+struct PacketDesc {
+	uint64_t       seq;
+	int            nsrc;
+	int            src;
+	int            nchan;
+	int            chan0;
+	int            payload_size;
+	const uint8_t* payload_ptr;
+};
+
+// Returns the index of the output buffer that the packet belongs in
+inline int packet_obuf_index(const PacketDesc* pkt,
+                             uint64_t          seq0,
+                             uint64_t          nseq_per_obuf) {
+	return ((pkt->seq - seq0 >= 1*nseq_per_obuf) +
+	        (pkt->seq - seq0 >= 2*nseq_per_obuf));
+}
+
+// Copies each NBYTE-byte channel of the payload to out[src + nsrc*chan]
+// Note: The fixed-size memcpys compile to (unaligned) SIMD loads and stores;
+//         neither the payload nor the output is guaranteed to be aligned.
+template<int NBYTE>
+inline void scatter_channels(const PacketDesc* pkt, uint8_t* obuf) {
+	uint8_t const* __restrict__ in  = pkt->payload_ptr;
+	uint8_t*       __restrict__ out = obuf;
+	for( int chan=0; chan<pkt->nchan; ++chan ) {
+		::memcpy(&out[(pkt->src + pkt->nsrc*chan)*NBYTE],
+		         &in[chan*NBYTE], NBYTE);
+	}
+}
+
+// Zeros a source's channels in each of nseq time samples
+inline void blank_out_channels(uint8_t* data,
+                               int      src,
+                               int      nsrc,
+                               int      nchan,
+                               int      chan_nbyte,
+                               int      nseq) {
+	for( int t=0; t<nseq; ++t ) {
+		for( int c=0; c<nchan; ++c ) {
+			::memset(&data[(src + nsrc*(c + nchan*t))*chan_nbyte],
+			         0, chan_nbyte);
+		}
+	}
+}
+
+#pragma pack(1)
+struct chips_hdr_type {
+	uint8_t  roach;    // Note: 1-based
+	uint8_t  gbe;      // (AKA tuning)
+	uint8_t  nchan;    // 109
+	uint8_t  nsubband; // 11
+	uint8_t  subband;  // 0-11
+	uint8_t  nroach;   // 16
+	// Note: Big endian
+	uint16_t chan0;    // First chan in packet
+	uint64_t seq;      // Note: 1-based
+};
+// Note: Big endian
+struct simple_hdr_type {
+	uint64_t seq;
+};
+// Note: Big endian
+struct generic_hdr_type {
+	uint64_t seq;
+	uint16_t src;
+	uint16_t nsrc;
+	uint16_t chan0;
+	uint16_t nchan;
+};
+#pragma pack()
+
+class CHIPSDecoder {
+	// TODO: See if can remove these once firmware supports per-GbE nroach
+	int _nsrc;
+	int _src0;
+	inline bool valid_packet(const PacketDesc* pkt) const {
+		return (pkt->seq   >= 0 &&
+		        pkt->src   >= 0 && pkt->src < _nsrc &&
+		        pkt->chan0 >= 0);
+	}
+public:
+	CHIPSDecoder(int nsrc, int src0) : _nsrc(nsrc), _src0(src0) {}
+	inline bool operator()(const uint8_t* pkt_ptr,
+	                       int            pkt_size,
+	                       PacketDesc*    pkt) const {
+		if( pkt_size < (int)sizeof(chips_hdr_type) ) {
+			return false;
+		}
+		const chips_hdr_type* pkt_hdr  = (chips_hdr_type*)pkt_ptr;
+		const uint8_t*        pkt_pld  = pkt_ptr  + sizeof(chips_hdr_type);
+		int                   pld_size = pkt_size - sizeof(chips_hdr_type);
+		pkt->seq   = be64toh(pkt_hdr->seq)  - 1;
+		//pkt->nsrc  =         pkt_hdr->nroach;
+		pkt->nsrc  =         _nsrc;
+		pkt->src   =        (pkt_hdr->roach - 1) - _src0;
+		pkt->nchan =         pkt_hdr->nchan;
+		pkt->chan0 =   ntohs(pkt_hdr->chan0);
+		pkt->payload_size = pld_size;
+		pkt->payload_ptr  = pkt_pld;
+		return this->valid_packet(pkt);
+	}
+};
+
+class CHIPSProcessor8bit {
+public:
+	inline void operator()(const PacketDesc* pkt,
+	                       uint64_t          seq0,
+	                       uint64_t          nseq_per_obuf,
+	                       int               nbuf,
+	                       uint8_t*          obufs[],
+	                       size_t            ngood_bytes[],
+	                       size_t*           src_ngood_bytes[]) {
+		int    obuf_idx = packet_obuf_index(pkt, seq0, nseq_per_obuf);
+		size_t obuf_seq0 = seq0 + obuf_idx*nseq_per_obuf;
+		size_t nbyte = pkt->payload_size * BF_UNPACK_FACTOR;
+		ngood_bytes[obuf_idx]               += nbyte;
+		src_ngood_bytes[obuf_idx][pkt->src] += nbyte;
+		// Note: Each channel holds 32 inputs of 4+4-bit complex samples
+		int payload_size = pkt->payload_size;
+		size_t obuf_offset = (pkt->seq-obuf_seq0)*pkt->nsrc*payload_size;
+		obuf_offset *= BF_UNPACK_FACTOR;
+		scatter_channels<32>(pkt, &obufs[obuf_idx][obuf_offset]);
+	}
+	inline void blank_out_source(uint8_t* data,
+	                             int      src,
+	                             int      nsrc,
+	                             int      nchan,
+	                             int      payload_size,
+	                             int      nseq) {
+		blank_out_channels(data, src, nsrc, nchan, 32, nseq);
+	}
+};
+
+// A single-source stream of packets that each hold one time sample
+class SimpleDecoder {
+	int _nsrc;
+public:
+	SimpleDecoder(int nsrc, int src0) : _nsrc(nsrc) {}
+	inline bool operator()(const uint8_t* pkt_ptr,
+	                       int            pkt_size,
+	                       PacketDesc*    pkt) const {
+		if( pkt_size <= (int)sizeof(simple_hdr_type) ) {
+			return false;
+		}
+		const simple_hdr_type* pkt_hdr = (simple_hdr_type*)pkt_ptr;
+		pkt->seq   = be64toh(pkt_hdr->seq);
+		pkt->nsrc  = _nsrc;
+		pkt->src   = 0;
+		pkt->nchan = 1;
+		pkt->chan0 = 0;
+		pkt->payload_size = pkt_size - sizeof(simple_hdr_type);
+		pkt->payload_ptr  = pkt_ptr  + sizeof(simple_hdr_type);
+		return true;
+	}
+};
+
+// Packets that each hold nchan equal-sized channels from one source
+class GenericDecoder {
+	int _nsrc;
+	int _src0;
+public:
+	GenericDecoder(int nsrc, int src0) : _nsrc(nsrc), _src0(src0) {}
+	inline bool operator()(const uint8_t* pkt_ptr,
+	                       int            pkt_size,
+	                       PacketDesc*    pkt) const {
+		if( pkt_size <= (int)sizeof(generic_hdr_type) ) {
+			return false;
+		}
+		const generic_hdr_type* pkt_hdr = (generic_hdr_type*)pkt_ptr;
+		pkt->seq   = be64toh(pkt_hdr->seq);
+		pkt->nsrc  = _nsrc;
+		pkt->src   = ntohs(pkt_hdr->src) - _src0;
+		pkt->nchan = ntohs(pkt_hdr->nchan);
+		pkt->chan0 = ntohs(pkt_hdr->chan0);
+		pkt->payload_size = pkt_size - sizeof(generic_hdr_type);
+		pkt->payload_ptr  = pkt_ptr  + sizeof(generic_hdr_type);
+		return (pkt->src >= 0 && pkt->src < _nsrc &&
+		        pkt->nchan > 0 && pkt->payload_size % pkt->nchan == 0);
+	}
+};
+
+// Scatters channels of any size, using fixed-size copies for the common sizes
+class ChannelProcessor {
+public:
+	inline void operator()(const PacketDesc* pkt,
+	                       uint64_t          seq0,
+	                       uint64_t          nseq_per_obuf,
+	                       int               nbuf,
+	                       uint8_t*          obufs[],
+	                       size_t            ngood_bytes[],
+	                       size_t*           src_ngood_bytes[]) {
+		int    obuf_idx = packet_obuf_index(pkt, seq0, nseq_per_obuf);
+		size_t obuf_seq0 = seq0 + obuf_idx*nseq_per_obuf;
+		size_t nbyte = pkt->payload_size;
+		ngood_bytes[obuf_idx]               += nbyte;
+		src_ngood_bytes[obuf_idx][pkt->src] += nbyte;
+		int payload_size = pkt->payload_size;
+		size_t obuf_offset = (pkt->seq-obuf_seq0)*pkt->nsrc*payload_size;
+		uint8_t* obuf = &obufs[obuf_idx][obuf_offset];
+		int chan_nbyte = payload_size / pkt->nchan;
+		switch( chan_nbyte ) {
+		case  8: scatter_channels< 8>(pkt, obuf); break;
+		case 16: scatter_channels<16>(pkt, obuf); break;
+		case 32: scatter_channels<32>(pkt, obuf); break;
+		case 64: scatter_channels<64>(pkt, obuf); break;
+		default: {
+			for( int chan=0; chan<pkt->nchan; ++chan ) {
+				::memcpy(&obuf[(pkt->src + pkt->nsrc*chan)*chan_nbyte],
+				         &pkt->payload_ptr[chan*chan_nbyte], chan_nbyte);
+			}
+		}
+		}
+	}
+	inline void blank_out_source(uint8_t* data,
+	                             int      src,
+	                             int      nsrc,
+	                             int      nchan,
+	                             int      payload_size,
+	                             int      nseq) {
+		blank_out_channels(data, src, nsrc, nchan, payload_size / nchan, nseq);
+	}
+};
+
+class CHIPSEncoder {
+public:
+	static const size_t header_size = sizeof(chips_hdr_type);
+	inline void operator()(uint8_t* hdr_ptr, uint64_t seq, int src) const {
+		chips_hdr_type* pkt_hdr = (chips_hdr_type*)hdr_ptr;
+		pkt_hdr->roach = src + 1;
+		pkt_hdr->seq   = htobe64(seq + 1);
+	}
+};
+
+class SimpleEncoder {
+public:
+	static const size_t header_size = sizeof(simple_hdr_type);
+	inline void operator()(uint8_t* hdr_ptr, uint64_t seq, int src) const {
+		simple_hdr_type* pkt_hdr = (simple_hdr_type*)hdr_ptr;
+		pkt_hdr->seq = htobe64(seq);
+	}
+};
+
+class GenericEncoder {
+public:
+	static const size_t header_size = sizeof(generic_hdr_type);
+	inline void operator()(uint8_t* hdr_ptr, uint64_t seq, int src) const {
+		generic_hdr_type* pkt_hdr = (generic_hdr_type*)hdr_ptr;
+		pkt_hdr->seq = htobe64(seq);
+		pkt_hdr->src = htons(src);
+	}
+};
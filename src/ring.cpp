@@ -39,6 +39,19 @@ BFstatus bfRingCreate(BFring* ring, BFspace space) {
 	BF_TRY_RETURN_ELSE(*ring = new BFring_impl(space),
 	                   *ring = 0);
 }
+BFstatus bfRingCreateShared(BFring* ring, BFspace space, const char* name,
+                            BFbool hugepages) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(name, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*ring = new BFring_impl(space, name, hugepages),
+	                   *ring = 0);
+}
+BFstatus bfRingAttach(BFring* ring, const char* name) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(name, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*ring = new BFring_impl(name),
+	                   *ring = 0);
+}
 BFstatus bfRingDestroy(BFring ring) {
 	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
 	delete ring;
@@ -323,6 +336,21 @@ BFstatus   bfRingSpanRelease(BFrspan span) {
 	delete span;
 	return BF_STATUS_SUCCESS;
 }
+BFstatus   bfRingSpanReleaseKeep(BFrspan span,
+                                 BFsize  keep_size) {
+	BF_ASSERT(span, BF_STATUS_INVALID_HANDLE);
+	span->set_keep_size(keep_size);
+	delete span;
+	return BF_STATUS_SUCCESS;
+}
+BFstatus   bfRingSpanAvailable(BFrsequence sequence,
+                               BFoffset    offset,
+                               BFsize*     size) {
+	BF_ASSERT(sequence, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(size,     BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*size = sequence->ring()->available_span(sequence, offset),
+	                   *size = 0);
+}
 
 /*
 BFstatus bfRingSpanOpen(BFrspan*   span,
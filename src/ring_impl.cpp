@@ -31,7 +31,7 @@
 
 // Note: Due to potential wrapping, offsets should never be compared using <,<=,>,>=
 //         Always compare positive differences between offsets instead
-//           E.g., offset < tail --> _head-offset > _head-tail
+//           E.g., offset < tail --> _state->head-offset > _state->head-tail
 
 // **TODO: Work out whether/how to do resize inside begin_sequence
 //           ACTUALLY, put this on hold for now (try it out in ring.py first)
@@ -53,6 +53,115 @@
 #include <bifrost/cuda.h>
 #include "cuda.hpp"
 
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <sys/statfs.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <cstring>
+#include <cstdio>
+#include <cstdlib>
+#include <sstream>
+
+// Directory in which the shared-memory segments of process-shared rings
+//   are created.
+#ifndef BF_RING_SHARED_DIR
+#define BF_RING_SHARED_DIR "/dev/shm"
+#endif
+// Default hugetlbfs mount point used for hugepage-backed ring buffers
+//   (overridden by $BIFROST_HUGEPAGE_DIR).
+#ifndef BF_RING_HUGEPAGE_DIR
+#define BF_RING_HUGEPAGE_DIR "/dev/hugepages"
+#endif
+// Max no. sequences that may be resident in a process-shared ring at once
+#ifndef BF_RING_SHARED_MAX_SEQUENCES
+#define BF_RING_SHARED_MAX_SEQUENCES 1024
+#endif
+// Total capacity for the headers of resident sequences in a
+//   process-shared ring.
+#ifndef BF_RING_SHARED_HEADER_CAPACITY
+#define BF_RING_SHARED_HEADER_CAPACITY (4*1024*1024)
+#endif
+#define BF_RING_SHARED_MAX_NAME 256
+#define BF_RING_SHARED_MAX_PATH 4096
+#define BF_RING_SHARED_MAGIC    0x676e69725f6662ull // "bf_ring"
+#define BF_RING_SHARED_VERSION  2
+
+// A sequence as recorded in the log of a process-shared ring
+struct RingSharedSequence {
+	BFoffset index;         // Slot is valid only if this matches
+	BFoffset time_tag;
+	BFsize   nringlet;
+	BFoffset begin;
+	BFoffset end;
+	BFoffset header_offset; // Into RingShared::headers (modulo its size)
+	BFsize   header_size;
+	char     name[BF_RING_SHARED_MAX_NAME];
+};
+
+// The control segment of a process-shared ring
+// Note: The data buffer lives in a separate segment so that it can be
+//         reallocated, which is tracked by buf_generation.
+struct RingShared {
+	enum {
+		MAX_SEQUENCES   = BF_RING_SHARED_MAX_SEQUENCES,
+		HEADER_CAPACITY = BF_RING_SHARED_HEADER_CAPACITY
+	};
+	uint64_t  magic; // Set only once initialisation is complete
+	uint32_t  version;
+	BFspace   space;
+	char      name[BF_RING_SHARED_MAX_NAME];
+	// Directory holding the data buffer segment (e.g., a hugetlbfs mount)
+	char      buf_dir[BF_RING_SHARED_MAX_PATH];
+	RingState state;
+	BFoffset  buf_generation; // 0 means no buffer is allocated
+	BFsize    buf_nbyte;
+	// Resident sequences are [sequence_begin, sequence_end)
+	BFoffset  sequence_begin;
+	BFoffset  sequence_end;
+	// Headers of resident sequences are [header_tail, header_head)
+	BFoffset  header_tail;
+	BFoffset  header_head;
+	RingSharedSequence sequences[MAX_SEQUENCES];
+	char      headers[HEADER_CAPACITY];
+	inline RingSharedSequence& sequence(BFoffset index) {
+		return sequences[index % MAX_SEQUENCES];
+	}
+};
+
+void RingState::init(bool process_shared) {
+	mutex.init(process_shared);
+	read_condition.init(process_shared);
+	write_condition.init(process_shared);
+	write_close_condition.init(process_shared);
+	realloc_condition.init(process_shared);
+	sequence_condition.init(process_shared);
+	ghost_span       = 0;
+	span             = 0;
+	stride           = 0;
+	nringlet         = 0;
+	offset0          = 0;
+	tail             = 0;
+	head             = 0;
+	reserve_head     = 0;
+	ghost_dirty      = false;
+	writing_begun    = false;
+	writing_ended    = false;
+	eod              = 0;
+	nread_open       = 0;
+	nwrite_open      = 0;
+	nrealloc_pending = 0;
+	guarantees.clear();
+}
+void RingState::destroy() {
+	sequence_condition.destroy();
+	realloc_condition.destroy();
+	write_close_condition.destroy();
+	write_condition.destroy();
+	read_condition.destroy();
+	mutex.destroy();
+}
+
 // This implements a lock with the condition that no reads or writes
 //   can be open while it is held.
 class RingReallocLock {
@@ -68,26 +177,24 @@ public:
 	inline RingReallocLock(unique_lock_type& lock,
 	                       BFring_impl*      ring)
 		: _lock(lock), _ring(ring) {
-		++_ring->_nrealloc_pending;
-		_ring->_realloc_condition.wait(_lock, [&]() {
-			return (_ring->_nwrite_open == 0 &&
-			        _ring->_nread_open == 0);
+		++_ring->_state->nrealloc_pending;
+		_ring->_state->realloc_condition.wait(_lock, [&]() {
+			_ring->_sync();
+			return (_ring->_state->nwrite_open == 0 &&
+			        _ring->_state->nread_open == 0);
 		});
 	}
 	inline ~RingReallocLock() {
-		--_ring->_nrealloc_pending;
-		_ring->_read_condition.notify_all();
-		_ring->_write_condition.notify_all();
+		--_ring->_state->nrealloc_pending;
+		_ring->_state->read_condition.notify_all();
+		_ring->_state->write_condition.notify_all();
 	}
 };
 
 BFring_impl::BFring_impl(BFspace space)
-	: _space(space), _buf(nullptr),
-	  _ghost_span(0), _span(0), _stride(0), _nringlet(0), _offset0(0),
-	  _tail(0), _head(0), _reserve_head(0),
-	  _ghost_dirty(false),
-	  _writing_begun(false), _writing_ended(false), _eod(0),
-	  _nread_open(0), _nwrite_open(0), _nrealloc_pending(0) {
+	: _space(space), _buf(nullptr), _state(nullptr),
+	  _shared(nullptr), _shared_owner_pid(0),
+	  _buf_generation(0), _buf_nbyte(0), _sequence_sync_index(0) {
 
 #if defined BF_CUDA_ENABLED && BF_CUDA_ENABLED
 	BF_ASSERT_EXCEPTION(space==BF_SPACE_SYSTEM       ||
@@ -99,34 +206,257 @@ BFring_impl::BFring_impl(BFspace space)
 	BF_ASSERT_EXCEPTION(space==BF_SPACE_SYSTEM,
 	                    BF_STATUS_INVALID_ARGUMENT);
 #endif
+	_state = new RingState();
+	_state->init(false);
+}
+BFring_impl::BFring_impl(BFspace space, const char* name, bool hugepages)
+	: _space(space), _buf(nullptr), _state(nullptr),
+	  _shared(nullptr), _shared_owner_pid(0),
+	  _buf_generation(0), _buf_nbyte(0), _sequence_sync_index(0) {
+	// Note: Only host memory can be shared between processes
+	BF_ASSERT_EXCEPTION(space==BF_SPACE_SYSTEM, BF_STATUS_UNSUPPORTED_SPACE);
+	std::string buf_dir = BF_RING_SHARED_DIR;
+	if( hugepages ) {
+		const char* dir = getenv("BIFROST_HUGEPAGE_DIR");
+		buf_dir = dir ? dir : BF_RING_HUGEPAGE_DIR;
+		// Note: This requires a mounted hugetlbfs with pages reserved
+		BF_ASSERT_EXCEPTION(::access(buf_dir.c_str(), R_OK | W_OK | X_OK) == 0,
+		                    BF_STATUS_UNSUPPORTED);
+	}
+	BF_ASSERT_EXCEPTION(buf_dir.size() < BF_RING_SHARED_MAX_PATH,
+	                    BF_STATUS_INVALID_ARGUMENT);
+	this->_shared_open(name, true, buf_dir.c_str());
+}
+BFring_impl::BFring_impl(const char* name)
+	: _space(BF_SPACE_SYSTEM), _buf(nullptr), _state(nullptr),
+	  _shared(nullptr), _shared_owner_pid(0),
+	  _buf_generation(0), _buf_nbyte(0), _sequence_sync_index(0) {
+	this->_shared_open(name, false);
+}
+void BFring_impl::_shared_open(const char* name, bool create, const char* buf_dir) {
+	BF_ASSERT_EXCEPTION(name, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT_EXCEPTION(*name && !std::strchr(name, '/') &&
+	                    std::strlen(name) < BF_RING_SHARED_MAX_NAME,
+	                    BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT_EXCEPTION(!create ||
+	                    (buf_dir && std::strlen(buf_dir) < BF_RING_SHARED_MAX_PATH),
+	                    BF_STATUS_INVALID_ARGUMENT);
+	std::string path = std::string(BF_RING_SHARED_DIR) + "/bifrost_ring_" + name;
+	int fd = ::open(path.c_str(), create ? (O_RDWR | O_CREAT | O_EXCL) : O_RDWR, 0660);
+	// Note: This fails if the name is already in use (or does not exist)
+	BF_ASSERT_EXCEPTION(fd != -1, BF_STATUS_INVALID_ARGUMENT);
+	bool ok = true;
+	if( create ) {
+		// Note: The new segment is zero-filled
+		ok = (::ftruncate(fd, sizeof(RingShared)) == 0);
+	} else {
+		struct stat info;
+		ok = (::fstat(fd, &info) == 0 &&
+		      (BFsize)info.st_size == sizeof(RingShared));
+	}
+	void* ptr = MAP_FAILED;
+	if( ok ) {
+		ptr = ::mmap(0, sizeof(RingShared), PROT_READ | PROT_WRITE,
+		             MAP_SHARED, fd, 0);
+	}
+	::close(fd);
+	if( ptr == MAP_FAILED ) {
+		if( create ) {
+			::unlink(path.c_str());
+		}
+		BF_ASSERT_EXCEPTION(ok, BF_STATUS_INVALID_STATE);
+		BF_FAIL_EXCEPTION("Mapped ring shared memory", BF_STATUS_MEM_ALLOC_FAILED);
+	}
+	_shared      = (RingShared*)ptr;
+	_shared_path = path;
+	_state       = &_shared->state;
+	if( create ) {
+		_shared_owner_pid = ::getpid();
+		_shared->version  = BF_RING_SHARED_VERSION;
+		_shared->space    = _space;
+		// Note: Lengths were checked above, and snprintf always terminates
+		std::snprintf(_shared->name,    sizeof(_shared->name),    "%s", name);
+		std::snprintf(_shared->buf_dir, sizeof(_shared->buf_dir), "%s", buf_dir);
+		_state->init(true);
+		__sync_synchronize();
+		_shared->magic    = BF_RING_SHARED_MAGIC;
+	} else {
+		// Wait for the creator to finish initialising the segment
+		for( int i=0; i<1000 && _shared->magic != BF_RING_SHARED_MAGIC; ++i ) {
+			::usleep(1000);
+		}
+		__sync_synchronize();
+		if( _shared->magic   != BF_RING_SHARED_MAGIC ||
+		    _shared->version != BF_RING_SHARED_VERSION ) {
+			::munmap(_shared, sizeof(RingShared));
+			_shared = nullptr;
+			BF_FAIL_EXCEPTION("Valid ring shared memory", BF_STATUS_INVALID_STATE);
+		}
+		_space = _shared->space;
+		lock_guard_type lock(_state->mutex);
+		this->_sync_buffer();
+	}
 }
 BFring_impl::~BFring_impl() {
 	// TODO: Should check if anything is still open here?
+	if( _shared ) {
+		if( _buf ) {
+			::munmap(_buf, _buf_nbyte);
+		}
+		// Note: Processes that attached (or were forked) do not remove the
+		//         segments; they just unmap them.
+		if( ::getpid() == _shared_owner_pid ) {
+			if( _shared->buf_generation ) {
+				::unlink(this->_shared_buf_path(_shared->buf_generation).c_str());
+			}
+			::unlink(_shared_path.c_str());
+		}
+		::munmap(_shared, sizeof(RingShared));
+		return;
+	}
 	if( _buf ) {
 		bfFree(_buf, _space);
 	}
+	_state->destroy();
+	delete _state;
+}
+std::string BFring_impl::_shared_buf_path(BFoffset generation) const {
+	std::stringstream ss;
+	ss << _shared->buf_dir << "/bifrost_ring_" << _shared->name << "." << generation;
+	return ss.str();
+}
+BFring_impl::pointer BFring_impl::_shared_alloc(BFsize* nbyte, BFoffset generation) {
+	std::string path = this->_shared_buf_path(generation);
+	int fd = ::open(path.c_str(), O_RDWR | O_CREAT | O_TRUNC, 0660);
+	BF_ASSERT_EXCEPTION(fd != -1, BF_STATUS_MEM_ALLOC_FAILED);
+	// Note: Mappings must be a whole number of pages, which for hugetlbfs
+	//         means huge pages.
+	struct statfs fs_info;
+	if( ::fstatfs(fd, &fs_info) == 0 && fs_info.f_bsize > 0 ) {
+		*nbyte = round_up(*nbyte, (BFsize)fs_info.f_bsize);
+	}
+	// Note: posix_fallocate ensures failure here rather than SIGBUS later if
+	//         there is insufficient space.
+	int ret = ::ftruncate(fd, *nbyte);
+	if( ret == 0 ) {
+		ret = ::posix_fallocate(fd, 0, *nbyte);
+		if( ret == EINVAL || ret == EOPNOTSUPP ) {
+			ret = 0;
+		}
+	}
+	void* ptr = MAP_FAILED;
+	if( ret == 0 ) {
+		ptr = ::mmap(0, *nbyte, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+	}
+	::close(fd);
+	if( ptr == MAP_FAILED ) {
+		::unlink(path.c_str());
+		throw BFexception(BF_STATUS_MEM_ALLOC_FAILED);
+	}
+	return (pointer)ptr;
+}
+void BFring_impl::_shared_free(pointer buf, BFsize nbyte, BFoffset generation) {
+	::munmap(buf, nbyte);
+	// Note: Other processes' mappings remain valid until they remap
+	::unlink(this->_shared_buf_path(generation).c_str());
+}
+void BFring_impl::_sync_buffer() {
+	BFoffset generation = _shared->buf_generation;
+	if( generation == _buf_generation ) {
+		return;
+	}
+	if( _buf ) {
+		::munmap(_buf, _buf_nbyte);
+		_buf = nullptr;
+	}
+	BFsize nbyte = _shared->buf_nbyte;
+	std::string path = this->_shared_buf_path(generation);
+	int fd = ::open(path.c_str(), O_RDWR);
+	BF_ASSERT_EXCEPTION(fd != -1, BF_STATUS_INVALID_STATE);
+	void* ptr = ::mmap(0, nbyte, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+	::close(fd);
+	BF_ASSERT_EXCEPTION(ptr != MAP_FAILED, BF_STATUS_MEM_ALLOC_FAILED);
+	_buf            = (pointer)ptr;
+	_buf_nbyte      = nbyte;
+	_buf_generation = generation;
+}
+void BFring_impl::_sync_sequences() {
+	RingShared* shared = _shared;
+	// Update the ends of sequences that were still open at the last sync
+	// Note: Sequences finish in order, so only a suffix can still be open
+	for( auto it=_sequence_queue.rbegin(); it!=_sequence_queue.rend(); ++it ) {
+		BFsequence_impl* sequence = it->get();
+		if( sequence->is_finished() ) {
+			break;
+		}
+		RingSharedSequence const& record = shared->sequence(sequence->_index);
+		sequence->_end = record.end;
+	}
+	// Add sequences begun by other processes
+	BFoffset index = std::max(_sequence_sync_index, shared->sequence_begin);
+	for( ; index!=shared->sequence_end; ++index ) {
+		RingSharedSequence const& record = shared->sequence(index);
+		BFsequence_sptr sequence(
+			new BFsequence_impl(this, record.name, record.time_tag,
+			                    record.header_size,
+			                    &shared->headers[record.header_offset %
+			                                     RingShared::HEADER_CAPACITY],
+			                    record.nringlet, record.begin));
+		sequence->_index = index;
+		sequence->_end   = record.end;
+		this->_push_sequence(sequence);
+	}
+	_sequence_sync_index = index;
+	// Remove sequences that other processes have pulled off the tail
+	while( !_sequence_queue.empty() &&
+	       _sequence_queue.front()->_index < shared->sequence_begin ) {
+		this->_pop_sequence();
+	}
+}
+void BFring_impl::_push_sequence(BFsequence_sptr sequence) {
+	if( _sequence_queue.size() ) {
+		_sequence_queue.back()->set_next(sequence);
+	}
+	_sequence_queue.push_back(sequence);
+	if( !std::string(sequence->_name).empty() ) {
+		_sequence_map.insert(std::make_pair(sequence->_name,sequence));
+	}
+	if( sequence->_time_tag != BFoffset(-1) ) {
+		_sequence_time_tag_map.insert(std::make_pair(sequence->_time_tag,sequence));
+	}
+}
+void BFring_impl::_pop_sequence() {
+	BFsequence_sptr sequence = _sequence_queue.front();
+	if( !sequence->_name.empty() ) {
+		_sequence_map.erase(sequence->_name);
+	}
+	if( sequence->_time_tag != BFoffset(-1) ) {
+		_sequence_time_tag_map.erase(sequence->_time_tag);
+	}
+	_sequence_queue.pop_front();
 }
 void BFring_impl::resize(BFsize contiguous_span,
                          BFsize total_span,
                          BFsize nringlet) {
-	unique_lock_type lock(_mutex);
+	unique_lock_type lock(_state->mutex);
+	this->_sync();
 	// Check if reallocation is actually necessary
-	if( contiguous_span <= _ghost_span &&
-	    total_span      <= _span &&
-	    nringlet        <= _nringlet) {
+	if( contiguous_span <= _state->ghost_span &&
+	    total_span      <= _state->span &&
+	    nringlet        <= _state->nringlet) {
 		return;
 	}
 	realloc_lock_type realloc_lock(lock, this);
 	// Check if reallocation is still actually necessary
-	if( contiguous_span <= _ghost_span &&
-	    total_span      <= _span &&
-	    nringlet        <= _nringlet) {
+	if( contiguous_span <= _state->ghost_span &&
+	    total_span      <= _state->span &&
+	    nringlet        <= _state->nringlet) {
 		return;
 	}
 	// Perform the reallocation
-	BFsize  new_ghost_span = std::max(contiguous_span, _ghost_span);
-	BFsize  new_span       = std::max(total_span,      _span);
-	BFsize  new_nringlet   = std::max(nringlet,        _nringlet);
+	BFsize  new_ghost_span = std::max(contiguous_span, _state->ghost_span);
+	BFsize  new_span       = std::max(total_span,      _state->span);
+	BFsize  new_nringlet   = std::max(nringlet,        _state->nringlet);
 	//new_ghost_span = round_up(new_ghost_span, bfGetAlignment());
 	//new_span       = round_up(new_span,       bfGetAlignment());
 	new_span = std::max(new_span, bfGetAlignment());
@@ -140,7 +470,8 @@ void BFring_impl::resize(BFsize contiguous_span,
 	BFsize  new_nbyte  = new_stride*new_nringlet;
 	//pointer new_buf    = (pointer)bfMalloc(new_nbyte, _space);
 	//std::cout << "new_buf = " << (void*)new_buf << std::endl; // HACK TESTING
-	pointer new_buf = nullptr;
+	pointer  new_buf = nullptr;
+	BFoffset new_generation = _buf_generation + 1;
 	//std::cout << "contig_span:    " << contiguous_span << std::endl;
 	//std::cout << "total_span:     " << total_span << std::endl;
 	//std::cout << "new_span:       " << new_span << std::endl;
@@ -148,67 +479,84 @@ void BFring_impl::resize(BFsize contiguous_span,
 	//std::cout << "new_nringlet:   " << new_nringlet << std::endl;
 	//std::cout << "new_stride:     " << new_stride << std::endl;
 	//std::cout << "Allocating " << new_nbyte << std::endl;
-	BF_ASSERT_EXCEPTION(bfMalloc((void**)&new_buf, new_nbyte, _space) == BF_STATUS_SUCCESS,
-	                    BF_STATUS_MEM_ALLOC_FAILED);
+	BFsize   new_buf_nbyte = new_nbyte;
+	if( _shared ) {
+		new_buf = this->_shared_alloc(&new_buf_nbyte, new_generation);
+	}
+	else {
+		BF_ASSERT_EXCEPTION(bfMalloc((void**)&new_buf, new_nbyte, _space) == BF_STATUS_SUCCESS,
+		                    BF_STATUS_MEM_ALLOC_FAILED);
+	}
 	
 	if( _buf ) {
 		// Must move existing data and delete old buf
-		if( _buf_offset(_tail) < _buf_offset(_head) ) {
+		if( _buf_offset(_state->tail) < _buf_offset(_state->head) ) {
 			// Copy middle to beginning
 			bfMemcpy2D(new_buf,                   new_stride, _space,
-			           _buf + _buf_offset(_tail),    _stride, _space,
-			           BFoffset(_head - _tail), _nringlet);
-			_offset0 = _tail;
+			           _buf + _buf_offset(_state->tail),    _state->stride, _space,
+			           BFoffset(_state->head - _state->tail), _state->nringlet);
+			_state->offset0 = _state->tail;
 		}
 		else {
 			// Copy beg to beg and end to end, with larger gap between
 			bfMemcpy2D(new_buf, new_stride, _space,
-			           _buf,       _stride, _space,
-			           _buf_offset(_head), _nringlet);
-			bfMemcpy2D(new_buf + (_buf_offset(_tail)+(new_span-_span)), new_stride, _space,
-			           _buf    +  _buf_offset(_tail),                      _stride, _space,
-			           _span - _buf_offset(_tail), _nringlet);
-			_offset0 = _head - _buf_offset(_head); // TODO: Check this for sign/overflow issues
+			           _buf,       _state->stride, _space,
+			           _buf_offset(_state->head), _state->nringlet);
+			bfMemcpy2D(new_buf + (_buf_offset(_state->tail)+(new_span-_state->span)), new_stride, _space,
+			           _buf    +  _buf_offset(_state->tail),                      _state->stride, _space,
+			           _state->span - _buf_offset(_state->tail), _state->nringlet);
+			_state->offset0 = _state->head - _buf_offset(_state->head); // TODO: Check this for sign/overflow issues
 		}
 		// Copy old ghost region to new buffer
 		bfMemcpy2D(new_buf + new_span, new_stride, _space,
-		           _buf    +    _span,    _stride, _space,
-		           _ghost_span, _nringlet);
+		           _buf    +    _state->span,    _state->stride, _space,
+		           _state->ghost_span, _state->nringlet);
 		// Copy the part of the beg corresponding to the extra ghost space
-		bfMemcpy2D(new_buf + new_span + _ghost_span, new_stride, _space,
-		           _buf + _ghost_span,                  _stride, _space,
-		           std::min(new_ghost_span, _span) - _ghost_span, _nringlet);
-		_ghost_dirty = true; // TODO: Is this the right thing to do?
-		bfFree(_buf, _space);
+		bfMemcpy2D(new_buf + new_span + _state->ghost_span, new_stride, _space,
+		           _buf + _state->ghost_span,                  _state->stride, _space,
+		           std::min(new_ghost_span, _state->span) - _state->ghost_span, _state->nringlet);
+		_state->ghost_dirty = true; // TODO: Is this the right thing to do?
+		if( _shared ) {
+			this->_shared_free(_buf, _buf_nbyte, _buf_generation);
+		}
+		else {
+			bfFree(_buf, _space);
+		}
 		bfStreamSynchronize();
 	}
 	_buf        = new_buf;
-	_ghost_span = new_ghost_span;
-	_span       = new_span;
-	_stride     = new_stride;
-	_nringlet   = new_nringlet;
+	_buf_nbyte  = new_buf_nbyte;
+	_buf_generation = new_generation;
+	if( _shared ) {
+		_shared->buf_nbyte      = new_buf_nbyte;
+		_shared->buf_generation = new_generation;
+	}
+	_state->ghost_span = new_ghost_span;
+	_state->span       = new_span;
+	_state->stride     = new_stride;
+	_state->nringlet   = new_nringlet;
 }
 void BFring_impl::begin_writing() {
-	lock_guard_type lock(_mutex);
-	BF_ASSERT_EXCEPTION(!_writing_begun, BF_STATUS_INVALID_STATE);
-	BF_ASSERT_EXCEPTION(!_writing_ended, BF_STATUS_INVALID_STATE);
-	_writing_begun = true;
+	lock_guard_type lock(_state->mutex);
+	BF_ASSERT_EXCEPTION(!_state->writing_begun, BF_STATUS_INVALID_STATE);
+	BF_ASSERT_EXCEPTION(!_state->writing_ended, BF_STATUS_INVALID_STATE);
+	_state->writing_begun = true;
 }
 void BFring_impl::end_writing() {
-	lock_guard_type lock(_mutex);
-	BF_ASSERT_EXCEPTION(_writing_begun && !_writing_ended, BF_STATUS_INVALID_STATE);
-	BF_ASSERT_EXCEPTION(!_nwrite_open,                     BF_STATUS_INVALID_STATE);
+	lock_guard_type lock(_state->mutex);
+	BF_ASSERT_EXCEPTION(_state->writing_begun && !_state->writing_ended, BF_STATUS_INVALID_STATE);
+	BF_ASSERT_EXCEPTION(!_state->nwrite_open,                     BF_STATUS_INVALID_STATE);
 	// TODO: Assert that no sequences are open for writing
-	_writing_ended = true;
-	_eod = _head;
-	_sequence_condition.notify_all();
+	_state->writing_ended = true;
+	_state->eod = _state->head;
+	_state->sequence_condition.notify_all();
 }
 /*
 BFoffset BFring_impl::_wrap_offset(BFoffset offset) const {
-	// Avoid integer overflow by wrapping to a multiple of _span once
+	// Avoid integer overflow by wrapping to a multiple of _state->span once
 	//   the offset passes the half-way point of representable values.
 	BFoffset halfmax = (std::numeric_limits<BFoffset>::max() - 1) / 2 + 1;
-	BFoffset wrap_point = round_up(halfmax, _span);
+	BFoffset wrap_point = round_up(halfmax, _state->span);
 	return (offset >= wrap_point ?
 	        offset - wrap_point,
 	        offset);
@@ -218,10 +566,10 @@ BFoffset BFring_impl::_wrap_offset(BFoffset offset) const {
 //	return _wrap_offset(offset + amount);
 //}
 BFoffset BFring_impl::_buf_offset(BFoffset offset) const {
-	//while( offset < _offset0 ) {
-	//	offset += _span;
+	//while( offset < _state->offset0 ) {
+	//	offset += _state->span;
 	//}
-	return (offset - _offset0) % _span;
+	return (offset - _state->offset0) % _state->span;
 }
 BFring_impl::pointer BFring_impl::_buf_pointer(BFoffset offset) const {
 	return _buf + _buf_offset(offset);
@@ -233,9 +581,9 @@ void BFring_impl::_ghost_write(BFoffset offset, BFsize span) {
 		// The write went into the ghost region, so copy to the ghosted part
 		this->_copy_from_ghost(0, buf_offset_end);
 	}
-	else if( buf_offset_beg < (BFoffset)_ghost_span ) {
+	else if( buf_offset_beg < (BFoffset)_state->ghost_span ) {
 		// The write touched the ghosted front of the buffer
-		_ghost_dirty = true;
+		_state->ghost_dirty = true;
 		// TODO: Implement fine-grained dirty region tracking
 	}
 }
@@ -244,24 +592,24 @@ void BFring_impl::_ghost_read(BFoffset offset, BFsize span) {
 	BFoffset buf_offset_end = _buf_offset(offset + span);
 	if( buf_offset_end < buf_offset_beg ) {
 		// The read will enter the ghost region, so copy from the ghosted part
-		if( _ghost_dirty ) {
-			this->_copy_to_ghost(0, _ghost_span);
-			_ghost_dirty = false;
+		if( _state->ghost_dirty ) {
+			this->_copy_to_ghost(0, _state->ghost_span);
+			_state->ghost_dirty = false;
 		}
 	}
 }
 void BFring_impl::_copy_to_ghost(BFoffset buf_offset, BFsize span) {
 	// Copy from the front of the buffer to the ghost region at the end
-	bfMemcpy2D(_buf + (_span + buf_offset), _stride, _space,
-	           _buf + buf_offset,           _stride, _space,
-	           span, _nringlet);
+	bfMemcpy2D(_buf + (_state->span + buf_offset), _state->stride, _space,
+	           _buf + buf_offset,           _state->stride, _space,
+	           span, _state->nringlet);
 	bfStreamSynchronize();
 }
 void BFring_impl::_copy_from_ghost(BFoffset buf_offset, BFsize span) {
 	// Copy from the ghost region to the front of the buffer
-	bfMemcpy2D(_buf + buf_offset,           _stride, _space,
-	           _buf + (_span + buf_offset), _stride, _space,
-	           span, _nringlet);
+	bfMemcpy2D(_buf + buf_offset,           _state->stride, _space,
+	           _buf + (_state->span + buf_offset), _state->stride, _space,
+	           span, _state->nringlet);
 	bfStreamSynchronize();
 }
 BFsequence_sptr BFring_impl::begin_sequence(const char* name,
@@ -272,85 +620,125 @@ BFsequence_sptr BFring_impl::begin_sequence(const char* name,
                                             BFoffset    offset_from_head) {
 	BF_ASSERT_EXCEPTION(name,                   BF_STATUS_INVALID_ARGUMENT);
 	BF_ASSERT_EXCEPTION(header || !header_size, BF_STATUS_INVALID_ARGUMENT);
-	lock_guard_type lock(_mutex);
-	//unique_lock_type lock(_mutex);
-	BF_ASSERT_EXCEPTION(nringlet <= _nringlet,  BF_STATUS_INVALID_ARGUMENT);
+	lock_guard_type lock(_state->mutex);
+	//unique_lock_type lock(_state->mutex);
+	this->_sync();
+	BF_ASSERT_EXCEPTION(nringlet <= _state->nringlet,  BF_STATUS_INVALID_ARGUMENT);
 	// Cannot have any writes still open
 	// TODO: Removed this since allowing writes independent of sequences
-	//BF_ASSERT_EXCEPTION(_head == _reserve_head, BF_STATUS_INVALID_STATE);
+	//BF_ASSERT_EXCEPTION(_state->head == _state->reserve_head, BF_STATUS_INVALID_STATE);
 	// Cannot have the previous sequence still open
 	BF_ASSERT_EXCEPTION(_sequence_queue.empty() ||
 	                    _sequence_queue.back()->is_finished(),
 	                    BF_STATUS_INVALID_STATE);
-	////_head         = round_up(_head, bfGetAlignment());
+	////_state->head         = round_up(_state->head, bfGetAlignment());
 	//// Note: We force sequences to always begin on a multiple of the
 	////         max contiguous span size.
 	////         ACTUALLY, this complicates the packet-capture use-case
 	////           and doesn't really contribute anything significant.
 	////           It also adds a wait that is otherwise unnecessary
 	////             and wastes space.
-	//_head         = round_up(_head, _ghost_span);
-	//_reserve_head = _head;
-	//this->_pull_tail(lock); // Must be called after updating _reserve_head
-	//BFoffset seq_begin = _reserve_head;
-	BFoffset seq_begin = _head + offset_from_head;
+	//_state->head         = round_up(_state->head, _state->ghost_span);
+	//_state->reserve_head = _state->head;
+	//this->_pull_tail(lock); // Must be called after updating _state->reserve_head
+	//BFoffset seq_begin = _state->reserve_head;
+	BFoffset seq_begin = _state->head + offset_from_head;
 	// Cannot have existing sequence with same name
 	BF_ASSERT_EXCEPTION(_sequence_map.count(name)==0,              BF_STATUS_INVALID_ARGUMENT);
 	BF_ASSERT_EXCEPTION(_sequence_time_tag_map.count(time_tag)==0, BF_STATUS_INVALID_ARGUMENT);
+	if( _shared ) {
+		// Record the sequence in the shared log, from which it is picked up
+		//   by all processes (including this one).
+		this->_shared_begin_sequence(name, time_tag, header_size, header,
+		                             nringlet, seq_begin);
+		_state->sequence_condition.notify_all();
+		return _sequence_queue.back();
+	}
 	BFsequence_sptr sequence(new BFsequence_impl(this, name, time_tag, header_size,
 	                                             header, nringlet, seq_begin));
-	if( _sequence_queue.size() ) {
-		_sequence_queue.back()->set_next(sequence);
-		//_sequence_condition.notify_all();
-	}
-	_sequence_queue.push(sequence);
-	_sequence_condition.notify_all();
-	if( !std::string(name).empty() ) {
-		_sequence_map.insert(std::make_pair(std::string(name),sequence));
+	this->_push_sequence(sequence);
+	_state->sequence_condition.notify_all();
+	return sequence;
+}
+void BFring_impl::_shared_begin_sequence(const char* name,
+                                         BFoffset    time_tag,
+                                         BFsize      header_size,
+                                         const void* header,
+                                         BFsize      nringlet,
+                                         BFoffset    begin) {
+	RingShared* shared = _shared;
+	BF_ASSERT_EXCEPTION(std::strlen(name) < BF_RING_SHARED_MAX_NAME,
+	                    BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT_EXCEPTION(shared->sequence_end - shared->sequence_begin <
+	                    (BFoffset)RingShared::MAX_SEQUENCES,
+	                    BF_STATUS_INSUFFICIENT_STORAGE);
+	// Allocate contiguous space for the header, skipping the remainder of
+	//   the arena if it would otherwise wrap.
+	BFoffset capacity      = RingShared::HEADER_CAPACITY;
+	BFoffset header_offset = shared->header_head;
+	if( header_offset % capacity + header_size > capacity ) {
+		header_offset = round_up(header_offset, capacity);
 	}
-	if( time_tag != BFoffset(-1) ) {
-		_sequence_time_tag_map.insert(std::make_pair(time_tag,sequence));
+	BF_ASSERT_EXCEPTION(header_offset + header_size - shared->header_tail <= capacity,
+	                    BF_STATUS_INSUFFICIENT_STORAGE);
+	if( header_size ) {
+		::memcpy(&shared->headers[header_offset % capacity], header, header_size);
 	}
-	return sequence;
+	shared->header_head = header_offset + header_size;
+	BFoffset index = shared->sequence_end;
+	RingSharedSequence& record = shared->sequence(index);
+	record.index         = index;
+	record.time_tag      = time_tag;
+	record.nringlet      = nringlet;
+	record.begin         = begin;
+	record.end           = BFsequence_impl::BF_SEQUENCE_OPEN;
+	record.header_offset = header_offset;
+	record.header_size   = header_size;
+	std::snprintf(record.name, sizeof(record.name), "%s", name);
+	++shared->sequence_end;
+	this->_sync_sequences();
 }
 void BFring_impl::open_sequence(BFsequence_sptr sequence,
                                 BFbool          guarantee,
                                 BFoffset*       guarantee_begin) {
-	lock_guard_type lock(_mutex);
+	lock_guard_type lock(_state->mutex);
+	this->_sync();
 	// Check that the sequence is still within the ring
 	BF_ASSERT_EXCEPTION(!sequence->is_finished() ||
-	                    BFoffset(_head - sequence->end()) <= BFoffset(_head - _tail),
+	                    BFoffset(_state->head - sequence->end()) <= BFoffset(_state->head - _state->tail),
 	                    BF_STATUS_INVALID_ARGUMENT);
 	if( guarantee ) {
-		if( BFoffset(_head - sequence->begin()) > BFoffset(_head - _tail) ) {
+		if( BFoffset(_state->head - sequence->begin()) > BFoffset(_state->head - _state->tail) ) {
 			// Sequence starts before tail
-			*guarantee_begin = _tail;
+			*guarantee_begin = _state->tail;
 		}
 		else {
 			*guarantee_begin = sequence->begin();
 		}
-		//_guarantees.insert(*guarantee_begin);
+		//_state->guarantees.insert(*guarantee_begin);
 		this->_add_guarantee(*guarantee_begin);
 	}
 }
 void BFring_impl::close_sequence(BFsequence_sptr sequence,
                                  BFbool          guarantee,
                                  BFoffset        guarantee_begin) {
-	lock_guard_type lock(_mutex);
+	lock_guard_type lock(_state->mutex);
 	if( guarantee ) {
 		this->_remove_guarantee(guarantee_begin);
-		//auto iter = _guarantees.find(guarantee_begin);
-		//BF_ASSERT_EXCEPTION(iter != _guarantees.end(), BF_STATUS_INTERNAL_ERROR);
-		//_guarantees.erase(iter);
+		//auto iter = _state->guarantees.find(guarantee_begin);
+		//BF_ASSERT_EXCEPTION(iter != _state->guarantees.end(), BF_STATUS_INTERNAL_ERROR);
+		//_state->guarantees.erase(iter);
 	}
 }
 BFsequence_sptr BFring_impl::get_sequence(const char* name) {
-	lock_guard_type lock(_mutex);
+	lock_guard_type lock(_state->mutex);
+	this->_sync();
 	BF_ASSERT_EXCEPTION(_sequence_map.count(name), BF_STATUS_INVALID_ARGUMENT);
 	return _sequence_map.find(name)->second;
 }
 BFsequence_sptr BFring_impl::get_sequence_at(BFoffset time_tag) {
-	lock_guard_type lock(_mutex);
+	lock_guard_type lock(_state->mutex);
+	this->_sync();
 	// Note: This function only works if time_tag resides within the buffer
 	//         (or in its overwritten history) at the time of the call.
 	//         There is no way for the function to know if a time_tag
@@ -368,26 +756,28 @@ BFsequence_sptr BFring_impl::get_sequence_at(BFoffset time_tag) {
 	return (--iter)->second;
 }
 BFsequence_sptr BFring_impl::get_latest_sequence() {
-	unique_lock_type lock(_mutex);
+	unique_lock_type lock(_state->mutex);
 	// Wait until a sequence has been opened or writing has ended
-	_sequence_condition.wait(lock, [&]() {
-			return !_sequence_queue.empty() || _writing_ended;
+	_state->sequence_condition.wait(lock, [&]() {
+			this->_sync();
+			return !_sequence_queue.empty() || _state->writing_ended;
 		});
-	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() && !_writing_ended), BF_STATUS_INVALID_STATE);
-	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() &&  _writing_ended), BF_STATUS_END_OF_DATA);
-	//BF_ASSERT_EXCEPTION(!_writing_ended, BF_STATUS_END_OF_DATA);
+	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() && !_state->writing_ended), BF_STATUS_INVALID_STATE);
+	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() &&  _state->writing_ended), BF_STATUS_END_OF_DATA);
+	//BF_ASSERT_EXCEPTION(!_state->writing_ended, BF_STATUS_END_OF_DATA);
 	//BF_ASSERT_EXCEPTION(!_sequence_queue.empty(), BF_STATUS_INVALID_STATE);
 	return _sequence_queue.back();
 }
 BFsequence_sptr BFring_impl::get_earliest_sequence() {
-	unique_lock_type lock(_mutex);
+	unique_lock_type lock(_state->mutex);
 	// Wait until a sequence has been opened or writing has ended
-	_sequence_condition.wait(lock, [&]() {
-			return !_sequence_queue.empty() || _writing_ended;
+	_state->sequence_condition.wait(lock, [&]() {
+			this->_sync();
+			return !_sequence_queue.empty() || _state->writing_ended;
 		});
-	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() && !_writing_ended), BF_STATUS_INVALID_STATE);
-	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() &&  _writing_ended), BF_STATUS_END_OF_DATA);
-	//BF_ASSERT_EXCEPTION(!_writing_ended, BF_STATUS_END_OF_DATA);
+	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() && !_state->writing_ended), BF_STATUS_INVALID_STATE);
+	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() &&  _state->writing_ended), BF_STATUS_END_OF_DATA);
+	//BF_ASSERT_EXCEPTION(!_state->writing_ended, BF_STATUS_END_OF_DATA);
 	//BF_ASSERT_EXCEPTION(!_sequence_queue.empty(), BF_STATUS_INVALID_STATE);
 	return _sequence_queue.front();
 }
@@ -406,30 +796,35 @@ BFsequence_impl::BFsequence_impl(BFring      ring,
 	          (const char*)header+header_size),
 	  //_header(new header_type((const char*)header,
 	  //                        (const char*)header+header_size)),
-	  _next(nullptr) {
+	  _next(nullptr), _index(0) {
 	//std::cout << "BEGIN SEQUENCE: " << _begin << std::endl;
 	  }
 void BFsequence_impl::finish(BFoffset offset_from_head) {
-	BFring_impl::lock_guard_type lock(_ring->_mutex);
+	BFring_impl::lock_guard_type lock(_ring->_state->mutex);
+	_ring->_sync();
 	// Cannot have any writes still open
 	// TODO: Changed this since allowing writes independent of sequences
-	//BF_ASSERT_EXCEPTION(_ring->_head == _ring->_reserve_head, BF_STATUS_INVALID_STATE);
+	//BF_ASSERT_EXCEPTION(_ring->_state->head == _ring->_state->reserve_head, BF_STATUS_INVALID_STATE);
 	// Must have the sequence still open
 	BF_ASSERT_EXCEPTION(!_ring->_sequence_queue.empty() &&
 	                    !_ring->_sequence_queue.back()->is_finished(),
 	                    BF_STATUS_INVALID_STATE);
-	_end = _ring->_head + offset_from_head;
-	_ring->_read_condition.notify_all();
+	_end = _ring->_state->head + offset_from_head;
+	if( _ring->_shared ) {
+		_ring->_shared->sequence(_index).end = _end;
+	}
+	_ring->_state->read_condition.notify_all();
 	//std::cout << "END SEQUENCE: " << _end << std::endl;
 }
 void BFsequence_impl::set_next(BFsequence_sptr next) {
 	_next = next;
 }
 BFsequence_sptr BFsequence_impl::get_next() const {
-	BFring_impl::unique_lock_type lock(_ring->_mutex);
+	BFring_impl::unique_lock_type lock(_ring->_state->mutex);
 	// Wait until the next sequence has been opened or writing has ended
-	_ring->_sequence_condition.wait(lock, [&]() {
-			return ((bool)_next) || _ring->_writing_ended;
+	_ring->_state->sequence_condition.wait(lock, [&]() {
+			_ring->_sync();
+			return ((bool)_next) || _ring->_state->writing_ended;
 		});
 	BF_ASSERT_EXCEPTION(_next, BF_STATUS_END_OF_DATA);
 	return _next;
@@ -437,63 +832,68 @@ BFsequence_sptr BFsequence_impl::get_next() const {
 
 void BFring_impl::_pull_tail(unique_lock_type& lock) {
 	// This waits until all guarantees have caught up to the new valid
-	//   buffer region defined by _reserve_head, and then pulls the tail
-	//   along to ensure it is within a distance of _span from _reserve_head.
-	// This must be done whenever _reserve_head is updated.
+	//   buffer region defined by _state->reserve_head, and then pulls the tail
+	//   along to ensure it is within a distance of _state->span from _state->reserve_head.
+	// This must be done whenever _state->reserve_head is updated.
 	
-	// Note: By using _span, this correctly handles ring resizes that occur
+	// Note: By using _state->span, this correctly handles ring resizes that occur
 	//         while waiting on the condition.
 	// TODO: This enables guaranteed reads to "cover for" unguaranteed
 	//         siblings that would be too slow on their own. Is this actually
 	//         a problem, and if so is there any way around it?
-	_write_condition.wait(lock, [&]() {
-			return ((_guarantees.empty() ||
-			         BFoffset(_reserve_head - _get_earliest_guarantee()) <= _span) &&
-			        _nrealloc_pending == 0);
+	_state->write_condition.wait(lock, [&]() {
+			this->_sync();
+			return ((_state->guarantees.empty() ||
+			         BFoffset(_state->reserve_head - _get_earliest_guarantee()) <= _state->span) &&
+			        _state->nrealloc_pending == 0);
 		});
 	
-	BFoffset cur_span = _reserve_head - _tail;
-	if( cur_span > _span ) {
+	BFoffset cur_span = _state->reserve_head - _state->tail;
+	if( cur_span > _state->span ) {
 		// Pull the tail
-		 _tail += cur_span - _span;
+		 _state->tail += cur_span - _state->span;
 		// Delete old sequences
 		while( !_sequence_queue.empty() &&
 		       //_sequence_queue.front()->_end != BFsequence_impl::BF_SEQUENCE_OPEN &&
 		       _sequence_queue.front()->is_finished() &&
-		       //_sequence_queue.front()->_end <= _tail ) {
-		       BFoffset(_head - _sequence_queue.front()->_end) >= BFoffset(_head - _tail) ) {
-			if( !_sequence_queue.front()->_name.empty() ) {
-				_sequence_map.erase(_sequence_queue.front()->_name);
-			}
-			if( _sequence_queue.front()->_time_tag != BFoffset(-1) ) {
-				_sequence_time_tag_map.erase(_sequence_queue.front()->_time_tag);
+		       //_sequence_queue.front()->_end <= _state->tail ) {
+		       BFoffset(_state->head - _sequence_queue.front()->_end) >= BFoffset(_state->head - _state->tail) ) {
+			if( _shared ) {
+				// Release the sequence's slot and header in the shared log
+				BFoffset index = _sequence_queue.front()->_index + 1;
+				_shared->sequence_begin = index;
+				_shared->header_tail = (index == _shared->sequence_end ?
+				                        _shared->header_head :
+				                        _shared->sequence(index).header_offset);
 			}
 			//delete _sequence_queue.front();
-			_sequence_queue.pop();
+			this->_pop_sequence();
 		}
 	}
 }
 
 void BFring_impl::reserve_span(BFsize size, BFoffset* begin, void** data) {
-	unique_lock_type lock(_mutex);
-	BF_ASSERT_EXCEPTION(size <= _ghost_span, BF_STATUS_INVALID_ARGUMENT);
+	unique_lock_type lock(_state->mutex);
+	this->_sync();
+	BF_ASSERT_EXCEPTION(size <= _state->ghost_span, BF_STATUS_INVALID_ARGUMENT);
 	
-	*begin = _reserve_head;
-	_reserve_head += size;
-	this->_pull_tail(lock); // Must be called after updating _reserve_head
+	*begin = _state->reserve_head;
+	_state->reserve_head += size;
+	this->_pull_tail(lock); // Must be called after updating _state->reserve_head
 	/*
-	_write_condition.wait(lock, [&]() {
-			return ((_guarantees.empty() ||
-			         //_guarantees.begin()->first >= _tail) &&
-			         BFoffset(_head - _get_earliest_guarantee()) <= BFoffset(_head - _tail)) &&
-			        _nrealloc_pending == 0);
+	_state->write_condition.wait(lock, [&]() {
+			return ((_state->guarantees.empty() ||
+			         //_state->guarantees.begin()->first >= _state->tail) &&
+			         BFoffset(_state->head - _get_earliest_guarantee()) <= BFoffset(_state->head - _state->tail)) &&
+			        _state->nrealloc_pending == 0);
 		});
 	*/
-	++_nwrite_open;
+	++_state->nwrite_open;
 	*data = _buf_pointer(*begin);
 }
 void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit_size) {
-	unique_lock_type lock(_mutex);
+	unique_lock_type lock(_state->mutex);
+	this->_sync();
 	_ghost_write(begin, commit_size);
 
 	// TODO: Refactor/tidy this function a bit
@@ -501,12 +901,12 @@ void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit
 	// Note: This allows unused open blocks to be 'cancelled' if they
 	//         are closed in reverse order.
 	if( commit_size == 0 &&
-	    _reserve_head == begin + reserve_size ) {
+	    _state->reserve_head == begin + reserve_size ) {
 		// This is the last-opened block so we can 'cancel' it by pulling back
 		//   the reserve head.
-		_reserve_head = begin;
-		--_nwrite_open;
-		_realloc_condition.notify_all();
+		_state->reserve_head = begin;
+		--_state->nwrite_open;
+		_state->realloc_condition.notify_all();
 		return;
 	}
 	
@@ -515,16 +915,17 @@ void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit
 	//         in which case they will block here until they are
 	//         in order (i.e., they will automatically synchronise).
 	//         This is useful for multithreading with OpenMP
-	//std::cout << "(1) begin, head, rhead: " << begin << ", " << _head << ", " << _reserve_head << std::endl;
-	_write_close_condition.wait(lock, [&]() {
-			return (begin == _head);
+	//std::cout << "(1) begin, head, rhead: " << begin << ", " << _state->head << ", " << _state->reserve_head << std::endl;
+	_state->write_close_condition.wait(lock, [&]() {
+			this->_sync();
+			return (begin == _state->head);
 		});
-	_write_close_condition.notify_all();
+	_state->write_close_condition.notify_all();
 	
-	if( _reserve_head == _head + reserve_size ) {
+	if( _state->reserve_head == _state->head + reserve_size ) {
 		// This is the front-most wspan, so we can pull back
 		//   the reserve head if commit_size < size.
-		_reserve_head = _head + commit_size;
+		_state->reserve_head = _state->head + commit_size;
 	}
 	else if( commit_size < reserve_size ) {
 		// There are reservations in front of this one, so we
@@ -534,12 +935,12 @@ void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit
 		//return;
 		BF_ASSERT_EXCEPTION(false, BF_STATUS_INVALID_STATE);
 	}
-	_head += commit_size;
+	_state->head += commit_size;
 	
-	_read_condition.notify_all();
-	--_nwrite_open;
-	_realloc_condition.notify_all();
-	//std::cout << "(2) begin, head, rhead: " << begin << ", " << _head << ", " << _reserve_head << std::endl;
+	_state->read_condition.notify_all();
+	--_state->nwrite_open;
+	_state->realloc_condition.notify_all();
+	//std::cout << "(2) begin, head, rhead: " << begin << ", " << _state->head << ", " << _state->reserve_head << std::endl;
 }
 
 BFwspan_impl::BFwspan_impl(//BFwsequence sequence,
@@ -573,23 +974,27 @@ void BFring_impl::acquire_span(BFrsequence rsequence,
 	// Cannot go back beyond the start of the sequence
 	BF_ASSERT_EXCEPTION(offset >= 0,           BF_STATUS_INVALID_ARGUMENT);
 	BFsequence_sptr sequence = rsequence->sequence();
-	unique_lock_type lock(_mutex);
-	BF_ASSERT_EXCEPTION(*size_ <= _ghost_span, BF_STATUS_INVALID_ARGUMENT);
+	unique_lock_type lock(_state->mutex);
+	this->_sync();
+	BF_ASSERT_EXCEPTION(*size_ <= _state->ghost_span, BF_STATUS_INVALID_ARGUMENT);
 	
 	BFoffset requested_begin = sequence->begin() + offset;
 	BFoffset requested_end   = requested_begin + *size_;
 	
 	if( rsequence->guaranteed() ) {
-		BFoffset guarantee_begin = rsequence->guarantee_begin();
-		if( BFdelta(requested_begin - guarantee_begin) > BFdelta(0) ) {
-			// Move the guarantee forward to the beginning of this span
-			// Note: This is (only) important when reading starts in the middle
-			//         of a sequence (e.g., a triggered dump); otherwise the
-			//         guarantee is probably already here.
-			this->_remove_guarantee(guarantee_begin);
-			this->_add_guarantee(requested_begin);
-			rsequence->set_guarantee_begin(requested_begin);
+		BFoffset new_guarantee_begin = requested_begin;
+		if( sequence->is_finished() &&
+		    BFdelta(new_guarantee_begin - sequence->end()) > BFdelta(0) ) {
+			// Note: The guarantee must not move past the end of the sequence,
+			//         otherwise the start of the next one is left unprotected
+			//         (e.g., when reading off the end of a sequence).
+			new_guarantee_begin = sequence->end();
 		}
+		// Move the guarantee forward to the beginning of this span
+		// Note: This is (only) important when reading starts in the middle
+		//         of a sequence (e.g., a triggered dump) or skips ahead;
+		//         otherwise release_span has already moved it here.
+		this->_advance_guarantee(rsequence, new_guarantee_begin);
 	}
 	
 	// This function returns whatever part of the requested span is available
@@ -600,15 +1005,16 @@ void BFring_impl::acquire_span(BFrsequence rsequence,
 	//   after the end of the sequence.
 	
 	// Wait until requested span has been written or sequence has ended
-	_read_condition.wait(lock, [&]() {
-			return ((BFdelta(_head         - std::max(requested_begin, _tail)) >=
-			         BFdelta(requested_end - std::max(requested_begin, _tail)) ||
+	_state->read_condition.wait(lock, [&]() {
+			this->_sync();
+			return ((BFdelta(_state->head         - std::max(requested_begin, _state->tail)) >=
+			         BFdelta(requested_end - std::max(requested_begin, _state->tail)) ||
 			         sequence->is_finished()) &&
-			        _nrealloc_pending == 0);
+			        _state->nrealloc_pending == 0);
 		});
 	
 	// Constrain to what is in the buffer (i.e., what hasn't been overwritten)
-	BFoffset begin = std::max(requested_begin, _tail);
+	BFoffset begin = std::max(requested_begin, _state->tail);
 	// Note: This results in size being 0 if the requested span has been
 	//         completely overwritten.
 	BFsize   size  = std::max(BFdelta(requested_end - begin), BFdelta(0));
@@ -621,25 +1027,63 @@ void BFring_impl::acquire_span(BFrsequence rsequence,
 	*begin_ = begin;
 	*size_  = size;
 	
-	++_nread_open;
+	++_state->nread_open;
+	rsequence->_open_span_begins.insert(begin);
 	_ghost_read(begin, size);
 	*data_ = _buf_pointer(begin);
 }
 void BFring_impl::release_span(BFrsequence sequence,
                                BFoffset    begin,
-                               BFsize      size) {
-	unique_lock_type lock(_mutex);
+                               BFsize      size,
+                               BFsize      keep_size) {
+	unique_lock_type lock(_state->mutex);
 	
+	std::multiset<BFoffset>::iterator it = sequence->_open_span_begins.find(begin);
+	if( it != sequence->_open_span_begins.end() ) {
+		sequence->_open_span_begins.erase(it);
+	}
 	if( sequence->guaranteed() ) {
-		// Move the guarantee to the end of this span
-		this->_remove_guarantee(sequence->guarantee_begin());
-		BFoffset new_begin = begin + size;
+		// Move the guarantee to the end of this span, so that the writer can
+		//   reuse the space without waiting for the next acquire
+		// Note: Overlapping reads (whose next span starts inside this one)
+		//         keep the last keep_size bytes guaranteed; otherwise they
+		//         could be overwritten before they are read again.
+		keep_size = std::min(keep_size, size);
+		this->_advance_guarantee(sequence, begin + size - keep_size);
+	}
+	--_state->nread_open;
+	_state->realloc_condition.notify_all();
+}
+
+// Moves a reader's guarantee forward (never back) to new_begin, but not past
+//   any of its spans that are still open (e.g., ones whose data are still
+//   being read asynchronously while the next span is acquired).
+// Note: Must be called with the lock held
+void BFring_impl::_advance_guarantee(BFrsequence rsequence,
+                                     BFoffset    new_begin) {
+	if( !rsequence->_open_span_begins.empty() &&
+	    BFdelta(*rsequence->_open_span_begins.begin() - new_begin) < BFdelta(0) ) {
+		new_begin = *rsequence->_open_span_begins.begin();
+	}
+	BFoffset guarantee_begin = rsequence->guarantee_begin();
+	if( BFdelta(new_begin - guarantee_begin) > BFdelta(0) ) {
+		this->_remove_guarantee(guarantee_begin);
 		this->_add_guarantee(new_begin);
-		sequence->set_guarantee_begin(new_begin);
+		rsequence->set_guarantee_begin(new_begin);
 	}
-	
-	--_nread_open;
-	_realloc_condition.notify_all();
+}
+
+BFsize BFring_impl::available_span(BFrsequence rsequence,
+                                   BFoffset    offset) { // Relative to sequence beg
+	BF_ASSERT_EXCEPTION(rsequence, BF_STATUS_INVALID_HANDLE);
+	BFsequence_sptr sequence = rsequence->sequence();
+	lock_guard_type lock(_state->mutex);
+	this->_sync();
+	BFoffset begin = sequence->begin() + offset;
+	BFoffset end   = sequence->is_finished() ? sequence->end() : _state->head;
+	// Note: This does not wait, and so returns 0 if nothing has been written
+	//         beyond offset yet.
+	return std::max(BFdelta(end - begin), BFdelta(0));
 }
 
 BFrspan_impl::BFrspan_impl(BFrsequence sequence,
@@ -647,11 +1091,11 @@ BFrspan_impl::BFrspan_impl(BFrsequence sequence,
                            BFsize      requested_size)
 	: BFspan_impl(sequence->ring(), requested_size),
 	  _sequence(sequence), _begin(0),
-	  _data(nullptr) {
+	  _data(nullptr), _keep_size(0) {
 	BFsize returned_size = requested_size;
 	this->ring()->acquire_span(sequence, offset, &returned_size, &_begin, &_data);
 	this->set_base_size(returned_size);
 }
 BFrspan_impl::~BFrspan_impl() {
-	this->ring()->release_span(_sequence, _begin, this->size());
+	this->ring()->release_span(_sequence, _begin, this->size(), _keep_size);
 }
@@ -43,9 +43,13 @@
 #include <condition_variable>
 #include <string>
 #include <map>
-#include <queue>
+#include <deque>
 #include <set>
 #include <memory>
+#include <algorithm>
+#include <cerrno>
+#include <pthread.h>
+#include <sys/types.h>
 
 class BFsequence_impl;
 class BFspan_impl;
@@ -63,6 +67,158 @@ public:
 	BFsequence_sptr(Y* ptr) : super_type(ptr) {}
 };
 */
+// Mutex and condition variable that may optionally be shared between
+//   processes (i.e., placed in shared memory).
+// Note: These are used instead of std::mutex and std::condition_variable
+//         because the latter cannot be shared between processes.
+class RingMutex {
+	pthread_mutex_t _mutex;
+public:
+	void init(bool process_shared) {
+		pthread_mutexattr_t attr;
+		pthread_mutexattr_init(&attr);
+		if( process_shared ) {
+			pthread_mutexattr_setpshared(&attr, PTHREAD_PROCESS_SHARED);
+			// Allows recovery if a process dies while holding the lock
+			pthread_mutexattr_setrobust(&attr, PTHREAD_MUTEX_ROBUST);
+		}
+		int ret = pthread_mutex_init(&_mutex, &attr);
+		pthread_mutexattr_destroy(&attr);
+		BF_ASSERT_EXCEPTION(ret == 0, BF_STATUS_INTERNAL_ERROR);
+	}
+	void destroy() { pthread_mutex_destroy(&_mutex); }
+	inline void lock() {
+		int ret = pthread_mutex_lock(&_mutex);
+		if( ret == EOWNERDEAD ) {
+			pthread_mutex_consistent(&_mutex);
+		} else if( ret != 0 ) {
+			throw BFexception(BF_STATUS_INTERNAL_ERROR);
+		}
+	}
+	inline void unlock() { pthread_mutex_unlock(&_mutex); }
+	inline pthread_mutex_t* native_handle() { return &_mutex; }
+};
+class RingCondition {
+	pthread_cond_t _cond;
+public:
+	void init(bool process_shared) {
+		pthread_condattr_t attr;
+		pthread_condattr_init(&attr);
+		if( process_shared ) {
+			pthread_condattr_setpshared(&attr, PTHREAD_PROCESS_SHARED);
+		}
+		int ret = pthread_cond_init(&_cond, &attr);
+		pthread_condattr_destroy(&attr);
+		BF_ASSERT_EXCEPTION(ret == 0, BF_STATUS_INTERNAL_ERROR);
+	}
+	void destroy() { pthread_cond_destroy(&_cond); }
+	template<typename Predicate>
+	inline void wait(std::unique_lock<RingMutex>& lock, Predicate pred) {
+		while( !pred() ) {
+			int ret = pthread_cond_wait(&_cond, lock.mutex()->native_handle());
+			if( ret == EOWNERDEAD ) {
+				pthread_mutex_consistent(lock.mutex()->native_handle());
+			}
+		}
+	}
+	inline void notify_all() { pthread_cond_broadcast(&_cond); }
+};
+
+#ifndef BF_RING_MAX_GUARANTEES
+#define BF_RING_MAX_GUARANTEES 256
+#endif
+
+// A fixed-capacity multiset of guaranteed read offsets
+// Note: This avoids heap allocations so that it can live in shared memory
+class RingGuarantees {
+	enum { CAPACITY = BF_RING_MAX_GUARANTEES };
+	BFsize   _size;
+	BFoffset _offsets[CAPACITY];
+	BFsize   _counts[CAPACITY];
+	inline BFsize find(BFoffset offset) const {
+		for( BFsize i=0; i<_size; ++i ) {
+			if( _offsets[i] == offset ) {
+				return i;
+			}
+		}
+		return _size;
+	}
+public:
+	inline void   clear()       { _size = 0; }
+	inline bool   empty() const { return _size == 0; }
+	inline void insert(BFoffset offset) {
+		BFsize i = this->find(offset);
+		if( i == _size ) {
+			BF_ASSERT_EXCEPTION(_size < CAPACITY,
+			                    BF_STATUS_INSUFFICIENT_STORAGE);
+			_offsets[i] = offset;
+			_counts[i]  = 0;
+			++_size;
+		}
+		++_counts[i];
+	}
+	// Returns true if the last instance of offset was removed
+	inline bool remove(BFoffset offset) {
+		BFsize i = this->find(offset);
+		if( i == _size ) {
+			throw BFexception(BF_STATUS_INTERNAL_ERROR);
+		}
+		if( --_counts[i] ) {
+			return false;
+		}
+		--_size;
+		_offsets[i] = _offsets[_size];
+		_counts[i]  = _counts[_size];
+		return true;
+	}
+	inline BFoffset earliest() const {
+		BFoffset ret = _offsets[0];
+		for( BFsize i=1; i<_size; ++i ) {
+			ret = std::min(ret, _offsets[i]);
+		}
+		return ret;
+	}
+};
+
+// The synchronisation primitives and scalar state of a ring
+// Note: This is placed in shared memory for process-shared rings
+struct RingState {
+	RingMutex      mutex;
+	RingCondition  read_condition;
+	RingCondition  write_condition;
+	RingCondition  write_close_condition;
+	RingCondition  realloc_condition;
+	RingCondition  sequence_condition;
+	
+	BFsize         ghost_span;
+	BFsize         span;
+	BFsize         stride;
+	BFsize         nringlet;
+	BFoffset       offset0;
+	
+	BFoffset       tail;
+	BFoffset       head;
+	BFoffset       reserve_head;
+	
+	bool           ghost_dirty;
+	
+	bool           writing_begun;
+	bool           writing_ended;
+	BFoffset       eod;
+	
+	BFsize         nread_open;
+	BFsize         nwrite_open;
+	BFsize         nrealloc_pending;
+	
+	RingGuarantees guarantees;
+	
+	void init(bool process_shared);
+	void destroy();
+};
+
+// Layout of the control segment of a process-shared ring (see ring_impl.cpp)
+struct RingShared;
+
 class BFring_impl {
 	friend class BFsequence_impl;
 	friend class BFrsequence_impl;
@@ -77,46 +233,25 @@ class BFring_impl {
 	typedef uint8_t const* const_pointer;
 	pointer        _buf;
 	
-	BFsize         _ghost_span;
-	BFsize         _span;
-	BFsize         _stride;
-	BFsize         _nringlet;
-	BFoffset       _offset0;
+	RingState*     _state;
 	
-	BFoffset       _tail;
-	BFoffset       _head;
-	BFoffset       _reserve_head;
+	// Process-shared rings only
+	RingShared*    _shared;
+	std::string    _shared_path;
+	pid_t          _shared_owner_pid;
+	BFoffset       _buf_generation;
+	BFsize         _buf_nbyte;
+	BFoffset       _sequence_sync_index;
 	
-	bool           _ghost_dirty;
-	
-	bool     _writing_begun;
-	bool     _writing_ended;
-	BFoffset _eod;
-	
-	typedef std::mutex                   mutex_type;
-	typedef std::lock_guard<std::mutex>  lock_guard_type;
-	typedef std::unique_lock<std::mutex> unique_lock_type;
-	typedef std::condition_variable      condition_type;
+	typedef RingMutex                    mutex_type;
+	typedef std::lock_guard<RingMutex>   lock_guard_type;
+	typedef std::unique_lock<RingMutex>  unique_lock_type;
+	typedef RingCondition                condition_type;
 	typedef RingReallocLock              realloc_lock_type;
-	mutex_type     _mutex;
-	condition_type _read_condition;
-	condition_type _write_condition;
-	condition_type _write_close_condition;
-	condition_type _realloc_condition;
-	condition_type _sequence_condition;
-	
-	BFsize         _nread_open;
-	BFsize         _nwrite_open;
-	BFsize         _nrealloc_pending;
 	
-	std::queue<BFsequence_sptr>           _sequence_queue;
+	std::deque<BFsequence_sptr>           _sequence_queue;
 	std::map<std::string,BFsequence_sptr> _sequence_map;
 	std::map<BFoffset,BFsequence_sptr>    _sequence_time_tag_map;
-	//typedef std::pair<BFoffset,BFsize>          guarantee_value_type;
-	//typedef BFoffset guarantee_value_type;
-	//typedef std::multiset<guarantee_value_type> guarantee_set;
-	typedef std::map<BFoffset,BFsize> guarantee_set; // offset-->count
-	guarantee_set _guarantees;
 	
 	BFoffset _wrap_offset(BFoffset offset) const;
 	//BFoffset _advance_offset(BFoffset offset, BFdelta amount) const;
@@ -128,27 +263,39 @@ class BFring_impl {
 	void _copy_from_ghost(BFoffset buf_offset, BFsize span);
 	void _pull_tail(unique_lock_type& lock);
 	inline void _add_guarantee(BFoffset offset) {
-		auto iter = _guarantees.find(offset);
-		if( iter == _guarantees.end() ) {
-			_guarantees.insert(std::make_pair(offset, 1));
-		}
-		else {
-			++iter->second;
-		}
+		_state->guarantees.insert(offset);
 	}
 	inline void _remove_guarantee(BFoffset offset) {
-		auto iter = _guarantees.find(offset);
-		if( iter == _guarantees.end() ) {
-			throw BFexception(BF_STATUS_INTERNAL_ERROR);
-		}
-		if( !--iter->second ) {
-			_guarantees.erase(iter);
-			_write_condition.notify_all();
+		if( _state->guarantees.remove(offset) ) {
+			_state->write_condition.notify_all();
 		}
 	}
 	inline BFoffset _get_earliest_guarantee() {
-		return _guarantees.begin()->first;
+		return _state->guarantees.earliest();
+	}
+	void _advance_guarantee(BFrsequence rsequence, BFoffset new_begin);
+	// Brings this process's view of a process-shared ring up to date
+	// Note: Must be called with the lock held
+	inline void _sync() {
+		if( _shared ) {
+			this->_sync_buffer();
+			this->_sync_sequences();
+		}
 	}
+	void _sync_buffer();
+	void _sync_sequences();
+	void _shared_open(const char* name, bool create, const char* buf_dir=0);
+	pointer _shared_alloc(BFsize* nbyte, BFoffset generation);
+	void _shared_free(pointer buf, BFsize nbyte, BFoffset generation);
+	void _shared_begin_sequence(const char* name,
+	                            BFoffset    time_tag,
+	                            BFsize      header_size,
+	                            const void* header,
+	                            BFsize      nringlet,
+	                            BFoffset    begin);
+	std::string _shared_buf_path(BFoffset generation) const;
+	void _push_sequence(BFsequence_sptr sequence);
+	void _pop_sequence();
 	void open_sequence(BFsequence_sptr sequence,
 	                   BFbool          guarantee,
 	                   BFoffset*       guarantee_begin);
@@ -162,25 +309,30 @@ class BFring_impl {
 	BFring_impl& operator=(BFring_impl&& )      = delete;
 public:
 	BFring_impl(BFspace space);
+	// Creates a ring whose buffer and state reside in named shared memory
+	BFring_impl(BFspace space, const char* name, bool hugepages=false);
+	// Attaches to a ring created in shared memory by another process
+	explicit BFring_impl(const char* name);
 	~BFring_impl();
 	void resize(BFsize max_contiguous_span,
 	            BFsize max_total_size,
 	            BFsize max_ringlets);
 	inline BFspace space()    const { return _space; }
+	inline bool    is_shared() const { return _shared != nullptr; }
 	//inline BFsize nringlet() const { return _nringlet; }
-	inline void   lock()   { _mutex.lock(); }
-	inline void   unlock() { _mutex.unlock(); }
+	inline void   lock()   { _state->mutex.lock(); this->_sync(); }
+	inline void   unlock() { _state->mutex.unlock(); }
 	inline void*  locked_data()            const { return _buf; }
-	inline BFsize locked_contiguous_span() const { return _ghost_span; }
-	inline BFsize locked_total_span()      const { return _span; }
-	inline BFsize locked_nringlet()        const { return _nringlet; }
-	inline BFsize locked_stride()          const { return _stride; }
+	inline BFsize locked_contiguous_span() const { return _state->ghost_span; }
+	inline BFsize locked_total_span()      const { return _state->span; }
+	inline BFsize locked_nringlet()        const { return _state->nringlet; }
+	inline BFsize locked_stride()          const { return _state->stride; }
 	// TODO: Add getters for debugging/monitoring queries
 	//         such as positions of tail, head etc. in buffer.
 	
 	void begin_writing();
 	void end_writing();
-	inline bool writing_ended() { return _writing_ended; }
+	inline bool writing_ended() { return _state->writing_ended; }
 	
 	BFsequence_sptr begin_sequence(const char* name,
 	                               BFoffset    time_tag,
@@ -204,7 +356,10 @@ public:
 	                  void**      data);
 	void release_span(BFrsequence sequence,
 	                  BFoffset    begin,
-	                  BFsize      size);
+	                  BFsize      size,
+	                  BFsize      keep_size=0);
+	BFsize available_span(BFrsequence sequence,
+	                      BFoffset    offset);
 };
 
 /*
@@ -253,6 +408,8 @@ class BFsequence_impl {
 	//BFsequence_sptr   _next;
 	BFsequence_sptr   _next;
 	BFsize            _readrefcount;
+	// Position in the ring's sequence log (process-shared rings only)
+	BFoffset          _index;
 	// No copy or move
 	//BFsequence_impl(BFsequence_impl const& )            = delete;
 	//BFsequence_impl& operator=(BFsequence_impl const& ) = delete;
@@ -342,6 +499,9 @@ class BFrsequence_impl : public BFsequence_wrapper {
 	BFbool   _guaranteed;
 	BFoffset _guarantee_begin;
 	BFbool   _is_open;
+	// Beginnings of the spans acquired through this sequence that have not
+	//   yet been released
+	std::multiset<BFoffset> _open_span_begins;
 	void set_guarantee_begin(BFoffset b) { _guarantee_begin = b; }
 	//BFrsequence_impl(BFrsequence_impl const& )            = delete;
 	BFrsequence_impl& operator=(BFrsequence_impl const& ) = delete;
@@ -408,11 +568,26 @@ public:
 		//}
 	}
 	inline void increment_to_next() {
-		// TODO: Is it possible/necessary for this to be atomic?
-		//         Only relevant when no rspans are opened (which is a pathological case)?
-		this->close();
-		this->reset_sequence(this->get_next());
+		if( !this->sequence()->is_finished() ) {
+			// Note: The guarantee must not be held while waiting for the
+			//         writer to finish this sequence, otherwise it could
+			//         block the writer.
+			this->close();
+			this->reset_sequence(this->get_next());
+			this->open();
+			return;
+		}
+		// Note: Once this sequence is finished, the guarantee on the next
+		//         sequence is opened before the one on this sequence is
+		//         closed, so that the writer cannot overwrite the start of
+		//         the next sequence in between.
+		BFsequence_sptr next = this->get_next();
+		BFsequence_sptr prev = this->sequence();
+		BFoffset prev_guarantee_begin = _guarantee_begin;
+		_is_open = false;
+		this->reset_sequence(next);
 		this->open();
+		prev->ring()->close_sequence(prev, _guaranteed, prev_guarantee_begin);
 	}
 	inline BFbool   guaranteed()      const { return _guaranteed; }
 	inline BFoffset guarantee_begin() const { return _guarantee_begin; }
@@ -446,12 +621,12 @@ public:
 	inline BFsize     size()     const { return _size; }
 	// Note: This is only safe to read while a span is open (preventing resize)
 	inline BFsize     stride()   const {
-		BFring_impl::lock_guard_type lock(_ring->_mutex);
-		return _ring->_stride;
+		BFring_impl::lock_guard_type lock(_ring->_state->mutex);
+		return _ring->_state->stride;
 	}
 	inline BFsize     nringlet() const {
-		BFring_impl::lock_guard_type lock(_ring->_mutex);
-		return _ring->_nringlet;
+		BFring_impl::lock_guard_type lock(_ring->_state->mutex);
+		return _ring->_state->nringlet;
 	}
 	//inline BFsequence_sptr sequence() const { return _sequence; }
 	//virtual BFsequence_sptr sequence() const = 0;
@@ -487,6 +662,7 @@ class BFrspan_impl : public BFspan_impl {
 	BFrsequence     _sequence;
 	BFoffset        _begin;
 	void*           _data;
+	BFsize          _keep_size;
 	//BFbool          _guaranteed;
 	//void _open_at(BFoffset offset, BFsize size, BFbool guarantee,
 	//              BFring_impl::unique_lock_type& lock);
@@ -507,4 +683,7 @@ public:
 	inline virtual void*           data()     const { return _data; }
 	// Note: This is the offset relative to the beginning of the sequence
 	inline virtual BFoffset        offset()   const { return _begin - _sequence->begin(); }
+	// Sets the no. bytes at the end of the span that remain guaranteed after
+	//   it is released (i.e., that will be read again by an overlapping span)
+	inline void set_keep_size(BFsize keep_size) { _keep_size = keep_size; }
 };
@@ -36,12 +36,17 @@ using bifrost::ring::RingWriter;
 using bifrost::ring::WriteSpan;
 using bifrost::ring::WriteSequence;
 #include "proclog.hpp"
+#include "packet_formats.hpp"
 
-#include <arpa/inet.h>  // For ntohs
-#include <sys/socket.h> // For recvfrom
+#include <sys/socket.h> // For recvmmsg
 
 #include <queue>
+#include <map>
+#include <mutex>
+#include <chrono>
+#include <string>
 #include <memory>
+#include <algorithm>
 #include <stdexcept>
 #include <cstdlib>      // For posix_memalign
 #include <cstring>      // For memcpy, memset
@@ -65,8 +70,6 @@ using bifrost::ring::WriteSequence;
 //#define BF_HWLOC_ENABLED 1
 #endif
 
-#define BF_UNPACK_FACTOR 1
-
 enum {
 	JUMBO_FRAME_SIZE = 9000
 };
@@ -80,6 +83,12 @@ inline T atomic_fetch_and_add(T* dst, T val) {
 	return __sync_fetch_and_add(dst, val); // GCC builtin
 }
 
+inline uint64_t round_up(uint64_t val, uint64_t mult) {
+	return (val == 0 ?
+	        0 :
+	        ((val-1)/mult+1)*mult);
+}
+
 // Wrap-safe comparisons
 inline bool greater_equal(uint64_t a, uint64_t b) { return int64_t(a-b) >= 0; }
 inline bool less_than(    uint64_t a, uint64_t b) { return int64_t(a-b) <  0; }
@@ -175,7 +184,7 @@ public:
 	~AlignedBuffer() {
 		this->free();
 	}
-	inline void swap(AlignedBuffer const& other) {
+	inline void swap(AlignedBuffer& other) {
 		std::swap(_buf,       other._buf);
 		std::swap(_size,      other._size);
 		std::swap(_alignment, other._alignment);
@@ -239,43 +248,89 @@ public:
 	}
 };
 
+// Receives packets in batches of up to batch_npkt with a single recvmmsg
+//   call, handing them out one at a time
 class UDPPacketReceiver {
-	int                    _fd;
-	AlignedBuffer<uint8_t> _buf;
+	int                      _fd;
+	size_t                   _slot_size;
+	AlignedBuffer<uint8_t>   _buf;
+	std::vector<mmsghdr>     _msgs;
+	std::vector<iovec>       _iovecs;
+	std::vector<uint8_t>     _control;
+	int                      _npkt; // No. packets in the current batch
+	int                      _ipkt; // Index of the next packet to hand out
+	uint32_t                 _ndropped;
+	enum { CONTROL_SIZE = CMSG_SPACE(sizeof(uint32_t)) };
+	inline void update_ndropped() {
+		// Note: With SO_RXQ_OVFL, each packet carries the total no. packets
+		//         dropped by the socket so far.
+		msghdr* hdr = &_msgs[_npkt-1].msg_hdr;
+		for( cmsghdr* cmsg=CMSG_FIRSTHDR(hdr); cmsg; cmsg=CMSG_NXTHDR(hdr, cmsg) ) {
+			if( cmsg->cmsg_level == SOL_SOCKET &&
+			    cmsg->cmsg_type  == SO_RXQ_OVFL ) {
+				::memcpy(&_ndropped, CMSG_DATA(cmsg), sizeof(_ndropped));
+				break;
+			}
+		}
+	}
 #if BF_VMA_ENABLED
-	VMAReceiver            _vma;
+	VMAReceiver              _vma;
 #endif
 public:
-	UDPPacketReceiver(int fd, size_t pkt_size_max=JUMBO_FRAME_SIZE)
-		: _fd(fd), _buf(pkt_size_max)
+	UDPPacketReceiver(int fd, size_t pkt_size_max=JUMBO_FRAME_SIZE,
+	                  int batch_npkt=1)
+		// Note: Each slot starts on a cache line to keep payloads aligned
+		: _fd(fd), _slot_size(round_up(pkt_size_max, 64)),
+		  _buf(_slot_size*batch_npkt), _msgs(batch_npkt), _iovecs(batch_npkt),
+		  _control(CONTROL_SIZE*batch_npkt), _npkt(0), _ipkt(0), _ndropped(0)
 #if BF_VMA_ENABLED
 		, _vma(fd)
 #endif
-	{}
+	{
+		::memset(&_msgs[0], 0, _msgs.size()*sizeof(mmsghdr));
+		for( int i=0; i<batch_npkt; ++i ) {
+			_iovecs[i].iov_base = &_buf[i*_slot_size];
+			_iovecs[i].iov_len  = _slot_size;
+			_msgs[i].msg_hdr.msg_iov    = &_iovecs[i];
+			_msgs[i].msg_hdr.msg_iovlen = 1;
+		}
+		// Enable reporting of packets dropped due to a full socket buffer
+		// Note: This is not supported on all platforms, in which case no
+		//         drops are reported.
+		int enable = 1;
+		::setsockopt(_fd, SOL_SOCKET, SO_RXQ_OVFL, &enable, sizeof(enable));
+	}
+	// Returns the no. packets dropped by the socket so far
+	inline size_t ndropped() const { return _ndropped; }
+	// Returns the size of the next packet, or -1 on error (see errno)
 	inline int recv_packet(uint8_t** pkt_ptr, int flags=0) {
 #if BF_VMA_ENABLED
 		if( _vma ) {
 			*pkt_ptr = 0;
-			return _vma.recv_packet(&_buf[0], _buf.size(), pkt_ptr, flags);
-		} else {
-#endif
-			*pkt_ptr = &_buf[0];
-			return ::recvfrom(_fd, &_buf[0], _buf.size(), flags, 0, 0);
-#if BF_VMA_ENABLED
+			return _vma.recv_packet(&_buf[0], _slot_size, pkt_ptr, flags);
 		}
 #endif
+		if( _ipkt == _npkt ) {
+			// Note: This blocks (up to the socket timeout) for the first
+			//         packet only, and then takes whatever else is queued.
+			_ipkt = 0;
+			for( int i=0; i<(int)_msgs.size(); ++i ) {
+				_msgs[i].msg_hdr.msg_control    = &_control[i*CONTROL_SIZE];
+				_msgs[i].msg_hdr.msg_controllen = CONTROL_SIZE;
+			}
+			_npkt = ::recvmmsg(_fd, &_msgs[0], _msgs.size(),
+			                   flags | MSG_WAITFORONE, 0);
+			if( _npkt <= 0 ) {
+				_npkt = 0;
+				return -1;
+			}
+			this->update_ndropped();
+		}
+		*pkt_ptr = &_buf[_ipkt*_slot_size];
+		return _msgs[_ipkt++].msg_len;
 	}
 };
 
-struct PacketDesc {
-	uint64_t       seq;
-	int            nsrc;
-	int            src;
-	int            nchan;
-	int            chan0;
-	int            payload_size;
-	const uint8_t* payload_ptr;
-};
 struct PacketStats {
 	size_t ninvalid;
 	size_t ninvalid_bytes;
@@ -298,8 +353,10 @@ public:
 		CAPTURE_INTERRUPTED = 1 << 2,
 		CAPTURE_ERROR       = 1 << 3
 	};
-	UDPCaptureThread(int fd, int nsrc, int core=0, size_t pkt_size_max=9000)
-		: BoundThread(core), _udp(fd, pkt_size_max), _src_stats(nsrc),
+	UDPCaptureThread(int fd, int nsrc, int core=0, size_t pkt_size_max=9000,
+	                 int batch_npkt=1)
+		: BoundThread(core), _udp(fd, pkt_size_max, batch_npkt),
+		  _src_stats(nsrc),
 		  _have_pkt(false) {
 		this->reset_stats();
 	}
@@ -324,7 +381,7 @@ public:
 			if( !_have_pkt ) {
 				uint8_t* pkt_ptr;
 				int pkt_size = _udp.recv_packet(&pkt_ptr);
-				if( pkt_size <= 0 ) {
+				if( pkt_size < 0 ) {
 					if( errno == EAGAIN || errno == EWOULDBLOCK ) {
 						ret = CAPTURE_TIMEOUT; // Timed out
 					} else if( errno == EINTR ) {
@@ -372,6 +429,7 @@ public:
 	inline const PacketDesc* get_last_packet() const {
 		return _have_pkt ? &_pkt : NULL;
 	}
+	inline size_t get_ndropped() const { return _udp.ndropped(); }
 	inline const PacketStats* get_stats() const { return &_stats; }
 	inline const PacketStats* get_stats(int src) const { return &_src_stats[src]; }
 	inline void reset_stats() {
@@ -380,161 +438,14 @@ public:
 	}
 };
 
-#pragma pack(1)
-struct chips_hdr_type {
-	uint8_t  roach;    // Note: 1-based
-	uint8_t  gbe;      // (AKA tuning)
-	uint8_t  nchan;    // 109
-	uint8_t  nsubband; // 11
-	uint8_t  subband;  // 0-11
-	uint8_t  nroach;   // 16
-	// Note: Big endian
-	uint16_t chan0;    // First chan in packet
-	uint64_t seq;      // Note: 1-based
-};
-
-class CHIPSDecoder {
-	// TODO: See if can remove these once firmware supports per-GbE nroach
-	int _nsrc;
-	int _src0;
-	inline bool valid_packet(const PacketDesc* pkt) const {
-		return (pkt->seq   >= 0 &&
-		        pkt->src   >= 0 && pkt->src < _nsrc &&
-		        pkt->chan0 >= 0);
-	}
-public:
-	CHIPSDecoder(int nsrc, int src0) : _nsrc(nsrc), _src0(src0) {}
-	inline bool operator()(const uint8_t* pkt_ptr,
-	                       int            pkt_size,
-	                       PacketDesc*    pkt) const {
-		if( pkt_size < (int)sizeof(chips_hdr_type) ) {
-			return false;
-		}
-		const chips_hdr_type* pkt_hdr  = (chips_hdr_type*)pkt_ptr;
-		const uint8_t*        pkt_pld  = pkt_ptr  + sizeof(chips_hdr_type);
-		int                   pld_size = pkt_size - sizeof(chips_hdr_type);
-		pkt->seq   = be64toh(pkt_hdr->seq)  - 1;
-		//pkt->nsrc  =         pkt_hdr->nroach;
-		pkt->nsrc  =         _nsrc;
-		pkt->src   =        (pkt_hdr->roach - 1) - _src0;
-		pkt->nchan =         pkt_hdr->nchan;
-		pkt->chan0 =   ntohs(pkt_hdr->chan0);
-		pkt->payload_size = pld_size;
-		pkt->payload_ptr  = pkt_pld;
-		return this->valid_packet(pkt);
-	}
-};
-
-struct __attribute__((aligned(32))) aligned256_type {
-	uint8_t data[32];
-};
-struct __attribute__((aligned(64))) aligned512_type {
-	uint8_t data[64];
-};
-
-class CHIPSProcessor8bit {
-public:
-	inline void operator()(const PacketDesc* pkt,
-	                       uint64_t          seq0,
-	                       uint64_t          nseq_per_obuf,
-	                       int               nbuf,
-	                       uint8_t*          obufs[],
-	                       size_t            ngood_bytes[],
-	                       size_t*           src_ngood_bytes[]) {
-		enum {
-			PKT_NINPUT = 32,
-			PKT_NBIT   = 4
-		};
-		int    obuf_idx = ((pkt->seq - seq0 >= 1*nseq_per_obuf) +
-		                   (pkt->seq - seq0 >= 2*nseq_per_obuf));
-		size_t obuf_seq0 = seq0 + obuf_idx*nseq_per_obuf;
-		size_t nbyte = pkt->payload_size * BF_UNPACK_FACTOR;
-		ngood_bytes[obuf_idx]               += nbyte;
-		src_ngood_bytes[obuf_idx][pkt->src] += nbyte;
-		// **CHANGED RECENTLY
-		int payload_size = pkt->payload_size;//pkt->nchan*(PKT_NINPUT*2*PKT_NBIT/8);
-		
-		size_t obuf_offset = (pkt->seq-obuf_seq0)*pkt->nsrc*payload_size;
-		typedef aligned256_type itype;
-		typedef aligned256_type otype;
-		
-		obuf_offset *= BF_UNPACK_FACTOR;
-		
-		// Note: Using these SSE types allows the compiler to use SSE instructions
-		//         However, they require aligned memory (otherwise segfault)
-		itype const* __restrict__ in  = (itype const*)pkt->payload_ptr;
-		otype*       __restrict__ out = (otype*      )&obufs[obuf_idx][obuf_offset];
-		
-		int chan = 0;
-		//cout << pkt->src << ", " << pkt->nsrc << endl;
-		//cout << pkt->nchan << endl;
-		/*
-		  // HACK TESTING disabled
-		for( ; chan<pkt->nchan/4*4; chan+=4 ) {
-			__m128i tmp0 = ((__m128i*)&in[chan])[0];
-			__m128i tmp1 = ((__m128i*)&in[chan])[1];
-			__m128i tmp2 = ((__m128i*)&in[chan+1])[0];
-			__m128i tmp3 = ((__m128i*)&in[chan+1])[1];
-			__m128i tmp4 = ((__m128i*)&in[chan+2])[0];
-			__m128i tmp5 = ((__m128i*)&in[chan+2])[1];
-			__m128i tmp6 = ((__m128i*)&in[chan+3])[0];
-			__m128i tmp7 = ((__m128i*)&in[chan+3])[1];
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*chan])[0], tmp0);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*chan])[1], tmp1);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*(chan+1)])[0], tmp2);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*(chan+1)])[1], tmp3);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*(chan+2)])[0], tmp4);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*(chan+2)])[1], tmp5);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*(chan+3)])[0], tmp6);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*(chan+3)])[1], tmp7);
-		}
-		*/
-		//for( ; chan<pkt->nchan; ++chan ) {
-		/*
-		for( ; chan<10; ++chan ) { // HACK TESTING
-			__m128i tmp0 = ((__m128i*)&in[chan])[0];
-			__m128i tmp1 = ((__m128i*)&in[chan])[1];
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*chan])[0], tmp0);
-			_mm_store_si128(&((__m128i*)&out[pkt->src + pkt->nsrc*chan])[1], tmp1);
-		}
-		*/
-		//if( pkt->src < 8 ) { // HACK TESTING
-		//for( ; chan<32; ++chan ) { // HACK TESTING
-		for( ; chan<pkt->nchan; ++chan ) { // HACK TESTING
-			out[pkt->src + pkt->nsrc*chan] = in[chan];
-			//::memset(
-		}
-		//}
-	}
-	inline void blank_out_source(uint8_t* data,
-	                             int      src,
-	                             int      nsrc,
-	                             int      nchan,
-	                             int      nseq) {
-		typedef aligned256_type otype;
-		otype* __restrict__ aligned_data = (otype*)data;
-		for( int t=0; t<nseq; ++t ) {
-			for( int c=0; c<nchan; ++c ) {
-				::memset(&aligned_data[src + nsrc*(c + nchan*t)],
-				         0, sizeof(otype));
-			}
-		}
-	}
-};
-
-inline uint64_t round_up(uint64_t val, uint64_t mult) {
-	return (val == 0 ?
-	        0 :
-	        ((val-1)/mult+1)*mult);
-}
 inline uint64_t round_nearest(uint64_t val, uint64_t mult) {
 	return (2*val/mult+1)/2*mult;
 }
 
 class BFudpcapture_impl {
+protected:
 	UDPCaptureThread   _capture;
-	CHIPSDecoder       _decoder;
-	CHIPSProcessor8bit _processor;
+private:
 	ProcLog            _type_log;
 	ProcLog            _size_log;
 	ProcLog            _chan_log;
@@ -559,6 +470,20 @@ class BFudpcapture_impl {
 	std::shared_ptr<WriteSequence>          _sequence;
 	size_t _ngood_bytes;
 	size_t _nmissing_bytes;
+	size_t _nblanked;
+	double _reserve_time;
+	std::vector<size_t> _src_ngood_bytes;
+	std::vector<size_t> _src_nmissing_bytes;
+	std::vector<size_t> _src_nblanked;
+	
+	typedef std::chrono::steady_clock clock_type;
+	enum { STATS_LOG_INTERVAL_MS = 1000 };
+	// Note: The snapshot is what other threads see (see get_stats)
+	std::mutex                      _stats_mutex;
+	BFudpcapture_stats              _stats_snapshot;
+	std::vector<BFudpcapture_stats> _src_stats_snapshot;
+	clock_type::time_point          _stats_log_time;
+	size_t                          _stats_log_nvalid_bytes;
 	
 	inline size_t bufsize(int payload_size=-1) {
 		if( payload_size == -1 ) {
@@ -570,8 +495,10 @@ class BFudpcapture_impl {
 		_buf_ngood_bytes.push(0);
 		_buf_src_ngood_bytes.push(std::vector<size_t>(_nsrc, 0));
 		size_t size = this->bufsize();
+		clock_type::time_point t0 = clock_type::now();
 		// TODO: Can make this simpler?
 		_bufs.push(std::shared_ptr<WriteSpan>(new bifrost::ring::WriteSpan(_oring, size)));
+		_reserve_time += std::chrono::duration<double>(clock_type::now() - t0).count();
 	}
 	inline void commit_buf() {
 		size_t expected_bytes = _bufs.front()->size();
@@ -580,23 +507,30 @@ class BFudpcapture_impl {
 			// TODO: This assumes all sources contribute equally; should really
 			//         allow non-uniform partitioning.
 			size_t src_expected_bytes = expected_bytes / _nsrc;
-			size_t src_ngood_bytes    = _buf_src_ngood_bytes.front()[src];
+			// Note: Duplicated packets are counted more than once
+			size_t src_ngood_bytes    = std::min(_buf_src_ngood_bytes.front()[src],
+			                                     src_expected_bytes);
 			size_t src_nmissing_bytes = src_expected_bytes - src_ngood_bytes;
+			_src_ngood_bytes[src]    += src_ngood_bytes;
+			_src_nmissing_bytes[src] += src_nmissing_bytes;
 			// Detect >50% missing data from this source
 			if( src_nmissing_bytes > src_ngood_bytes ) {
+				++_nblanked;
+				++_src_nblanked[src];
 				// Zero-out this source's contribution to the buffer
 				uint8_t* data = (uint8_t*)_bufs.front()->data();
-				_processor.blank_out_source(data, src, _nsrc,
-				                            _nchan, _nseq_per_buf);
+				this->blank_out_source(data, src, _nsrc, _nchan,
+				                       _payload_size, _nseq_per_buf);
 			}
 		}
 		_buf_src_ngood_bytes.pop();
 		
-		_ngood_bytes    += _buf_ngood_bytes.front();
+		size_t ngood_bytes = std::min(_buf_ngood_bytes.front(), expected_bytes);
+		_ngood_bytes    += ngood_bytes;
 		//_nmissing_bytes += _bufs.front()->size() - _buf_ngood_bytes.front();
 		//// HACK TESTING 15/16 correction for missing roach11
 		//_nmissing_bytes += _bufs.front()->size()*15/16 - _buf_ngood_bytes.front();
-		_nmissing_bytes += expected_bytes - _buf_ngood_bytes.front();
+		_nmissing_bytes += expected_bytes - ngood_bytes;
 		_buf_ngood_bytes.pop();
 		
 		_bufs.front()->commit();
@@ -634,17 +568,93 @@ class BFudpcapture_impl {
 	inline void end_sequence() {
 		_sequence.reset(); // Note: This is releasing the shared_ptr
 	}
+	inline void fill_stats(BFudpcapture_stats* stats,
+	                       PacketStats const*  pkt_stats) {
+		stats->nvalid         = pkt_stats->nvalid;
+		stats->nvalid_bytes   = pkt_stats->nvalid_bytes;
+		stats->nlate          = pkt_stats->nlate;
+		stats->nlate_bytes    = pkt_stats->nlate_bytes;
+		stats->ninvalid       = pkt_stats->ninvalid;
+		stats->ninvalid_bytes = pkt_stats->ninvalid_bytes;
+	}
+	inline void update_stats(bool force_log=false) {
+		{
+			std::lock_guard<std::mutex> lock(_stats_mutex);
+			this->fill_stats(&_stats_snapshot, _capture.get_stats());
+			_stats_snapshot.ndropped       = _capture.get_ndropped();
+			_stats_snapshot.ngood_bytes    = _ngood_bytes;
+			_stats_snapshot.nmissing_bytes = _nmissing_bytes;
+			_stats_snapshot.nblanked       = _nblanked;
+			_stats_snapshot.reserve_time   = _reserve_time;
+			for( int src=0; src<_nsrc; ++src ) {
+				BFudpcapture_stats* src_stats = &_src_stats_snapshot[src];
+				this->fill_stats(src_stats, _capture.get_stats(src));
+				src_stats->ngood_bytes    = _src_ngood_bytes[src];
+				src_stats->nmissing_bytes = _src_nmissing_bytes[src];
+				src_stats->nblanked       = _src_nblanked[src];
+			}
+		}
+		clock_type::time_point now = clock_type::now();
+		double dt = std::chrono::duration<double>(now - _stats_log_time).count();
+		if( force_log || dt*1000 >= STATS_LOG_INTERVAL_MS ) {
+			this->log_stats(dt);
+			_stats_log_time = now;
+			_stats_log_nvalid_bytes = _stats_snapshot.nvalid_bytes;
+		}
+	}
+	inline void log_stats(double dt) {
+		BFudpcapture_stats const& stats = _stats_snapshot;
+		double rate = (stats.nvalid_bytes - _stats_log_nvalid_bytes) / dt;
+		movable_ofstream_WAR out = _stat_log.update();
+		out << "ngood_bytes    : " << stats.ngood_bytes << "\n"
+		    << "nmissing_bytes : " << stats.nmissing_bytes << "\n"
+		    << "ninvalid       : " << stats.ninvalid << "\n"
+		    << "ninvalid_bytes : " << stats.ninvalid_bytes << "\n"
+		    << "nlate          : " << stats.nlate << "\n"
+		    << "nlate_bytes    : " << stats.nlate_bytes << "\n"
+		    << "nvalid         : " << stats.nvalid << "\n"
+		    << "nvalid_bytes   : " << stats.nvalid_bytes << "\n"
+		    << "ndropped       : " << stats.ndropped << "\n"
+		    << "nblanked       : " << stats.nblanked << "\n"
+		    << "reserve_time   : " << stats.reserve_time << "\n"
+		    << "recv_rate      : " << rate << "\n";
+		// Per-source loss (the fraction of bytes committed without data)
+		for( int src=0; src<_nsrc; ++src ) {
+			BFudpcapture_stats const& src_stats = _src_stats_snapshot[src];
+			size_t nbyte = src_stats.ngood_bytes + src_stats.nmissing_bytes;
+			out << "src" << src << "_nvalid   : " << src_stats.nvalid << "\n"
+			    << "src" << src << "_nlate    : " << src_stats.nlate << "\n"
+			    << "src" << src << "_nblanked : " << src_stats.nblanked << "\n"
+			    << "src" << src << "_loss     : "
+			    << (nbyte ? double(src_stats.nmissing_bytes) / nbyte : 0.) << "\n";
+		}
+	}
+	// Captures packets into the output buffers using the packet format's
+	//   decoder and processor (see UDPCaptureThread::run)
+	virtual int capture(uint64_t seq_beg,
+	                    uint64_t nseq_per_obuf,
+	                    int      nbuf,
+	                    uint8_t* obufs[],
+	                    size_t*  ngood_bytes[],
+	                    size_t*  src_ngood_bytes[]) = 0;
+	virtual void blank_out_source(uint8_t* data,
+	                              int      src,
+	                              int      nsrc,
+	                              int      nchan,
+	                              int      payload_size,
+	                              int      nseq) = 0;
 public:
-	inline BFudpcapture_impl(int    fd,
+	inline BFudpcapture_impl(std::string format,
+	           int    fd,
 	           BFring ring,
 	           int    nsrc,
-	           int    src0,
 	           int    max_payload_size,
 	           int    buffer_ntime,
 	           int    slot_ntime,
 	           BFudpcapture_sequence_callback sequence_callback,
-	           int    core)
-		: _capture(fd, nsrc, core), _decoder(nsrc, src0), _processor(),
+	           int    core,
+	           int    batch_npkt)
+		: _capture(fd, nsrc, core, JUMBO_FRAME_SIZE, batch_npkt),
 		  _type_log("udp_capture/type"),
 		  _size_log("udp_capture/sizes"),
 		  _chan_log("udp_capture/chans"),
@@ -654,18 +664,24 @@ public:
 		  _sequence_callback(sequence_callback),
 		  _ring(ring), _oring(_ring),
 		  // TODO: Add reset method for stats
-		  _ngood_bytes(0), _nmissing_bytes(0) {
+		  _ngood_bytes(0), _nmissing_bytes(0), _nblanked(0), _reserve_time(0),
+		  _src_ngood_bytes(nsrc, 0), _src_nmissing_bytes(nsrc, 0),
+		  _src_nblanked(nsrc, 0), _src_stats_snapshot(nsrc),
+		  _stats_log_time(clock_type::now()), _stats_log_nvalid_bytes(0) {
+		::memset(&_stats_snapshot, 0, sizeof(_stats_snapshot));
+		::memset(&_src_stats_snapshot[0], 0, nsrc*sizeof(BFudpcapture_stats));
 		size_t contig_span  = this->bufsize(max_payload_size);
 		// Note: 2 write bufs may be open for writing at one time
 		size_t total_span   = contig_span * 4;
 		size_t nringlet_max = 1;
 		_ring.resize(contig_span, total_span, nringlet_max);
-		_type_log.update("type : %s", "chips");
+		_type_log.update("type : %s", format.c_str());
 		_size_log.update("nsrc         : %i\n"
 		                 "nseq_per_buf : %i\n"
 		                 "slot_ntime   : %i\n",
 		                 _nsrc, _nseq_per_buf, _slot_ntime);
 	}
+	virtual ~BFudpcapture_impl() {}
 	inline void flush() {
 		while( _bufs.size() ) {
 			this->commit_buf();
@@ -673,6 +689,7 @@ public:
 		if( _sequence ) {
 			this->end_sequence();
 		}
+		this->update_stats(true);
 	}
 	inline void end_writing() {
 		this->flush();
@@ -692,28 +709,17 @@ public:
 		src_ngood_bytes_ptrs[0] = _buf_src_ngood_bytes.size() > 0 ? &_buf_src_ngood_bytes.front()[0] : NULL;
 		src_ngood_bytes_ptrs[1] = _buf_src_ngood_bytes.size() > 1 ? &_buf_src_ngood_bytes.back()[0]  : NULL;
 		
-		int state = _capture.run(_seq,
-		                         _nseq_per_buf,
-		                         _bufs.size(),
-		                         buf_ptrs,
-		                         ngood_bytes_ptrs,
-		                         src_ngood_bytes_ptrs,
-		                         &_decoder,
-		                         &_processor);
+		int state = this->capture(_seq,
+		                          _nseq_per_buf,
+		                          _bufs.size(),
+		                          buf_ptrs,
+		                          ngood_bytes_ptrs,
+		                          src_ngood_bytes_ptrs);
 		if( state & UDPCaptureThread::CAPTURE_ERROR ) {
 			return BF_CAPTURE_ERROR;
 		} else if( state & UDPCaptureThread::CAPTURE_INTERRUPTED ) {
 			return BF_CAPTURE_INTERRUPTED;
 		}
-		const PacketStats* stats = _capture.get_stats();
-		_stat_log.update() << "ngood_bytes    : " << _ngood_bytes << "\n"
-		                   << "nmissing_bytes : " << _nmissing_bytes << "\n"
-		                   << "ninvalid       : " << stats->ninvalid << "\n"
-		                   << "ninvalid_bytes : " << stats->ninvalid_bytes << "\n"
-		                   << "nlate          : " << stats->nlate << "\n"
-		                   << "nlate_bytes    : " << stats->nlate_bytes << "\n"
-		                   << "nvalid         : " << stats->nvalid << "\n"
-		                   << "nvalid_bytes   : " << stats->nvalid_bytes << "\n";
 		
 		BFudpcapture_status ret;
 		bool was_active = _active;
@@ -770,10 +776,98 @@ public:
 				ret = BF_CAPTURE_NO_DATA;
 			}
 		}
+		this->update_stats();
 		return ret;
 	}
+	inline void get_stats(int src, BFudpcapture_stats* stats) {
+		std::lock_guard<std::mutex> lock(_stats_mutex);
+		*stats = (src < 0) ? _stats_snapshot : _src_stats_snapshot[src];
+	}
+	inline int nsrc() const { return _nsrc; }
 };
 
+// Binds a packet format's decoder and processor into the capture loop
+template<class PacketDecoder, class PacketProcessor>
+class UDPCaptureFormat : public BFudpcapture_impl {
+	PacketDecoder   _decoder;
+	PacketProcessor _processor;
+	int capture(uint64_t seq_beg,
+	            uint64_t nseq_per_obuf,
+	            int      nbuf,
+	            uint8_t* obufs[],
+	            size_t*  ngood_bytes[],
+	            size_t*  src_ngood_bytes[]) {
+		return _capture.run(seq_beg, nseq_per_obuf, nbuf, obufs,
+		                    ngood_bytes, src_ngood_bytes,
+		                    &_decoder, &_processor);
+	}
+	void blank_out_source(uint8_t* data,
+	                      int      src,
+	                      int      nsrc,
+	                      int      nchan,
+	                      int      payload_size,
+	                      int      nseq) {
+		_processor.blank_out_source(data, src, nsrc, nchan, payload_size, nseq);
+	}
+public:
+	UDPCaptureFormat(std::string format,
+	                 int    fd,
+	                 BFring ring,
+	                 int    nsrc,
+	                 int    src0,
+	                 int    max_payload_size,
+	                 int    buffer_ntime,
+	                 int    slot_ntime,
+	                 BFudpcapture_sequence_callback sequence_callback,
+	                 int    core,
+	                 int    batch_npkt)
+		: BFudpcapture_impl(format, fd, ring, nsrc, max_payload_size,
+		                    buffer_ntime, slot_ntime, sequence_callback,
+		                    core, batch_npkt),
+		  _decoder(nsrc, src0), _processor() {}
+};
+
+typedef BFudpcapture_impl* (*UDPCaptureFactory)(std::string format,
+                                                int    fd,
+                                                BFring ring,
+                                                int    nsrc,
+                                                int    src0,
+                                                int    max_payload_size,
+                                                int    buffer_ntime,
+                                                int    slot_ntime,
+                                                BFudpcapture_sequence_callback sequence_callback,
+                                                int    core,
+                                                int    batch_npkt);
+
+template<class PacketDecoder, class PacketProcessor>
+BFudpcapture_impl* create_udp_capture(std::string format,
+                                      int    fd,
+                                      BFring ring,
+                                      int    nsrc,
+                                      int    src0,
+                                      int    max_payload_size,
+                                      int    buffer_ntime,
+                                      int    slot_ntime,
+                                      BFudpcapture_sequence_callback sequence_callback,
+                                      int    core,
+                                      int    batch_npkt) {
+	return new UDPCaptureFormat<PacketDecoder, PacketProcessor>(
+		format, fd, ring, nsrc, src0, max_payload_size, buffer_ntime,
+		slot_ntime, sequence_callback, core, batch_npkt);
+}
+
+// The registry of supported packet formats
+// Note: New formats are added by defining their decoder and processor in
+//         packet_formats.hpp and adding them here.
+static std::map<std::string, UDPCaptureFactory> const& udp_capture_formats() {
+	static std::map<std::string, UDPCaptureFactory> formats = {
+		{"chips",   &create_udp_capture<CHIPSDecoder,   CHIPSProcessor8bit>},
+		{"simple",  &create_udp_capture<SimpleDecoder,  ChannelProcessor>},
+		{"generic", &create_udp_capture<GenericDecoder, ChannelProcessor>}
+	};
+	return formats;
+}
+
 BFstatus bfUdpCaptureCreate(BFudpcapture* obj,
                             const char*   format,
                             int           fd,
@@ -784,16 +878,28 @@ BFstatus bfUdpCaptureCreate(BFudpcapture* obj,
                             BFsize        buffer_ntime,
                             BFsize        slot_ntime,
                             BFudpcapture_sequence_callback sequence_callback,
-                            int           core) {
+                            int           core,
+                            BFsize        batch_npkt) {
 	BF_ASSERT(obj, BF_STATUS_INVALID_POINTER);
-	if( format == std::string("chips") ) {
-		BF_TRY_RETURN_ELSE(*obj = new BFudpcapture_impl(fd, ring, nsrc, src0, max_payload_size,
-		                                                buffer_ntime, slot_ntime,
-		                                                sequence_callback, core),
-		                   *obj = 0);
-	} else {
+	BF_ASSERT(format, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(batch_npkt > 0, BF_STATUS_INVALID_ARGUMENT);
+	std::map<std::string, UDPCaptureFactory>::const_iterator it =
+		udp_capture_formats().find(format);
+	if( it == udp_capture_formats().end() ) {
 		return BF_STATUS_UNSUPPORTED;
 	}
+	BF_TRY_RETURN_ELSE(*obj = (*it->second)(format, fd, ring, nsrc, src0,
+	                                        max_payload_size,
+	                                        buffer_ntime, slot_ntime,
+	                                        sequence_callback, core,
+	                                        batch_npkt),
+	                   *obj = 0);
+}
+BFstatus bfUdpCaptureFormatSupported(const char* format, BFbool* supported) {
+	BF_ASSERT(format,    BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(supported, BF_STATUS_INVALID_POINTER);
+	*supported = udp_capture_formats().count(format) > 0;
+	return BF_STATUS_SUCCESS;
 }
 BFstatus bfUdpCaptureDestroy(BFudpcapture obj) {
 	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
@@ -813,3 +919,11 @@ BFstatus bfUdpCaptureEnd(BFudpcapture obj) {
 	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
 	BF_TRY_RETURN(obj->end_writing());
 }
+BFstatus bfUdpCaptureGetStats(BFudpcapture obj, int src,
+                              BFudpcapture_stats* stats) {
+	BF_ASSERT(obj,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(stats, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(src < obj->nsrc(), BF_STATUS_INVALID_ARGUMENT);
+	obj->get_stats(src, stats);
+	return BF_STATUS_SUCCESS;
+}
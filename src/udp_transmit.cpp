@@ -31,15 +31,23 @@
 #include <bifrost/udp_transmit.h>
 #include <bifrost/affinity.h>
 #include "proclog.hpp"
+#include "packet_formats.hpp"
 
 #include <arpa/inet.h>  // For ntohs
 #include <sys/socket.h> // For recvfrom
 
 #include <queue>
 #include <memory>
+#include <vector>
+#include <map>
+#include <string>
+#include <chrono>
+#include <thread>
+#include <random>
 #include <stdexcept>
 #include <cstdlib>      // For posix_memalign
 #include <cstring>      // For memcpy, memset
+#include <algorithm>    // For std::min
 #include <cstdint>
 
 #include <sys/types.h>
@@ -100,6 +108,14 @@ struct PacketStats {
 	size_t nvalid_bytes;
 };
 
+inline size_t msghdr_nbyte(msghdr const* msg) {
+	size_t nbyte = 0;
+	for( size_t i=0; i<msg->msg_iovlen; ++i ) {
+		nbyte += msg->msg_iov[i].iov_len;
+	}
+	return nbyte;
+}
+
 class UDPTransmitThread : public BoundThread {
 	PacketStats       _stats;
 	
@@ -114,21 +130,31 @@ public:
 		ssize_t nsent = sendmsg(_fd, packet, 0);
 		if( nsent == -1 ) {
 			++_stats.ninvalid;
-			_stats.ninvalid_bytes += packet->msg_iovlen;
+			_stats.ninvalid_bytes += msghdr_nbyte(packet);
 		} else {
 			++_stats.nvalid;
 			_stats.nvalid_bytes += nsent;
 		}
 		return nsent;
 	}
+	// Sends all of the packets, resuming after partial sends
+	// Returns the no. packets sent, or -1 on error
 	inline ssize_t sendmany(mmsghdr *packets, unsigned int npackets) {
-		ssize_t nsent = sendmmsg(_fd, packets, npackets, 0);
-		if( nsent == -1 ) {
-			_stats.ninvalid += npackets;
-			_stats.ninvalid_bytes += packets->msg_len;
-		} else {
-			_stats.nvalid += npackets;
-			_stats.nvalid_bytes += packets->msg_len;
+		unsigned int nsent = 0;
+		while( nsent < npackets ) {
+			int n = sendmmsg(_fd, packets + nsent, npackets - nsent, 0);
+			if( n == -1 ) {
+				for( unsigned int i=nsent; i<npackets; ++i ) {
+					++_stats.ninvalid;
+					_stats.ninvalid_bytes += msghdr_nbyte(&packets[i].msg_hdr);
+				}
+				return -1;
+			}
+			for( unsigned int i=nsent; i<nsent+n; ++i ) {
+				++_stats.nvalid;
+				_stats.nvalid_bytes += packets[i].msg_len;
+			}
+			nsent += n;
 		}
 		return nsent;
 	}
@@ -138,25 +164,76 @@ public:
 	}
 };
 
+// Paces batches of packets so that the average data rate does not exceed
+//   the given no. bytes per second (0 => unlimited)
+class RateLimiter {
+	typedef std::chrono::steady_clock clock_type;
+	double                 _rate;
+	clock_type::time_point _next;
+public:
+	RateLimiter() : _rate(0) {}
+	inline void set_rate(double rate) {
+		_rate = rate;
+		_next = clock_type::now();
+	}
+	inline double rate() const { return _rate; }
+	// Waits until nbyte bytes may be sent
+	inline void wait(size_t nbyte) {
+		if( _rate <= 0 ) {
+			return;
+		}
+		clock_type::time_point now = clock_type::now();
+		if( _next > now ) {
+			std::this_thread::sleep_until(_next);
+		} else if( now - _next > std::chrono::milliseconds(1) ) {
+			// Note: Falling behind by a little (e.g., due to oversleeping) is
+			//         made up for, but idle time is not made up for with a
+			//         burst.
+			_next = now;
+		}
+		std::chrono::duration<double> dt(nbyte / _rate);
+		_next += std::chrono::duration_cast<clock_type::duration>(dt);
+	}
+};
+
+// Stamps the per-packet fields of a format into a copy of its header template
+typedef void (*UDPTransmitEncoder)(uint8_t* hdr_ptr, uint64_t seq, int src);
+
+template<class Encoder>
+void encode_udp_header(uint8_t* hdr_ptr, uint64_t seq, int src) {
+	Encoder()(hdr_ptr, seq, src);
+}
+
+struct UDPTransmitFormat {
+	size_t             header_size; // 0 => any size
+	UDPTransmitEncoder encode;      // NULL => header is sent as-is
+};
+
+static std::map<std::string, UDPTransmitFormat> const& udp_transmit_formats() {
+	static std::map<std::string, UDPTransmitFormat> formats = {
+		{"raw",     {0, NULL}},
+		{"chips",   {sizeof(chips_hdr_type),   &encode_udp_header<CHIPSEncoder>}},
+		{"simple",  {sizeof(simple_hdr_type),  &encode_udp_header<SimpleEncoder>}},
+		{"generic", {sizeof(generic_hdr_type), &encode_udp_header<GenericEncoder>}}
+	};
+	return formats;
+}
+
 class BFudptransmit_impl {
-	UDPTransmitThread  _transmit;
-	ProcLog            _type_log;
-	ProcLog            _stat_log;
-	pid_t              _pid;
+	enum {
+		// Note: sendmmsg accepts at most UIO_MAXIOV (1024) messages per call
+		MAX_BATCH_NPKT = 64
+	};
+protected:
+	UDPTransmitThread    _transmit;
+	ProcLog              _type_log;
+	ProcLog              _stat_log;
+	pid_t                _pid;
+	RateLimiter          _limiter;
+	std::vector<uint8_t> _headers;
+	std::vector<iovec>   _iovs;
+	std::vector<mmsghdr> _mmsgs;
 	
-	inline struct msghdr _build_msghdr(char* packet, unsigned int len) {
-		struct msghdr msg;
-		struct iovec iov[1];
-		
-		iov[0].iov_base = packet;
-		iov[0].iov_len = len;
-		
-		memset(&msg, 0, sizeof(msg));
-		msg.msg_iov = iov;
-		msg.msg_iovlen = 1;
-		
-		return msg;
-	}
 	void update_stats_log() {
 		const PacketStats* stats = _transmit.get_stats();
 		_stat_log.update() << "ngood_bytes    : " << stats->nvalid_bytes << "\n"
@@ -166,7 +243,66 @@ class BFudptransmit_impl {
 		                   << "nlate          : " << stats->nlate << "\n"
 		                   << "nlate_bytes    : " << stats->nlate_bytes << "\n"
 		                   << "nvalid         : " << stats->nvalid << "\n"
-		                   << "nvalid_bytes   : " << stats->nvalid_bytes << "\n";
+		                   << "nvalid_bytes   : " << stats->nvalid_bytes << "\n"
+		                   << "rate_limit     : " << _limiter.rate() << "\n";
+	}
+	// Prepares npackets messages, each made of up to 2 iovecs
+	void reserve_messages(size_t npackets) {
+		_iovs.resize(npackets*2);
+		_mmsgs.resize(npackets);
+		::memset(&_mmsgs[0], 0, sizeof(mmsghdr)*npackets);
+		for( size_t i=0; i<npackets; ++i ) {
+			_mmsgs[i].msg_hdr.msg_iov = &_iovs[i*2];
+		}
+	}
+	inline void set_message(size_t i,
+	                        void const* hdr,  size_t hdr_size,
+	                        void const* data, size_t data_size) {
+		iovec* iov = _mmsgs[i].msg_hdr.msg_iov;
+		int iovlen = 0;
+		if( hdr_size ) {
+			iov[iovlen].iov_base = (void*)hdr;
+			iov[iovlen].iov_len  = hdr_size;
+			++iovlen;
+		}
+		iov[iovlen].iov_base = (void*)data;
+		iov[iovlen].iov_len  = data_size;
+		++iovlen;
+		_mmsgs[i].msg_hdr.msg_iovlen = iovlen;
+	}
+	// Makes a copy of hdr_template (or of zeros if NULL) with the per-packet
+	//   fields of fmt set
+	inline void fill_header(UDPTransmitFormat const& fmt,
+	                        void const* hdr_template, size_t hdr_size,
+	                        uint64_t seq, int src, uint8_t* hdr) const {
+		if( hdr_template ) {
+			::memcpy(hdr, hdr_template, hdr_size);
+		} else {
+			::memset(hdr, 0, hdr_size);
+		}
+		if( fmt.encode ) {
+			fmt.encode(hdr, seq, src);
+		}
+	}
+	// Sends the prepared messages in rate-limited batches
+	BFudptransmit_status send_messages(size_t npackets) {
+		BFudptransmit_status ret = BF_TRANSMIT_CONTINUED;
+		for( size_t i=0; i<npackets; i+=MAX_BATCH_NPKT ) {
+			unsigned int nbatch = std::min(npackets - i, (size_t)MAX_BATCH_NPKT);
+			if( _limiter.rate() > 0 ) {
+				size_t nbyte = 0;
+				for( unsigned int j=0; j<nbatch; ++j ) {
+					nbyte += msghdr_nbyte(&_mmsgs[i+j].msg_hdr);
+				}
+				_limiter.wait(nbyte);
+			}
+			if( _transmit.sendmany(&_mmsgs[i], nbatch) == -1 ) {
+				ret = BF_TRANSMIT_ERROR;
+				break;
+			}
+		}
+		this->update_stats_log();
+		return ret;
 	}
 public:
 	inline BFudptransmit_impl(int fd,
@@ -176,6 +312,10 @@ public:
 		  _stat_log("udp_transmit/stats") {
 		_type_log.update() << "type : " << "generic";
 	}
+	inline void set_rate(double rate) {
+		_limiter.set_rate(rate);
+		this->update_stats_log();
+	}
 	BFudptransmit_status send(char *packet, unsigned int len) {
 		ssize_t state;
 		struct msghdr msg;
@@ -187,6 +327,7 @@ public:
 		iov[0].iov_base = packet;
 		iov[0].iov_len = len;
 		
+		_limiter.wait(len);
 		state = _transmit.send( &msg );
 		if( state == -1 ) {
 			return BF_TRANSMIT_ERROR;
@@ -195,29 +336,165 @@ public:
 		return BF_TRANSMIT_CONTINUED;
 	}
 	BFudptransmit_status sendmany(char *packets, unsigned int len, unsigned int npackets) {
-		ssize_t state;
-		unsigned int i;
-		struct mmsghdr *mmsg = NULL;
-		struct iovec *iovs = NULL;
-		
-		mmsg = (struct mmsghdr *) malloc(sizeof(struct mmsghdr)*npackets);
-		iovs = (struct iovec *) malloc(sizeof(struct iovec)*npackets);
-		memset(mmsg, 0, sizeof(struct mmsghdr)*npackets);
-		for(i=0; i<npackets; i++) {
-			mmsg[i].msg_hdr.msg_iov = &iovs[i];
-			mmsg[i].msg_hdr.msg_iovlen = 1;
-			iovs[i].iov_base = (packets + i*len);
-			iovs[i].iov_len = len;
+		this->reserve_messages(npackets);
+		for( unsigned int i=0; i<npackets; ++i ) {
+			this->set_message(i, NULL, 0, packets + i*len, len);
 		}
-		
-		state = _transmit.sendmany(mmsg, npackets);
-		free(mmsg);
-		free(iovs);
-		if( state == -1 ) {
-			return BF_TRANSMIT_ERROR;
+		return this->send_messages(npackets);
+	}
+	BFudptransmit_status sendv(void**  packets,
+	                           BFsize* sizes,
+	                           BFsize  npackets) {
+		this->reserve_messages(npackets);
+		for( BFsize i=0; i<npackets; ++i ) {
+			this->set_message(i, NULL, 0, packets[i], sizes[i]);
 		}
-		this->update_stats_log();
-		return BF_TRANSMIT_CONTINUED;
+		return this->send_messages(npackets);
+	}
+	// Sends one packet per [time][src] element of data, with the payloads
+	//   sent directly from data and the headers generated from hdr_template.
+	BFudptransmit_status send_span(std::string const& format,
+	                               void const*        hdr_template,
+	                               BFsize             hdr_size,
+	                               BFoffset           seq0,
+	                               int                src0,
+	                               void const*        data,
+	                               BFsize             ntime,
+	                               BFsize             nsrc,
+	                               BFsize             payload_size) {
+		UDPTransmitFormat const& fmt = udp_transmit_formats().at(format);
+		if( !hdr_size ) {
+			hdr_template = NULL;
+		}
+		if( fmt.header_size ) {
+			BF_ASSERT_EXCEPTION(!hdr_template || hdr_size == fmt.header_size,
+			                    BF_STATUS_INVALID_ARGUMENT);
+			hdr_size = fmt.header_size;
+		}
+		if( format != "raw" ) {
+			_type_log.update() << "type : " << format;
+		}
+		size_t npackets = ntime*nsrc;
+		_headers.resize(npackets*hdr_size);
+		this->reserve_messages(npackets);
+		uint8_t const* payloads = (uint8_t const*)data;
+		for( BFsize t=0; t<ntime; ++t ) {
+			for( BFsize s=0; s<nsrc; ++s ) {
+				size_t   i   = t*nsrc + s;
+				uint8_t* hdr = &_headers[i*hdr_size];
+				this->fill_header(fmt, hdr_template, hdr_size,
+				                  seq0 + t, src0 + s, hdr);
+				this->set_message(i, hdr, hdr_size,
+				                  payloads + i*payload_size, payload_size);
+			}
+		}
+		return this->send_messages(npackets);
+	}
+};
+
+// Sends synthetic packets, optionally dropping, duplicating and reordering
+//   some of them to imitate an imperfect network
+class BFudpgenerator_impl : public BFudptransmit_impl {
+	std::string          _format;
+	int                  _nsrc;
+	int                  _src0;
+	BFsize               _payload_size;
+	std::vector<uint8_t> _hdr_template;
+	double               _drop_prob;
+	double               _duplicate_prob;
+	double               _reorder_prob;
+	int                  _reorder_distance;
+	std::mt19937_64      _rng;
+	std::vector<uint8_t> _payloads;
+	std::vector<size_t>  _order;
+	BFudpgenerator_stats _stats;
+public:
+	BFudpgenerator_impl(std::string format,
+	                    int         fd,
+	                    int         nsrc,
+	                    int         src0,
+	                    BFsize      payload_size,
+	                    int         core)
+		: BFudptransmit_impl(fd, core),
+		  _format(format), _nsrc(nsrc), _src0(src0),
+		  _payload_size(payload_size),
+		  _hdr_template(udp_transmit_formats().at(format).header_size, 0),
+		  _drop_prob(0), _duplicate_prob(0),
+		  _reorder_prob(0), _reorder_distance(0) {
+		::memset(&_stats, 0, sizeof(_stats));
+		_type_log.update() << "type : " << format;
+	}
+	void set_header(void const* hdr_template, BFsize hdr_size) {
+		size_t fmt_hdr_size = udp_transmit_formats().at(_format).header_size;
+		BF_ASSERT_EXCEPTION(!fmt_hdr_size || hdr_size == fmt_hdr_size,
+		                    BF_STATUS_INVALID_ARGUMENT);
+		uint8_t const* hdr = (uint8_t const*)hdr_template;
+		_hdr_template.assign(hdr, hdr + hdr_size);
+	}
+	void set_impairments(double drop_prob,
+	                     double duplicate_prob,
+	                     double reorder_prob,
+	                     int    reorder_distance,
+	                     BFsize seed) {
+		_drop_prob        = drop_prob;
+		_duplicate_prob   = duplicate_prob;
+		_reorder_prob     = reorder_prob;
+		_reorder_distance = reorder_distance;
+		_rng.seed(seed);
+	}
+	// Sends the packets for ntime time samples starting at seq0
+	// Note: Every byte of a packet's payload is set to (seq*nsrc + src) % 256,
+	//         where src is counted from 0.
+	BFudptransmit_status send(BFoffset seq0, BFsize ntime) {
+		size_t npackets = ntime*_nsrc;
+		_payloads.resize(npackets*_payload_size);
+		for( size_t i=0; i<npackets; ++i ) {
+			::memset(&_payloads[i*_payload_size],
+			         (uint8_t)(seq0*_nsrc + i), _payload_size);
+		}
+		std::uniform_real_distribution<double> uniform(0., 1.);
+		_order.clear();
+		for( size_t i=0; i<npackets; ++i ) {
+			if( _drop_prob > 0 && uniform(_rng) < _drop_prob ) {
+				++_stats.ndropped;
+				continue;
+			}
+			_order.push_back(i);
+			if( _duplicate_prob > 0 && uniform(_rng) < _duplicate_prob ) {
+				_order.push_back(i);
+				++_stats.nduplicated;
+			}
+		}
+		if( _reorder_prob > 0 && _reorder_distance > 0 ) {
+			for( size_t j=0; j<_order.size(); ++j ) {
+				if( uniform(_rng) < _reorder_prob ) {
+					size_t k = j + 1 + _rng() % _reorder_distance;
+					if( k < _order.size() ) {
+						std::swap(_order[j], _order[k]);
+						++_stats.nreordered;
+					}
+				}
+			}
+		}
+		UDPTransmitFormat const& fmt = udp_transmit_formats().at(_format);
+		size_t hdr_size = _hdr_template.size();
+		void const* hdr_template = hdr_size ? &_hdr_template[0] : NULL;
+		_headers.resize(_order.size()*hdr_size);
+		this->reserve_messages(_order.size());
+		for( size_t j=0; j<_order.size(); ++j ) {
+			size_t   i   = _order[j];
+			uint8_t* hdr = &_headers[j*hdr_size];
+			this->fill_header(fmt, hdr_template, hdr_size,
+			                  seq0 + i / _nsrc, _src0 + i % _nsrc, hdr);
+			this->set_message(j, hdr, hdr_size,
+			                  &_payloads[i*_payload_size], _payload_size);
+		}
+		return this->send_messages(_order.size());
+	}
+	void get_stats(BFudpgenerator_stats* stats) const {
+		*stats = _stats;
+		stats->nsent       = _transmit.get_stats()->nvalid;
+		stats->nsent_bytes = _transmit.get_stats()->nvalid_bytes;
 	}
 };
 
@@ -229,11 +506,22 @@ BFstatus bfUdpTransmitCreate(BFudptransmit* obj,
 		              *obj = 0);
 
 }
+BFstatus bfUdpTransmitFormatSupported(const char* format, BFbool* supported) {
+	BF_ASSERT(format,    BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(supported, BF_STATUS_INVALID_POINTER);
+	*supported = udp_transmit_formats().count(format) > 0;
+	return BF_STATUS_SUCCESS;
+}
 BFstatus bfUdpTransmitDestroy(BFudptransmit obj) {
 	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
 	delete obj;
 	return BF_STATUS_SUCCESS;
 }
+BFstatus bfUdpTransmitSetRate(BFudptransmit obj, double rate) {
+	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(rate >= 0, BF_STATUS_INVALID_ARGUMENT);
+	BF_TRY_RETURN(obj->set_rate(rate));
+}
 BFstatus bfUdpTransmitSend(BFudptransmit obj, char* packet, unsigned int len) {
 	BF_TRY_RETURN(obj->send(packet, len));
 }
@@ -241,3 +529,100 @@ BFstatus bfUdpTransmitSendMany(BFudptransmit obj, char* packets, unsigned int le
 	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
 	BF_TRY_RETURN(obj->sendmany(packets, len, npackets));
 }
+BFstatus bfUdpTransmitSendV(BFudptransmit         obj,
+                            void**                packets,
+                            BFsize*               sizes,
+                            BFsize                npackets,
+                            BFudptransmit_status* result) {
+	BF_ASSERT(obj,     BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(packets || !npackets, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(sizes   || !npackets, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(result,  BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*result = obj->sendv(packets, sizes, npackets),
+	                   *result = BF_TRANSMIT_ERROR);
+}
+BFstatus bfUdpTransmitSendSpan(BFudptransmit         obj,
+                               const char*           format,
+                               void const*           hdr_template,
+                               BFsize                hdr_size,
+                               BFoffset              seq0,
+                               int                   src0,
+                               void const*           data,
+                               BFsize                ntime,
+                               BFsize                nsrc,
+                               BFsize                payload_size,
+                               BFudptransmit_status* result) {
+	BF_ASSERT(obj,    BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(format, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(data || ntime*nsrc == 0, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(hdr_template || !hdr_size, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(result, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(udp_transmit_formats().count(format), BF_STATUS_UNSUPPORTED);
+	BF_TRY_RETURN_ELSE(*result = obj->send_span(format, hdr_template, hdr_size,
+	                                            seq0, src0, data, ntime, nsrc,
+	                                            payload_size),
+	                   *result = BF_TRANSMIT_ERROR);
+}
+
+BFstatus bfUdpGeneratorCreate(BFudpgenerator* obj,
+                              const char*     format,
+                              int             fd,
+                              int             nsrc,
+                              int             src0,
+                              BFsize          payload_size,
+                              int             core) {
+	BF_ASSERT(obj,    BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(format, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(nsrc > 0, BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT(udp_transmit_formats().count(format), BF_STATUS_UNSUPPORTED);
+	BF_TRY_RETURN_ELSE(*obj = new BFudpgenerator_impl(format, fd, nsrc, src0,
+	                                                  payload_size, core),
+	                   *obj = 0);
+}
+BFstatus bfUdpGeneratorDestroy(BFudpgenerator obj) {
+	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
+	delete obj;
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfUdpGeneratorSetHeader(BFudpgenerator obj,
+                                 void const*    hdr_template,
+                                 BFsize         hdr_size) {
+	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(hdr_template || hdr_size == 0, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN(obj->set_header(hdr_template, hdr_size));
+}
+BFstatus bfUdpGeneratorSetRate(BFudpgenerator obj, double rate) {
+	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(rate >= 0, BF_STATUS_INVALID_ARGUMENT);
+	BF_TRY_RETURN(obj->set_rate(rate));
+}
+BFstatus bfUdpGeneratorSetImpairments(BFudpgenerator obj,
+                                      double         drop_prob,
+                                      double         duplicate_prob,
+                                      double         reorder_prob,
+                                      int            reorder_distance,
+                                      BFsize         seed) {
+	BF_ASSERT(obj, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(0 <= drop_prob      && drop_prob      <= 1, BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT(0 <= duplicate_prob && duplicate_prob <= 1, BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT(0 <= reorder_prob   && reorder_prob   <= 1, BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT(reorder_distance >= 0, BF_STATUS_INVALID_ARGUMENT);
+	BF_TRY_RETURN(obj->set_impairments(drop_prob, duplicate_prob,
+	                                   reorder_prob, reorder_distance, seed));
+}
+BFstatus bfUdpGeneratorSend(BFudpgenerator        obj,
+                            BFoffset              seq0,
+                            BFsize                ntime,
+                            BFudptransmit_status* result) {
+	BF_ASSERT(obj,    BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(result, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*result = obj->send(seq0, ntime),
+	                   *result = BF_TRANSMIT_ERROR);
+}
+BFstatus bfUdpGeneratorGetStats(BFudpgenerator        obj,
+                                BFudpgenerator_stats* stats) {
+	BF_ASSERT(obj,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(stats, BF_STATUS_INVALID_POINTER);
+	obj->get_stats(stats);
+	return BF_STATUS_SUCCESS;
+}
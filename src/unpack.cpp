@@ -264,13 +264,14 @@ BFstatus bfUnpack(BFarray const* in,
 	           out->dtype == BF_DTYPE_CI8 ) {
 	//case BF_DTYPE_I8: {
 		switch( in->dtype ) {
-		// TODO: Work out how to properly deal with 1-bit
+		// TODO: Work out how to properly deal with complex 1-bit
 		//case BF_DTYPE_CI1: nelement *= 2;
-		//case BF_DTYPE_I1: {
-		//	BF_ASSERT(nelement % 8 == 0, BF_STATUS_INVALID_SHAPE);
-		//	nelement /= 8;
-		//	CALL_FOREACH_SIMPLE_CPU_UNPACK(uint8_t,int64_t); break;
-		//}
+		case BF_DTYPE_I1: {
+			BF_ASSERT(nelement % 8 == 0, BF_STATUS_INVALID_SHAPE);
+			nelement /= 8;
+			CALL_FOREACH_SIMPLE_CPU_UNPACK(uint8_t,int64_t);
+			break;
+		}
 		case BF_DTYPE_CI2: nelement *= 2;
 		case BF_DTYPE_I2: {
 			BF_ASSERT(nelement % 4 == 0, BF_STATUS_INVALID_SHAPE);
@@ -302,6 +303,28 @@ BFstatus bfUnpack(BFarray const* in,
 		}
 		default: BF_FAIL("Supported bfQuantize input dtype", BF_STATUS_UNSUPPORTED_DTYPE);
 		}
+	} else if( out->dtype == BF_DTYPE_U8 ) {
+		switch( in->dtype ) {
+		case BF_DTYPE_U1: {
+			BF_ASSERT(nelement % 8 == 0, BF_STATUS_INVALID_SHAPE);
+			nelement /= 8;
+			CALL_FOREACH_SIMPLE_CPU_UNPACK(uint8_t,uint64_t);
+			break;
+		}
+		case BF_DTYPE_U2: {
+			BF_ASSERT(nelement % 4 == 0, BF_STATUS_INVALID_SHAPE);
+			nelement /= 4;
+			CALL_FOREACH_SIMPLE_CPU_UNPACK(uint8_t,uint32_t);
+			break;
+		}
+		case BF_DTYPE_U4: {
+			BF_ASSERT(nelement % 2 == 0, BF_STATUS_INVALID_SHAPE);
+			nelement /= 2;
+			CALL_FOREACH_SIMPLE_CPU_UNPACK(uint8_t,uint16_t);
+			break;
+		}
+		default: BF_FAIL("Supported bfUnpack input dtype", BF_STATUS_UNSUPPORTED_DTYPE);
+		}
 	} else {
 		BF_FAIL("Supported bfQuantize output dtype", BF_STATUS_UNSUPPORTED_DTYPE);
 	}
@@ -206,16 +206,17 @@ inline BFsize capacity_bytes(const BFarray* array) {
 	return array->strides[0] * array->shape[0];
 }
 inline bool is_contiguous(const BFarray* array) {
-	BFsize logical_size = get_dtype_nbyte(array->dtype);
+	// Note: Sizes are in bits to support packed (sub-byte) dtypes
+	BFsize logical_nbit = BF_DTYPE_NBIT(array->dtype);
 	for( int d=0; d<array->ndim; ++d ) {
-		logical_size *= array->shape[d];
+		logical_nbit *= array->shape[d];
 	}
-	BFsize physical_size = capacity_bytes(array);
-	return logical_size == physical_size;
+	BFsize physical_nbit = capacity_bytes(array) * 8;
+	return logical_nbit == physical_nbit;
 }
 inline BFsize num_contiguous_elements(const BFarray* array ) {
 	// Assumes array is contiguous
-	return capacity_bytes(array) / BF_DTYPE_NBYTE(array->dtype);
+	return capacity_bytes(array) * 8 / BF_DTYPE_NBIT(array->dtype);
 }
 
 // Merges together contiguous dimensions
@@ -0,0 +1,201 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Measures the sustained throughput and packet loss of UDP capture on the
+loopback interface, using the built-in packet generator as the source.
+One trial is run for each combination of the given capture settings, e.g.:
+
+  python udp_capture_benchmark.py --buffer-ntime 32 256 --core -1 2
+
+Note that the generator and the capture compete for the same machine, so
+the results are a lower bound on what the capture can sustain.
+"""
+
+import bifrost as bf
+from bifrost.address import Address
+from bifrost.udp_socket import UDPSocket
+from bifrost.udp_capture import UDPCapture
+from bifrost.udp_generator import UDPGenerator
+from bifrost.ring2 import Ring
+from bifrost.libbifrost import _bf
+
+import argparse
+import ctypes
+import itertools
+import json
+import socket
+import struct
+import threading
+import time
+
+def make_header_template(fmt, nsrc, nchan):
+	if fmt == 'chips':
+		return struct.pack('>BBBBBBHQ', 0, 1, nchan, 1, 0, nsrc, 0, 0)
+	elif fmt == 'generic':
+		return struct.pack('>QHHHH', 0, 0, nsrc, 0, nchan)
+	elif fmt == 'simple':
+		return struct.pack('>Q', 0)
+	else:
+		raise ValueError("Unsupported packet format: %s" % fmt)
+
+def make_sequence_callback(chan_nbyte):
+	headers = []
+	def callback(seq0, chan0, nchan, nsrc, time_tag, hdr, hdr_size):
+		header = json.dumps({'name':     'benchmark',
+		                     'time_tag': seq0,
+		                     'chan0':    chan0,
+		                     '_tensor':  {'dtype': 'u8',
+		                                  'shape': [-1, nchan, nsrc,
+		                                            chan_nbyte]}})
+		# Note: The header must stay alive until the sequence is closed
+		buf = ctypes.create_string_buffer(header, len(header))
+		headers.append(buf)
+		time_tag[0] = seq0
+		hdr[0]      = ctypes.cast(buf, ctypes.c_void_p)
+		hdr_size[0] = len(header)
+		return 0
+	return _bf.BFudpcapture_sequence_callback(callback)
+
+def run_trial(args, buffer_ntime, slot_ntime, core, batch_npkt):
+	nsrc  = 1 if args.format == 'simple' else args.nsrc
+	nchan = 1 if args.format == 'simple' else args.nchan
+	payload_size = nchan * args.chan_nbyte
+	
+	isock = UDPSocket()
+	isock.bind(Address('127.0.0.1', 0))
+	isock.timeout = args.timeout
+	pysock = socket.fromfd(isock.fileno(), socket.AF_INET, socket.SOCK_DGRAM)
+	pysock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, args.rcvbuf)
+	port = pysock.getsockname()[1]
+	pysock.close()
+	
+	ring = Ring(space='system')
+	callback = make_sequence_callback(args.chan_nbyte)
+	ready  = threading.Event()
+	result = {}
+	def capture_loop():
+		# Note: The capture binds the thread that creates it to core
+		capture = UDPCapture(args.format, isock, ring, nsrc, 0,
+		                     payload_size + 64, buffer_ntime, slot_ntime,
+		                     callback, core=core, batch_npkt=batch_npkt)
+		ready.set()
+		while True:
+			status = capture.recv()
+			if status in (_bf.BF_CAPTURE_ENDED, _bf.BF_CAPTURE_NO_DATA,
+			              _bf.BF_CAPTURE_ERROR):
+				break
+			result['t_last'] = time.time()
+		capture.end()
+		result['stats'] = capture.get_stats()
+	thread = threading.Thread(target=capture_loop)
+	thread.daemon = True
+	thread.start()
+	ready.wait()
+	
+	osock = UDPSocket()
+	osock.connect(Address('127.0.0.1', port))
+	generator = UDPGenerator(args.format, osock, nsrc, payload_size,
+	                         hdr_template=make_header_template(args.format,
+	                                                           nsrc, nchan),
+	                         rate=args.rate * 1e9 / 8 if args.rate else None,
+	                         core=args.generator_core)
+	generator.set_impairments(drop=args.drop, duplicate=args.duplicate,
+	                          reorder=args.reorder, seed=args.seed)
+	t0 = time.time()
+	for _ in xrange(args.ntime // args.gulp_ntime):
+		generator.send(args.gulp_ntime)
+	t_send = time.time() - t0
+	thread.join()
+	osock.close()
+	isock.close()
+	
+	gen_stats = generator.get_stats()
+	stats     = result['stats']
+	elapsed   = max(t_send, result.get('t_last', t0) - t0)
+	nsent     = gen_stats['nsent'] - gen_stats['nduplicated']
+	return {'gbps':     stats['ngood_bytes'] * 8 / elapsed / 1e9,
+	        'send_gbps': gen_stats['nsent_bytes'] * 8 / t_send / 1e9,
+	        'loss':     1 - stats['nvalid'] / float(max(nsent, 1)),
+	        'ndropped': stats['ndropped'],
+	        'missing':  stats['nmissing_bytes'] /
+	                    float(max(stats['ngood_bytes'] +
+	                              stats['nmissing_bytes'], 1))}
+
+def main(args):
+	print "%12s %10s %5s %10s %10s %10s %8s %10s %8s" % (
+		'buffer_ntime', 'slot_ntime', 'core', 'batch_npkt',
+		'Gbps', 'send Gbps', 'loss', 'sock drops', 'missing')
+	for buffer_ntime, slot_ntime, core, batch_npkt in itertools.product(
+			args.buffer_ntime, args.slot_ntime, args.core, args.batch_npkt):
+		r = run_trial(args, buffer_ntime, slot_ntime, core, batch_npkt)
+		print "%12i %10i %5i %10i %10.3f %10.3f %7.3f%% %10i %7.3f%%" % (
+			buffer_ntime, slot_ntime, core, batch_npkt,
+			r['gbps'], r['send_gbps'], r['loss']*100, r['ndropped'],
+			r['missing']*100)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description="Benchmark UDP capture on the loopback interface")
+	parser.add_argument('--format', default='chips',
+	                    help="Packet format (chips, simple or generic)")
+	parser.add_argument('--nsrc', type=int, default=16,
+	                    help="No. sources (roaches)")
+	parser.add_argument('--nchan', type=int, default=109,
+	                    help="No. channels per packet")
+	parser.add_argument('--chan-nbyte', type=int, default=32,
+	                    help="No. bytes per channel (must be 32 for chips)")
+	parser.add_argument('--ntime', type=int, default=65536,
+	                    help="No. time samples to send per trial")
+	parser.add_argument('--gulp-ntime', type=int, default=64,
+	                    help="No. time samples per generator call")
+	parser.add_argument('--rate', type=float, default=0,
+	                    help="Send rate limit in Gbps (0 => unlimited)")
+	parser.add_argument('--drop', type=float, default=0,
+	                    help="Probability of deliberately dropping a packet")
+	parser.add_argument('--duplicate', type=float, default=0,
+	                    help="Probability of duplicating a packet")
+	parser.add_argument('--reorder', type=float, default=0,
+	                    help="Probability of reordering a packet")
+	parser.add_argument('--seed', type=int, default=0,
+	                    help="Seed for the packet impairments")
+	parser.add_argument('--buffer-ntime', type=int, nargs='+', default=[256],
+	                    help="Capture buffer_ntime values to try")
+	parser.add_argument('--slot-ntime', type=int, nargs='+', default=[1],
+	                    help="Capture slot_ntime values to try")
+	parser.add_argument('--core', type=int, nargs='+', default=[-1],
+	                    help="Capture cores to try (-1 => unbound)")
+	parser.add_argument('--batch-npkt', type=int, nargs='+', default=[16],
+	                    help="Capture batch_npkt values to try")
+	parser.add_argument('--generator-core', type=int, default=-1,
+	                    help="Core to bind the generator to")
+	parser.add_argument('--rcvbuf', type=int, default=64*1024*1024,
+	                    help="Capture socket receive buffer size in bytes")
+	parser.add_argument('--timeout', type=float, default=0.5,
+	                    help="Capture socket timeout in seconds")
+	main(parser.parse_args())
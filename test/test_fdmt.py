@@ -31,7 +31,14 @@ import numpy as np
 import bifrost as bf
 from bifrost.fdmt import Fdmt
 
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from test_pipeline_executor import FilterbankSourceBlock, ArraySinkBlock
+
 class FdmtTest(unittest.TestCase):
+	def setUp(self):
+		np.random.seed(1234)
+		self.space = 'cuda'
 	def test_fdmt(self):
 		fdmt = Fdmt()
 		ntime     = 1024
@@ -41,21 +48,126 @@ class FdmtTest(unittest.TestCase):
 		bw        = 400.
 		df        = bw / nchan
 		exponent  = -2.0
-		fdmt.init(nchan, max_delay, f0, df, exponent, 'cuda')
-		idata = bf.asarray(np.random.normal(size=(nchan,ntime)).astype(np.float32), space='cuda')
+		fdmt.init(nchan, max_delay, f0, df, exponent, self.space)
+		idata = bf.asarray(np.random.normal(size=(nchan,ntime)).astype(np.float32), space=self.space)
 		
-		odata1 = bf.asarray(-999*np.ones((max_delay,ntime), np.float32), space='cuda')
+		odata1 = bf.asarray(-999*np.ones((max_delay,ntime), np.float32), space=self.space)
 		fdmt.execute(idata, odata1)
 		odata1 = odata1.copy('system')
 		self.assertEqual(odata1.min(), -999)
 		# TODO: Need better tests
 		self.assertLess(odata1.max(), 100.)
 		
-		odata2 = bf.asarray(-999*np.ones((max_delay,ntime), np.float32), space='cuda')
+		odata2 = bf.asarray(-999*np.ones((max_delay,ntime), np.float32), space=self.space)
 		workspace_size = fdmt.get_workspace_size(idata, odata2)
 		self.assertEqual(workspace_size, 3293184)
-		workspace = bf.asarray(np.empty(workspace_size, np.uint8), space='cuda')
+		workspace = bf.asarray(np.empty(workspace_size, np.uint8), space=self.space)
 		workspace_ptr = workspace.ctypes.data
 		fdmt.execute_workspace(idata, odata2, workspace_ptr, workspace_size)
 		odata2 = odata2.copy('system')
 		np.testing.assert_equal(odata1, odata2)
+	def run_fdmt(self, idata, max_delay, f0, df, space, negative_delays=False):
+		fdmt = Fdmt()
+		fdmt.init(idata.shape[0], max_delay, f0, df, -2.0, space)
+		# Note: The incomplete output samples are not written
+		odata = bf.asarray(np.zeros((max_delay, idata.shape[1]), np.float32),
+		                   space=space)
+		fdmt.execute(bf.asarray(idata, space=space), odata, negative_delays)
+		return odata.copy('system')
+	def test_matches_host(self):
+		idata = np.random.normal(size=(64,512)).astype(np.float32)
+		for negative_delays in [False, True]:
+			for df in [+2., -2.]:
+				odata      = self.run_fdmt(idata, 100, 1200., df, self.space,
+				                           negative_delays)
+				odata_host = self.run_fdmt(idata, 100, 1200., df, 'system',
+				                           negative_delays)
+				np.testing.assert_allclose(odata, odata_host, rtol=1e-6)
+	def run_fdmt_incremental(self, fdmt, idata, chunks):
+		max_delay = fdmt.max_delay
+		odata = np.zeros((max_delay, 0), np.float32)
+		t0 = 0
+		for nt in chunks:
+			ochunk = bf.asarray(np.zeros((max_delay, nt), np.float32),
+			                    space=self.space)
+			ichunk = bf.asarray(idata[:,t0:t0+nt].copy(), space=self.space)
+			nout = fdmt.execute_incremental(ichunk, ochunk)
+			odata = np.concatenate([odata, ochunk.copy('system')[:,:nout]],
+			                       axis=1)
+			t0 += nt
+		return odata
+	def test_incremental(self):
+		nchan, max_delay = 64, 100
+		idata = np.random.normal(size=(nchan,2000)).astype(np.float32)
+		for df in [+2., -2.]:
+			expected = self.run_fdmt(idata, max_delay, 1200., df, self.space)
+			expected = expected[:,:-max_delay]
+			fdmt = Fdmt()
+			fdmt.init(nchan, max_delay, 1200., df, -2.0, self.space)
+			for chunks in [[2000], [50, 150, 7, 793, 1000], [500]*4]:
+				fdmt.reset_incremental()
+				odata = self.run_fdmt_incremental(fdmt, idata, chunks)
+				self.assertEqual(odata.shape, expected.shape)
+				np.testing.assert_equal(odata, expected)
+
+class TestHostFdmt(FdmtTest):
+	def setUp(self):
+		np.random.seed(1234)
+		self.space = 'system'
+	def dispersed_pulse(self, nchan, ntime, delay, toa, f0, df,
+	                    negative_delays=False):
+		"""Returns a filterbank containing a unit pulse that arrives at time toa
+		    at the highest frequency and is delayed by up to delay samples
+		    across the band"""
+		freqs = f0 + np.arange(nchan)*df
+		fmin, fmax = freqs.min(), freqs.max()
+		delays = delay * (freqs**-2 - fmax**-2) / (fmin**-2 - fmax**-2)
+		if negative_delays:
+			delays *= -1
+		idata = np.zeros((nchan, ntime), np.float32)
+		idata[np.arange(nchan), np.round(toa + delays).astype(int)] = 1
+		return idata
+	def test_dispersed_pulse(self):
+		nchan, ntime, max_delay = 128, 1024, 200
+		for negative_delays in [False, True]:
+			for df in [+400./nchan, -400./nchan]:
+				f0 = 1000. if df > 0 else 1400.
+				idata = self.dispersed_pulse(nchan, ntime, 120, 500, f0, df,
+				                             negative_delays)
+				odata = self.run_fdmt(idata, max_delay, f0, df, 'system',
+				                      negative_delays)
+				peak = np.unravel_index(np.nanargmax(odata), odata.shape)
+				self.assertEqual(peak, (120, 500))
+	def test_integer_input(self):
+		idata = np.random.randint(0, 100, size=(64,512))
+		odata_float = self.run_fdmt(idata.astype(np.float32), 100,
+		                            1200., 2., 'system')
+		for dtype in [np.uint8, np.int16, np.int32]:
+			odata = self.run_fdmt(idata.astype(dtype), 100, 1200., 2., 'system')
+			np.testing.assert_equal(odata, odata_float)
+	def run_block_test(self, incremental):
+		nchan, ntime = 64, 2048
+		f0, df, dt = 1200., 2., 1e-3
+		kdm = 4.148741601e3 # MHz**2 cm**3 s / pc
+		idata = self.dispersed_pulse(nchan, ntime, 80, 1000, f0, df)
+		# Note: Gives a max_delay of 100 in FdmtBlock
+		max_dm = 99.5 * dt / (kdm * (f0**-2 - (f0+nchan*df)**-2))
+		with bfp.Pipeline() as pipeline:
+			data = FilterbankSourceBlock([idata.T.reshape(ntime,1,nchan)],
+			                             256, f0, df, dt)
+			data = blocks.transpose(data, ['pol', 'freq', 'time'])
+			data = blocks.fdmt(data, max_dm=max_dm, incremental=incremental)
+			sink = ArraySinkBlock(data)
+			pipeline.run()
+		otensor = sink.header['_tensor']
+		self.assertEqual(otensor['labels'], ['pol', 'dispersion', 'time'])
+		self.assertEqual(otensor['shape'], [1, 100, -1])
+		odata = sink.result(axis=-1)[0]
+		self.assertEqual(odata.shape, (100, ntime - 100))
+		peak = np.unravel_index(np.nanargmax(odata), odata.shape)
+		self.assertEqual(peak, (80, 1000))
+		return odata
+	def test_block(self):
+		odata = self.run_block_test(incremental=True)
+		odata_overlap = self.run_block_test(incremental=False)
+		np.testing.assert_equal(odata, odata_overlap)
@@ -36,6 +36,10 @@ from numpy.fft import fftn as gold_fftn, ifftn as gold_ifftn
 from numpy.fft import rfftn as gold_rfftn, irfftn as gold_irfftn
 from bifrost.fft import Fft
 import bifrost as bf
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+
+from test_pipeline_executor import ArraySourceBlock, ArraySinkBlock
 
 # TODO: These tolerances are way too high, but only a tiny fraction of the
 #         result values have such large errors. Need a better way to quantify.
@@ -45,6 +49,7 @@ ATOL = 1e-1
 class TestFFT(unittest.TestCase):
 	def setUp(self):
 		np.random.seed(1234)
+		self.space = 'cuda'
 		self.shape1D = (16777216,)
 		self.shape2D = (4096, 4096)
 		self.shape3D = (256,256,256)
@@ -57,7 +62,7 @@ class TestFFT(unittest.TestCase):
 		shape = list(shape)
 		shape[-1] *= 2 # For complex
 		known_data = np.random.uniform(size=shape).astype(np.float32).view(np.complex64)
-		idata = bf.ndarray(known_data, space='cuda')
+		idata = bf.ndarray(known_data, space=self.space)
 		odata = bf.empty_like(idata)
 		fft = Fft()
 		fft.init(idata, odata, axes=axes)
@@ -71,10 +76,10 @@ class TestFFT(unittest.TestCase):
 		np.testing.assert_allclose(odata.copy('system'), known_result, RTOL, ATOL)
 	def run_test_r2c(self, shape, axes):
 		known_data = np.random.uniform(size=shape).astype(np.float32)
-		idata = bf.ndarray(known_data, space='cuda')
+		idata = bf.ndarray(known_data, space=self.space)
 		oshape = list(shape)
 		oshape[axes[-1]] = shape[axes[-1]] // 2 + 1
-		odata = bf.ndarray(shape=oshape, dtype='cf32', space='cuda')
+		odata = bf.ndarray(shape=oshape, dtype='cf32', space=self.space)
 		fft = Fft()
 		fft.init(idata, odata, axes=axes)
 		fft.execute(idata, odata)
@@ -85,8 +90,8 @@ class TestFFT(unittest.TestCase):
 		ishape[axes[-1]] = shape[axes[-1]] // 2 + 1
 		ishape[-1] *= 2 # For complex
 		known_data = np.random.uniform(size=ishape).astype(np.float32).view(np.complex64)
-		idata = bf.ndarray(known_data, space='cuda')
-		odata = bf.ndarray(shape=shape, dtype='f32', space='cuda')
+		idata = bf.ndarray(known_data, space=self.space)
+		odata = bf.ndarray(shape=shape, dtype='f32', space=self.space)
 		fft = Fft()
 		fft.init(idata, odata, axes=axes)
 		fft.execute(idata, odata)
@@ -189,3 +194,84 @@ class TestFFT(unittest.TestCase):
 		self.run_test_c2r(self.shape4D, [1,3])
 	def test_c2r_2D_in_4D_dims23(self):
 		self.run_test_c2r(self.shape4D, [2,3])
+
+class TestHostFFT(TestFFT):
+	def setUp(self):
+		np.random.seed(1234)
+		self.space = 'system'
+		self.shape1D = (65536,)
+		self.shape2D = (256, 256)
+		self.shape3D = (32, 32, 32)
+		self.shape4D = (16, 16, 16, 16)
+	def test_ci8_input(self):
+		known_data = np.random.randint(-128, 128, size=(64, 32, 2)).astype(np.int8)
+		idata = bf.ndarray(shape=(64, 32), dtype='ci8', space='system')
+		idata.view(np.int8)[...] = known_data.reshape(64, 64)
+		odata = bf.ndarray(shape=(64, 32), dtype='cf32', space='system')
+		fft = Fft()
+		fft.init(idata, odata, axes=[1])
+		fft.execute(idata, odata)
+		known_result = gold_fftn(known_data[...,0] + 1j*known_data[...,1],
+		                         axes=[1])
+		np.testing.assert_allclose(odata, known_result, RTOL, ATOL)
+	def test_multithreaded(self):
+		nthread = bf.fft.get_num_threads()
+		bf.fft.set_num_threads(4)
+		try:
+			self.run_test_c2c(self.shape3D, [1])
+			self.run_test_r2c(self.shape3D, [0,2])
+			self.run_test_c2r(self.shape2D, [1])
+		finally:
+			bf.fft.set_num_threads(nthread)
+
+class TestHostFftBlock(unittest.TestCase):
+	def run_fft_pipeline(self, arrays, nblock=1):
+		with bfp.Pipeline() as pipeline:
+			source = ArraySourceBlock(arrays, 128)
+			sinks = [ArraySinkBlock(blocks.fft(source, axes=1))
+			         for _ in xrange(nblock)]
+			pipeline.run()
+		for sink in sinks:
+			for array, result in zip(arrays, sink.arrays):
+				np.testing.assert_allclose(np.concatenate(result),
+				                           gold_rfftn(array, axes=[1]),
+				                           RTOL, ATOL)
+	def test_system_ring(self):
+		np.random.seed(1234)
+		self.run_fft_pipeline([np.random.uniform(size=(1000, 64)).astype(np.float32)])
+	def test_plans_reused(self):
+		# Partial final gulps, later sequences and other blocks performing
+		#   the same transform all reuse cached plans.
+		np.random.seed(1234)
+		arrays = [np.random.uniform(size=(1000, 64)).astype(np.float32)
+		          for _ in xrange(3)]
+		self.run_fft_pipeline(arrays[:1])
+		nplan = bf.fft.plan_cache.nplan
+		self.run_fft_pipeline(arrays, nblock=2)
+		self.assertEqual(bf.fft.plan_cache.nplan, nplan)
+
+class TestPlanCache(unittest.TestCase):
+	def setUp(self):
+		self.capacity = bf.fft.plan_cache.capacity
+	def tearDown(self):
+		bf.fft.set_plan_cache_size(self.capacity)
+	def create_plan(self, n):
+		idata = bf.ndarray(shape=(4, n), dtype='cf32', space='system')
+		odata = bf.ndarray(shape=(4, n), dtype='cf32', space='system')
+		fft = Fft()
+		fft.init(idata, odata, axes=1)
+		return fft.plan
+	def test_shared(self):
+		self.assertIs(self.create_plan(16), self.create_plan(16))
+		self.assertIsNot(self.create_plan(16), self.create_plan(32))
+	def test_lru_eviction(self):
+		bf.fft.plan_cache.clear()
+		bf.fft.set_plan_cache_size(2)
+		plan16 = self.create_plan(16)
+		plan32 = self.create_plan(32)
+		self.assertIs(self.create_plan(16), plan16)
+		# Evicts the least recently used plan (32)
+		self.create_plan(64)
+		self.assertEqual(len(bf.fft.plan_cache), 2)
+		self.assertIs(self.create_plan(16), plan16)
+		self.assertIsNot(self.create_plan(32), plan32)
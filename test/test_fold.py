@@ -0,0 +1,125 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+import bifrost.sigproc2 as sigproc
+
+from test_pipeline_executor import FilterbankSourceBlock, ArraySinkBlock
+
+import glob
+import os
+import shutil
+import tempfile
+
+KDM = 4.148741601e3 # MHz**2 cm**3 s / pc
+
+class TimedFilterbankSourceBlock(FilterbankSourceBlock):
+	"""Testing-only block which emits filterbanks starting at time t0"""
+	def __init__(self, arrays, gulp_nframe, t0, *args, **kwargs):
+		super(TimedFilterbankSourceBlock, self).__init__(arrays, gulp_nframe,
+		                                                 *args, **kwargs)
+		self.t0 = t0
+	def on_sequence(self, reader, index):
+		ohdr = super(TimedFilterbankSourceBlock, self).on_sequence(reader,
+		                                                           index)[0]
+		ohdr['_tensor']['scales'][0][0] = self.t0
+		return [ohdr]
+
+def gold_fold(data, period, nbin, dm, t0, dt, f0, df, subint_nframe):
+	ntime, npol, nchan = data.shape
+	freqs  = f0 + np.arange(nchan)*df
+	delays = KDM * dm * (freqs**-2 - freqs.max()**-2)
+	nsubint = ntime // subint_nframe
+	profiles = np.zeros((nsubint, npol, nchan, nbin))
+	hits     = np.zeros((nsubint, 1,    nchan, nbin))
+	for t in xrange(nsubint*subint_nframe):
+		for c in xrange(nchan):
+			phase = (t0 + t*dt - delays[c]) / period
+			phase -= np.floor(phase)
+			b = int(phase * nbin)
+			profiles[t // subint_nframe, :, c, b] += data[t, :, c]
+			hits[t // subint_nframe, :, c, b] += 1
+	return profiles / np.maximum(hits, 1)
+
+class FoldBlockTest(unittest.TestCase):
+	def setUp(self):
+		np.random.seed(1234)
+		self.tempdir = tempfile.mkdtemp()
+	def tearDown(self):
+		shutil.rmtree(self.tempdir)
+	def run_fold(self, data, period, nbin, dm, subint_nframe, gulp_nframe=256,
+	             t0=0., dt=1e-3, f0=1200., df=2., path=None):
+		with bfp.Pipeline() as pipeline:
+			source = TimedFilterbankSourceBlock([data], gulp_nframe, t0,
+			                                    f0, df, dt)
+			profiles = blocks.fold(source, period, nbin, dm, subint_nframe)
+			sink = ArraySinkBlock(profiles)
+			if path is not None:
+				blocks.write_sigproc(profiles, path, gulp_nframe=1)
+			pipeline.run()
+		return sink
+	def test_matches_gold(self):
+		data = np.random.normal(size=(1000, 2, 16)).astype(np.float32)
+		sink = self.run_fold(data, 0.0371, 32, 20., 300)
+		profiles = sink.result()
+		self.assertEqual(profiles.shape, (3, 2, 16, 32))
+		expected = gold_fold(data, 0.0371, 32, 20., 0., 1e-3, 1200., 2., 300)
+		np.testing.assert_allclose(profiles, expected, rtol=1e-5, atol=1e-5)
+	def test_dispersed_pulse(self):
+		ntime, nchan, nbin = 4096, 32, 64
+		period, dm, dt, f0, df = 0.1, 30., 1e-3, 1200., 4.
+		freqs  = f0 + np.arange(nchan)*df
+		delays = KDM * dm * (freqs**-2 - freqs.max()**-2)
+		t = np.arange(ntime)[:,None]*dt - delays
+		pulse  = (np.fmod(t + period, period) / period * nbin).astype(int) == 10
+		data = np.random.normal(size=(ntime, 1, nchan)).astype(np.float32)
+		data[:,0] += 20 * pulse
+		sink = self.run_fold(data, period, nbin, dm, 2048, dt=dt, f0=f0, df=df)
+		profile = sink.result().sum(axis=(1,2))
+		self.assertEqual(list(np.argmax(profile, axis=1)), [10, 10])
+	def test_header_and_sigproc_output(self):
+		data = np.random.normal(size=(1000, 1, 8)).astype(np.float32)
+		sink = self.run_fold(data, 0.01, 16, 0., 250, t0=1.5e9,
+		                     path=self.tempdir)
+		otensor = sink.header['_tensor']
+		self.assertEqual(otensor['labels'], ['time', 'pol', 'freq', 'phase'])
+		self.assertEqual(otensor['shape'],  [-1, 1, 8, 16])
+		np.testing.assert_allclose(otensor['scales'][0], [1.5e9, 0.25])
+		filenames = sorted(glob.glob(os.path.join(self.tempdir, '*.tim')))
+		self.assertEqual(len(filenames), 4)
+		with open(filenames[0], 'rb') as f:
+			hdr = sigproc._read_header(f)
+			self.assertEqual(hdr['nbins'],  16)
+			self.assertEqual(hdr['nchans'], 8)
+			profile = np.fromfile(f, np.float32)
+		np.testing.assert_allclose(profile.reshape(1, 8, 16), sink.result()[0])
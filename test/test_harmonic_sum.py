@@ -0,0 +1,112 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from bifrost.blocks.harmonic_sum import CANDIDATE_FIELDS
+from bifrost.DataType import DataType
+
+from test_pipeline_executor import ArraySourceBlock, ArraySinkBlock
+
+class SpectrumSourceBlock(ArraySourceBlock):
+	"""Testing-only block which emits [time, pol, freq] power spectra"""
+	def __init__(self, arrays, gulp_nframe, f0=0., df=1., *args, **kwargs):
+		super(SpectrumSourceBlock, self).__init__(arrays, gulp_nframe,
+		                                          *args, **kwargs)
+		self.f0, self.df = f0, df
+	def on_sequence(self, reader, index):
+		return [{'name': 'array_%i' % index,
+		         '_tensor': {'dtype':  str(DataType(reader.array.dtype)),
+		                     'shape':  [-1] + list(reader.array.shape[1:]),
+		                     'labels': ['time', 'pol', 'freq'],
+		                     'scales': [[0, 2.], None, [self.f0, self.df]],
+		                     'units':  ['s', None, 'Hz']}}]
+
+def gold_harmonic_sum(data, nharms, c=0.):
+	"""Harmonic sums of [..., freq] spectra with bin i at frequency i + c"""
+	nfreq = data.shape[-1]
+	sums = np.zeros(data.shape[:-1] + (len(nharms), nfreq), np.float32)
+	for f in xrange(nfreq):
+		total = 0
+		for k in xrange(1, max(nharms) + 1):
+			lo = max(int(np.floor(k*(f + c - 0.5) - c + 0.5)), 0)
+			hi = min(int(np.floor(k*(f + c + 0.5) - c + 0.5)), nfreq)
+			if lo < hi:
+				total = total + data[..., lo:hi].max(axis=-1)
+			if k in nharms:
+				sums[..., nharms.index(k), f] = total
+	return sums
+
+class HarmonicSumTest(unittest.TestCase):
+	def setUp(self):
+		np.random.seed(1234)
+	def run_harmonic_sum(self, data, gulp_nframe=16, **kwargs):
+		with bfp.Pipeline() as pipeline:
+			source = SpectrumSourceBlock([data], gulp_nframe,
+			                             kwargs.pop('f0', 0.),
+			                             kwargs.pop('df', 1.))
+			sink = ArraySinkBlock(blocks.harmonic_sum(source, **kwargs))
+			pipeline.run()
+		return sink
+	def test_matches_gold(self):
+		data = np.random.exponential(size=(40, 2, 300)).astype(np.float32)
+		sink = self.run_harmonic_sum(data, nharms=[1, 2, 4, 8, 16])
+		otensor = sink.header['_tensor']
+		self.assertEqual(otensor['labels'], ['time', 'pol', 'harmonic', 'freq'])
+		self.assertEqual(otensor['shape'],  [-1, 2, 5, 300])
+		np.testing.assert_allclose(sink.result(),
+		                           gold_harmonic_sum(data, [1, 2, 4, 8, 16]),
+		                           rtol=1e-6)
+	def test_offset_frequencies(self):
+		# E.g., fftshifted spectra, with bin i at frequency (i - 64)*0.5
+		data = np.random.exponential(size=(8, 1, 128)).astype(np.float32)
+		sink = self.run_harmonic_sum(data, nharms=[2, 4], f0=-32., df=0.5)
+		np.testing.assert_allclose(sink.result(),
+		                           gold_harmonic_sum(data, [2, 4], c=-64.),
+		                           rtol=1e-6)
+	def test_candidates(self):
+		nfreq = 1024
+		data = np.random.exponential(size=(32, 2, nfreq)).astype(np.float32)
+		# A periodic signal with power in the first 8 harmonics of bin 50
+		data[20, 1, 50:8*50+1:50] += 10.
+		sink = self.run_harmonic_sum(data, nharms=[1, 2, 4, 8],
+		                             threshold=[25., 35., 40., 80.])
+		self.assertEqual(sink.header['candidate_fields'], CANDIDATE_FIELDS)
+		cands = sink.result()
+		power, freq, nharm, time, beam = cands[0]
+		self.assertEqual((freq, nharm, time, beam), (50., 8, 40., 1))
+		self.assertGreater(power, 80.)
+		self.assertIn((50., 4, 40., 1), [tuple(c[1:]) for c in cands])
+		# Note: Multiples of the fundamental may also be detected
+		self.assertLess(len(cands), 4)
+		self.assertTrue(np.all(np.mod(cands[:,1], 50) == 0))
+		self.assertTrue(np.all(np.diff(cands[:,0]) <= 0))
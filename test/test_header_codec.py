@@ -0,0 +1,79 @@
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""@package test_header_codec
+This file tests the binary encoding of sequence headers"""
+import unittest
+import json
+import numpy as np
+from bifrost.DataType import DataType
+from bifrost.header_codec import encode_header, decode_header, copy_header
+
+class TestHeaderCodec(unittest.TestCase):
+    """Check that headers survive encoding exactly as they would JSON"""
+    def setUp(self):
+        """Create a typical pipeline header"""
+        self.header = {
+            'name': 'seq_0', 'time_tag': 2**40, 'gulp_nframe': 1024,
+            'flag': True, 'missing': None,
+            '_tensor': {'dtype': DataType('ci8'),
+                        'shape': (-1, np.int64(64), 2),
+                        'labels': ['time', 'freq', 'pol'],
+                        'scales': [(0, 1e-6), (1400., np.float32(0.25)), None],
+                        'units': ['s', 'MHz', None]}}
+    def test_round_trip(self):
+        """Decoded header matches the JSON round trip"""
+        header = decode_header(encode_header(self.header))
+        self.header['_tensor']['dtype'] = str(self.header['_tensor']['dtype'])
+        self.header['_tensor']['shape'] = [-1, 64, 2]
+        self.header['_tensor']['scales'][1] = (1400., 0.25)
+        self.assertEqual(header, json.loads(json.dumps(self.header)))
+        self.assertIsInstance(header['_tensor']['shape'], list)
+    def test_json_header(self):
+        """JSON headers (e.g., from capture callbacks) are still decoded"""
+        header = {'name': 'seq_1', '_tensor': {'dtype': 'f32', 'shape': [-1]}}
+        self.assertEqual(decode_header(json.dumps(header)), header)
+    def test_memoized(self):
+        """Each distinct header is decoded only once"""
+        encoded = encode_header(self.header)
+        self.assertIs(decode_header(encoded), decode_header(encoded[:]))
+    def test_copy_header(self):
+        """copy_header returns an independent copy"""
+        header = decode_header(encode_header(self.header))
+        header_copy = copy_header(header)
+        self.assertEqual(header_copy, header)
+        header_copy['_tensor']['shape'][1] = 32
+        self.assertEqual(header['_tensor']['shape'][1], 64)
+        # Also works with objects that cannot be marshalled
+        self.assertEqual(copy_header(self.header)['_tensor']['dtype'],
+                         self.header['_tensor']['dtype'])
+    def test_bad_tensor(self):
+        """Tensors are checked against their schema"""
+        self.header['_tensor']['labels'] = ['time']
+        self.assertRaises(ValueError, encode_header, self.header)
+        del self.header['_tensor']['shape']
+        self.assertRaises(ValueError, encode_header, self.header)
@@ -31,12 +31,46 @@ import unittest
 import numpy as np
 import bifrost as bf
 
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Precompiles (or, with run=True, also runs and checks) a host map kernel
+_PRECOMPILE_SCRIPT = """
+import sys
+import numpy as np
+import bifrost as bf
+mode, func = sys.argv[1:]
+x = bf.asarray(np.arange(89*89, dtype=np.float32).reshape(89,89), 'system')
+x.flags['WRITEABLE'] = False
+y = bf.empty_like(x)
+bf.map.precompile(func, x=(x.shape, 'f32', 'system', True),
+                        y=(y.shape, 'f32', 'system'))
+if mode == 'run':
+	bf.map(func, x=x, y=y)
+	if func == "y = x*x":
+		np.testing.assert_equal(y, x*x)
+"""
+
+_cache_dir = None
+def setUpModule():
+	# Keeps kernels compiled by these tests out of the user's cache
+	global _cache_dir
+	_cache_dir = tempfile.mkdtemp()
+	os.environ['BIFROST_MAP_CACHE_DIR'] = _cache_dir
+def tearDownModule():
+	del os.environ['BIFROST_MAP_CACHE_DIR']
+	shutil.rmtree(_cache_dir)
+
 class TestMap(unittest.TestCase):
 	def setUp(self):
 		np.random.seed(1234)
-	def run_simple_test(self, x, funcstr, func):
+	def run_simple_test(self, x, funcstr, func, space='cuda'):
 		x_orig = x
-		x = bf.asarray(x, 'cuda')
+		x = bf.asarray(x, space)
 		y = bf.empty_like(x)
 		x.flags['WRITEABLE'] = False
 		x.bf.immutable = True # TODO: Is this actually doing anything? (flags is, just not sure about bf.immutable)
@@ -48,13 +82,13 @@ class TestMap(unittest.TestCase):
 		# Note: Using func(x) is dangerous because bf.ndarray does things like
 		#         lazy .conj(), which break when used as if it were np.ndarray.
 		np.testing.assert_equal(y, func(x_orig))
-	def run_simple_test_funcs(self, x):
-		self.run_simple_test(x, "y = x+1", lambda x: x+1)
-		self.run_simple_test(x, "y = x*3", lambda x: x*3)
+	def run_simple_test_funcs(self, x, space='cuda'):
+		self.run_simple_test(x, "y = x+1", lambda x: x+1, space)
+		self.run_simple_test(x, "y = x*3", lambda x: x*3, space)
 		# Note: Must use "f" suffix to avoid very slow double-precision math
-		self.run_simple_test(x, "y = rint(pow(x, 2.f))", lambda x: x**2)
-		self.run_simple_test(x, "auto tmp = x; y = tmp*tmp", lambda x: x*x)
-		self.run_simple_test(x, "y = x; y += x", lambda x: x+x)
+		self.run_simple_test(x, "y = rint(pow(x, 2.f))", lambda x: x**2, space)
+		self.run_simple_test(x, "auto tmp = x; y = tmp*tmp", lambda x: x*x, space)
+		self.run_simple_test(x, "y = x; y += x", lambda x: x+x, space)
 	def test_simple_1D(self):
 		n = 7919
 		x = np.random.randint(256, size=n)
@@ -174,3 +208,118 @@ class TestMap(unittest.TestCase):
 		a = a.copy('system')
 		b = b.copy('system')
 		np.testing.assert_equal(b, a[:,j,:])
+	def test_simple_2D_cpu(self):
+		n = 89
+		x = np.random.randint(256, size=(n,n))
+		self.run_simple_test_funcs(x, 'system')
+	def test_simple_3D_padded_cpu(self):
+		n = 23
+		x = np.random.randint(256, size=(n,n,n))
+		x = bf.asarray(x, space='system')
+		x = x[:,:,1:]
+		self.run_simple_test_funcs(x, 'system')
+	def test_broadcast_cpu(self):
+		n = 89
+		a = np.arange(n).astype(np.float32)
+		a = bf.asarray(a, space='system')
+		b = a[:,None]
+		c = bf.empty((a.shape[0],b.shape[0]), a.dtype, 'system')
+		bf.map("c = a*b", a=a, b=b, c=c)
+		np.testing.assert_equal(c, a*b)
+	def test_scalar_cpu(self):
+		n = 7919
+		x = np.random.randint(1, 256, size=n)
+		x = bf.asarray(x, space='system')
+		y = bf.empty_like(x)
+		bf.map("y = (x-m)/s", x=x, y=y, m=1, s=3)
+		np.testing.assert_equal(y, (x-1)//3)
+	def test_shift_cpu(self):
+		shape = (55,66,77)
+		a = np.random.randint(65536, size=shape).astype(np.int32)
+		a = bf.asarray(a, space='system')
+		b = bf.empty_like(a)
+		bf.map("b = a(_-a.shape()/2)", a=a, b=b)
+		np.testing.assert_equal(b, np.fft.fftshift(a))
+	def test_complex_cpu(self):
+		n = 89
+		real = np.random.randint(-127, 128, size=(n,n)).astype(np.float32)
+		imag = np.random.randint(-127, 128, size=(n,n)).astype(np.float32)
+		x = real + 1j*imag
+		self.run_simple_test(x, "y.assign(x.imag, x.real)",
+		                     lambda x: x.imag + 1j*x.real, 'system')
+		self.run_simple_test(x, "y = x*x.conj()", lambda x: x*x.conj(), 'system')
+		self.run_simple_test(x, "y = x.mag2()",   lambda x: x*x.conj(), 'system')
+	def test_explicit_indexing_cpu(self):
+		shape = (55,66,77)
+		a = np.random.randint(65536, size=shape).astype(np.int32)
+		a = bf.asarray(a, space='system')
+		b = bf.empty((a.shape[2],a.shape[0], a.shape[1]), a.dtype, 'system')
+		bf.map("b(i,j,k) = a(j,k,i)", b.shape, 'i', 'j', 'k', a=a, b=b)
+		np.testing.assert_equal(b, a.transpose([2,0,1]))
+	def test_precompile_cpu(self):
+		n = 89
+		x = np.random.randint(256, size=(n,n)).astype(np.float32)
+		x = bf.asarray(x, space='system')
+		x.flags['WRITEABLE'] = False
+		y = bf.empty_like(x)
+		bf.map.precompile("y = x*x", x=(x.shape, 'f32', 'system', True),
+		                             y=(y.shape, 'f32', 'system'))
+		bf.map.precompile("y = x*x", x=x, y=y)
+		bf.map("y = x*x", x=x, y=y)
+		np.testing.assert_equal(y, x*x)
+	def run_disk_cache_test(self, test, cxx='c++'):
+		# Note: The cache location is read once per process, so each step is
+		#         run in a fresh process (which also starts with an empty
+		#         in-memory kernel cache)
+		cache_dir = tempfile.mkdtemp()
+		try:
+			# Wraps the compiler to record each kernel it builds
+			cxx_wrapper = os.path.join(cache_dir, 'cxx')
+			compile_log = os.path.join(cache_dir, 'compiles.log')
+			with open(cxx_wrapper, 'w') as f:
+				f.write('#!/bin/sh\n'
+				        'case "$*" in *" -o "*) echo >> "%s";; esac\n'
+				        'exec %s "$@"\n' % (compile_log, cxx))
+			os.chmod(cxx_wrapper, 0o755)
+			env = dict(os.environ, BIFROST_MAP_CACHE_DIR=cache_dir,
+			           BIFROST_MAP_CXX=cxx_wrapper)
+			def run_script(mode, func="y = x*x"):
+				"""Returns the exit code and the total no. compiles so far"""
+				ret = subprocess.call([sys.executable, '-c',
+				                       _PRECOMPILE_SCRIPT, mode, func], env=env)
+				if not os.path.exists(compile_log):
+					return ret, 0
+				with open(compile_log) as f:
+					return ret, len(f.readlines())
+			def cache_files(pattern):
+				return glob.glob(os.path.join(cache_dir, pattern))
+			test(run_script, cache_files)
+		finally:
+			shutil.rmtree(cache_dir)
+	def test_precompile_cpu_disk_cache(self):
+		def test(run_script, cache_files):
+			self.assertEqual(run_script('precompile'), (0, 1))
+			libs = cache_files('host_*.so')
+			self.assertEqual(len(libs), 1)
+			self.assertEqual(cache_files('*.tmp*'), [])
+			# The cached kernel is loaded without being recompiled
+			self.assertEqual(run_script('run'), (0, 1))
+			self.assertEqual(cache_files('host_*.so'), libs)
+		self.run_disk_cache_test(test)
+	def test_precompile_cpu_disk_cache_fallback(self):
+		# This kernel needs full indexing, so the first (basic indexing)
+		#   compile fails
+		func = "y = x(_-x.shape()/2)"
+		def test(run_script, cache_files):
+			self.assertEqual(run_script('precompile', func), (0, 2))
+			self.assertEqual(len(cache_files('host_*.fail')), 1)
+			self.assertEqual(len(cache_files('host_*.so')), 1)
+			# Neither compile is repeated by a new process
+			self.assertEqual(run_script('run', func), (0, 2))
+		self.run_disk_cache_test(test)
+	def test_precompile_cpu_missing_compiler(self):
+		def test(run_script, cache_files):
+			ret, _ = run_script('precompile')
+			self.assertNotEqual(ret, 0)
+			self.assertEqual(cache_files('host_*'), [])
+		self.run_disk_cache_test(test, cxx='/nonexistent/c++')
@@ -0,0 +1,90 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from bifrost.blocks.pfb import pfb_coeffs
+
+from test_pipeline_executor import TensorSourceBlock, ArraySinkBlock
+
+def gold_pfb(data, nchan, ntap):
+	coeffs = pfb_coeffs(nchan, ntap)
+	nspectra = len(data) // nchan - (ntap - 1)
+	data = data[:(nspectra + ntap - 1)*nchan]
+	data = data.reshape((nspectra + ntap - 1, nchan) + data.shape[1:])
+	coeffs = coeffs.reshape(coeffs.shape + (1,) * (data.ndim - 2))
+	fir_output = sum(data[t:t+nspectra] * coeffs[t] for t in xrange(ntap))
+	if np.iscomplexobj(data):
+		return np.fft.fft(fir_output, axis=1)
+	else:
+		return np.fft.rfft(fir_output, axis=1)
+
+class PfbBlockTest(unittest.TestCase):
+	def setUp(self):
+		np.random.seed(1234)
+	def run_pfb(self, data, nchan, ntap, gulp_nframe=100):
+		with bfp.Pipeline() as pipeline:
+			source = TensorSourceBlock([data], gulp_nframe)
+			sink = ArraySinkBlock(blocks.pfb(source, nchan, ntap))
+			pipeline.run()
+		return sink
+	def test_complex(self):
+		data = np.random.normal(size=(1000, 2)).astype(np.float32).view(np.complex64)
+		data = data.reshape(1000)
+		sink = self.run_pfb(data, 16, 4)
+		np.testing.assert_allclose(sink.result(), gold_pfb(data, 16, 4),
+		                           rtol=1e-4, atol=1e-4)
+	def test_real_multi_axis(self):
+		data = np.random.normal(size=(1000, 2)).astype(np.float32)
+		sink = self.run_pfb(data, 32, 8, gulp_nframe=256)
+		result = sink.result()
+		self.assertEqual(result.shape, (1000 // 32 - 7, 17, 2))
+		np.testing.assert_allclose(result, gold_pfb(data, 32, 8),
+		                           rtol=1e-4, atol=1e-4)
+	def test_header(self):
+		data = np.zeros((1000, 2), dtype=np.complex64)
+		tensor = self.run_pfb(data, 16, 4).header['_tensor']
+		self.assertEqual(tensor['dtype'],  'cf32')
+		self.assertEqual(tensor['shape'],  [-1, 16, 2])
+		self.assertEqual(tensor['labels'], ['time', 'freq', 'pol'])
+		self.assertEqual(tensor['units'][:2], ['s', '1/s'])
+		np.testing.assert_allclose(tensor['scales'][0], [0, 16e-6])
+		np.testing.assert_allclose(tensor['scales'][1], [0, 1e6/16])
+	def test_leakage(self):
+		# A tone at a channel centre should not leak beyond its neighbours
+		nchan = 16
+		t = np.arange(4096)
+		data = np.exp(2j*np.pi*3./nchan*t).astype(np.complex64)
+		power = np.abs(self.run_pfb(data, nchan, 8).result())**2
+		power = power.mean(axis=0)
+		self.assertEqual(np.argmax(power), 3)
+		self.assertLess(power[6:].max(), 1e-6 * power[3])
@@ -0,0 +1,155 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+
+from test_pipeline_executor import ArraySourceBlock, ArraySinkBlock, ScaleBlock
+from contextlib2 import ExitStack
+from copy import deepcopy
+import time
+
+class WindowBlock(bfp.TransformBlock):
+	"""Testing-only block which reads overlapping gulps and commits only the
+	    frames that are not part of the overlap"""
+	def __init__(self, iring, noverlap, *args, **kwargs):
+		super(WindowBlock, self).__init__(iring, *args, **kwargs)
+		self.noverlap = noverlap
+	def on_sequence(self, iseq):
+		gulp_nframe = iseq.header['gulp_nframe']
+		return deepcopy(iseq.header), slice(0, gulp_nframe + self.noverlap,
+		                                    gulp_nframe)
+	def on_data(self, ispan, ospan):
+		nframe = max(ispan.nframe - self.noverlap, 0)
+		ospan.data[:nframe] = ispan.data[:nframe] + ispan.data[self.noverlap:]
+		return nframe
+
+class EventTest(unittest.TestCase):
+	def test_event(self):
+		event = bf.device.Event()
+		event.record()
+		event.synchronize()
+		self.assertTrue(event.query())
+		# Events can be recorded again once complete
+		self.assertTrue(event.record().query())
+		bf.device.stream_synchronize()
+
+class FakeSpan(object):
+	def __init__(self, nframe):
+		self.nframe = nframe
+		self.commit_nframe = None
+	def commit(self, nframe):
+		self.commit_nframe = nframe
+
+class CompletionQueueTest(unittest.TestCase):
+	def push(self, queue, ostride, log, start_time=None, on_retire=None):
+		ospan = FakeSpan(10)
+		stack = ExitStack()
+		stack.callback(log.append, ospan)
+		if start_time is None:
+			start_time = time.time()
+		queue.push(stack, [ospan], [ostride], start_time, on_retire)
+		return ospan
+	def test_host_work_retired_immediately(self):
+		queue = bfp._CompletionQueue(2)
+		log = []
+		ospan = self.push(queue, 10, log)
+		self.assertEqual(len(queue), 0)
+		self.assertEqual(log, [ospan])
+		self.assertEqual(ospan.commit_nframe, 10)
+	def test_partial_commit(self):
+		queue = bfp._CompletionQueue(2)
+		log = []
+		ospans = [self.push(queue, 10, log), self.push(queue, 3, log)]
+		self.assertEqual(len(queue), 0)
+		self.assertEqual(log, ospans)
+		self.assertEqual(ospans[1].commit_nframe, 3)
+	def test_process_time(self):
+		queue = bfp._CompletionQueue(2)
+		log, process_times = [], []
+		start_time = time.time() - 10
+		self.push(queue, 10, log, start_time, process_times.append)
+		# Time already charged to the previous gulp is not counted again
+		self.push(queue, 10, log, start_time, process_times.append)
+		self.assertEqual(len(process_times), 2)
+		self.assertGreaterEqual(process_times[0], 10)
+		self.assertLess(process_times[1], 1)
+
+class PipelineAsyncTest(unittest.TestCase):
+	def run_pipeline(self, noverlap=0, **kwargs):
+		arrays = [np.arange(1000*4, dtype=np.float32).reshape(1000,4) + i
+		          for i in xrange(3)]
+		with bfp.Pipeline(buffer_nframe=4096) as pipeline:
+			data = ArraySourceBlock(arrays, 37)
+			with bfp.block_scope(**kwargs):
+				data = ScaleBlock(data)
+				if noverlap:
+					data = WindowBlock(data, noverlap)
+				sink = ArraySinkBlock(data)
+			pipeline.run()
+		return arrays, [np.concatenate(spans) for spans in sink.arrays]
+	def test_default_synchronous(self):
+		with bfp.Pipeline() as pipeline:
+			data = ArraySourceBlock([np.zeros((10,4), dtype=np.float32)], 5)
+			self.assertEqual(data._max_async_ngulp(), 0)
+			with bfp.block_scope(async_ngulp=2):
+				data = ScaleBlock(data)
+			self.assertEqual(data._max_async_ngulp(), 2)
+	def test_system_rings_resized(self):
+		arrays = [np.zeros((1000,4), dtype=np.float32)]
+		gulp_nbyte = 37*4*4
+		with bfp.Pipeline() as pipeline:
+			data = ArraySourceBlock(arrays, 37)
+			with bfp.block_scope(async_ngulp=8):
+				data = ScaleBlock(data)
+			ArraySinkBlock(data)
+			pipeline.run()
+		# Room for the in-flight gulps on top of the readers' buffering
+		self.assertGreaterEqual(data.orings[0].total_span(), 12*gulp_nbyte)
+	def test_async_ngulp(self):
+		arrays, outputs = self.run_pipeline(async_ngulp=0)
+		for array, output in zip(arrays, outputs):
+			np.testing.assert_equal(output, 2*array)
+		for async_ngulp in [1, 2]:
+			_, async_outputs = self.run_pipeline(async_ngulp=async_ngulp)
+			self.assertEqual(len(async_outputs), len(arrays))
+			for output, async_output in zip(outputs, async_outputs):
+				np.testing.assert_equal(async_output, output)
+	def test_overlap_partial_commit(self):
+		arrays, outputs = self.run_pipeline(noverlap=5, async_ngulp=0)
+		for array, output in zip(arrays, outputs):
+			np.testing.assert_equal(output, 2*(array[:-5] + array[5:]))
+		_, async_outputs = self.run_pipeline(noverlap=5, async_ngulp=2)
+		for output, async_output in zip(outputs, async_outputs):
+			np.testing.assert_equal(async_output, output)
+	def test_batched(self):
+		arrays, outputs = self.run_pipeline(batch_ngulp=4, async_ngulp=2)
+		for array, output in zip(arrays, outputs):
+			np.testing.assert_equal(output, 2*array)
@@ -0,0 +1,90 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+
+from test_pipeline_executor import ArraySourceBlock, QueueSinkBlock
+from copy import deepcopy
+import multiprocessing
+import time
+
+class BatchScaleBlock(bfp.TransformBlock):
+	"""Testing-only block which multiplies its input by 2 and records the
+	    nframe of each span it is given"""
+	def __init__(self, iring, variable_nframe, *args, **kwargs):
+		super(BatchScaleBlock, self).__init__(iring, *args, **kwargs)
+		self.variable_nframe = variable_nframe
+		self.nframes = []
+	def define_variable_nframe(self):
+		return self.variable_nframe
+	def on_sequence(self, iseq):
+		# Give the source time to get ahead
+		time.sleep(0.1)
+		return deepcopy(iseq.header)
+	def on_data(self, ispan, ospan):
+		self.nframes.append(ispan.nframe)
+		ospan.data[...] = ispan.data * 2
+
+class PipelineBatchTest(unittest.TestCase):
+	def run_batch_test(self, variable_nframe, **kwargs):
+		gulp_nframe = 37
+		arrays = [np.arange(1000*4, dtype=np.float32).reshape(1000,4) + i
+		          for i in xrange(3)]
+		queue = multiprocessing.Queue()
+		with bfp.Pipeline(buffer_nframe=4096) as pipeline:
+			data = ArraySourceBlock(arrays, gulp_nframe)
+			with bfp.block_scope(batch_ngulp=8, **kwargs):
+				scale = BatchScaleBlock(data, variable_nframe)
+			QueueSinkBlock(scale, queue)
+			pipeline.run()
+		for i, array in enumerate(arrays):
+			name, nframe, total = queue.get(timeout=10)
+			self.assertEqual(name,   'array_%i' % i)
+			self.assertEqual(nframe, len(array))
+			self.assertEqual(total,  2 * array.astype(np.float64).sum())
+		for nframe in scale.nframes:
+			self.assertLessEqual(nframe, 8 * gulp_nframe)
+		# All but the last span of each sequence must be whole gulps
+		self.assertTrue(all(nframe % gulp_nframe in (0, 1000 % gulp_nframe)
+		                    for nframe in scale.nframes))
+		return scale.nframes
+	def test_batched(self):
+		nframes = self.run_batch_test(True)
+		self.assertEqual(max(nframes), 8 * 37)
+	def test_not_variable_nframe(self):
+		nframes = self.run_batch_test(False)
+		self.assertEqual(max(nframes), 37)
+	def test_batch_latency(self):
+		# A latency bound smaller than the processing time of one gulp
+		#   disables batching once the processing time has been measured.
+		nframes = self.run_batch_test(True, batch_latency=1e-9)
+		self.assertEqual(set(nframes[1:]), set([37, 1000 % 37]))
@@ -0,0 +1,219 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+from bifrost.DataType import DataType
+
+from copy import deepcopy
+import multiprocessing
+import threading
+import Queue
+
+class ArraySourceBlock(bfp.SourceBlock):
+	"""Testing-only block which emits each of a list of arrays as a sequence"""
+	class Reader(object):
+		def __init__(self, array):
+			self.array = array
+			self.pos   = 0
+		def __enter__(self):
+			return self
+		def __exit__(self, type, value, tb):
+			pass
+	def __init__(self, arrays, gulp_nframe, *args, **kwargs):
+		super(ArraySourceBlock, self).__init__(range(len(arrays)), gulp_nframe,
+		                                       *args, **kwargs)
+		self.arrays = arrays
+	def create_reader(self, index):
+		return ArraySourceBlock.Reader(self.arrays[index])
+	def on_sequence(self, reader, index):
+		return [{'name': 'array_%i' % index,
+		         '_tensor': {'dtype': 'f32',
+		                     'shape': [-1] + list(reader.array.shape[1:])}}]
+	def on_data(self, reader, ospans):
+		ospan = ospans[0]
+		nframe = min(ospan.nframe, len(reader.array) - reader.pos)
+		ospan.data[:nframe] = reader.array[reader.pos:reader.pos+nframe]
+		reader.pos += nframe
+		return [nframe]
+
+class TensorSourceBlock(ArraySourceBlock):
+	"""Testing-only block which emits each array as a [time, ...] sequence"""
+	def on_sequence(self, reader, index):
+		ndim = reader.array.ndim
+		return [{'name': 'array_%i' % index,
+		         '_tensor': {'dtype':  str(DataType(reader.array.dtype)),
+		                     'shape':  [-1] + list(reader.array.shape[1:]),
+		                     'labels': ['time'] + ['pol'] * (ndim - 1),
+		                     'scales': [[0, 1e-6]] + [None] * (ndim - 1),
+		                     'units':  ['s'] + [None] * (ndim - 1)}}]
+
+class FilterbankSourceBlock(ArraySourceBlock):
+	"""Testing-only block which emits arrays as [time, pol, freq] filterbank
+	    sequences"""
+	def __init__(self, arrays, gulp_nframe, f0, df, dt, *args, **kwargs):
+		super(FilterbankSourceBlock, self).__init__(arrays, gulp_nframe,
+		                                            *args, **kwargs)
+		self.f0, self.df, self.dt = f0, df, dt
+	def on_sequence(self, reader, index):
+		ohdr = super(FilterbankSourceBlock, self).on_sequence(reader, index)[0]
+		ohdr['_tensor'].update({'labels': ['time', 'pol', 'freq'],
+		                        'scales': [[0, self.dt], None,
+		                                   [self.f0, self.df]],
+		                        'units':  ['s', None, 'MHz']})
+		return [ohdr]
+
+class ArraySinkBlock(bfp.SinkBlock):
+	"""Testing-only block which gathers the header and data of each sequence"""
+	def __init__(self, iring, *args, **kwargs):
+		super(ArraySinkBlock, self).__init__(iring, *args, **kwargs)
+		self.headers = []
+		self.arrays  = []
+	@property
+	def header(self):
+		return self.headers[-1]
+	def on_sequence(self, iseq):
+		self.headers.append(iseq.header)
+		self.arrays.append([])
+	def on_data(self, ispan):
+		self.arrays[-1].append(ispan.data.copy())
+	def result(self, axis=0):
+		"""Returns the data of the last sequence as a single array"""
+		return np.concatenate(self.arrays[-1], axis=axis)
+
+class ScaleBlock(bfp.TransformBlock):
+	"""Testing-only block which multiplies its input by 2 and records the
+	    threads it ran in"""
+	def __init__(self, iring, *args, **kwargs):
+		super(ScaleBlock, self).__init__(iring, *args, **kwargs)
+		self.thread_names = set()
+	def on_sequence(self, iseq):
+		return deepcopy(iseq.header)
+	def on_data(self, ispan, ospan):
+		self.thread_names.add(threading.current_thread().name)
+		ospan.data[...] = ispan.data * 2
+
+class QueueSinkBlock(bfp.SinkBlock):
+	"""Testing-only block which puts each sequence's name, length and sum
+	    into a (multiprocessing) queue"""
+	def __init__(self, iring, queue, *args, **kwargs):
+		super(QueueSinkBlock, self).__init__(iring, *args, **kwargs)
+		self.queue = queue
+	def on_sequence(self, iseq):
+		self.nframe = 0
+		self.total  = 0.
+	def on_sequence_end(self, iseq):
+		self.queue.put((iseq.header['name'], self.nframe, self.total))
+	def on_data(self, ispan):
+		self.nframe += ispan.nframe
+		self.total  += float(ispan.data.astype(np.float64).sum())
+
+class FailingBlock(bfp.TransformBlock):
+	"""Testing-only block which raises as soon as it sees a sequence"""
+	def on_sequence(self, iseq):
+		raise ValueError("Testing failure during startup")
+	def on_data(self, ispan, ospan):
+		pass
+
+class PipelineExecutorTest(unittest.TestCase):
+	def run_with_timeout(self, pipeline, executor, timeout=30):
+		result = {}
+		def target():
+			try:
+				pipeline.run(executor=executor)
+			except Exception as e:
+				result['error'] = e
+		thread = threading.Thread(target=target)
+		thread.daemon = True
+		thread.start()
+		thread.join(timeout)
+		if thread.is_alive():
+			pipeline.shutdown()
+			self.fail("Pipeline hung after a block failed")
+		return result.get('error', None)
+	def run_failure_test(self, executor, process):
+		arrays = [np.arange(1000*4, dtype=np.float32).reshape(1000,4)]
+		queue = multiprocessing.Queue()
+		with bfp.Pipeline(buffer_nframe=4096) as pipeline:
+			data = ArraySourceBlock(arrays, 37)
+			with bfp.block_scope(process=process):
+				data = FailingBlock(data)
+			QueueSinkBlock(data, queue)
+			return self.run_with_timeout(pipeline, executor)
+	def run_process_test(self, executor):
+		arrays = [np.arange(1000*4, dtype=np.float32).reshape(1000,4) + i
+		          for i in xrange(3)]
+		queue = multiprocessing.Queue()
+		with bfp.Pipeline(buffer_nframe=4096) as pipeline:
+			data = ArraySourceBlock(arrays, 37)
+			with bfp.block_scope(process=True):
+				data = ScaleBlock(data)
+				data = ScaleBlock(data)
+			QueueSinkBlock(data, queue)
+			pipeline.run(executor=executor)
+		for i, array in enumerate(arrays):
+			name, nframe, total = queue.get(timeout=10)
+			self.assertEqual(name,   'array_%i' % i)
+			self.assertEqual(nframe, len(array))
+			self.assertEqual(total,  4 * array.astype(np.float64).sum())
+		self.assertRaises(Queue.Empty, queue.get, timeout=0.1)
+	def test_process_scope(self):
+		self.run_process_test('thread')
+	def test_process_executor(self):
+		self.run_process_test('process')
+	def test_thread_failure(self):
+		# The failing block's thread ends and the rest of the pipeline drains
+		self.assertIsNone(self.run_failure_test('thread', process=False))
+	def test_process_scope_failure(self):
+		error = self.run_failure_test('thread', process=True)
+		self.assertIsInstance(error, RuntimeError)
+	def test_process_executor_failure(self):
+		error = self.run_failure_test('process', process=False)
+		self.assertIsInstance(error, RuntimeError)
+	def test_fused_scope(self):
+		arrays = [np.arange(1000*4, dtype=np.float32).reshape(1000,4) + i
+		          for i in xrange(3)]
+		queue = multiprocessing.Queue()
+		with bfp.Pipeline(buffer_nframe=4096) as pipeline:
+			data = ArraySourceBlock(arrays, 37)
+			with bfp.block_scope(fuse=True):
+				scale1 = ScaleBlock(data)
+				scale2 = ScaleBlock(scale1)
+				QueueSinkBlock(scale2, queue)
+			pipeline.run()
+		for i, array in enumerate(arrays):
+			name, nframe, total = queue.get(timeout=10)
+			self.assertEqual(name,   'array_%i' % i)
+			self.assertEqual(nframe, len(array))
+			self.assertEqual(total,  4 * array.astype(np.float64).sum())
+		# All of the fused blocks must have run in the same thread
+		self.assertEqual(len(scale1.thread_names), 1)
+		self.assertEqual(scale1.thread_names, scale2.thread_names)
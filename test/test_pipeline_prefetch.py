@@ -0,0 +1,148 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+
+from test_pipeline_executor import ArraySourceBlock, ScaleBlock, QueueSinkBlock
+import multiprocessing
+import threading
+import time
+
+class SlowArraySourceBlock(ArraySourceBlock):
+	"""Testing-only block which emits arrays as sequences with a delay on
+	    each read and records the threads it read in"""
+	def __init__(self, *args, **kwargs):
+		super(SlowArraySourceBlock, self).__init__(*args, **kwargs)
+		self.thread_names = set()
+	def on_data(self, reader, ospans):
+		self.thread_names.add(threading.current_thread().name)
+		time.sleep(0.001)
+		return super(SlowArraySourceBlock, self).on_data(reader, ospans)
+
+class TrackingArraySourceBlock(ArraySourceBlock):
+	"""Testing-only block which records the threads its readers were
+	    created in and which of its readers have been closed"""
+	class Reader(ArraySourceBlock.Reader):
+		def __init__(self, array, closed):
+			super(TrackingArraySourceBlock.Reader, self).__init__(array)
+			self.closed = closed
+		def __exit__(self, type, value, tb):
+			self.closed.append(self)
+	def __init__(self, *args, **kwargs):
+		super(TrackingArraySourceBlock, self).__init__(*args, **kwargs)
+		self.thread_names = set()
+		self.readers = []
+		self.closed  = []
+	def create_reader(self, index):
+		self.thread_names.add(threading.current_thread().name)
+		reader = TrackingArraySourceBlock.Reader(self.arrays[index],
+		                                         self.closed)
+		self.readers.append(reader)
+		return reader
+
+class FailingArraySourceBlock(ArraySourceBlock):
+	"""Testing-only block whose reads fail after the first gulp"""
+	def on_data(self, reader, ospans):
+		if reader.pos > 0:
+			raise IOError("Read failed")
+		return super(FailingArraySourceBlock, self).on_data(reader, ospans)
+
+class PipelinePrefetchTest(unittest.TestCase):
+	def run_prefetch_test(self, gulp_nframe, prefetch_depth):
+		arrays = [np.arange(1000*4, dtype=np.float32).reshape(1000,4) + i
+		          for i in xrange(3)]
+		queue = multiprocessing.Queue()
+		with bfp.Pipeline() as pipeline:
+			with bfp.block_scope(prefetch_depth=prefetch_depth):
+				source = SlowArraySourceBlock(arrays, gulp_nframe)
+			data = ScaleBlock(source)
+			QueueSinkBlock(data, queue)
+			pipeline.run()
+		for i, array in enumerate(arrays):
+			name, nframe, total = queue.get(timeout=10)
+			self.assertEqual(name,   'array_%i' % i)
+			self.assertEqual(nframe, len(array))
+			self.assertEqual(total,  2 * array.astype(np.float64).sum())
+		return source.thread_names
+	def test_prefetch(self):
+		thread_names = self.run_prefetch_test(37, 4)
+		self.assertEqual(len(thread_names), 1)
+		self.assertTrue(thread_names.pop().endswith('/prefetch'))
+	def test_prefetch_whole_gulps(self):
+		# The end of each sequence is found by a zero-length read
+		self.run_prefetch_test(40, 2)
+	def test_no_prefetch(self):
+		thread_names = self.run_prefetch_test(37, None)
+		self.assertFalse(any(name.endswith('/prefetch')
+		                     for name in thread_names))
+	def test_prefetch_read_error(self):
+		# Errors in the prefetch thread are raised by the block itself
+		arrays = [np.ones((1000,4), dtype=np.float32)]
+		with bfp.Pipeline() as pipeline:
+			with bfp.block_scope(prefetch_depth=4):
+				source = FailingArraySourceBlock(arrays, 37)
+		self.assertRaises(IOError, source.run)
+	def run_prefetch_nsource_test(self, **kwargs):
+		arrays = [np.arange(100*4, dtype=np.float32).reshape(100,4) + i
+		          for i in xrange(10)]
+		queue = multiprocessing.Queue()
+		with bfp.Pipeline() as pipeline:
+			with bfp.block_scope(**kwargs):
+				source = TrackingArraySourceBlock(arrays, 37)
+			QueueSinkBlock(source, queue)
+			pipeline.run()
+		for i, array in enumerate(arrays):
+			name, nframe, total = queue.get(timeout=10)
+			self.assertEqual(name,   'array_%i' % i)
+			self.assertEqual(nframe, len(array))
+			self.assertEqual(total,  array.astype(np.float64).sum())
+		self.assertEqual(len(source.closed), len(arrays))
+		return source
+	def test_prefetch_nsource(self):
+		source = self.run_prefetch_nsource_test(prefetch_nsource=3)
+		self.assertFalse(threading.current_thread().name in
+		                 source.thread_names)
+		self.assertFalse(source.name in source.thread_names)
+	def test_prefetch_nsource_and_depth(self):
+		self.run_prefetch_nsource_test(prefetch_nsource=2, prefetch_depth=2)
+	def test_prefetch_nsource_closes_unused(self):
+		arrays = [np.ones((100,4), dtype=np.float32)] * 10
+		with bfp.Pipeline() as pipeline:
+			with bfp.block_scope(prefetch_nsource=3):
+				source = TrackingArraySourceBlock(arrays, 37)
+		readers = source._open_readers()
+		next(readers)
+		next(readers)
+		readers.close()
+		# The two sources yielded are the caller's responsibility
+		self.assertEqual(len(source.readers), 2 + 3)
+		self.assertEqual(len(source.closed),  3)
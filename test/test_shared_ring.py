@@ -0,0 +1,156 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+from bifrost.ring2 import Ring
+
+import multiprocessing
+import os
+import time
+
+NFRAME = 16
+NGULP  = 50
+
+def write_shared_ring(name, ready_event):
+	ring = Ring.attach(name)
+	header = {'name': 'shared_test', 'time_tag': 0, 'gulp_nframe': NFRAME,
+	          '_tensor': {'dtype': 'f32', 'shape': [-1, 8]}}
+	with ring.begin_writing() as writer:
+		# Note: The ring holds only two gulps, so this relies on the reader's
+		#         guarantee to prevent data from being overwritten.
+		with writer.begin_sequence(header, 2*NFRAME) as oseq:
+			ready_event.wait()
+			for i in xrange(NGULP):
+				with oseq.reserve(NFRAME) as ospan:
+					ospan.data[...] = i
+
+def write_frame_indices(name, ready_event, ngulp, buf_nframe):
+	"""Writes ngulp gulps of NFRAME frames, each filled with its index"""
+	ring = Ring.attach(name)
+	header = {'name': 'guarantee_test', 'time_tag': 0, 'gulp_nframe': NFRAME,
+	          '_tensor': {'dtype': 'f32', 'shape': [-1, 64]}}
+	with ring.begin_writing() as writer:
+		with writer.begin_sequence(header, buf_nframe) as oseq:
+			ready_event.wait()
+			for i in xrange(ngulp):
+				with oseq.reserve(NFRAME) as ospan:
+					ospan.data[...] = np.arange(i*NFRAME,
+					                            (i+1)*NFRAME)[:,None]
+
+class SharedRingTest(unittest.TestCase):
+	def setUp(self):
+		self.name = 'test_shared_ring_%i' % os.getpid()
+	def test_attach_reader(self):
+		ring = Ring(space='shared', name=self.name)
+		self.assertEqual(ring.space, 'system')
+		ready_event = multiprocessing.Event()
+		writer = multiprocessing.Process(target=write_shared_ring,
+		                                 args=(self.name, ready_event))
+		writer.start()
+		ngulp = 0
+		with ring.open_earliest_sequence(guarantee=True) as iseq:
+			self.assertEqual(iseq.header['name'], 'shared_test')
+			ready_event.set()
+			for ispan in iseq.read(NFRAME):
+				if ispan.nframe == 0:
+					break
+				np.testing.assert_equal(ispan.data, ngulp)
+				ngulp += 1
+		writer.join()
+		self.assertEqual(writer.exitcode, 0)
+		self.assertEqual(ngulp, NGULP)
+	def start_writer(self, ngulp, buf_nframe):
+		ready_event = multiprocessing.Event()
+		writer = multiprocessing.Process(target=write_frame_indices,
+		                                 args=(self.name, ready_event,
+		                                       ngulp, buf_nframe))
+		writer.daemon = True
+		writer.start()
+		return writer, ready_event
+	def join_writer(self, writer):
+		writer.join(10)
+		if writer.is_alive():
+			writer.terminate()
+			self.fail("Writer is blocked")
+		self.assertEqual(writer.exitcode, 0)
+	def test_overlapping_reads(self):
+		# The ring holds only two gulps, so the overlap between successive
+		#   spans would be overwritten by the (faster) writer if it were not
+		#   kept guaranteed when each span is released.
+		ring = Ring(space='shared', name=self.name)
+		writer, ready_event = self.start_writer(NGULP, 2*NFRAME)
+		nframe_total = NGULP*NFRAME
+		stride = NFRAME // 4
+		end = 0
+		with ring.open_earliest_sequence(guarantee=True) as iseq:
+			ready_event.set()
+			for ispan in iseq.read(NFRAME, stride):
+				offset = ispan.frame_offset
+				self.assertEqual(ispan.nframe, min(NFRAME, nframe_total - offset))
+				np.testing.assert_equal(ispan.data[:,0],
+				                        np.arange(offset, offset + ispan.nframe))
+				end = offset + ispan.nframe
+				if ispan.nframe < NFRAME:
+					break
+				# Give the writer time to fill the ring
+				time.sleep(0.001)
+		self.join_writer(writer)
+		self.assertEqual(end, nframe_total)
+	def test_writer_not_blocked_after_release(self):
+		# The ring holds only a single gulp, so the writer can continue only
+		#   once the reader's guarantee has moved past the released span.
+		ring = Ring(space='shared', name=self.name)
+		writer, ready_event = self.start_writer(2, NFRAME)
+		with ring.open_earliest_sequence(guarantee=True) as iseq:
+			ready_event.set()
+			with iseq.acquire(0, NFRAME) as ispan:
+				np.testing.assert_equal(ispan.data[:,0], np.arange(NFRAME))
+			# Note: The sequence (and its guarantee) remains open here
+			self.join_writer(writer)
+			with iseq.acquire(NFRAME, NFRAME) as ispan:
+				np.testing.assert_equal(ispan.data[:,0],
+				                        np.arange(NFRAME, 2*NFRAME))
+	def test_name_in_use(self):
+		ring = Ring(space='shared', name=self.name)
+		self.assertRaises(RuntimeError, Ring, space='shared', name=self.name)
+	def test_name_too_long(self):
+		self.assertRaises(RuntimeError, Ring, space='shared', name='x'*256)
+	def test_sequence_name_too_long(self):
+		ring = Ring(space='shared', name=self.name)
+		header = {'name': 'x'*256, 'time_tag': 0, 'gulp_nframe': NFRAME,
+		          '_tensor': {'dtype': 'f32', 'shape': [-1, 8]}}
+		with ring.begin_writing() as writer:
+			self.assertRaises(RuntimeError, writer.begin_sequence,
+			                  header, NFRAME)
+	def test_attach_missing(self):
+		self.assertRaises(RuntimeError, Ring.attach, self.name + '_missing')
+	def test_unnamed(self):
+		self.assertRaises(ValueError, Ring, space='shared')
@@ -0,0 +1,108 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+import bifrost.sigproc2 as sigproc
+
+from test_pipeline_executor import ArraySinkBlock
+
+import os
+import shutil
+import tempfile
+
+class SigprocFileTest(unittest.TestCase):
+	def setUp(self):
+		self.tempdir = tempfile.mkdtemp()
+		np.random.seed(1234)
+	def tearDown(self):
+		shutil.rmtree(self.tempdir)
+	def create_file(self, nbit, nframe=1000, nifs=1, nchans=16):
+		"""Writes a filterbank of random samples and returns its name and
+		packed data"""
+		hdr = {'data_type':    1,
+		       'telescope_id': 0,
+		       'machine_id':   0,
+		       'tstart':       58000.,
+		       'tsamp':        1e-3,
+		       'fch1':         1400.,
+		       'foff':         -1.,
+		       'nbits':        nbit,
+		       'nifs':         nifs,
+		       'nchans':       nchans}
+		nbyte = nframe * nifs * nchans * nbit // 8
+		data = np.random.randint(0, 256, size=nbyte).astype(np.uint8)
+		filename = os.path.join(self.tempdir, 'test_%ibit.fil' % nbit)
+		with open(filename, 'wb') as f:
+			sigproc.write_header(hdr, f)
+			data.tofile(f)
+		return filename, data
+	def test_view(self):
+		filename, data = self.create_file(8)
+		with sigproc.SigprocFile(filename) as f:
+			nframe = f.nframe()
+			view = f.view(100)
+			self.assertEqual(view.shape, (100, 1, 16))
+			self.assertFalse(view.flags.writeable)
+			np.testing.assert_equal(view, f.read(0, 100))
+			# Sequential views continue from the current position
+			f.seek(0)
+			f.view(100)
+			np.testing.assert_equal(f.view(50), f.read(100, 150))
+			# Views stop at the end of the file
+			self.assertEqual(f.view(nframe - 10, nframe + 10).shape[0], 10)
+			self.assertEqual(f.view(10).shape[0], 0)
+	def test_view_packed(self):
+		filename, data = self.create_file(2)
+		with sigproc.SigprocFile(filename) as f:
+			view = f.view(0, 100)
+		# Views remain valid after the file is closed
+		self.assertEqual(view.shape, (100, 1, 4))
+		np.testing.assert_equal(view.ravel(), data[:400])
+	def run_source_test(self, nbit):
+		filename, data = self.create_file(nbit)
+		with sigproc.SigprocFile(filename) as f:
+			expected = f.read(0, -1)
+		with bfp.Pipeline() as pipeline:
+			data = blocks.read_sigproc([filename], gulp_nframe=128)
+			sink = ArraySinkBlock(data)
+			pipeline.run()
+		self.assertEqual(len(sink.arrays), 1)
+		np.testing.assert_equal(np.concatenate(sink.arrays[0]), expected)
+	def test_source_8bit(self):
+		self.run_source_test(8)
+	def test_source_4bit(self):
+		self.run_source_test(4)
+	def test_source_2bit(self):
+		self.run_source_test(2)
+	def test_source_1bit(self):
+		self.run_source_test(1)
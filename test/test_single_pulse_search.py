@@ -0,0 +1,111 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from bifrost.blocks.single_pulse_search import (cluster_candidates,
+                                                CANDIDATE_FIELDS)
+from bifrost.DataType import DataType
+
+from test_pipeline_executor import ArraySourceBlock, ArraySinkBlock
+
+class DmTimeSourceBlock(ArraySourceBlock):
+	"""Testing-only block which emits [time, pol, dispersion] arrays"""
+	def __init__(self, arrays, gulp_nframe, dt, ddm, *args, **kwargs):
+		super(DmTimeSourceBlock, self).__init__(arrays, gulp_nframe,
+		                                        *args, **kwargs)
+		self.dt, self.ddm = dt, ddm
+	def on_sequence(self, reader, index):
+		return [{'name': 'array_%i' % index,
+		         '_tensor': {'dtype':  str(DataType(reader.array.dtype)),
+		                     'shape':  [-1] + list(reader.array.shape[1:]),
+		                     'labels': ['time', 'pol', 'dispersion'],
+		                     'scales': [[0, self.dt], None, [0, self.ddm]],
+		                     'units':  ['s', None, 'pc cm^-3']}}]
+
+class SinglePulseSearchTest(unittest.TestCase):
+	def setUp(self):
+		np.random.seed(1234)
+	def run_search(self, data, gulp_nframe=500, **kwargs):
+		with bfp.Pipeline() as pipeline:
+			source = DmTimeSourceBlock([data], gulp_nframe, 1e-3, 0.5)
+			source = blocks.transpose(source, ['pol', 'dispersion', 'time'])
+			sink = ArraySinkBlock(blocks.single_pulse_search(source, **kwargs))
+			pipeline.run()
+		return sink
+	def test_injected_pulses(self):
+		ntime, npol, ndm = 4000, 2, 64
+		data = np.random.normal(size=(ntime, npol, ndm)).astype(np.float32)
+		# (time, pol, dm, width, amplitude)
+		pulses = [(700, 0, 10, 1, 12.), (1990, 1, 40, 8, 4.),
+		          (3100, 0, 55, 32, 2.)]
+		for t, pol, dm, width, amp in pulses:
+			# Note: Pulses are smeared across neighbouring DM trials
+			for ddm in xrange(-3, 4):
+				if 0 <= dm + ddm < ndm:
+					data[t:t+width, pol, dm+ddm] += amp * (1 - abs(ddm)/4.)
+		sink = self.run_search(data, threshold=7.0)
+		self.assertEqual(sink.header['candidate_fields'], CANDIDATE_FIELDS)
+		cands = sink.result()
+		self.assertEqual(cands.shape, (len(pulses), len(CANDIDATE_FIELDS)))
+		cands = cands[np.argsort(cands[:,1])]
+		for cand, (t, pol, dm, width, amp) in zip(cands, pulses):
+			snr, time, dm_, width_, beam, nmember = cand
+			expected_snr = amp * np.sqrt(width)
+			self.assertGreater(snr, 0.8 * expected_snr)
+			self.assertLess(   snr, 1.2 * expected_snr)
+			self.assertAlmostEqual(time,   t * 1e-3)
+			self.assertAlmostEqual(dm_,    dm * 0.5)
+			self.assertAlmostEqual(width_, width * 1e-3)
+			self.assertEqual(beam, pol)
+			self.assertGreater(nmember, 1)
+	def test_noise(self):
+		data = np.random.normal(size=(4000, 1, 32)).astype(np.float32)
+		data += 100. # Removed by the baseline subtraction
+		cands = self.run_search(data, threshold=7.0).arrays[-1]
+		self.assertEqual(sum(len(c) for c in cands), 0)
+	def test_max_ncandidate(self):
+		data = np.random.normal(size=(1000, 1, 16)).astype(np.float32)
+		data[100::200] += 20.
+		sink = self.run_search(data, gulp_nframe=1000, max_ncandidate=2)
+		cands = sink.result()
+		self.assertEqual(len(cands), 2)
+	def test_cluster_candidates(self):
+		# Two pulses in beam 0 (one smeared across DM) and one in beam 1
+		beam  = np.array([0,   0,   0,   0,   1  ])
+		dm    = np.array([10,  11,  13,  30,  10 ])
+		time  = np.array([100, 102, 104, 100, 100])
+		width = np.array([4,   4,   4,   1,   4  ])
+		snr   = np.array([8.,  9.,  7.,  10., 6. ])
+		peaks, nmembers = cluster_candidates(beam, dm, time, width, snr, 2, 0)
+		self.assertEqual(list(peaks),    [3, 1, 4])
+		self.assertEqual(list(nmembers), [1, 3, 1])
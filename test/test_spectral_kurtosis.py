@@ -0,0 +1,94 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from bifrost.blocks.spectral_kurtosis import sk_thresholds
+
+from test_pipeline_executor import TensorSourceBlock, ArraySinkBlock
+
+def gold_sk_flags(power, m, nd=1.):
+	nwindow = power.shape[0] // m
+	power = power[:nwindow*m].reshape((nwindow, m) + power.shape[1:])
+	power = power.astype(np.float64)
+	s1 = power.sum(axis=1)
+	s2 = (power**2).sum(axis=1)
+	sk = (m*nd + 1) / (m - 1) * (m*s2 / s1**2 - 1)
+	lower, upper = sk_thresholds(m, nd)
+	return (sk < lower) | (sk > upper)
+
+class SpectralKurtosisTest(unittest.TestCase):
+	def setUp(self):
+		np.random.seed(1234)
+	def run_sk(self, data, gulp_nframe=100, **kwargs):
+		with bfp.Pipeline() as pipeline:
+			source = TensorSourceBlock([data], gulp_nframe)
+			sink = ArraySinkBlock(blocks.spectral_kurtosis(source, **kwargs))
+			pipeline.run()
+		return sink
+	def make_power(self, ntime=2048, nchan=64):
+		power = np.random.exponential(size=(ntime, 2, nchan)).astype(np.float32)
+		power[:, :, 10] = 1.                    # Constant (e.g., a carrier)
+		power[300, 1, 20] = 500.                # Impulsive
+		power[1024:1152, 0, 30] *= np.arange(128) % 2 * 10 # Intermittent
+		return power
+	def test_mask(self):
+		power = self.make_power()
+		sink = self.run_sk(power, window_nframe=128, mode='mask')
+		self.assertEqual(sink.header['_tensor']['dtype'], 'u8')
+		np.testing.assert_allclose(sink.header['_tensor']['scales'][0],
+		                           [0, 128e-6])
+		mask = sink.result()
+		expected = gold_sk_flags(power, 128)
+		self.assertEqual(mask.shape, (16, 2, 64))
+		np.testing.assert_equal(mask.astype(bool), expected)
+		self.assertTrue(np.all(mask[:, :, 10]))
+		self.assertTrue(mask[2, 1, 20])
+		self.assertTrue(mask[8, 0, 30])
+		# Note: Some Gaussian noise windows are flagged by chance
+		self.assertLess(mask.mean(), 0.05)
+	def test_zero(self):
+		power = self.make_power(ntime=2000)
+		# Note: The gulp size is rounded up to a whole no. windows
+		result = self.run_sk(power, window_nframe=64, mode='zero').result()
+		self.assertEqual(result.shape, (31*64, 2, 64))
+		flags = gold_sk_flags(power, 64).repeat(64, axis=0)
+		expected = np.where(flags, 0, power[:31*64])
+		np.testing.assert_equal(result, expected)
+	def test_complex_input(self):
+		volts = np.random.normal(size=(1024, 1, 16, 2)).astype(np.float32)
+		volts = volts.view(np.complex64)[..., 0]
+		volts[:, 0, 5] = np.exp(0.1j * np.arange(1024)) # A tone
+		mask = self.run_sk(volts, window_nframe=256, mode='mask').result()
+		np.testing.assert_equal(mask.astype(bool),
+		                        gold_sk_flags(np.abs(volts)**2, 256))
+		self.assertTrue(np.all(mask[:, 0, 5]))
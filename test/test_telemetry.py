@@ -0,0 +1,146 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.telemetry as telemetry
+
+from copy import deepcopy
+import os
+import shutil
+import tempfile
+import time
+
+from test_pipeline_executor import ArraySourceBlock
+
+class SlowCopyBlock(bfp.TransformBlock):
+	"""Testing-only block which copies its input slowly"""
+	def on_sequence(self, iseq):
+		return deepcopy(iseq.header)
+	def on_data(self, ispan, ospan):
+		time.sleep(0.002)
+		ospan.data[...] = ispan.data
+
+class MonitorSinkBlock(bfp.SinkBlock):
+	"""Testing-only block which takes two snapshots of its own process's
+	block performance while the pipeline is running"""
+	def __init__(self, iring, *args, **kwargs):
+		super(MonitorSinkBlock, self).__init__(iring, *args, **kwargs)
+		self.monitor = telemetry.Monitor(pids=[os.getpid()])
+		self.ngulp = 0
+		self.rows = None
+	def on_sequence(self, iseq):
+		pass
+	def on_data(self, ispan):
+		self.ngulp += 1
+		if self.ngulp == 10:
+			self.monitor.update()
+		elif self.ngulp == 40:
+			self.rows = self.monitor.update()
+
+class TelemetryTest(unittest.TestCase):
+	def setUp(self):
+		self.logdir = tempfile.mkdtemp()
+	def tearDown(self):
+		shutil.rmtree(self.logdir)
+	def write_log(self, name, contents):
+		filename = os.path.join(self.logdir, str(os.getpid()), name)
+		if not os.path.exists(os.path.dirname(filename)):
+			os.makedirs(os.path.dirname(filename))
+		with open(filename, 'w') as f:
+			f.write(contents)
+	def test_load_logs(self):
+		self.write_log('Pipeline_0/FftBlock_0/perf',
+		               "acquire_time : 0.5\nngulp : 3\nname : fft\n")
+		self.write_log('udp_capture/stats', "nvalid         : 10\n")
+		self.write_log('99999999/perf', "")
+		self.assertEqual(telemetry.list_pids(self.logdir), [os.getpid()])
+		logs = telemetry.load_process_logs(os.getpid(), self.logdir)
+		self.assertEqual(logs['Pipeline_0/FftBlock_0/perf'],
+		                 {'acquire_time': 0.5, 'ngulp': 3, 'name': 'fft'})
+		self.assertEqual(logs['udp_capture/stats'], {'nvalid': 10})
+		perfs = telemetry.load_block_perfs(os.getpid(), self.logdir)
+		self.assertEqual(sorted(perfs.keys()),
+		                 ['99999999', 'Pipeline_0/FftBlock_0'])
+	def test_block_stats(self):
+		perf0 = {'start_time': 100., 'update_time': 110., 'ngulp': 10,
+		         'nframe': 100, 'nbyte': 1000, 'total_acquire_time': 1.,
+		         'total_reserve_time': 2., 'total_process_time': 7.,
+		         'in0_fill': 0.5}
+		perf1 = dict(perf0, update_time=120., ngulp=30, nframe=300,
+		             nbyte=3000, total_acquire_time=7.,
+		             total_reserve_time=3., total_process_time=9.)
+		stats = telemetry.block_stats(perf0)
+		self.assertAlmostEqual(stats['byte_rate'],  100.)
+		self.assertAlmostEqual(stats['duty_cycle'], 0.7)
+		self.assertEqual(stats['bound'],    'compute')
+		self.assertEqual(stats['in_fills'], [0.5])
+		# Rates are averaged over the time since the previous log
+		stats = telemetry.block_stats(perf1, perf0)
+		self.assertAlmostEqual(stats['gulp_rate'],    2.)
+		self.assertAlmostEqual(stats['frame_rate'],   20.)
+		self.assertAlmostEqual(stats['acquire_frac'], 0.6)
+		self.assertAlmostEqual(stats['reserve_frac'], 0.1)
+		self.assertAlmostEqual(stats['duty_cycle'],   0.2)
+		self.assertEqual(stats['bound'], 'input')
+		# Logs holding only the latest gulp's times
+		stats = telemetry.block_stats({'acquire_time': -1,
+		                               'reserve_time': 3.,
+		                               'process_time': 1.})
+		self.assertIsNone(stats['byte_rate'])
+		self.assertAlmostEqual(stats['reserve_frac'], 0.75)
+		self.assertEqual(stats['bound'], 'output')
+	def test_pipeline(self):
+		data = np.ones((64*100, 16), dtype=np.float32)
+		with bfp.Pipeline() as pipeline:
+			source = ArraySourceBlock([data], 64)
+			copied = SlowCopyBlock(source)
+			sink = MonitorSinkBlock(copied)
+			pipeline.run()
+		rows = sink.rows
+		self.assertIsNotNone(rows)
+		stats = dict((name.split('/')[-1], row_stats)
+		             for pid, name, row_stats in rows)
+		source, copied, sink = [block.name.split('/')[-1]
+		                        for block in [source, copied, sink]]
+		for name in [source, copied, sink]:
+			self.assertIn(name, stats)
+			self.assertGreater(stats[name]['frame_rate'], 0)
+		# The bytes processed by each block are logged
+		self.assertAlmostEqual(stats[copied]['byte_rate'] /
+		                       stats[copied]['frame_rate'],
+		                       16*4)
+		# The slow block is the bottleneck
+		self.assertEqual(stats[copied]['bound'], 'compute')
+		self.assertEqual(stats[source]['bound'], 'output')
+		self.assertEqual(stats[sink]['bound'],   'input')
+		self.assertEqual(len(stats[copied]['in_fills']), 1)
+		self.assertEqual(len(stats[source]['in_fills']), 0)
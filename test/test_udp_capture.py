@@ -0,0 +1,252 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import unittest
+import numpy as np
+import bifrost as bf
+
+from bifrost.address import Address
+from bifrost.udp_socket import UDPSocket
+from bifrost.udp_capture import UDPCapture, format_supported
+from bifrost.udp_generator import UDPGenerator
+from bifrost.ring2 import Ring
+from bifrost.libbifrost import _bf
+
+import ctypes
+import json
+import os
+import socket
+import struct
+
+def chips_packet(seq, src, nchan, nsrc, payload):
+	hdr = struct.pack('>BBBBBBHQ', src+1, 1, nchan, 1, 0, nsrc, 0, seq+1)
+	return hdr + payload.tobytes()
+
+def simple_packet(seq, src, nchan, nsrc, payload):
+	return struct.pack('>Q', seq) + payload.tobytes()
+
+def generic_packet(seq, src, nchan, nsrc, payload):
+	hdr = struct.pack('>QHHHH', seq, src, nsrc, 0, nchan)
+	return hdr + payload.tobytes()
+
+class UDPCaptureTest(unittest.TestCase):
+	"""Sends packets over the loopback interface and checks that they are
+	captured into the ring in [time, chan, src, chan_nbyte] order"""
+	def setUp(self):
+		np.random.seed(1234)
+		self.sock = UDPSocket()
+		self.sock.bind(Address('127.0.0.1', 0))
+		self.sock.timeout = 0.2
+		pysock = socket.fromfd(self.sock.fileno(),
+		                       socket.AF_INET, socket.SOCK_DGRAM)
+		self.port = pysock.getsockname()[1]
+		pysock.close()
+		self.headers = []
+	def tearDown(self):
+		self.sock.close()
+		del self.sock
+	def sequence_callback(self, nchan_nbyte):
+		def callback(seq0, chan0, nchan, nsrc, time_tag, hdr, hdr_size):
+			header = json.dumps({'name':     'capture',
+			                     'time_tag': seq0,
+			                     'chan0':    chan0,
+			                     '_tensor':  {'dtype': 'u8',
+			                                  'shape': [-1, nchan, nsrc,
+			                                            nchan_nbyte]}})
+			# Note: The header must stay alive until the sequence is closed
+			buf = ctypes.create_string_buffer(header, len(header))
+			self.headers.append(buf)
+			time_tag[0] = seq0
+			hdr[0]      = ctypes.cast(buf, ctypes.c_void_p)
+			hdr_size[0] = len(header)
+			return 0
+		return _bf.BFudpcapture_sequence_callback(callback)
+	def run_capture(self, fmt, make_packet, data, batch_npkt=16,
+	                buffer_ntime=8, extra_packets=[], skip_packets=[]):
+		"""Captures the packets made by make_packet(seq, src, nchan, nsrc,
+		payload) from data, or sent by make_packet(port) if data is only a
+		shape"""
+		if isinstance(data, np.ndarray):
+			ntime, nchan, nsrc, chan_nbyte = data.shape
+		else:
+			ntime, nchan, nsrc, chan_nbyte = data
+		ring = Ring(space='system')
+		callback = self.sequence_callback(chan_nbyte)
+		capture = UDPCapture(fmt, self.sock, ring, nsrc, 0, 9000,
+		                     buffer_ntime, 1, callback,
+		                     batch_npkt=batch_npkt)
+		if not isinstance(data, np.ndarray):
+			make_packet(self.port)
+		else:
+			tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			for t in xrange(ntime):
+				for src in xrange(nsrc):
+					if (t, src) in skip_packets:
+						continue
+					tx.sendto(make_packet(t, src, nchan, nsrc, data[t,:,src]),
+					          ('127.0.0.1', self.port))
+				if t == 0:
+					for pkt in extra_packets:
+						tx.sendto(pkt, ('127.0.0.1', self.port))
+			tx.close()
+		statuses = []
+		while True:
+			status = capture.recv()
+			statuses.append(status)
+			if status in (_bf.BF_CAPTURE_ENDED, _bf.BF_CAPTURE_NO_DATA,
+			              _bf.BF_CAPTURE_ERROR):
+				break
+		capture.end()
+		self.stats = capture.get_stats()
+		self.src_stats = [capture.get_stats(src) for src in xrange(nsrc)]
+		# Note: The log is removed when the capture is destroyed
+		logname = '/dev/shm/bifrost/%i/udp_capture/stats' % os.getpid()
+		with open(logname) as logfile:
+			self.stats_log = dict([field.strip() for field in line.split(':')]
+			                      for line in logfile.read().splitlines())
+		self.assertEqual(statuses[0],  _bf.BF_CAPTURE_STARTED)
+		self.assertEqual(statuses[-1], _bf.BF_CAPTURE_ENDED)
+		for iseq in ring.read(guarantee=True):
+			self.assertEqual(iseq.header['time_tag'], 0)
+			with iseq.acquire(0, ntime) as ispan:
+				self.assertEqual(ispan.nframe, ntime)
+				return np.array(ispan.data)
+	def test_chips(self):
+		data = np.random.randint(0, 256, size=(24, 4, 2, 32)).astype(np.uint8)
+		np.testing.assert_equal(self.run_capture('chips', chips_packet, data),
+		                        data)
+	def test_simple(self):
+		data = np.random.randint(0, 256, size=(24, 1, 1, 100)).astype(np.uint8)
+		np.testing.assert_equal(self.run_capture('simple', simple_packet, data),
+		                        data)
+	def test_generic(self):
+		for chan_nbyte in [6, 16, 32]:
+			data = np.random.randint(0, 256, size=(24, 5, 3, chan_nbyte))
+			data = data.astype(np.uint8)
+			np.testing.assert_equal(
+				self.run_capture('generic', generic_packet, data), data)
+	def test_generic_fixed_sizes(self):
+		# These channel sizes take the fixed-size copy paths, which must not
+		#   assume that payloads (which follow the header) are aligned
+		for chan_nbyte in [8, 16, 32, 64]:
+			for nchan in [1, 7]:
+				data = np.random.randint(0, 256,
+				                         size=(24, nchan, 3, chan_nbyte))
+				data = data.astype(np.uint8)
+				np.testing.assert_equal(
+					self.run_capture('generic', generic_packet, data), data)
+	def test_invalid_packets(self):
+		data = np.random.randint(0, 256, size=(24, 2, 2, 8)).astype(np.uint8)
+		payload = np.zeros((2, 8), dtype=np.uint8)
+		extra_packets = ['',                                       # Empty
+		                 generic_packet(1, 7, 2, 2, payload),      # Bad src
+		                 generic_packet(1, 0, 2, 2, payload)[:-1]] # Bad size
+		np.testing.assert_equal(
+			self.run_capture('generic', generic_packet, data,
+			                 extra_packets=extra_packets), data)
+	def test_batch_npkt(self):
+		data = np.random.randint(0, 256, size=(24, 4, 2, 32)).astype(np.uint8)
+		for batch_npkt in [1, 3, 64]:
+			np.testing.assert_equal(
+				self.run_capture('chips', chips_packet, data,
+				                 batch_npkt=batch_npkt), data)
+	def test_unsupported_format(self):
+		self.assertTrue(format_supported('chips'))
+		self.assertFalse(format_supported('nonexistent'))
+		ring = Ring(space='system')
+		self.assertRaises(ValueError, UDPCapture, 'nonexistent', self.sock,
+		                  ring, 1, 0, 9000, 8, 1, None)
+	def test_stats(self):
+		data = np.random.randint(0, 256, size=(24, 2, 2, 8)).astype(np.uint8)
+		payload = np.zeros((2, 8), dtype=np.uint8)
+		# Source 1 is missing 5 of the 8 time samples of the second buffer,
+		#   which is therefore blanked
+		skip_packets = [(t, 1) for t in xrange(8, 13)]
+		captured = self.run_capture('generic', generic_packet, data,
+		                            extra_packets=['', 'x'*20],
+		                            skip_packets=skip_packets)
+		expected = data.copy()
+		expected[8:16,:,1] = 0
+		np.testing.assert_equal(captured, expected)
+		nbyte = data[0,:,0].nbytes
+		stats = self.stats
+		self.assertEqual(stats['nvalid'],         24*2 - 5)
+		self.assertEqual(stats['nvalid_bytes'],   (24*2 - 5)*nbyte)
+		self.assertEqual(stats['ninvalid'],       2)
+		self.assertEqual(stats['nlate'],          0)
+		self.assertEqual(stats['ngood_bytes'],    (24*2 - 5)*nbyte)
+		self.assertEqual(stats['nmissing_bytes'], 5*nbyte)
+		self.assertEqual(stats['nblanked'],       1)
+		self.assertGreaterEqual(stats['reserve_time'], 0)
+		self.assertEqual(self.src_stats[0]['nmissing_bytes'], 0)
+		self.assertEqual(self.src_stats[1]['nmissing_bytes'], 5*nbyte)
+		self.assertEqual(self.src_stats[1]['nvalid'],         24 - 5)
+		self.assertEqual(self.src_stats[1]['nblanked'],       1)
+		self.assertEqual(self.src_stats[1]['ninvalid'],       0)
+		# The statistics are also logged, including per-source loss
+		log = self.stats_log
+		self.assertEqual(int(log['nvalid']), stats['nvalid'])
+		self.assertAlmostEqual(float(log['src1_loss']), 5/24., 5)
+		self.assertEqual(float(log['src0_loss']), 0)
+	def run_generator_capture(self, **impairments):
+		ntime, nchan, nsrc, chan_nbyte = 24, 2, 3, 8
+		def send(port):
+			sock = UDPSocket()
+			sock.connect(Address('127.0.0.1', port))
+			template = struct.pack('>QHHHH', 0, 0, nsrc, 0, nchan)
+			generator = UDPGenerator('generic', sock, nsrc, nchan*chan_nbyte,
+			                         hdr_template=template)
+			# Note: The first time sample is sent intact to start the sequence
+			generator.send(1)
+			generator.set_impairments(seed=1234, **impairments)
+			generator.send(ntime - 1)
+			self.gen_stats = generator.get_stats()
+			sock.close()
+		shape = (ntime, nchan, nsrc, chan_nbyte)
+		captured = self.run_capture('generic', send, shape)
+		t, c, s, b = np.meshgrid(*[np.arange(n) for n in shape], indexing='ij')
+		expected = ((t*nsrc + s) % 256).astype(np.uint8)
+		return captured, expected
+	def test_generator(self):
+		captured, expected = self.run_generator_capture(duplicate=0.1,
+		                                                reorder=0.2,
+		                                                reorder_distance=3)
+		np.testing.assert_equal(captured, expected)
+		gen_stats = self.gen_stats
+		self.assertGreater(gen_stats['nduplicated'], 0)
+		self.assertGreater(gen_stats['nreordered'],  0)
+		self.assertEqual(self.stats['nvalid'],   gen_stats['nsent'])
+		self.assertEqual(self.stats['ninvalid'], 0)
+		self.assertEqual(self.stats['nlate'],    0)
+	def test_generator_drops(self):
+		captured, expected = self.run_generator_capture(drop=0.05)
+		gen_stats = self.gen_stats
+		nbyte = expected[0,:,0].nbytes
+		self.assertGreater(gen_stats['ndropped'], 0)
+		self.assertEqual(self.stats['nvalid'], gen_stats['nsent'])
+		self.assertEqual(self.stats['nmissing_bytes'],
+		                 gen_stats['ndropped']*nbyte)
@@ -0,0 +1,186 @@
+
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import unittest
+import unittest
+import numpy as np
+import bifrost as bf
+
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from bifrost.address import Address
+from bifrost.udp_socket import UDPSocket
+from bifrost.udp_transmit import UDPTransmit, format_supported
+from bifrost.udp_generator import UDPGenerator
+from bifrost.libbifrost import _bf
+
+import socket
+import struct
+import time
+
+from test_pipeline_executor import ArraySourceBlock
+
+class LoopbackTest(unittest.TestCase):
+	"""Sends packets over the loopback interface and checks what arrives"""
+	def setUp(self):
+		np.random.seed(1234)
+		self.rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+		self.rx.bind(('127.0.0.1', 0))
+		self.rx.settimeout(1.)
+		self.sock = UDPSocket()
+		self.sock.connect(Address('127.0.0.1', self.rx.getsockname()[1]))
+	def tearDown(self):
+		self.rx.close()
+		self.sock.close()
+		del self.sock
+	def recv_packets(self, npacket):
+		return [self.rx.recv(65536) for _ in xrange(npacket)]
+
+class UDPTransmitTest(LoopbackTest):
+	def test_send_span_simple(self):
+		data = np.random.randint(0, 256, size=(10, 1, 40)).astype(np.uint8)
+		transmit = UDPTransmit(self.sock)
+		status = transmit.send_span('simple', data, seq0=100)
+		self.assertEqual(status, _bf.BF_TRANSMIT_CONTINUED)
+		for t, packet in enumerate(self.recv_packets(10)):
+			self.assertEqual(struct.unpack('>Q', packet[:8])[0], 100 + t)
+			self.assertEqual(packet[8:], data[t,0].tobytes())
+	def test_send_span_generic(self):
+		ntime, nsrc, nchan = 6, 3, 4
+		data = np.random.randint(0, 256, size=(ntime, nsrc, nchan, 2))
+		data = data.astype(np.uint8)
+		template = struct.pack('>QHHHH', 0, 0, nsrc, 7, nchan)
+		transmit = UDPTransmit(self.sock)
+		transmit.send_span('generic', data, seq0=5, src0=2,
+		                   hdr_template=template)
+		packets = self.recv_packets(ntime*nsrc)
+		for i, packet in enumerate(packets):
+			t, src = divmod(i, nsrc)
+			hdr = struct.unpack('>QHHHH', packet[:16])
+			self.assertEqual(hdr, (5 + t, 2 + src, nsrc, 7, nchan))
+			self.assertEqual(packet[16:], data[t,src].tobytes())
+	def test_send_span_chips(self):
+		data = np.random.randint(0, 256, size=(4, 2, 32)).astype(np.uint8)
+		template = struct.pack('>BBBBBBHQ', 0, 1, 1, 1, 0, 2, 0, 0)
+		transmit = UDPTransmit(self.sock)
+		transmit.send_span('chips', data, hdr_template=template)
+		for i, packet in enumerate(self.recv_packets(8)):
+			t, src = divmod(i, 2)
+			hdr = struct.unpack('>BBBBBBHQ', packet[:16])
+			# Note: CHIPS roach and seq numbers are 1-based
+			self.assertEqual(hdr, (src + 1, 1, 1, 1, 0, 2, 0, t + 1))
+			self.assertEqual(packet[16:], data[t,src].tobytes())
+	def test_send_span_raw(self):
+		data = np.arange(12, dtype=np.float32).reshape(3, 2, 2)
+		transmit = UDPTransmit(self.sock)
+		transmit.send_span('raw', data, hdr_template='HDR')
+		for i, packet in enumerate(self.recv_packets(6)):
+			self.assertEqual(packet, 'HDR' + data[i//2,i%2].tobytes())
+	def test_unsupported_format(self):
+		self.assertTrue(format_supported('generic'))
+		self.assertFalse(format_supported('nonexistent'))
+		transmit = UDPTransmit(self.sock)
+		data = np.zeros((1, 1, 8), dtype=np.uint8)
+		with self.assertRaises(ValueError):
+			transmit.send_span('nonexistent', data)
+	def test_sendmany_unequal_sizes(self):
+		packets = ['a'*10, 'bb'*50, 'c']
+		UDPTransmit(self.sock).sendmany(packets)
+		self.assertEqual(self.recv_packets(3), packets)
+	def test_rate_limit(self):
+		nbyte = 1000
+		data = np.zeros((200, 1, nbyte), dtype=np.uint8)
+		rate = 1e6
+		transmit = UDPTransmit(self.sock, rate=rate)
+		t0 = time.time()
+		transmit.send_span('raw', data)
+		elapsed = time.time() - t0
+		# Note: The first batch of packets is sent without waiting
+		self.assertGreater(elapsed, 0.8 * (200 - 64) * nbyte / rate)
+		self.assertEqual(len(self.recv_packets(200)), 200)
+	def test_block(self):
+		ntime, nsrc = 100, 2
+		array = np.random.rand(ntime, nsrc, 8).astype(np.float32)
+		template = struct.pack('>QHHHH', 0, 0, nsrc, 0, 8)
+		with bfp.Pipeline() as pipeline:
+			data = ArraySourceBlock([array], 16)
+			blocks.udp_transmit(data, self.sock, 'generic', template, seq0=10)
+			pipeline.run()
+		packets = self.recv_packets(ntime*nsrc)
+		for i, packet in enumerate(packets):
+			t, src = divmod(i, nsrc)
+			seq, psrc = struct.unpack('>QH', packet[:10])
+			self.assertEqual((seq, psrc), (10 + t, src))
+			np.testing.assert_equal(np.fromstring(packet[16:], np.float32),
+			                        array[t,src])
+
+class UDPGeneratorTest(LoopbackTest):
+	def test_send(self):
+		nsrc, payload_size = 3, 20
+		template = struct.pack('>QHHHH', 0, 0, nsrc, 0, 1)
+		generator = UDPGenerator('generic', self.sock, nsrc, payload_size,
+		                         src0=4, hdr_template=template)
+		generator.send(5, seq0=90)
+		generator.send(5)
+		for i, packet in enumerate(self.recv_packets(10*nsrc)):
+			t, src = divmod(i, nsrc)
+			hdr = struct.unpack('>QHHHH', packet[:16])
+			self.assertEqual(hdr, (90 + t, 4 + src, nsrc, 0, 1))
+			value = ((90 + t)*nsrc + src) % 256
+			self.assertEqual(packet[16:], chr(value)*payload_size)
+		stats = generator.get_stats()
+		self.assertEqual(stats['nsent'], 10*nsrc)
+		self.assertEqual(stats['nsent_bytes'], 10*nsrc*(16 + payload_size))
+	def test_impairments(self):
+		ntime, nsrc = 200, 2
+		generator = UDPGenerator('simple', self.sock, nsrc, 8)
+		generator.set_impairments(drop=0.1, duplicate=0.1, reorder=0.1,
+		                          reorder_distance=4, seed=1)
+		generator.send(ntime)
+		stats = generator.get_stats()
+		self.assertGreater(stats['ndropped'],    0)
+		self.assertGreater(stats['nduplicated'], 0)
+		self.assertGreater(stats['nreordered'],  0)
+		self.assertEqual(stats['nsent'], ntime*nsrc - stats['ndropped'] +
+		                                 stats['nduplicated'])
+		packets = self.recv_packets(stats['nsent'])
+		seqs = [struct.unpack('>Q', packet[:8])[0] for packet in packets]
+		self.assertNotEqual(seqs, sorted(seqs))
+		self.assertTrue(all(seq < ntime for seq in seqs))
+		# The same seed gives the same impairments
+		generator.set_impairments(drop=0.1, duplicate=0.1, reorder=0.1,
+		                          reorder_distance=4, seed=1)
+		generator.send(ntime, seq0=0)
+		packets2 = self.recv_packets(stats['nsent'])
+		self.assertEqual(packets2, packets)
+	def test_rate_limit(self):
+		generator = UDPGenerator('simple', self.sock, 1, 992, rate=1e6)
+		t0 = time.time()
+		generator.send(200)
+		elapsed = time.time() - t0
+		self.assertGreater(elapsed, 0.8 * (200 - 64) * 1000 / 1e6)
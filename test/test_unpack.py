@@ -64,3 +64,17 @@ class UnpackTest(unittest.TestCase):
 		                     [(0x87,),(0xA5,)]],
 		                    dtype='ci4')
 		self.run_unpack_to_ci8_test(iarray.byteswap().conj())
+	def test_u2_to_u8(self):
+		idata  = bf.ndarray([[0xE4, 0x1B]], dtype='u8')
+		iarray = bf.ndarray(buffer=idata.ctypes.data, shape=(1, 8),
+		                    dtype='u2', space='system')
+		oarray = bf.ndarray(shape=(1, 8), dtype='u8')
+		bf.unpack.unpack(iarray, oarray)
+		np.testing.assert_equal(oarray, [[0, 1, 2, 3, 3, 2, 1, 0]])
+	def test_i1_to_i8(self):
+		idata  = bf.ndarray([[0xA5]], dtype='u8')
+		iarray = bf.ndarray(buffer=idata.ctypes.data, shape=(1, 8),
+		                    dtype='i1', space='system')
+		oarray = bf.ndarray(shape=(1, 8), dtype='i8')
+		bf.unpack.unpack(iarray, oarray)
+		np.testing.assert_equal(oarray, [[-1, 0, -1, 0, 0, -1, 0, -1]])
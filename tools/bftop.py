@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Bifrost Authors. All rights reserved.
+# Copyright (c) 2016, NVIDIA CORPORATION. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Shows the performance of the pipeline blocks of all running bifrost
+processes, in the manner of top.
+
+For each block, the columns are:
+  MB/s, frames/s: Throughput
+  duty%:          Time spent processing
+  in-wait%:       Time spent waiting for input (acquiring spans)
+  out-wait%:      Time spent waiting for output space (reserving spans)
+  in-fill%:       How full the block's input ring(s) are
+  bound:          Which of processing, input or output dominates
+A block that is compute-bound with full input rings is a bottleneck, and
+the blocks upstream of it will be output-bound.
+"""
+
+import argparse
+import sys
+import time
+
+from bifrost.telemetry import Monitor, PROCLOG_DIR, get_command_line
+
+def format_rate(rate, scale=1.):
+	return '%10s' % ('-' if rate is None else '%.3f' % (rate / scale))
+
+def format_table(rows):
+	lines = []
+	pid = None
+	for row_pid, name, stats in rows:
+		if row_pid != pid:
+			pid = row_pid
+			lines.append('')
+			lines.append('PID %i: %s' % (pid, get_command_line(pid)))
+			lines.append('  %-32s %10s %10s %6s %9s %9s %8s %7s' %
+			             ('block', 'MB/s', 'frames/s', 'duty%',
+			              'in-wait%', 'out-wait%', 'in-fill%', 'bound'))
+		fills = '/'.join(['%.0f' % (fill*100) for fill in stats['in_fills']])
+		lines.append('  %-32s %s %s %6.1f %9.1f %9.1f %8s %7s' %
+		             (name[-32:],
+		              format_rate(stats['byte_rate'], 1e6),
+		              format_rate(stats['frame_rate']),
+		              stats['duty_cycle']*100,
+		              stats['acquire_frac']*100,
+		              stats['reserve_frac']*100,
+		              fills or '-',
+		              stats['bound']))
+	if not lines:
+		lines.append('No running pipelines found')
+	return '\n'.join(lines)
+
+def main(args):
+	monitor = Monitor(args.pid or None, args.logdir)
+	# Note: The first update averages over each block's whole lifetime
+	monitor.update()
+	try:
+		while True:
+			time.sleep(args.interval)
+			table = format_table(monitor.update())
+			if not args.once:
+				sys.stdout.write('\033[2J\033[H') # Clear the screen
+			print time.strftime('%Y-%m-%d %H:%M:%S'), \
+			    '(averaged over %gs)' % args.interval
+			print table
+			sys.stdout.flush()
+			if args.once:
+				break
+	except KeyboardInterrupt:
+		pass
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description="Monitor the performance of running bifrost pipelines")
+	parser.add_argument('-p', '--pid', type=int, action='append',
+	                    help="Only show this process (may be repeated)")
+	parser.add_argument('-i', '--interval', type=float, default=1.,
+	                    help="Update interval in seconds")
+	parser.add_argument('-1', '--once', action='store_true',
+	                    help="Print one update and exit")
+	parser.add_argument('--logdir', default=PROCLOG_DIR,
+	                    help="Base proclog directory")
+	main(parser.parse_args())